@@ -6,10 +6,9 @@ assumptions
     all arcs that bound water have unique (not-contact, not-fault) types
 
 ***
-IDENTITY copyCAF with MapUnitPolys to get copy2CAF
+find map units left and right of not-concealed arcs with MapUnitPolys
 
-make list of nodes-arcIDs in copy2CAF
-sort list on XY
+make dictionary of nodes-arcIDs, keyed by quantized XY
 if 3 arcs at node:
    figure out which two arcs have lowest hKey values for leftMapUnit or RightMapUnit
    set youngArcsDict[nodeID] = [youngArcID, youngArcID]
@@ -22,8 +21,7 @@ youngArcsDict for some nodes. Instead of a list of nodes-arcIDS, we could make a
 and only figure out youngArcsDict for those nodes where we will use the information
 
 ***
-Make list of nodes-arcIDs in copyCAF
-sort list on XY
+Make list of nodes-arcIDs in CAF, keyed by quantized XY
 
 if 2 arcs at node
     if arcsIdentical(), assign same mergeNumber to each
@@ -61,6 +59,8 @@ drop field mergeNumber and add any unconserved fields (Notes, Label, Symbol, ...
 
 import arcpy, os.path, sys
 from GeMS_utilityFunctions import *
+import merge_numbers as mn
+import side_units as su
 
 versionString = "GeMS_Deplanarize.py, version of 8/21/23"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_Deplanarize.py"
@@ -69,13 +69,10 @@ checkVersion(versionString, rawurl, "gems-tools-pro")
 
 # globals
 debug1 = False
-mergeNumber2ArcsDict = (
-    {}
-)  # key is mergeNumber, value is list of arcFIDs with this mergeNumber
-arc2MergeNumberDict = {}  # key is arcFID, value is mergeNumber
+mergeGroups = []  # lists of arcFIDs to be merged
 nodeName2ArcsDict = (
     {}
-)  # key is nodeName, value is list [ [arcFID,rMapUnit,lMapUnit],[arcFID,rMapUnit,lMapUnit],...]
+)  # key is node key, value is list [ [arcFID,lMapUnit,rMapUnit],[arcFID,lMapUnit,rMapUnit],...]
 hKeyDict = {}  # key is MapUnit, value is HierarchyKey
 
 
@@ -94,8 +91,6 @@ compareFieldsTypeIndex = 0
 compareFieldsIsConcealedIndex = 1
 
 searchRadius = 0.01
-
-mergeNumber = 1  # counter values used to define which arcs to merge: we dissolve on fields AND mergeNumber
 ################################
 
 
@@ -106,175 +101,43 @@ def smallerOf(a, b):
         return b
 
 
-def pointPairGeographicAzimuth(pt1, pt2):
-    dx = pt2[0] - pt1[0]
-    dy = pt2[1] - pt1[1]
-    azi = math.atan2(dy, dx)
-    azi = 90 - math.degrees(azi)
-    if azi < 0:
-        azi = azi + 360
-    return azi
-
-
-def startGeogDirection(lineSeg):
-    firstPoint = [lineSeg[0].X, lineSeg[0].Y]
-    secondPoint = [lineSeg[1].X, lineSeg[1].Y]
-    return pointPairGeographicAzimuth(firstPoint, secondPoint)
-
-
-def endGeogDirection(lineSeg):
-    lpt = len(lineSeg) - 1
-    ntlPoint = [lineSeg[lpt - 1].X, lineSeg[lpt - 1].Y]
-    lastPoint = [lineSeg[lpt].X, lineSeg[lpt].Y]
-    return pointPairGeographicAzimuth(lastPoint, ntlPoint)
-
-
-def nodeName(x, y):
-    xstr = str(int(round(x * 100)))
-    ystr = str(int(round(y * 100)))
-    return xstr + "_" + ystr
-
-
-def makeNodeName2ArcsDict(caf, fields):
-    # takes arc fc, list of fields (e.g. [Left_MapUnit, Right_MapUnit] )
-    #   makes to and from node fcs, concatenates, sorts, finds arc-ends
-    #   that share common XY values
-    # returns dictionary of arcs at each node, keyed to nodename
-    #    i.e., dict[nodename] = [[arc1 fields], [arc2 fields],...]
-    fv1 = os.path.dirname(caf) + "/xxxNfv1"
-    fv2 = os.path.dirname(caf) + "/xxxNfv12"
-
-    lenFields = len(fields)
-    addMsgAndPrint("  making endpoint feature classes")
-    testAndDelete(fv1)
-    arcpy.FeatureVerticesToPoints_management(caf, fv1, "BOTH_ENDS")
-    addMsgAndPrint("  adding XY values and sorting by XY")
-    arcpy.AddXY_management(fv1)
-    testAndDelete(fv2)
-    arcpy.Sort_management(
-        fv1, fv2, [["POINT_X", "ASCENDING"], ["POINT_Y", "ASCENDING"]]
-    )
-    ##fix fields statement and following field references
-    fields.append("SHAPE@XY")
-    indexShape = len(fields) - 1
-
-    isFirst = True
-    nArcs = 0
-    nodeList = []
-    with arcpy.da.SearchCursor(fv2, fields) as cursor:
-        for row in cursor:
-            x = row[indexShape][0]
-            y = row[indexShape][1]
-            arcFields = row[0:lenFields]
-            if isFirst:
-                isFirst = False
-                lastX = x
-                lastY = y
-                arcs = [arcFields]
-            elif abs(x - lastX) < searchRadius and abs(y - lastY) < searchRadius:
-                arcs.append(arcFields)
-            else:
-                nodeList.append([nodeName(lastX, lastY), arcs])
-                lastX = x
-                lastY = y
-                arcs = [arcFields]
-        nodeList.append([nodeName(lastX, lastY), arcs])
-
-    addMsgAndPrint("  " + str(len(nodeList)) + " distinct nodes")
-    addMsgAndPrint("  cleaning up")
-    for fc in fv1, fv2:
-        testAndDelete(fc)
-
-    nodeDict = {}
-    for n in nodeList:
-        nodeDict[n[0]] = n[1]
-    return nodeDict
-
-
-def makeNodeList(caf, fields1, arcDirs=False):
-    # takes arc fc, list of fields (e.g. [FID, Type, LocConfM] )
-    #   makes to and from node fcs, concatenates, sorts, finds arc-ends
-    #   that share common XY values
-    # returns list of arcs at each node, keyed to nodename
-    #    i.e., list of [nodename, [[arc1 fields], [arc2 fields],...] ]
-    #  and, if arcDirs == True, includes initial direction for each arc
-    tempCaf = os.path.dirname(caf) + "/xxxtempCaf"
-    fv1 = os.path.dirname(caf) + "/xxxfv1"
-    fv1a = os.path.dirname(caf) + "/xxxfv1a"
-    fv2 = os.path.dirname(caf) + "/xxxfv12"
-
-    fields = list(fields1)  # make a copy of fields1, so that we don't modify it
-    lenFields = len(fields)
-    if not arcDirs:
-        xCaf = caf
-    else:
-        addMsgAndPrint("  calculating line directions at line ends")
-        fields.append("LineDir")
-        lineDirIndex = len(fields) - 1
-        testAndDelete(tempCaf)
-        arcpy.Copy_management(caf, tempCaf)
-        xCaf = tempCaf
-        arcpy.AddField_management(tempCaf, "LineDir", "FLOAT")
-        arcpy.AddField_management(tempCaf, "EndDir", "FLOAT")
-        dirFields = ["SHAPE@", "LineDir", "EndDir"]
-        with arcpy.da.UpdateCursor(tempCaf, dirFields) as cursor:
-            for row in cursor:
-                lineSeg = row[0].getPart(0)
-                row[1] = startGeogDirection(lineSeg)
-                row[2] = endGeogDirection(lineSeg)
-                cursor.updateRow(row)
-        xcaf = tempCaf
-        lenFields = lenFields + 1
-    addMsgAndPrint("  making endpoint feature classes")
-    testAndDelete(fv1)
-    testAndDelete(fv1a)
-    arcpy.FeatureVerticesToPoints_management(xCaf, fv1, "START")
-    arcpy.FeatureVerticesToPoints_management(xCaf, fv1a, "END")
-    if arcDirs:
-        arcpy.CalculateField_management(fv1a, "LineDir", "!EndDir!", "PYTHON")
-    arcpy.Append_management(fv1a, fv1)
-    addMsgAndPrint("  adding XY values and sorting by XY")
-    arcpy.AddXY_management(fv1)
-    testAndDelete(fv2)
-    arcpy.Sort_management(
-        fv1, fv2, [["POINT_X", "ASCENDING"], ["POINT_Y", "ASCENDING"]]
-    )
-
-    ##fix fields statement and following field references
-    fields.append("SHAPE@XY")
-    indexShape = len(fields) - 1
-    FID = "ORIG_FID"
-    fields.append(FID)
-    indexFID = len(fields) - 1
-
-    isFirst = True
-    nArcs = 0
-    nodeList = []
-    with arcpy.da.SearchCursor(fv2, fields) as cursor:
+def readNodes(caf, mup):
+    # reads the arcs of caf into nodes keyed by their end point coordinates,
+    #   quantized to searchRadius
+    # returns list of [nodeKey, [[arcFID, (compareFields values)], ...]], sorted
+    #   by node key, and dict[nodeKey] = [[arcFID, lMapUnit, rMapUnit], ...] of
+    #   the not-concealed arcs at each node, with map units from mup
+    sr = arcpy.Describe(mup).spatialReference
+    index = mapUnitIndex(mup)
+    offset = 10 * sr.XYTolerance
+    ends = []
+    fields = ["OID@", "SHAPE@"] + compareFields
+    with arcpy.da.SearchCursor(caf, fields) as cursor:
         for row in cursor:
-            x = row[indexShape][0]
-            y = row[indexShape][1]
-            origFID = row[indexFID]
-            arcFields = row[0:lenFields]
-            if isFirst:
-                lastX = x
-                lastY = y
-                isFirst = False
-                arcs = []
-            if abs(x - lastX) < searchRadius and abs(y - lastY) < searchRadius:
-                arcs.append([origFID, arcFields])
-            else:
-                nodeList.append([nodeName(lastX, lastY), arcs])
-                arcs = [[origFID, arcFields]]
-                lastX = x
-                lastY = y
-        nodeList.append([nodeName(lastX, lastY), arcs])
-
-    addMsgAndPrint("  " + str(len(nodeList)) + " distinct nodes")
-    addMsgAndPrint("  cleaning up")
-    for fc in tempCaf, fv1, fv1a, fv2:
-        testAndDelete(fc)
-    return nodeList
+            shape = row[1]
+            if shape is None:
+                continue
+            arcFields = tuple(row[2:])
+            sides = None
+            if arcFields[compareFieldsIsConcealedIndex] == "N":
+                lmu, rmu = su.line_sides(
+                    lineParts(shape, sr), index, offset, sr.XYTolerance
+                )
+                # arcs that adjoin nothing (map boundaries!) get ""
+                sides = [row[0], lmu or "", rmu or ""]
+            for pt in (shape.firstPoint, shape.lastPoint):
+                ends.append((pt.X, pt.Y, row[0], arcFields, sides))
+    ends.sort(key=lambda e: (e[0], e[1]))
+
+    nodes = {}
+    sidesDict = {}
+    for x, y, arcFID, arcFields, sides in ends:
+        key = mn.node_key(x, y, searchRadius)
+        nodes.setdefault(key, []).append([arcFID, arcFields])
+        if sides is not None:
+            sidesDict.setdefault(key, []).append(sides)
+    addMsgAndPrint("  " + str(len(nodes)) + " distinct nodes")
+    return sorted(nodes.items()), sidesDict
 
 
 def threeArcsMeet(nodeName, arcs):
@@ -296,7 +159,7 @@ def threeArcsMeet(nodeName, arcs):
     try:
         arcPolyList = nodeName2ArcsDict[nodeName]
     except:
-        addMsgAndPrint("  " + nodeName + " has no entry in nodeName2ArcDict")
+        addMsgAndPrint("  " + str(nodeName) + " has no entry in nodeName2ArcDict")
         return [], arcs
     ay = []
     for arc in arcPolyList:
@@ -336,58 +199,6 @@ def arcAttribsSame(arcs):
         return arcsSame
 
 
-def setUniqueMergeNumbers(arcs):
-    global mergeNumber
-    if arcs != [None]:
-        try:
-            for anArc in arcs:
-                if not anArc[0] in list(arc2MergeNumberDict.keys()):
-                    mergeNumber += 1
-                    arc2MergeNumberDict[anArc[0]] = mergeNumber
-                    mergeNumber2ArcsDict[mergeNumber] = [anArc[0]]
-        except:
-            addMsgAndPrint("  setUniqueMergeNumbers failed")
-            addMsgAndPrint(str(arcs))
-            pass
-    return
-
-
-def setMatchingMergeNumbers(arcs):
-    global mergeNumber
-    # test that len(arcs) >= 2 else print error message and return
-    otherArcs = None
-    if arcs != None:
-        if len(arcs) >= 2:
-            mn = 0
-            arcIDs = []
-            for anArc in arcs:
-                arcIDs.append(anArc[0])
-                if anArc[0] in list(arc2MergeNumberDict.keys()):
-                    mn = arc2MergeNumberDict[anArc[0]]
-                    otherArcs = mergeNumber2ArcsDict[mn]
-            if mn == 0:  # no arc yet tagged with mergeNumber
-                mergeNumber += 1
-            else:  # got some arcs with this mn already
-                for oa in otherArcs:
-                    if not oa in arcIDs:
-                        arcIDs.append(oa)
-            for anArc in arcs:
-                arc2MergeNumberDict[anArc[0]] = mergeNumber
-            mergeNumber2ArcsDict[mergeNumber] = arcIDs
-        else:
-            addMsgAndPrint(
-                "  Got an error in setMatchingMergeNumbers. Only "
-                + str(len(arcs))
-                + " arcs!"
-            )
-            for anArc in arcs:
-                addMsgAndPrint(str(anArc))
-            return
-    else:
-        addMsgAndPrint("  setMatchingMergeNumbers, arcs = None")
-    return
-
-
 #################################
 inGdb = sys.argv[1]
 inFds = inGdb + "/GeologicMap"
@@ -409,35 +220,10 @@ with arcpy.da.SearchCursor(inDMU, fields) as cursor:
 # and, for arcs that adjoin nothing (map boundaries!)
 hKeyDict[""] = "0"
 
-copyCaf = inFds + "/xxxCopyCAF"
-copy2Caf = inFds + "/xxxCopy2CAF"
-# copy CAF to copyCAF
-addMsgAndPrint("Copying ContactsAndFaults to " + copyCaf)
-addMsgAndPrint("  and deleting concealed arcs")
-testAndDelete(copyCaf)
-arcpy.Copy_management(inCaf, copyCaf)
-
-# delete all concealed arcs in copyCAF
-isCon = arcpy.AddFieldDelimiters(copyCaf, "IsConcealed")
-testAndDelete("notConcealedCaf")
-arcpy.MakeFeatureLayer_management(copyCaf, "notConcealedCaf", isCon + " = 'N' ")
-
-# IDENTITY notConcealedCAF with MapUnitPolys to get copy2CAF
-addMsgAndPrint("Copying ContactsAndFaults to " + copy2Caf)
-addMsgAndPrint("  and IDENTITYing with MapUnitPolys")
-testAndDelete(copy2Caf)
-arcpy.Identity_analysis(
-    "notConcealedCaf", inMup, copy2Caf, "ALL", "", "KEEP_RELATIONSHIPS"
-)
-# make dictionary Dict[nodeName] = [[arcFID,lMapUnit,rMapUnit],[arcFID,lMapUnit,rMapUnit],...] of arcs at each node
-addMsgAndPrint("Building nodeName2ArcsDict")
-nodeName2ArcsDict = makeNodeName2ArcsDict(
-    copy2Caf, ["FID_" + os.path.basename(copyCaf), "LEFT_MapUnit", "RIGHT_MapUnit"]
-)
-
-addMsgAndPrint("Building allNodeList")
-
-allNodeList = makeNodeList(inCaf, compareFields)
+# make list of arcs at each node, and dictionary of map units next to the
+# not-concealed arcs at each node
+addMsgAndPrint("Building allNodeList and nodeName2ArcsDict")
+allNodeList, nodeName2ArcsDict = readNodes(inCaf, inMup)
 
 addMsgAndPrint("Iterating through nodes to find arcs to be unsplit")
 for node in allNodeList:
@@ -515,12 +301,10 @@ for node in allNodeList:
         if debug1:
             addMsgAndPrint("  " + str(arcTypes))
 
-    if oddArcs != None:
-        if len(oddArcs) > 0:
-            setUniqueMergeNumbers(oddArcs)
+    # oddArcs keep a MergeNumber of their own unless merged at another node
     if mergeArcs != None:
-        if len(mergeArcs) > 0:
-            setMatchingMergeNumbers(mergeArcs)
+        if len(mergeArcs) >= 2:
+            mergeGroups.append([arc[0] for arc in mergeArcs])
 
 # copy CAF to savedCaf
 savedCaf = getSaveName(inCaf)
@@ -535,18 +319,20 @@ testAndDelete(inCaf)
 ## now, need to add mergeNumber field
 addMsgAndPrint("Updating arcs with MergeNumber values")
 arcpy.AddField_management(tempCaf, "MergeNumber", "LONG")
+with arcpy.da.SearchCursor(tempCaf, ["OID@"]) as cursor:
+    arcIDs = [row[0] for row in cursor]
+arc2MergeNumberDict = mn.merge_numbers(arcIDs, mergeGroups)
+addMsgAndPrint(
+    "  "
+    + str(len(arcIDs))
+    + " arcs, "
+    + str(len(set(arc2MergeNumberDict.values())))
+    + " MergeNumbers"
+)
 # open update cursor
-with arcpy.da.UpdateCursor(tempCaf, ["OBJECTID", "MergeNumber"]) as cursor:
+with arcpy.da.UpdateCursor(tempCaf, ["OID@", "MergeNumber"]) as cursor:
     for row in cursor:
-        if row[0] in list(arc2MergeNumberDict.keys()):
-            row[1] = arc2MergeNumberDict[row[0]]
-        else:
-            mergeNumber += 1
-            row[1] = mergeNumber
-            addMsgAndPrint(
-                "  OBJECTID = " + str(row[0]) + " not in arc2MergeNumberDict"
-            )
-        cursor.updateRow(row)
+        cursor.updateRow([row[0], arc2MergeNumberDict[row[0]]])
 ## merge tempCaf to CAF (and keep other fields!)
 addMsgAndPrint("Unsplitting " + tempCaf + " to ContactsAndFaults")
 arcpy.UnsplitLine_management(tempCaf, inCaf, compareFields, statFields)
@@ -560,10 +346,7 @@ addMsgAndPrint(
     + " rows in new CAF"
 )
 
-addMsgAndPrint("Cleaning up")
-addMsgAndPrint("  but not deleting tempCaf = " + tempCaf)
-for fc in copyCaf, copy2Caf:  # ,tempCaf:
-    testAndDelete(fc)
+addMsgAndPrint("  not deleting tempCaf = " + tempCaf)
 
 
 """
@@ -30,6 +30,7 @@ from pathlib import Path
 import copy
 import arcpy
 import GeMS_utilityFunctions as guf
+import hierarchy_keys as hk
 import docx
 
 versionString = "GeMS_DocxToDMU.py, version of 10/24/24"
@@ -676,17 +677,12 @@ def main(params):
     # finally, check for duplicate HierarchyKeys. This is most likely to happen when a headnote description has changed.
     # In this case, none of the SQL queries above will yeild results and the item in mod_list will marked for insertion
     # instead of updating.
-    with arcpy.da.SearchCursor(dmu_table, ("OID@", "HierarchyKey")) as cursor:
-        hk_dict = {}
-        for row in cursor:
-            if not row[1] in hk_dict:
-                hk_dict[row[1]] = [row[0]]
-            else:
-                oids = hk_dict[row[1]]
-                oids.append(row[0])
-                hk_dict[row[1]] = oids
-
-    dups = {k: v for k, v in hk_dict.items() if len(v) > 1}
+    hk_dict = {
+        row[0]: row[1]
+        for row in arcpy.da.SearchCursor(dmu_table, ("OID@", "HierarchyKey"))
+    }
+    tree = hk.HierarchyKeyTree(hk_dict)
+    dups = {g[0].raw: [k.oid for k in g] for g in tree.duplicates}
 
     if dups:
         arcpy.AddWarning(
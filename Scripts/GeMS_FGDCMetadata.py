@@ -19,7 +19,7 @@ import GeMS_utilityFunctions as guf
 from osgeo import ogr  # only used in def max_bounding
 import spatial_utils as su
 import copy
-import requests
+import fgdc_validator as fv
 
 versionString = "GeMS_FGDCMetadata.py, version of 2/27/24"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_FGDCMetadata.py"
@@ -514,87 +514,38 @@ def add_attributes(fc_name, detailed_node):
         detailed_node.append(attr)
 
 
-def validate_online(md_record):
-    """validate the xml metadata against the USGS metadata validation service API"""
-    # first write out the xml dom that is in memory to a file on disk
-    temp_path = db_dir / "temp.xml"
+def validate_md(md_record):
+    """validate the xml metadata against the CSDGM with fgdc_validator"""
+    # put elements in CSDGM order, as mp did in the xml it returned, and
+    # write the record to disk
+    fv.reorder(md_record)
     et = etree.ElementTree(md_record)
-    with open(temp_path, "wb") as f:
+    with open(mr_xml, "wb") as f:
         et.write(f, encoding="utf-8", xml_declaration=True, pretty_print=True)
 
-    # send the temp file to the API
-    url = r"https://www1.usgs.gov/mp/service.php"
-    with open(temp_path, "rb") as f:
-        r = requests.post(url, files={"input_file": f})
-
-    if r.ok:
-        # collect the 'link' array
-        links = r.json()["output"]["link"]
-
-        # save the output xml to disk
-        req = requests.get(links["xml"])
-        with open(mr_xml, "wb") as f:
-            f.write(req.content)
-
-        # the intermediate xml sent to the API likely had some out-of-order
-        # elements, but mp corrects those mistakes so the output xml doesn't have
-        # them but the error file reports them. Instead of sending the
-        # XML output to the API to be validated only to get a new error file,
-        # just edit the error file to remove out-of-order warnings
-        err_name = f"{str(mr_xml.stem)}-errors.txt"
-        err_path = db_dir / err_name
-        req = requests.get(links["error_txt"])
-        report = [n.decode("utf-8") for n in req.iter_lines()]
-        n_warn = 0
-        with open(err_path, "wt") as f:
-            for line in report[0:-1]:
-                if not "appears in unexpected order within" in line:
-                    f.write(f"{line}\n")
-                else:
-                    n_warn += 1
-
-            # edit the number of warnings since we just removed n_warn number
-            last_line = report[-1]
-            if "warnings" in last_line:
-                parts = last_line.split(", ")
-                e = []
-                for c in parts[1]:
-                    if c.isdigit():
-                        e.append(c)
-                a = "".join(e)
-                b = int(a) - n_warn
-                if b == 0:
-                    new_line = parts[0]
-                else:
-                    new_line = f"{parts[0]}, {b} warnings"
-                f.write(new_line)
-            else:
-                f.write(last_line)
-
-        # collect the text version of the metadata?
-        if text_bool:
-            text_name = f"{str(mr_xml.stem)}.txt"
-            text_path = db_dir / text_name
-            req = requests.get(links["txt"])
-            with open(text_path, "wt") as f:
-                f.write(req.text)
-
-        # print the error file contents to the geoprocessing window
-        with open(err_path, "r") as f:
-            arcpy.AddMessage(f.read())
-
-        # final report
-        arcpy.AddMessage(f"Output files have been saved to {db_dir}")
-        arcpy.AddMessage(
-            f"Open {mr_xml} in a xml or metadata editor to complete the record"
-        )
-
-        # cleanup
-        # temp_path.unlink()
-        return True
-    else:
-        arcpy.AddError("Could not write metadata to disk!")
-        arcpy.AddWarning(r.reason)
+    # validate the file on disk so that errors refer to its line numbers.
+    # Elements are in order now, so out-of-order warnings are not written
+    err_name = f"{str(mr_xml.stem)}-errors.txt"
+    err_path = db_dir / err_name
+    fv.write_errors(fv.validate(mr_xml), err_path)
+
+    # text version of the metadata
+    if text_bool:
+        text_name = f"{str(mr_xml.stem)}.txt"
+        text_path = db_dir / text_name
+        with open(text_path, "wt") as f:
+            f.write(fv.as_text(md_record))
+
+    # print the error file contents to the geoprocessing window
+    with open(err_path, "r") as f:
+        arcpy.AddMessage(f.read())
+
+    # final report
+    arcpy.AddMessage(f"Output files have been saved to {db_dir}")
+    arcpy.AddMessage(
+        f"Open {mr_xml} in a xml or metadata editor to complete the record"
+    )
+    return True
 
 
 # #### ARGUMENTS
@@ -1019,4 +970,4 @@ if Path(template_path).is_file():
     base_md = template_root
 
 arcpy.AddMessage("Validating")
-validate_online(base_md)
+validate_md(base_md)
@@ -1,7 +1,14 @@
 import arcpy
 import sys
+import os
+import datetime
 from pathlib import Path
 import GeMS_utilityFunctions as guf
+import label_points as lp
+import poly_state as ps
+import polygonize as pz
+import side_units as su
+import spatial_index as si
 
 """
 Parameters
@@ -25,6 +32,23 @@ simple_mode : Use simple mode or reporting mode. Boolean, true by default. Use
     where MapUnit = Null, and polgyons where MapUnit has changed. Reporting mode
     can take a long time but might be useful in large maps with conmplicated, 
     convoluted polygon boundaries.
+input_mapname : MapName of the map to build in an enterprise geodatabase
+incremental : Rebuild only the polygons touched by contacts and label points
+    that were added, edited, or deleted since the last incremental build. With
+    no label points, edited MapUnitPolys polygons are rebuilt instead. Boolean,
+    optional, false by default. Works in simple mode only and needs editor
+    tracking on ContactsAndFaults and on the label points, or on MapUnitPolys
+    if there are no label points. Every other polygon keeps its OBJECTID and
+    MapUnitPolys_ID. The first incremental build rebuilds every polygon and
+    saves the time of the build and the extents of the contacts and label
+    points in a file next to the geodatabase, <gdb>_<feature dataset>_polys.json.
+    Not in GeMS_Tools.tbx; give it as the sixth argument on the command line
+engine : How polygons are made from the lines, FeatureToPolygon or polygonize.
+    FeatureToPolygon by default. polygonize reads the contacts and label points
+    with cursors, builds the faces in Python with polygonize.polygonize, and
+    writes them back, with the fields of the label points that MapUnitPolys
+    has. Not in GeMS_Tools.tbx; give it as the seventh argument on the command
+    line
 """
 
 versionString = "GeMS_MakePolys3.py, version of 24 June 2022"
@@ -60,6 +84,170 @@ def sql_list(var):
         return f"({n})"
 
 
+def make_polygons(lines, out, labels=None):
+    """Polygons made by lines with the attributes of labels, in out, with the
+    engine chosen"""
+    if engine != "polygonize":
+        arcpy.management.FeatureToPolygon(lines, out, label_features=labels)
+        return
+
+    sr = arcpy.Describe(mup).spatialReference
+    parts = []
+    with arcpy.da.SearchCursor(lines, ["OID@", "SHAPE@"]) as cursor:
+        for row in cursor:
+            for part in guf.lineParts(row[1], sr):
+                parts.append((row[0], part))
+
+    # the fields of the label points that MapUnitPolys has, as Append keeps
+    mup_names = [f.name.lower() for f in arcpy.ListFields(mup) if f.editable]
+    fields = []
+    points = []
+    attribs = {}
+    if labels:
+        fields = [
+            f.name
+            for f in arcpy.ListFields(labels)
+            if f.editable
+            and f.type not in ("OID", "Geometry", "GlobalID")
+            and f.name.lower() in mup_names
+        ]
+        with arcpy.da.SearchCursor(labels, ["OID@", "SHAPE@XY"] + fields) as cursor:
+            for row in cursor:
+                if row[1] is None:
+                    continue
+                points.append((row[0], row[1][0], row[1][1]))
+                attribs[row[0]] = row[2:]
+    polygons = pz.polygonize(parts, sr.XYTolerance, points)
+
+    out = Path(out)
+    arcpy.management.CreateFeatureclass(
+        str(out.parent), out.name, "POLYGON", mup, "DISABLED", "DISABLED", sr
+    )
+    empty = (None,) * len(fields)
+    with arcpy.da.InsertCursor(str(out), ["SHAPE@"] + fields) as cursor:
+        for rings, key in polygons:
+            # shells are clockwise and holes counterclockwise in Esri polygons
+            shape = arcpy.Polygon(
+                arcpy.Array(
+                    [arcpy.Array([arcpy.Point(x, y) for x, y in ring[::-1]]) for ring in rings]
+                ),
+                sr,
+            )
+            cursor.insertRow([shape] + list(attribs.get(key, empty)))
+
+
+def box_polygon(box, sr):
+    return arcpy.Extent(*box, spatial_reference=sr).polygon
+
+
+def tracking_now(desc):
+    """The time now, in UTC if the editor tracking dates of desc are"""
+    if desc.isTimeInUTC:
+        return datetime.datetime.utcnow()
+    return datetime.datetime.now()
+
+
+def rebuild_edited(state):
+    """Rebuild the polygons touched by contacts and label points edited since
+    the build that saved state, and splice the new polygons into MapUnitPolys.
+    Without label points, polygons of MapUnitPolys that were edited since the
+    build take the place of edited label points.
+
+    The edits are grouped into regions by poly_state.regions, and each region
+    is rebuilt in its own window. A region is the union of the polygons that
+    touch the old or new extent of its edited contacts and label points. Its
+    boundary is made of contacts that were not edited, so the faces made from
+    the lines in and around the region that have their label point in the
+    region are the faces a full build would make there. Faces outside of every
+    old polygon, made by new contacts at the edge of the map, are kept when
+    they lie within the window.
+
+    Returns the envelopes of the contacts now, for the next build"""
+    since = datetime.datetime.fromisoformat(state["built"])
+    boxes, envelopes = guf.editedBoxes(caf, since, state["envelopes"])
+    label_since = datetime.datetime.fromisoformat(state["label_built"])
+    label_boxes, _ = guf.editedBoxes(label_source, label_since, state["label_envelopes"])
+    boxes.extend(label_boxes)
+    if not boxes:
+        arcpy.AddMessage("No contacts or label points have been edited since the last build")
+        return envelopes
+
+    sr = arcpy.Describe(mup).spatialReference
+    boxes = [si.expand_box(b, sr.XYTolerance) for b in boxes]
+    box_polys = [box_polygon(b, sr) for b in boxes]
+
+    # group the edits and the polygons they touch into regions
+    mup_oid = mup_dict["OIDFieldName"]
+    mup_where = None
+    if getGDBType(gdb) == "EGDB":
+        mup_where = "MapName = '" + input_mapname + "'"
+
+    def polygons():
+        with arcpy.da.SearchCursor(mup, ["OID@", "SHAPE@"], mup_where) as cursor:
+            for row in cursor:
+                if row[1] is None:
+                    continue
+                e = row[1].extent
+                yield row[0], (e.XMin, e.YMin, e.XMax, e.YMax), row[1]
+
+    found = ps.regions(boxes, polygons(), lambda shape, i: not shape.disjoint(box_polys[i]))
+    region_of = {oid: r for r, (oids, _) in enumerate(found) for oid in oids}
+    arcpy.AddMessage(f"Rebuilding {len(region_of)} polygons in {len(found)} regions")
+
+    rebuilt = []
+    seen = set()
+    kept = 0
+    for r, (touched, window_box) in enumerate(found):
+        window = box_polygon(window_box, sr)
+
+        # old polygons in and around the region, to find the faces in the region
+        around = arcpy.management.MakeFeatureLayer(mup, f"polys_around_{r}", mup_where)[0]
+        arcpy.management.SelectLayerByLocation(around, "INTERSECT", window)
+        index = guf.mapUnitIndex(around, "OID@")
+
+        # make faces from the contacts in and around the region
+        region_contacts = arcpy.management.MakeFeatureLayer(contacts, f"contacts_{r}")[0]
+        arcpy.management.SelectLayerByLocation(region_contacts, "INTERSECT", window)
+        if label_points:
+            labels = arcpy.management.MakeFeatureLayer(label_points, f"labels_around_{r}")[0]
+            arcpy.management.SelectLayerByLocation(labels, "INTERSECT", window)
+        else:
+            labels = rf"memory\{short_mup}_labels_{r}"
+            if touched:
+                exp = f"{mup_oid} IN {sql_list(touched)}"
+                touched_polys = arcpy.management.MakeFeatureLayer(
+                    mup, f"touched_polys_{r}", exp
+                )
+                arcpy.management.FeatureToPoint(touched_polys, labels, "INSIDE")
+            else:
+                arcpy.management.CreateFeatureclass(
+                    "memory", f"{short_mup}_labels_{r}", "POINT", mup, spatial_reference=sr
+                )
+        faces = f"{new_polys}_{r}"
+        make_polygons(region_contacts, faces, labels)
+
+        # keep the faces in the region
+        with arcpy.da.UpdateCursor(faces, ["SHAPE@"]) as cursor:
+            for row in cursor:
+                pt = row[0].labelPoint
+                poly = index.locate(pt.X, pt.Y, None)
+                within = poly is None and row[0].within(window)
+                if ps.keep_face(r, poly, within, (pt.X, pt.Y), region_of, seen):
+                    kept += 1
+                else:
+                    cursor.deleteRow()
+        rebuilt.append(faces)
+
+    # splice the new faces into MapUnitPolys
+    arcpy.AddMessage(f"Replacing them with {kept} polygons")
+    with arcpy.da.UpdateCursor(mup, ["OID@"], mup_where) as cursor:
+        for row in cursor:
+            if row[0] in region_of:
+                cursor.deleteRow()
+    arcpy.management.Append(rebuilt, mup, "NO_TEST")
+    return envelopes
+
+
 fds = arcpy.GetParameterAsText(0)
 gdb = str(Path(fds).parent)
 save_mup = False
@@ -77,6 +265,14 @@ if arcpy.GetParameterAsText(3).lower() in ["false", "no"]:
 
 input_mapname = arcpy.GetParameterAsText(4)
 
+incremental = False
+if arcpy.GetArgumentCount() > 5:
+    incremental = guf.eval_bool(arcpy.GetParameterAsText(5))
+
+engine = "FeatureToPolygon"
+if arcpy.GetArgumentCount() > 6 and arcpy.GetParameterAsText(6).lower() == "polygonize":
+    engine = "polygonize"
+
 # get caf, mup, name_token
 # dictionary
 fd_dict = arcpy.da.Describe(fds)
@@ -115,11 +311,53 @@ where = f"LOWER({fld}) NOT IN ('y', 'yes')"
 if getGDBType(gdb) == 'EGDB':
     where = where + " AND MapName = '" + input_mapname + "'"
 arcpy.AddMessage("Selecting all non-concealed lines")
-contacts = arcpy.management.SelectLayerByAttribute(caf, where_clause=where)
+contacts = arcpy.management.SelectLayerByAttribute(caf, where_clause=where)[0]
 
 # make new polys
 new_polys = r"memory\mup"
-if simple_mode:
+
+# incremental build
+rebuilt = False
+if incremental:
+    # polygons take their attributes from the label points, or from the
+    # polygons of MapUnitPolys, so edits to either are tracked with the contacts
+    label_source = label_points if label_points else mup
+    d = arcpy.Describe(caf)
+    label_d = arcpy.Describe(label_source)
+    tracked = True
+    for desc, name in ((d, short_caf), (label_d, Path(label_source).name)):
+        if not (desc.editorTrackingEnabled and desc.editedAtFieldName):
+            arcpy.AddMessage(f"Editor tracking is not enabled on {name}")
+            tracked = False
+    if not simple_mode:
+        arcpy.AddMessage("Incremental builds run in simple mode only")
+        tracked = False
+    state_path = os.path.join(
+        os.path.dirname(gdb),
+        f"{Path(gdb).stem}_{Path(fds).name.replace('.', '_')}_polys.json",
+    )
+    settings = {
+        "version": versionString,
+        "caf": caf,
+        "mup": mup,
+        "label_points": label_points,
+        "mapname": input_mapname,
+    }
+    state = ps.load(state_path, settings) if tracked else None
+    if tracked and state is None:
+        arcpy.AddMessage("No earlier incremental build; building every polygon")
+
+    # editor tracking dates are in UTC or local time
+    if tracked:
+        built = tracking_now(d)
+        label_built = tracking_now(label_d)
+    if state is not None:
+        envelopes = rebuild_edited(state)
+        rebuilt = True
+    elif tracked:
+        envelopes = guf.featureEnvelopes(caf)
+
+if simple_mode and not rebuilt:
     arcpy.AddMessage("Continuing in simple mode")
     # simple mode is for speed. EITHER label_points or existing polygons will
     # be used for attributes of new polygons. No reconciliation or error reporting
@@ -133,7 +371,7 @@ if simple_mode:
         arcpy.management.FeatureToPoint(mup, label_points, "INSIDE")
 
     arcpy.AddMessage("Building new map unit polygons in memory")
-    arcpy.management.FeatureToPolygon(contacts, new_polys, label_features=label_points)
+    make_polygons(contacts, new_polys, label_points)
 
     # truncate MapUnitPolys
     arcpy.AddMessage(f"Emptying {short_mup}")
@@ -153,15 +391,17 @@ elif simple_mode == False and getGDBType(gdb) == 'FileGDB':
     # 1) turn map unit polygons into points - adds ORIG_FID
     # 2) merge with optional label point - adds MERGE_SRC
     # 3) create polgyons from the lines, no attributes
-    # 4) Run Identity with empty polygons and all merged labels - adds FID_ for
-    #   label points and polys
+    # 4) find the polygon that contains each point, in one pass over an index
+    #   of the polygons
     # 5) if there is a mup point and a label point in any polygon, choose the
     #    label point
     # 6) build new MapUnitPolys
-    # 7) report multiple label points
-    # 8) report polygons with those extra points
-    # 9) report changed polygons
-    # 10) report polygons that have no MapUnit value
+    # 7) locate the label points and mup points in the new polygons, again in
+    #   one pass, to
+    # 8) report multiple label points
+    # 9) report polygons with those extra points
+    # 10) report changed polygons
+    # 11) report polygons that have no MapUnit value
 
     # turn map unit polygons into points - adds ORIG_FID
     orig_mup_labels = rf"memory\{short_mup}_labels"
@@ -188,37 +428,27 @@ elif simple_mode == False and getGDBType(gdb) == 'FileGDB':
         # make polygons from selected contacts. these will be empty but are needed
         # in order to reconcile multiple label points
         empty_polys = r"memory\empty"
-        arcpy.management.FeatureToPolygon(contacts, empty_polys)
-
-        # intersect with the merged label points
-        inter_points = r"memory\inter_points"
-        arcpy.analysis.Intersect([empty_polys, merge_labels], inter_points)
-
-        # find duplicate FID_empty; polygons that intersected with multiple points
-        # keep a list of oids of feature-to-points that are found in a polygon
-        # along with label_points; prioritize label_points by removing co-located
-        # feature-to-points
-        FIDs = [row[0] for row in arcpy.da.SearchCursor(inter_points, "FID_empty")]
-        dup_FIDs = list(set([x for x in FIDs if FIDs.count(x) > 1]))
-        for FID in dup_FIDs:
-            exp = f"FID_empty = {FID}"
-            with arcpy.da.SearchCursor(
-                inter_points, ["ORIG_FID", "MERGE_SRC"], exp
-            ) as cursor:
-                # list of ORIG_IDs to exclude from the feature-to-points
-                for row in cursor:
-                    if row[1] == orig_mup_labels:
-                        filter_from_labels.append(row[0])
-
-            # extra labels
-            exp = f"FID_empty = {FID} and MERGE_SRC = '{out}'"
-            selected = arcpy.management.SelectLayerByAttribute(
-                inter_points, where_clause=exp
-            )
-            if int(arcpy.management.GetCount(selected)[0]) > 1:
-                extra_labels.extend(
-                    [r[0] for r in arcpy.da.SearchCursor(selected, "ORIG_FID")]
-                )
+        make_polygons(contacts, empty_polys)
+
+        # find the polygon that contains each point
+        arcpy.AddMessage("Locating label points in new polygons")
+        index = guf.mapUnitIndex(empty_polys, "OID@")
+        points = [
+            (("mup", row[0]), row[1][0], row[1][1])
+            for row in arcpy.da.SearchCursor(orig_mup_labels, ["ORIG_FID", "SHAPE@XY"])
+        ]
+        points.extend(
+            (("label", row[0]), row[1][0], row[1][1])
+            for row in arcpy.da.SearchCursor(label_points, ["OID@", "SHAPE@XY"])
+        )
+        by_polygon = lp.points_by_polygon(index, points)
+
+        # polygons that contain multiple points: prioritize label_points by
+        # removing co-located feature-to-points, and keep the OBJECTIDs of
+        # extra label points
+        drop, extra = lp.reconcile_labels(by_polygon, lambda k: k[0] == "label")
+        filter_from_labels = set(k[1] for k in drop)
+        extra_labels = [k[1] for k in extra]
 
         # remove extra labels from merge_labels
         with arcpy.da.UpdateCursor(merge_labels, ["ORIG_FID", "MERGE_SRC"]) as cursor:
@@ -227,17 +457,12 @@ elif simple_mode == False and getGDBType(gdb) == 'FileGDB':
                     cursor.deleteRow()
 
         # make new polygons based on the contacts and this new set of label points
-        arcpy.management.FeatureToPolygon(
-            contacts, new_polys, label_features=merge_labels
-        )
+        make_polygons(contacts, new_polys, merge_labels)
     else:
-        arcpy.management.FeatureToPolygon(
-            contacts, new_polys, label_features=orig_mup_labels
-        )
+        make_polygons(contacts, new_polys, orig_mup_labels)
 
-    # make a copy in memory in order to look for changed polys later
-    old_polys = r"memory\old_polys"
-    arcpy.management.CopyFeatures(mup, old_polys)
+    # the old polygons, to look up the old MapUnit under each new polygon
+    old_index = guf.mapUnitIndex(mup)
 
     # truncate MapUnitPolys
     arcpy.AddMessage(f"Emptying {short_mup}")
@@ -251,41 +476,61 @@ elif simple_mode == False and getGDBType(gdb) == 'FileGDB':
     # do we need to build report layers?
     # look for null values
     mup_oid = mup_dict["OIDFieldName"]
-    null_vals = [
-        row[0]
-        for row in arcpy.da.SearchCursor(mup, [mup_oid, "MapUnit"])
-        if row[1] in (None, "", " ")
-    ]
+    new_units = {}
+    new_points = []
+    with arcpy.da.SearchCursor(mup, [mup_oid, "MapUnit", "SHAPE@"]) as cursor:
+        for row in cursor:
+            new_units[row[0]] = row[1]
+            if row[2] is not None:
+                pt = row[2].labelPoint
+                new_points.append((row[0], pt.X, pt.Y))
+    null_vals = [oid for oid, unit in new_units.items() if unit in (None, "", " ")]
+
+    # locate the label points and the points made from the old polygons in the
+    # new polygons
+    index = guf.mapUnitIndex(mup, "OID@")
 
     # look for multiple label points in the new polygons
-    mup_inter_labels = r"memory\mup_inter_labels"
-    arcpy.analysis.Intersect([mup, label_points], mup_inter_labels)
-    oids = [
-        row[0] for row in arcpy.da.SearchCursor(mup_inter_labels, f"FID_{short_mup}")
-    ]
-    dup_oids = set([x for x in oids if oids.count(x) > 1])
+    dup_oids = set()
+    if label_points:
+        points = (
+            (row[0], row[1][0], row[1][1])
+            for row in arcpy.da.SearchCursor(label_points, ["OID@", "SHAPE@XY"])
+        )
+        dup_oids = lp.multi_label_polygons(lp.points_by_polygon(index, points))
 
     # look for changed polygons
-    inter_polys = r"memory\inter_polys"
-    arcpy.analysis.Intersect([old_polys, mup], inter_polys)
-    changed = []
+    old_units = {}
+    points = []
     with arcpy.da.SearchCursor(
-        inter_polys, [f"FID_{short_mup}", "MapUnit", "MapUnit_1"]
+        orig_mup_labels, ["ORIG_FID", "SHAPE@XY", "MapUnit"]
     ) as cursor:
         for row in cursor:
-            if row[1] != row[2] and row[1] not in [None, ""]:
-                changed.append(row[0])
+            old_units[row[0]] = row[2]
+            points.append((row[0], row[1][0], row[1][1]))
+    changed = lp.changed_polygons(
+        lp.points_by_polygon(index, points),
+        old_units,
+        new_units,
+        old_index,
+        new_points,
+    )
 
     # look for contacts with the same MapUnit on either side
-    inter_lines = r"memory\inter_lines"
-    arcpy.analysis.Identity(caf, mup, inter_lines, relationship="KEEP_RELATIONSHIPS")
-    id_field = f"FID_{str(short_caf)}"
+    sr = arcpy.Describe(mup).spatialReference
+    offset = 10 * sr.XYTolerance
     same_unit = []
-    with arcpy.da.SearchCursor(
-        inter_lines, [id_field, "left_mapunit", "right_mapunit"]
-    ) as cursor:
+    with arcpy.da.SearchCursor(caf, ["OID@", "SHAPE@"]) as cursor:
         for row in cursor:
-            if row[1] == row[2]:
+            parts = guf.lineParts(row[1], sr)
+            if not any(su.longest_segment(part) for part in parts):
+                continue
+            # outside the map is "", as Identity leaves it
+            units = [
+                new_units.get(oid, "")
+                for oid in su.line_sides(parts, index, offset, sr.XYTolerance, None)
+            ]
+            if units[0] == units[1]:
                 same_unit.append(row[0])
 
     if null_vals or extra_labels or dup_oids or changed or same_unit:
@@ -365,6 +610,20 @@ elif simple_mode == False and getGDBType(gdb) == 'FileGDB':
 elif simple_mode == False and getGDBType(gdb) == 'EGDB':
     arcpy.AddMessage("Error reporting mode not currently configured for enterprise geodatabases")
 
+if incremental and tracked:
+    if label_source == mup:
+        # the polygons written by this build are not edits
+        label_built = tracking_now(label_d)
+    label_envelopes = guf.featureEnvelopes(label_source)
+    ps.save(
+        state_path,
+        settings,
+        built.isoformat(),
+        envelopes,
+        label_built.isoformat(),
+        label_envelopes,
+    )
+
 
 
 
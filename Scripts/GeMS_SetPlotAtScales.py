@@ -8,6 +8,7 @@
 
 import arcpy, os.path, sys
 from GeMS_utilityFunctions import *
+import plot_scales as ps
 
 versionString = "GeMS_SetPlotAtScales.py, version of 8/21/23"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_SetPlotAtScales.py"
@@ -123,11 +124,6 @@ if os.path.basename(inFc) == "OrientationPoints":
 else:
     isOP = False
 
-if getGDBType(gdb) == 'FileGDB':
-    outTable = gdb + "/xxxPlotAtScales"
-elif getGDBType(gdb) == 'EGDB':
-    outTable = arcpy.env.scratchWorkspace + "/xxxPlotAtScales"    
-testAndDelete(outTable)
 mapUnits = "meters"
 minSeparationMapUnits = minSeparation_mm / 1000.0
 searchRadius = minSeparationMapUnits * maxPlotAtScale
@@ -137,44 +133,25 @@ if not "meter" in arcpy.Describe(inFcLayer).spatialReference.linearUnitName.lowe
     searchRadius = searchRadius * 3.2808
     minSeparationMapUnits = minSeparationMapUnits * 3.2808
 addMsgAndPrint("Search radius is " + str(searchRadius) + " " + mapUnits)
-addMsgAndPrint("Building near table")
-arcpy.PointDistance_analysis(inFcLayer, inFcLayer, outTable, searchRadius)
-
-inPoints = []
-outPointDict = {}
-
-# read outTable into Python list inPoints, with each list component = [distance, fid1, fid2]
-fields = ["DISTANCE", "INPUT_FID", "NEAR_FID"]
-with arcpy.da.SearchCursor(outTable, fields) as cursor:
-    for row in cursor:
-        inPoints.append([row[0], row[1], row[2]])
-addMsgAndPrint("   " + str(len(inPoints)) + " rows in initial near table")
-
-# step through inPoints, smallest distance first, and write list of FID, PlotAtScale (outPoints)
-addMsgAndPrint("   Sorting through near table and calculating PlotAtScale values")
-inPoints.sort()
-lastLenInPoints = 0
-while len(inPoints) > 1 and lastLenInPoints != len(inPoints):
-    lastLenInPoints = len(inPoints)
-    pointSep = inPoints[0][0]
-    if isOP:  # figure out the most significant point
-        pt = lessSignificantOP(inPoints[0][1], inPoints[0][2])
-    else:  # take the second point
-        pt = inPoints[0][2]
-    outPointDict[pt] = plotScale(pointSep, minSeparationMapUnits)
-    inPoints.remove(inPoints[0])
-    j = len(inPoints)
-    for i in range(1, j + 1):
-        # addMsgAndPrint(str(i)+', '+str(j))
-        aPt = inPoints[j - i]
-        if aPt[1] == pt or aPt[2] == pt:
-            inPoints.remove(aPt)
-            # addMsgAndPrint( 'removing '+str(aPt))
-    addMsgAndPrint("   # inPoints = " + str(len(inPoints)))
-
-for i in range(0, len(inPoints)):
-    addMsgAndPrint("      " + str(inPoints[i]))
-
+addMsgAndPrint("Reading points")
+points = [
+    (row[0], row[1][0], row[1][1])
+    for row in arcpy.da.SearchCursor(inFcLayer, ["OBJECTID", "SHAPE@XY"])
+    if row[1][0] is not None
+]
+addMsgAndPrint("   " + str(len(points)) + " points")
+
+# take the closest pair of points over and over and drop one of them, the
+# less significant orientation point or the point with the higher OBJECTID
+addMsgAndPrint("   Finding neighbors and calculating PlotAtScale values")
+if isOP:
+    separations = ps.separations(points, searchRadius, lessSignificantOP)
+else:
+    separations = ps.separations(points, searchRadius)
+outPointDict = {
+    oid: plotScale(sep, minSeparationMapUnits) for oid, sep in separations.items()
+}
+addMsgAndPrint("   " + str(len(outPointDict)) + " points with PlotAtScale below the maximum")
 
 # attach plotScale values from outPoints to inFcLayer
 addMsgAndPrint("Updating " + os.path.basename(inFc))
@@ -184,17 +161,10 @@ edit.startOperation()
 fields = ["OBJECTID", "PlotAtScale"]
 with arcpy.da.UpdateCursor(inFcLayer, fields) as cursor:
     for row in cursor:
-        if row[0] in list(outPointDict.keys()):
-            row[1] = outPointDict[row[0]]
-        else:
-            row[1] = maxPlotAtScale
+        row[1] = outPointDict.get(row[0], maxPlotAtScale)
         cursor.updateRow(row)
 edit.stopOperation()
 edit.stopEditing(True)
-    
-# get rid of xxxPlotAtScales
-addMsgAndPrint("Deleting " + outTable)
-testAndDelete(outTable)
 
 
 
@@ -54,8 +54,13 @@ Significant assumptions:
 #   expanded all commas and plus signs with no spaces for readability (mine, at least!)
 #   increased length of Type field in _Topology geodatabase from 100 to 500 to accommodate longer concatenations
 
-import arcpy, os, sys, math, os.path, operator, time
+import arcpy, os, sys, os.path, operator, time
 from GeMS_utilityFunctions import *
+import topology_nodes as tn
+import planar
+import node_state as ns
+import duplicates as dp
+import datetime
 
 # see gems-tools-pro version<=2.2.2 to get earlier TopologyCheck tool
 versionString = "GeMS_TopologyCheck.py, version of 8/21/23"
@@ -101,6 +106,20 @@ class CAF_arc:
         "LEFT_MapUnit",
         "ORIG_FID",
     ]
+    __slots__ = (
+        "Type",
+        "IsConc",
+        "ExConf",
+        "IdConf",
+        "LCM",
+        "DSID",
+        "Notes",
+        "LineDir",
+        "ToFrom",
+        "RMU",
+        "LMU",
+        "OFID",
+    )
 
     def __init__(self, attribs):
         self.Type = attribs[0]
@@ -123,117 +142,6 @@ class CAF_arc:
             return False
 
 
-def sameArcAttributes(a, b):  # a and b are CAF_arc
-    if (
-        a.Type == b.Type
-        and a.IsConc == b.IsConc
-        and a.ExConf == b.ExConf
-        and a.IdConf == b.IdConf
-        and a.LCM == b.LCM
-        and a.DSID == b.DSID
-        and a.Notes == b.Notes
-    ):
-        return True
-    else:
-        return False
-
-
-def sameTypeIndices(arcs):  # arcs is triplet of CAF_arc
-    a = arcs[0]
-    b = arcs[1]
-    c = arcs[2]
-    if a.Type == b.Type:
-        same = [0, 1]
-        diff = 2
-        if b.Type == c.Type:
-            same = [0, 1, 2]
-            diff = None
-    elif a.Type == c.Type:
-        same = [0, 2]
-        diff = 1
-        if b.Type == c.Type:
-            same = [0, 1, 2]
-            diff = None
-    elif b.Type == c.Type:
-        same = [1, 2]
-        diff = 0
-    else:
-        same = [0]
-        diff = [0, 1, 2]
-    return same, diff
-
-
-def sameToFrom(a, b, c=None):
-    if c == None:
-        c = a
-    if a.ToFrom == b.ToFrom == c.ToFrom:
-        return True
-    else:
-        return False
-
-
-def concealedArcs(arcs):  # arcs is a list of CAF_arc
-    nConcealed = 0
-    concealedIndices = []
-    for a in arcs:
-        if a.isConcealed() == True:
-            nConcealed += 1
-            concealedIndices.append(arcs.index(a))
-    return nConcealed, concealedIndices
-
-
-def adjoiningMapUnits(arcs):
-    # for 3 arcs around a node, returns list ['a', 'b', 'c'] of adjoining map units
-    # 'a' is map unit opposite (not adjoining) arcs[0], 'b' is map unit opposite arcs[1], ...
-    mapUnits = []
-    if arcs[1].ToFrom == "From":
-        mapUnits.append(arcs[1].RMU)
-    else:
-        mapUnits.append(arcs[1].LMU)
-    if arcs[2].ToFrom == "From":
-        mapUnits.append(arcs[2].RMU)
-    else:
-        mapUnits.append(arcs[2].LMU)
-    if arcs[0].ToFrom == "From":
-        mapUnits.append(arcs[0].RMU)
-    else:
-        mapUnits.append(arcs[0].LMU)
-    return mapUnits
-
-
-def arcOrder(i):
-    # for 4 arcs around a node, indexed 0--3, returns index of arcOpposite and indices of arcsAdjacent
-    if i == 0:
-        return 2, [1, 3]
-    elif i == 1:
-        return 3, [0, 2]
-    elif i == 2:
-        return 0, [1, 3]
-    elif i == 3:
-        return 1, [0, 2]
-
-
-def ptsGeographicAzimuth(pt1, pt2):
-    dx = pt2[0] - pt1[0]
-    dy = pt2[1] - pt1[1]
-    azi = math.atan2(dy, dx)
-    azi = 90 - math.degrees(azi)
-    if azi < 0:
-        azi = azi + 360
-    return azi
-
-
-def startEndGeogDirections(lineSeg):
-    firstPoint = [lineSeg[0].X, lineSeg[0].Y]
-    secondPoint = [lineSeg[1].X, lineSeg[1].Y]
-    lpt = len(lineSeg) - 1
-    ntlPoint = [lineSeg[lpt - 1].X, lineSeg[lpt - 1].Y]
-    lastPoint = [lineSeg[lpt].X, lineSeg[lpt].Y]
-    return ptsGeographicAzimuth(firstPoint, secondPoint), ptsGeographicAzimuth(
-        lastPoint, ntlPoint
-    )
-
-
 def makeNodeFC(fd, fc):
     addMsgAndPrint("Building feature class " + fc)
     fdfc = os.path.join(fd, fc)
@@ -271,208 +179,107 @@ def buildHKeyDict(DMU, whereClause):
     return hKeyDict, sortedUnits
 
 
-def youngestMapUnit(mapUnits, hKeyDict):
-    # arcpy.AddMessage(f'mapUnits = {mapUnits}')
-    # arcpy.AddMessage(hKeyDict)
-    # returns youngest map unit in list mapUnits
-    ymu = mapUnits[0]
-    for mu in mapUnits[1:]:
-        # in Python 2.7 None is returned if the dictionary key is not found and 'None < str', evaluates to True.
-        # Python 3 is not so forgiving, this produces a TypeError
-        # but the code below reproduces the Python 2.7 behavior by returning "" if the dictionary key is not found
-        # Because '' and None can be be keys in hKeyDict, mu_hkey = hKeyDict.get(mu, "") was not working, returning None.
-        if hKeyDict[ymu] is None:
-            ymu_hkey = ""
-        else:
-            ymu_hkey = hKeyDict[ymu]
-
-        if hKeyDict[mu] is None:
-            mu_hkey = ""
-        else:
-            mu_hkey = hKeyDict[mu]
-
-        if mu_hkey < ymu_hkey:
-            ymu = mu
-    return ymu
-
-
-def isCoveringUnit(mu, hKeyDict):
-    if mu == None or mu == "":  # stuff outside map, unmapped areas
-        return False
-    elif hKeyDict[mu] < hKeyTestValue:
-        return True
-    else:
-        return False
-
-
 def processNodes(nodeList, hKeyDict):
     # nodes is a list of nodes (points at which one or more arcs begins or ends)
+    # the node rules are evaluated in topology_nodes.classify_nodes, all nodes
+    # with the same number of arcs at once
     addMsgAndPrint("Processing nodes")
-    badNodes = []
-    connectFIDs = []  # pairs of OIDs denoting arcs that should be merged
-    missingConcealedArcNodes = []
-    faultFlipNodes = []
-    count1 = 0
-    count2 = 0
-    count3 = 0
-    count4 = 0
-    count5 = 0
-    for node in nodeList:
-        arcs = node[2]
-        nArcs = len(arcs)
-        ######################
-        if nArcs == 1:
-            count1 += 1
-            if not isFault(arcs[0].Type):  # is a contact
-                if arcs[0].isConcealed():
-                    node.append("dangling concealed contact")
-                    badNodes.append(node)
-                else:  # dangling contact
-                    node.append("dangling contact")
-                    badNodes.append(node)
-        ######################
-        elif nArcs == 2:
-            count2 += 1
-            if arcs[0].Type != arcs[1].Type:
-                node.append("mismatched Type values")
-                badNodes.append(node)
-            if arcs[0].IsConc != arcs[1].IsConc:
-                node.append("one arc concealed, one not")
-                badNodes.append(node)
-            if sameArcAttributes(arcs[0], arcs[1]):
-                connectFIDs.append([arcs[0].OFID, arcs[1].OFID])
-            if (
-                isFault(arcs[0].Type)
-                and isFault(arcs[1].Type)
-                and sameToFrom(arcs[0], arcs[1])
-            ):
-                node.append(arcs[0].ToFrom + ", " + arcs[1].ToFrom)
-                faultFlipNodes.append(node)
-        ######################
-        elif nArcs == 3:
-            count3 += 1
-            nCon, conIndx = concealedArcs(arcs)
-            same, diff = sameTypeIndices(arcs)
-            mapUnits = adjoiningMapUnits(
-                arcs
-            )  # map units are ordered by not-adjacent arcs
-            if nCon in (1, 2):  # 1 or 2 arcs are concealed
-                node.append("impossible number of concealed arcs")
-                badNodes.append(node)
-            elif len(same) < 2:  # no two arcs have same type
-                node.append("at least 2 arcs must be same Type")
-                badNodes.append(node)
-            else:  # all arcs or none are concealed, at least two are of same type
-                if nCon == 3:
-                    if mapUnits[0] != mapUnits[1] or mapUnits[1] != mapUnits[2]:
-                        node.append(
-                            "all arcs concealed but bounding map units not all the same"
-                        )
-                        badNodes.append(node)
-                if len(same) == 2:  # only two arcs have same Type
-                    if isFault(arcs[same[0]].Type):
-                        if sameToFrom(arcs[same[0]], arcs[same[1]]):
-                            faultFlipNodes.append(node)
-                        elif sameArcAttributes(arcs[same[0]], arcs[same[1]]):
-                            connectFIDs.append([arcs[same[0]].OFID, arcs[same[1]].OFID])
-                    else:  # two arcs with same Type are not-faults; their shared adjacent poly should be youngest
-                        if youngestMapUnit(mapUnits, hKeyDict) == mapUnits[diff]:
-                            # if same arc attributes, flag for merge
-                            if sameArcAttributes(arcs[same[0]], arcs[same[1]]):
-                                connectFIDs.append(
-                                    [arcs[same[0]].OFID, arcs[same[1]].OFID]
-                                )
-                            # test to see if we could add a concealed extension
-                            if isCoveringUnit(
-                                youngestMapUnit(mapUnits, hKeyDict), hKeyDict
-                            ):
-                                missingConcealedArcNodes.append(node)
-                        else:
-                            node.append(
-                                "# "
-                                + str(mapUnits[diff])
-                                + " is not youngest unit in "
-                                + str(mapUnits)
-                            )
-                            badNodes.append(node)
-                else:  # all 3 arcs have same Type
-                    if isFault(arcs[same[0]].Type):
-                        if sameToFrom(arcs[0], arcs[1], arcs[2]):
-                            faultFlipNodes.append(node)
-                    else:  # all arcs are not-faults
-                        # find the arcs that bound the youngest map unit
-                        ymu = youngestMapUnit(mapUnits, hKeyDict)
-                        youngArcs = [0, 1, 2]
-                        youngArcs.remove(mapUnits.index(ymu))
-                        if sameArcAttributes(arcs[youngArcs[0]], arcs[youngArcs[1]]):
-                            connectFIDs.append(
-                                [arcs[youngArcs[0]].OFID, arcs[youngArcs[1]].OFID]
-                            )
-                        if isCoveringUnit(ymu, hKeyDict) == True:
-                            missingConcealedArcNodes.append(node)
-        ######################
-        elif nArcs == 4:
-            nCon, conIndx = concealedArcs(arcs)
-            if nCon != 0:
-                opp, adj = arcOrder(conIndx[0])
-            if nCon > 2:
-                node.append("too many concealed arcs")
-                badNodes.append(node)
-            elif nCon == 2:
-                if (
-                    arcs[conIndx[0]].Type != arcs[conIndx[1]].Type
-                    or arcs[adj[0]].Type != arcs[adj[1]].Type
-                ):
-                    node.append("opposite arcs must have same Type")
-                    badNodes.append(node)
-                elif not arcs[
-                    opp
-                ].isConcealed():  # thus the 2nd concealed arc must be adjacent
-                    node.append("adjacent arcs concealed")
-                    badNodes.append(node)
-                else:  #  geometry is OK. Test for arcs to be merged
-                    if sameArcAttributes(arcs[adj[0]], arcs[adj[1]]):
-                        connectFIDs.append([arcs[adj[0]].OFID, arcs[adj[1]].OFID])
-                    if isFault(arcs[conIndx[0]].Type) and sameToFrom(
-                        arcs[conIndx[0]], arcs[opp]
-                    ):
-                        faultFlipNodes.append(node)
-                    elif sameArcAttributes(
-                        arcs[conIndx[0]], arcs[opp]
-                    ):  # don't merge arcs when one should be flipped
-                        connectFIDs.append([arcs[conIndx[0]].OFID, arcs[opp].OFID])
-            elif nCon == 1:
-                # adjacent arcs must be same-type contacts and opposite arc must be of same type
-                if isFault(arcs[adj[0]].Type):
-                    node.append(
-                        "arcs adjacent to single concealed arc must not be faults"
-                    )
-                    badNodes.append(node)
-                elif arcs[opp].Type != arcs[conIndx[0]].Type:
-                    node.append(
-                        "concealed arc and unconcealed continuation must be same Type"
-                    )
-                    badNodes.append(node)
-                else:
-                    if sameArcAttributes(arcs[adj[0]], arcs[adj[1]]):
-                        connectFIDs.append([arcs[adj[0]].OFID, arcs[adj[1]].OFID])
-            else:  # nConc = 0
-                node.append("4 unconcealed arcs")
-                badNodes.append(node)
-            count4 += 1
-        ######################
-        else:  # 5 or more arcs at this node
-            count5 += 1
-            node.append("too many arcs")
-            badNodes.append(node)
-    addMsgAndPrint("  " + str(count1) + " 1-arc nodes")
-    addMsgAndPrint("  " + str(count2) + " 2-arc nodes")
-    addMsgAndPrint("  " + str(count3) + " 3-arc nodes")
-    addMsgAndPrint("  " + str(count4) + " 4-arc nodes")
-    addMsgAndPrint("  " + str(count5) + " 5+ arc nodes")
+    (
+        badNodes,
+        faultFlipNodes,
+        missingConcealedArcNodes,
+        connectFIDs,
+        counts,
+    ) = tn.classify_nodes(nodeList, hKeyDict, hKeyTestValue, isFault)
+    addMsgAndPrint("  " + str(counts[0]) + " 1-arc nodes")
+    addMsgAndPrint("  " + str(counts[1]) + " 2-arc nodes")
+    addMsgAndPrint("  " + str(counts[2]) + " 3-arc nodes")
+    addMsgAndPrint("  " + str(counts[3]) + " 4-arc nodes")
+    addMsgAndPrint("  " + str(counts[4]) + " 5+ arc nodes")
     return badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs
 
 
+def processNodesByTile(cafp, hKeyDict, tileSize, workers):
+    # getNodes and processNodes, one tileSize by tileSize tile of the map at a
+    # time in a pool of worker processes. Nodes that straddle tile edges are
+    # merged before they are processed, so results are the same as from
+    # getNodes and processNodes
+    addMsgAndPrint("Sorting segment endpoints into nodes and processing nodes")
+    addMsgAndPrint("  " + str(tileSize) + " map unit tiles")
+    xs, ys, arcs, keys = getArcEnds(cafp)
+    nodeList, nodeGroups, counts = tn.tiled_nodes(
+        xs, ys, arcs, zeroValue, tileSize, hKeyDict, hKeyTestValue, isFault, workers
+    )
+    addMsgAndPrint("  " + str(len(nodeList)) + " nodes")
+    addMsgAndPrint("  " + str(counts[0]) + " 1-arc nodes")
+    addMsgAndPrint("  " + str(counts[1]) + " 2-arc nodes")
+    addMsgAndPrint("  " + str(counts[2]) + " 3-arc nodes")
+    addMsgAndPrint("  " + str(counts[3]) + " 4-arc nodes")
+    addMsgAndPrint("  " + str(counts[4]) + " 5+ arc nodes")
+    return nodeList, nodeGroups
+
+
+def processNodesSinceLastCheck(cafp, hKeyDict):
+    # getNodes and processNodes for the nodes in places where inCaf or inMup
+    # have been edited since the last check, found by editor tracking. Results
+    # for other nodes are those saved by the last check
+    addMsgAndPrint("Sorting segment endpoints into nodes and processing nodes")
+    addMsgAndPrint("  since last check")
+    statePath = os.path.join(outWksp, outFdsName + "_nodes.json")
+    settings = {
+        "version": versionString,
+        "tolerance": zeroValue,
+        "hKeyTestValue": hKeyTestValue,
+        "hKeys": sorted([str(k), str(v)] for k, v in hKeyDict.items()),
+    }
+    tracked = True
+    for fc in (inCaf, inMup):
+        d = arcpy.Describe(fc)
+        if not (d.editorTrackingEnabled and d.editedAtFieldName):
+            addMsgAndPrint("  editor tracking is not enabled on " + os.path.basename(fc))
+            tracked = False
+    state = ns.load(statePath, settings) if tracked else None
+    if tracked and state is None:
+        addMsgAndPrint("  no results from an earlier check with these settings")
+
+    # editor tracking dates are in UTC or local time
+    if tracked and arcpy.Describe(inCaf).isTimeInUTC:
+        checked = datetime.datetime.utcnow()
+    else:
+        checked = datetime.datetime.now()
+    envelopes = {}
+    boxes = None
+    if tracked and state is None:
+        for name, fc in (("caf", inCaf), ("mup", inMup)):
+            envelopes[name] = featureEnvelopes(fc)
+    elif tracked:
+        since = datetime.datetime.fromisoformat(state["checked"])
+        boxes = []
+        for name, fc in (("caf", inCaf), ("mup", inMup)):
+            fcBoxes, envelopes[name] = editedBoxes(fc, since, state["envelopes"][name])
+            # grow the boxes by the search tolerance
+            for b in fcBoxes:
+                boxes.append(
+                    (b[0] - zeroValue, b[1] - zeroValue, b[2] + zeroValue, b[3] + zeroValue)
+                )
+        addMsgAndPrint("  " + str(len(boxes)) + " areas to check")
+
+    xs, ys, arcs, keys = getArcEnds(cafp)
+    nodeList, events, counts, saved = ns.recheck(
+        xs, ys, arcs, keys, zeroValue, boxes, state, hKeyDict, hKeyTestValue, isFault
+    )
+    addMsgAndPrint("  " + str(len(nodeList)) + " nodes")
+    addMsgAndPrint("  " + str(sum(counts)) + " nodes checked")
+    addMsgAndPrint("  " + str(counts[0]) + " 1-arc nodes")
+    addMsgAndPrint("  " + str(counts[1]) + " 2-arc nodes")
+    addMsgAndPrint("  " + str(counts[2]) + " 3-arc nodes")
+    addMsgAndPrint("  " + str(counts[3]) + " 4-arc nodes")
+    addMsgAndPrint("  " + str(counts[4]) + " 5+ arc nodes")
+    if tracked:
+        ns.save(statePath, settings, checked.isoformat(), envelopes, saved)
+    return nodeList, tn.apply_events(nodeList, events)
+
+
 def insertNodes(ptFc, nodeList):
     # creates insertcursor in pointFc
     addMsgAndPrint("  inserting points into " + os.path.basename(ptFc))
@@ -503,108 +310,108 @@ def insertNodesXY(ptFc, nodeList):
         cursor.insertRow(row)
 
 
-def getNodes(arcEndPoints):
-    #  sorts arcEndPoints into a Python list of nodes
-    addMsgAndPrint("Sorting segment endpoints into nodes")
-    addMsgAndPrint("  " + str(numberOfRows(arcEndPoints)) + " endpoints")
-    nodeList = []
-    # open searchCursor on arcEndPoints sorted by POINT_X and POINT_Y
-    sql = (None, "ORDER BY POINT_X, POINT_Y")
-    fieldNames = ["POINT_X", "POINT_Y"]
-    fieldNames.extend(CAF_arc.fieldList)
-    lastX = -99999
-    lastY = -99999
-    nodeArcs = []
-    with arcpy.da.SearchCursor(
-        arcEndPoints, fieldNames, None, None, False, sql
-    ) as cursor:
+def getArcEnds(cafp):
+    # returns x, y, CAF_arc, and node_state end key lists for the ends of the arcs in cafp
+    xs = []
+    ys = []
+    arcs = []
+    keys = []
+    # attributes of CAF_arc except LineDir, ToFrom, and ORIG_FID, which come from each end
+    fieldNames = ["OID@", "SHAPE@"]
+    fieldNames.extend(CAF_arc.fieldList[:7])
+    fieldNames.extend(["RIGHT_MapUnit", "LEFT_MapUnit", "LineID"])
+    with arcpy.da.SearchCursor(cafp, fieldNames) as cursor:
         for row in cursor:
-            x = row[0]
-            y = row[1]
-            thisArc = CAF_arc(row[2:])
-            if abs(x - lastX) < zeroValue and abs(y - lastY) < zeroValue:
-                nodeArcs.append(thisArc)
-            else:
-                if len(nodeArcs) > 0:
-                    # note that we sort arcs by LineDir, so that they are in clockwise order
-                    nodeArcs.sort(key=operator.attrgetter("LineDir"))
-                    nodeList.append([lastX, lastY, nodeArcs])
-                lastX = x
-                lastY = y
-                nodeArcs = [thisArc]
-        nodeArcs.sort(key=operator.attrgetter("LineDir"))
-        nodeList.append([lastX, lastY, nodeArcs])
+            if row[1] is None:
+                continue
+            points = [(pt.X, pt.Y) for pt in row[1].getPart(0)]
+            ends = tn.line_ends(points)
+            if ends is None:
+                continue
+            for x, y, lineDir, toFrom in ends:
+                xs.append(x)
+                ys.append(y)
+                attribs = list(row[2:9]) + [lineDir, toFrom] + list(row[9:11])
+                attribs.append(row[0])
+                arcs.append(CAF_arc(attribs))
+                keys.append(ns.end_key(row[11], arcs[-1], x, y))
+    addMsgAndPrint("  " + str(len(xs)) + " endpoints")
+    return xs, ys, arcs, keys
+
+
+def getNodes(cafp):
+    #  sorts the ends of the arcs in cafp into a Python list of nodes
+    addMsgAndPrint("Sorting segment endpoints into nodes")
+    xs, ys, arcs, keys = getArcEnds(cafp)
+    # note that we sort arcs by LineDir, so that they are in clockwise order
+    nodeList = tn.build_nodes(xs, ys, arcs, zeroValue, operator.attrgetter("LineDir"))
     addMsgAndPrint("  " + str(len(nodeList)) + " nodes")
     return nodeList
 
 
-def planarizeAndGetArcEndPoints(fds, caf, mup, fdsToken):
-    # returns a feature class of endpoints of all caf lines, two per planarized line segment
-    addMsgAndPrint(
-        "Planarizing " + os.path.basename(caf) + " and getting segment endpoints"
+def nodeLines(caf, planCaf):
+    # writes the lines of caf, split wherever they cross or touch, to planCaf.
+    # Takes the place of FeatureToLine; LineID and the other attributes are
+    # copied from the source line to each piece. Unlike FeatureToLine, the
+    # pieces are 2D: Z and M values are dropped, as the nodes and map units
+    # on either side that planCaf is used for only need x and y
+    sr = arcpy.Describe(caf).spatialReference
+    fields = [
+        f.name
+        for f in arcpy.ListFields(caf)
+        if f.editable and f.type not in ("OID", "Geometry")
+    ]
+    attribs = {}
+    lines = []
+    with arcpy.da.SearchCursor(caf, ["OID@", "SHAPE@"] + fields) as cursor:
+        for row in cursor:
+            shape = row[1]
+            if shape is None:
+                continue
+            if shape.hasCurves:
+                shape = shape.densify("OFFSET", shape.length, sr.XYTolerance)
+            attribs[row[0]] = row[2:]
+            for part in shape:
+                lines.append((row[0], [(pt.X, pt.Y) for pt in part if pt]))
+    pieces = planar.node_lines(lines, sr.XYTolerance)
+    addMsgAndPrint("  " + str(len(lines)) + " lines, " + str(len(pieces)) + " pieces")
+    arcpy.CreateFeatureclass_management(
+        os.path.dirname(planCaf),
+        os.path.basename(planCaf),
+        "POLYLINE",
+        caf,
+        "DISABLED",
+        "DISABLED",
+        sr,
     )
+    with arcpy.da.InsertCursor(planCaf, ["SHAPE@"] + fields) as cursor:
+        for oid, points in pieces:
+            array = arcpy.Array([arcpy.Point(x, y) for x, y in points])
+            cursor.insertRow([arcpy.Polyline(array, sr)] + list(attribs[oid]))
+
+
+def planarize(fds, caf, mup):
+    # returns the caf lines planarized and attributed with the map units on either side
+    addMsgAndPrint("Planarizing " + os.path.basename(caf))
     #   add LineID (so we can recover lines after planarization)
     arcpy.AddField_management(caf, "LineID", "LONG")
     arcpy.CalculateField_management(caf, "LineID", "!OBJECTID!", "PYTHON_9.3")
-    # planarize CAF by FeatureToLine
+    # planarize CAF by splitting the lines where they cross or touch
     addMsgAndPrint("  planarizing caf")
     planCaf = caf + "_xxx_plan"
     testAndDelete(planCaf)
-    arcpy.FeatureToLine_management(caf, planCaf)
-    #   planarize CAF (by IDENTITY with MUP)
-    addMsgAndPrint("  IDENTITYing caf with mup")
+    nodeLines(caf, planCaf)
+    #   get the map units on either side of each arc from MUP
+    addMsgAndPrint("  finding map units left and right of caf arcs")
     cafp = caf + "_planarized"
     testAndDelete(cafp)
-    arcpy.Identity_analysis(planCaf, mup, cafp, "ALL", "", "KEEP_RELATIONSHIPS")
-    # delete extra fields
-    addMsgAndPrint("  deleting extra fields")
-    fns = fieldNameList(cafp)
-    deleteFields = []
-    for f in fieldNameList(mup):
-        if f != "MapUnit":
-            for hf in ("RIGHT_" + f, "LEFT_" + f):
-                if hf in fns:
-                    deleteFields.append(hf)
-    arcpy.DeleteField_management(cafp, deleteFields)
-    #   calculate azimuths startDir and endDir
-    addMsgAndPrint("  adding StartAzimuth and EndAzimuth")
-    for f in ("LineDir", "StartAzimuth", "EndAzimuth"):
-        arcpy.AddField_management(cafp, f, "FLOAT")
+    arcpy.Rename_management(planCaf, cafp)
+    addSideMapUnits(cafp, mup)
+    # LineDir and ToFrom belong to arc ends. They are calculated by getNodes
+    # but the fields are expected by CAF_arc
+    arcpy.AddField_management(cafp, "LineDir", "FLOAT")
     arcpy.AddField_management(cafp, "ToFrom", "TEXT", "", "", 4)
-    fields = ["SHAPE@", "StartAzimuth", "EndAzimuth"]
-    with arcpy.da.UpdateCursor(cafp, fields) as cursor:
-        for row in cursor:
-            lineSeg = row[0].getPart(0)
-            row[1], row[2] = startEndGeogDirections(lineSeg)
-            cursor.updateRow(row)
-    #   make endpoint feature class
-    addMsgAndPrint("  converting line ends to points")
-    arcEndPoints = (
-        fds + "/" + fdsToken + "xxx_EndPoints"
-    )  # will be a feature class in fds
-    arcEndPoints2 = arcEndPoints + "_end"
-    testAndDelete(arcEndPoints)
-    arcpy.FeatureVerticesToPoints_management(cafp, arcEndPoints, "START")
-    arcpy.CalculateField_management(arcEndPoints, "LineDir", "!StartAzimuth!", "PYTHON")
-    arcpy.CalculateField_management(arcEndPoints, "ToFrom", '"From"', "PYTHON")
-    testAndDelete(arcEndPoints2)
-    arcpy.FeatureVerticesToPoints_management(cafp, arcEndPoints2, "END")
-    arcpy.CalculateField_management(arcEndPoints2, "LineDir", "!EndAzimuth!", "PYTHON")
-    arcpy.CalculateField_management(arcEndPoints2, "ToFrom", '"To"', "PYTHON")
-    arcpy.Append_management(arcEndPoints2, arcEndPoints)
-    testAndDelete(arcEndPoints2)
-    #  delete some more fields
-    deleteFields = [
-        "EndAzimuth",
-        "StartAzimuth",
-        "LEFT_MapUnitPolys",
-        "RIGHT_MapUnitPolys",
-    ]
-    arcpy.DeleteField_management(arcEndPoints, deleteFields)
-    addMsgAndPrint("  adding POINT_X and POINT_Y")
-    arcpy.AddXY_management(arcEndPoints)
-    testAndDelete(planCaf)
-    return cafp, arcEndPoints
+    return cafp
 
 
 def unplanarize(cafp, caf, connectFIDs):
@@ -851,34 +658,48 @@ def findDupPts(inFds, outFds):
                 notEdit = False
         if notEdit:
             ptFcs2.append(fc)
+    # find the duplicates in every point feature class, then write the dups_
+    # tables of the classes that have any
+    dups = []
     for fc in ptFcs2:
         addMsgAndPrint("  finding duplicate records in " + fc)
-        newTb = os.path.dirname(outFds) + "/dups_" + fc.replace('.','_')
-        testAndDelete(newTb)
-        dupFields = ["Shape"]
-        allFields1 = arcpy.ListFields(fc)
-        allFields = []
-        for fld in allFields1:
-            allFields.append(fld.name)
+        fcPath = inFds + "/" + fc
+        dupFields = ["OID@", "SHAPE@XY"]
+        allFields = fieldNameList(fcPath)
         for aF in ("Type", "Azimuth", "Inclination"):
             if aF in allFields:
                 dupFields.append(aF)
-        addMsgAndPrint("    fields to be compared: " + str(dupFields))
-        if getGDBType(inFds) == 'FileGDB':
-            arcpy.FindIdentical_management(inFds + "/" + fc, newTb, dupFields, "", "", "ONLY_DUPLICATES")
-        elif getGDBType(inFds) == 'EGDB':
-            arcpy.management.MakeFeatureLayer(inFds + "/" + fc, 'in_layer_' + fc.replace('.','_'), "MapName = '" + input_mapname + "'")
-            arcpy.FindIdentical_management('in_layer_' + fc.replace('.','_'), newTb, dupFields, "", "", "ONLY_DUPLICATES")
-        addMsgAndPrint("    dups_" + fc + ": " + str(numberOfRows(newTb)) + " rows")
-        if numberOfRows(newTb) == 0:
-            testAndDelete(newTb)
-        else:
-            duplicatePoints.append(
-                "&nbsp;&nbsp; "
-                + str(numberOfRows(newTb))
-                + " rows in "
-                + os.path.basename(newTb)
-            )
+        addMsgAndPrint("    fields to be compared: " + str(["Shape"] + dupFields[2:]))
+        whereClause = None
+        if getGDBType(inFds) == 'EGDB':
+            whereClause = "MapName = '" + input_mapname + "'"
+        tolerance = arcpy.Describe(fcPath).spatialReference.XYTolerance
+        rows = []
+        with arcpy.da.SearchCursor(fcPath, dupFields, whereClause) as cursor:
+            for row in cursor:
+                if row[1] is None or row[1][0] is None:
+                    continue
+                rows.append((row[0], row[1][0], row[1][1], tuple(row[2:])))
+        found = dp.find_duplicates(rows, tolerance)
+        addMsgAndPrint("    dups_" + fc + ": " + str(len(found)) + " rows")
+        newTb = os.path.dirname(outFds) + "/dups_" + fc.replace('.','_')
+        testAndDelete(newTb)
+        if len(found) > 0:
+            dups.append((newTb, found))
+
+    for newTb, found in dups:
+        arcpy.CreateTable_management(os.path.dirname(newTb), os.path.basename(newTb))
+        arcpy.AddField_management(newTb, "IN_FID", "LONG")
+        arcpy.AddField_management(newTb, "FEAT_SEQ", "LONG")
+        with arcpy.da.InsertCursor(newTb, ["IN_FID", "FEAT_SEQ"]) as cursor:
+            for row in found:
+                cursor.insertRow(row)
+        duplicatePoints.append(
+            "&nbsp;&nbsp; "
+            + str(len(found))
+            + " rows in "
+            + os.path.basename(newTb)
+        )
 
     return duplicatePoints
         
@@ -948,249 +769,276 @@ def esriTopology(outFds, caf, mup):
 
 ################################
 
-addMsgAndPrint(versionString)
-#### get inputs
-inFds = arcpy.GetParameterAsText(0)
-hKeyTestValue = arcpy.GetParameterAsText(1)
-input_mapname = arcpy.GetParameterAsText(2)
-
-inGdb = os.path.dirname(inFds)
-
-if getGDBType(inGdb) == 'EGDB' and input_mapname == '':
-    input_mapname = 'FullEGDB'
-
-if getGDBType(inGdb) == 'FileGDB':
-    outWksp = inGdb[:-4] + "_Topology"
-elif getGDBType(inGdb) == 'EGDB':
-    outWksp = os.path.dirname(inGdb) + '\\' + input_mapname + "_Topology"
-    
-if not os.path.exists(outWksp):
-    addMsgAndPrint("Making directory " + outWksp)
-    os.mkdir(outWksp)
-else:
-    if not os.path.isdir(outWksp):
-        addMsgAndPrint("Oops, " + md + " exists but is a file")
-        forceExit()
-
-inCaf = getCaf(inFds)
-fdsToken = os.path.basename(inCaf).replace("ContactsAndFaults", "").replace('.','_')
-inMup = inCaf.replace("ContactsAndFaults", "MapUnitPolys")
-zeroValue = 2 * arcpy.Describe(inCaf).spatialReference.XYTolerance
-# hKeyTestValue = '2'
-DMU = inGdb + "/DescriptionOfMapUnits"
-if getGDBType(inGdb) == 'FileGDB':
+# tile workers import this script as __mp_main__ and must not run the tool
+if __name__ == "__main__":
+    addMsgAndPrint(versionString)
+    #### get inputs
+    inFds = arcpy.GetParameterAsText(0)
+    hKeyTestValue = arcpy.GetParameterAsText(1)
+    input_mapname = arcpy.GetParameterAsText(2)
+    # optional: tile size in map units for a tiled, parallel node check, and the
+    # number of worker processes. 0 or empty checks all nodes in one pass.
+    # These are not in GeMS_Tools.tbx and can only be given on the command line
+    tileSize = 0
+    tileWorkers = None
+    if arcpy.GetArgumentCount() > 3 and arcpy.GetParameterAsText(3) not in ("", "#"):
+        tileSize = float(arcpy.GetParameterAsText(3))
+    if arcpy.GetArgumentCount() > 4 and arcpy.GetParameterAsText(4) not in ("", "#"):
+        tileWorkers = int(arcpy.GetParameterAsText(4))
+    # optional: only check nodes where CAF and MUP have been edited since the
+    # last check, by editor tracking. Command line only, as above
+    sinceLastCheck = False
+    if arcpy.GetArgumentCount() > 5:
+        sinceLastCheck = eval_bool(arcpy.GetParameterAsText(5))
+
+    inGdb = os.path.dirname(inFds)
+
+    if getGDBType(inGdb) == 'EGDB' and input_mapname == '':
+        input_mapname = 'FullEGDB'
+
+    if getGDBType(inGdb) == 'FileGDB':
+        outWksp = inGdb[:-4] + "_Topology"
+    elif getGDBType(inGdb) == 'EGDB':
+        outWksp = os.path.dirname(inGdb) + '\\' + input_mapname + "_Topology"
+
+    if not os.path.exists(outWksp):
+        addMsgAndPrint("Making directory " + outWksp)
+        os.mkdir(outWksp)
+    else:
+        if not os.path.isdir(outWksp):
+            addMsgAndPrint("Oops, " + md + " exists but is a file")
+            forceExit()
+
+    inCaf = getCaf(inFds)
+    fdsToken = os.path.basename(inCaf).replace("ContactsAndFaults", "").replace('.','_')
+    inMup = inCaf.replace("ContactsAndFaults", "MapUnitPolys")
+    zeroValue = 2 * arcpy.Describe(inCaf).spatialReference.XYTolerance
+    # hKeyTestValue = '2'
     DMU = inGdb + "/DescriptionOfMapUnits"
-    outGdbName = os.path.basename(inGdb)[:-4] + "_TopologyCheck.gdb"
-elif getGDBType(inGdb) == 'EGDB':
-    input_schema = os.path.basename(inFds).split('.')[0] + '.' + os.path.basename(inFds).split('.')[1]
-    DMU = inGdb + "/" + input_schema + ".DescriptionOfMapUnits"
-    outGdbName = input_schema.replace('.','_') + '_' + input_mapname + "_TopologyCheck.gdb"
-outGdb = os.path.join(outWksp, outGdbName)
-outFdsName = os.path.basename(inFds).replace('.','_')
-outFds = os.path.join(outGdb, outFdsName)
-addMsgAndPrint(" ")
-addMsgAndPrint(
-    "Writing to "
-    + outGdb
-    + ". Note that nodes within "
-    + str(zeroValue)
-    + " map units of each other are considered identical."
-)
-addMsgAndPrint(" ")
-
-outHtml = open(os.path.join(outWksp, outFdsName + ".html"), "w")
-if getGDBType(inGdb) == 'FileGDB' or input_mapname == 'FullEGDB':
-    hKeyDict, sortedUnits = buildHKeyDict(DMU, "OBJECTID > -1")
-elif getGDBType(inGdb) == 'EGDB':
-    hKeyDict, sortedUnits = buildHKeyDict(DMU, "MapName = '" + input_mapname + "'")
-
-### copy inputs to new gdb/feature dataset
-if not arcpy.Exists(outWksp):
-    os.mkdir(outWksp)
-if not arcpy.Exists(outGdb):
-    arcpy.CreateFileGDB_management(outWksp, outGdbName)
-if not arcpy.Exists(outFds):
-    arcpy.CreateFeatureDataset_management(outGdb, outFdsName, inFds)
-
-arcpy.env.workspace = outFds
-topologies = arcpy.ListDatasets("", "Topology")
-for t in topologies:
-    testAndDelete(t)
-
-for infc in (inCaf, inMup):
-    outfc = os.path.join(outFds, os.path.basename(infc).replace('.','_'))
-    testAndDelete(outfc)
+    if getGDBType(inGdb) == 'FileGDB':
+        DMU = inGdb + "/DescriptionOfMapUnits"
+        outGdbName = os.path.basename(inGdb)[:-4] + "_TopologyCheck.gdb"
+    elif getGDBType(inGdb) == 'EGDB':
+        input_schema = os.path.basename(inFds).split('.')[0] + '.' + os.path.basename(inFds).split('.')[1]
+        DMU = inGdb + "/" + input_schema + ".DescriptionOfMapUnits"
+        outGdbName = input_schema.replace('.','_') + '_' + input_mapname + "_TopologyCheck.gdb"
+    outGdb = os.path.join(outWksp, outGdbName)
+    outFdsName = os.path.basename(inFds).replace('.','_')
+    outFds = os.path.join(outGdb, outFdsName)
+    addMsgAndPrint(" ")
+    addMsgAndPrint(
+        "Writing to "
+        + outGdb
+        + ". Note that nodes within "
+        + str(zeroValue)
+        + " map units of each other are considered identical."
+    )
+    addMsgAndPrint(" ")
+
+    outHtml = open(os.path.join(outWksp, outFdsName + ".html"), "w")
     if getGDBType(inGdb) == 'FileGDB' or input_mapname == 'FullEGDB':
-        arcpy.Copy_management(infc, outfc)
+        hKeyDict, sortedUnits = buildHKeyDict(DMU, "OBJECTID > -1")
     elif getGDBType(inGdb) == 'EGDB':
-        arcpy.management.MakeFeatureLayer(infc, 'in_layer', "MapName = '" + input_mapname + "'")
-        arcpy.management.CopyFeatures('in_layer', outfc)    
-    if infc == inCaf:
-        caf = outfc
+        hKeyDict, sortedUnits = buildHKeyDict(DMU, "MapName = '" + input_mapname + "'")
+
+    ### copy inputs to new gdb/feature dataset
+    if not arcpy.Exists(outWksp):
+        os.mkdir(outWksp)
+    if not arcpy.Exists(outGdb):
+        arcpy.CreateFileGDB_management(outWksp, outGdbName)
+    if not arcpy.Exists(outFds):
+        arcpy.CreateFeatureDataset_management(outGdb, outFdsName, inFds)
+
+    arcpy.env.workspace = outFds
+    topologies = arcpy.ListDatasets("", "Topology")
+    for t in topologies:
+        testAndDelete(t)
+
+    for infc in (inCaf, inMup):
+        outfc = os.path.join(outFds, os.path.basename(infc).replace('.','_'))
+        testAndDelete(outfc)
+        if getGDBType(inGdb) == 'FileGDB' or input_mapname == 'FullEGDB':
+            arcpy.Copy_management(infc, outfc)
+        elif getGDBType(inGdb) == 'EGDB':
+            arcpy.management.MakeFeatureLayer(infc, 'in_layer', "MapName = '" + input_mapname + "'")
+            arcpy.management.CopyFeatures('in_layer', outfc)    
+        if infc == inCaf:
+            caf = outfc
+        else:
+            mup = outfc
+
+    ### TOPOLOGY (no mup gaps or overlaps;
+    #    no line overlaps, self-overlaps, or self-intersections; mup boundaries covered by CAF lines
+    topoStuff = esriTopology(outFds, caf, mup)
+
+    ### NODES
+    planarizedCAF = planarize(outFds, caf, mup)
+
+    if sinceLastCheck:
+        # sort the arc ends into nodes and assign the nodes to groups where
+        # features have been edited, and reuse the results of the last check elsewhere
+        nodeList, nodeGroups = processNodesSinceLastCheck(planarizedCAF, hKeyDict)
+        badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs = nodeGroups
+    elif tileSize > 0:
+        # sort the arc ends into nodes and assign the nodes to groups tile by tile
+        nodeList, nodeGroups = processNodesByTile(
+            planarizedCAF, hKeyDict, tileSize, tileWorkers
+        )
+        badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs = nodeGroups
     else:
-        mup = outfc
-
-### TOPOLOGY (no mup gaps or overlaps;
-#    no line overlaps, self-overlaps, or self-intersections; mup boundaries covered by CAF lines
-topoStuff = esriTopology(outFds, caf, mup)
-
-### NODES
-planarizedCAF, arcEndPoints = planarizeAndGetArcEndPoints(outFds, caf, mup, fdsToken)
-
-# sort arcEndPoints into list of nodes
-nodeList = getNodes(arcEndPoints)
-# assign nodes to various groups
-badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs = processNodes(
-    nodeList, hKeyDict
-)
-addMsgAndPrint("Bad nodes: " + str(len(badNodes)))
-addMsgAndPrint("Fault-flip nodes: " + str(len(faultFlipNodes)))
-addMsgAndPrint("Missing concealed-arc nodes: " + str(len(missingConcealedArcNodes)))
-addMsgAndPrint("ConnectFIDs: " + str(len(connectFIDs)))
-testAndDelete(arcEndPoints)
-
-### MAKE OUTPUT FEATURE CLASSES
-badNodesFC = makeNodeFC(outFds, "errors_" + fdsToken + "_BadNodes")
-insertNodes(badNodesFC, badNodes)
-
-missingConcealedFC = makeNodeFCXY(outFds, fdsToken + "MissingConcealedCAF_nodes")
-insertNodesXY(missingConcealedFC, missingConcealedArcNodes)
-faultFlipFC = makeNodeFCXY(outFds, "errors_" + fdsToken + "_FaultFlipNodes")
-insertNodesXY(faultFlipFC, faultFlipNodes)
-
-### UNPLANARIZE
-unplanarizedCAF = unplanarize(planarizedCAF, inCaf, connectFIDs)
-
-### ARC ADJACENCY
-(
-    badConcealed,
-    internalContacts,
-    concealedLinesDict,
-    contactLinesDict,
-    faultLinesDict,
-) = adjacencyTables(planarizedCAF, sortedUnits, outHtml)
-
-### DUPLICATE POINTS
-dupPoints = findDupPts(inFds, outFds)
-
-### WRITE OUTPUT
-addMsgAndPrint("Writing output")
-outHtml.write(htmlStart)
-outHtml.write("<h2>Topology Check</h2>\n")
-outHtml.write(
-    "<h2>"
-    + os.path.basename(inGdb)
-    + ", <i>feature dataset</i> "
-    + outFdsName
-    + "</h2>\n"
-)
-outHtml.write(
-    "File written by " + versionString + " at " + str(time.ctime()) + "<br>\n"
-)
-outHtml.write("Input database: <b>" + inGdb + "</b><br>\n")
-outHtml.write(
-    "Output database: <b>"
-    + outGdbName
-    + "</b> within folder <b>"
-    + outWksp
-    + "</b>.<br>\n"
-)
-outHtml.write("<blockquote><i>" + ValidateTopologyNote + "</blockquote></i>\n")
-
-outHtml.write("<h3>ESRI Line-Polygon Topology</h3>\n")
-for a in topoStuff:
-    outHtml.write(a + "<br>\n")
-
-outHtml.write("<h3>Node Topology</h3>\n")
-outHtml.write(str(len(badNodes)) + " nodes that may have bad geometry<br>\n")
-outHtml.write(
-    space4
-    + " See <b>"
-    + os.path.join(outFdsName, os.path.basename(badNodesFC))
-    + "</b><br>\n"
-)
-outHtml.write(
-    str(len(faultFlipNodes))
-    + " nodes where fault direction changes. These are likely to be errors<br>\n"
-)
-outHtml.write(
-    space4
-    + " See <b>"
-    + os.path.join(outFdsName, os.path.basename(faultFlipFC))
-    + "</b><br>\n"
-)
-outHtml.write(
-    str(len(missingConcealedArcNodes))
-    + " nodes where a concealed contact or fault continuation could be added<br>\n"
-)
-outHtml.write(
-    space4
-    + " See <b>"
-    + os.path.join(outFdsName, os.path.basename(missingConcealedFC))
-    + "</b><br>\n"
-)
-
-outHtml.write("<h3>MapUnits Adjacent to CAF Lines</h3>\n")
-outHtml.write(
-    "See feature class <b>"
-    + os.path.join(outFdsName, os.path.basename(planarizedCAF))
-    + "</b> for ContactsAndFaults arcs attributed with adjacent polygon information.<br>\n"
-)
-outHtml.write(
-    "<i>In tables below, upper cell value is number of arcs. Lower cell value is cumulative arc length in map units.</i><br><br>\n"
-)
-writeLineAdjacencyTable(
-    "Concealed contacts and faults",
-    outHtml,
-    concealedLinesDict,
-    sortedUnits,
-    "badConcealed",
-)
-outHtml.write("<br>\n")
-writeLineAdjacencyTable(
-    "Contacts (not concealed)",
-    outHtml,
-    contactLinesDict,
-    sortedUnits,
-    "internalContacts",
-)
-outHtml.write("<br>\n")
-writeLineAdjacencyTable(
-    "Faults (not concealed)", outHtml, faultLinesDict, sortedUnits, ""
-)
-outHtml.write("<br><b>Bad concealed contacts and faults</b><br>\n")
-if len(badConcealed) > 0:
+        # sort the ends of the planarized arcs into list of nodes
+        nodeList = getNodes(planarizedCAF)
+        # assign nodes to various groups
+        badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs = processNodes(
+            nodeList, hKeyDict
+        )
+    addMsgAndPrint("Bad nodes: " + str(len(badNodes)))
+    addMsgAndPrint("Fault-flip nodes: " + str(len(faultFlipNodes)))
+    addMsgAndPrint("Missing concealed-arc nodes: " + str(len(missingConcealedArcNodes)))
+    addMsgAndPrint("ConnectFIDs: " + str(len(connectFIDs)))
+
+    ### MAKE OUTPUT FEATURE CLASSES
+    badNodesFC = makeNodeFC(outFds, "errors_" + fdsToken + "_BadNodes")
+    insertNodes(badNodesFC, badNodes)
+
+    missingConcealedFC = makeNodeFCXY(outFds, fdsToken + "MissingConcealedCAF_nodes")
+    insertNodesXY(missingConcealedFC, missingConcealedArcNodes)
+    faultFlipFC = makeNodeFCXY(outFds, "errors_" + fdsToken + "_FaultFlipNodes")
+    insertNodesXY(faultFlipFC, faultFlipNodes)
+
+    ### UNPLANARIZE
+    unplanarizedCAF = unplanarize(planarizedCAF, inCaf, connectFIDs)
+
+    ### ARC ADJACENCY
+    (
+        badConcealed,
+        internalContacts,
+        concealedLinesDict,
+        contactLinesDict,
+        faultLinesDict,
+    ) = adjacencyTables(planarizedCAF, sortedUnits, outHtml)
+
+    ### DUPLICATE POINTS
+    dupPoints = findDupPts(inFds, outFds)
+
+    ### WRITE OUTPUT
+    addMsgAndPrint("Writing output")
+    outHtml.write(htmlStart)
+    outHtml.write("<h2>Topology Check</h2>\n")
+    outHtml.write(
+        "<h2>"
+        + os.path.basename(inGdb)
+        + ", <i>feature dataset</i> "
+        + outFdsName
+        + "</h2>\n"
+    )
+    outHtml.write(
+        "File written by " + versionString + " at " + str(time.ctime()) + "<br>\n"
+    )
+    outHtml.write("Input database: <b>" + inGdb + "</b><br>\n")
+    outHtml.write(
+        "Output database: <b>"
+        + outGdbName
+        + "</b> within folder <b>"
+        + outWksp
+        + "</b>.<br>\n"
+    )
+    outHtml.write("<blockquote><i>" + ValidateTopologyNote + "</blockquote></i>\n")
+
+    outHtml.write("<h3>ESRI Line-Polygon Topology</h3>\n")
+    for a in topoStuff:
+        outHtml.write(a + "<br>\n")
+
+    outHtml.write("<h3>Node Topology</h3>\n")
+    outHtml.write(str(len(badNodes)) + " nodes that may have bad geometry<br>\n")
     outHtml.write(
         space4
-        + "See feature class <b>"
-        + os.path.join(outFdsName, os.path.basename(planarizedCAF))
+        + " See <b>"
+        + os.path.join(outFdsName, os.path.basename(badNodesFC))
         + "</b><br>\n"
     )
-    contactListWrite(badConcealed, outHtml, "badConcealed")
-else:
-    outHtml.write(space4 + "No bad concealed contacts or faults")
-outHtml.write("<br><b>Internal Contacts</b><br>\n")
-if len(internalContacts) > 0:
+    outHtml.write(
+        str(len(faultFlipNodes))
+        + " nodes where fault direction changes. These are likely to be errors<br>\n"
+    )
     outHtml.write(
         space4
-        + "See feature class <b>"
-        + os.path.join(outFdsName, os.path.basename(planarizedCAF))
+        + " See <b>"
+        + os.path.join(outFdsName, os.path.basename(faultFlipFC))
         + "</b><br>\n"
     )
-    contactListWrite(internalContacts, outHtml, "internalContacts")
-else:
-    outHtml.write(space4 + "No internal contacts")
-
-outHtml.write("<h3>Duplicate Points</h3>\n")
-if len(dupPoints) == 0:
-    outHtml.write("No duplicate points found<br>\n")
-else:
-    for a in dupPoints:
-        outHtml.write(a + "<br>\n")
+    outHtml.write(
+        str(len(missingConcealedArcNodes))
+        + " nodes where a concealed contact or fault continuation could be added<br>\n"
+    )
+    outHtml.write(
+        space4
+        + " See <b>"
+        + os.path.join(outFdsName, os.path.basename(missingConcealedFC))
+        + "</b><br>\n"
+    )
+
+    outHtml.write("<h3>MapUnits Adjacent to CAF Lines</h3>\n")
+    outHtml.write(
+        "See feature class <b>"
+        + os.path.join(outFdsName, os.path.basename(planarizedCAF))
+        + "</b> for ContactsAndFaults arcs attributed with adjacent polygon information.<br>\n"
+    )
+    outHtml.write(
+        "<i>In tables below, upper cell value is number of arcs. Lower cell value is cumulative arc length in map units.</i><br><br>\n"
+    )
+    writeLineAdjacencyTable(
+        "Concealed contacts and faults",
+        outHtml,
+        concealedLinesDict,
+        sortedUnits,
+        "badConcealed",
+    )
+    outHtml.write("<br>\n")
+    writeLineAdjacencyTable(
+        "Contacts (not concealed)",
+        outHtml,
+        contactLinesDict,
+        sortedUnits,
+        "internalContacts",
+    )
+    outHtml.write("<br>\n")
+    writeLineAdjacencyTable(
+        "Faults (not concealed)", outHtml, faultLinesDict, sortedUnits, ""
+    )
+    outHtml.write("<br><b>Bad concealed contacts and faults</b><br>\n")
+    if len(badConcealed) > 0:
+        outHtml.write(
+            space4
+            + "See feature class <b>"
+            + os.path.join(outFdsName, os.path.basename(planarizedCAF))
+            + "</b><br>\n"
+        )
+        contactListWrite(badConcealed, outHtml, "badConcealed")
+    else:
+        outHtml.write(space4 + "No bad concealed contacts or faults")
+    outHtml.write("<br><b>Internal Contacts</b><br>\n")
+    if len(internalContacts) > 0:
+        outHtml.write(
+            space4
+            + "See feature class <b>"
+            + os.path.join(outFdsName, os.path.basename(planarizedCAF))
+            + "</b><br>\n"
+        )
+        contactListWrite(internalContacts, outHtml, "internalContacts")
+    else:
+        outHtml.write(space4 + "No internal contacts")
+
+    outHtml.write("<h3>Duplicate Points</h3>\n")
+    if len(dupPoints) == 0:
+        outHtml.write("No duplicate points found<br>\n")
+    else:
+        for a in dupPoints:
+            outHtml.write(a + "<br>\n")
 
-outHtml.write(htmlEnd)
-outHtml.close()
-addMsgAndPrint("DONE!")
+    outHtml.write(htmlEnd)
+    outHtml.close()
+    addMsgAndPrint("DONE!")
 
 
 
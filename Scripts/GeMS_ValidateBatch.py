@@ -0,0 +1,225 @@
+"""Validate Batch
+
+Runs GeMS_ValidateDatabase on every file geodatabase and geopackage in a folder,
+or matching a glob pattern, in a pool of worker processes. Each worker imports
+GeMS_ValidateDatabase, and with it arcpy and GeMS_Definition, once, and keeps
+the reference GeoMaterialDict and the jinja environment for all of the
+databases it validates.
+
+Usage:
+    python GeMS_ValidateBatch.py <folder or glob> [output folder] [workers]
+      [use_idfield] [skip_topology] [native_topology]
+    Use '#' for optional arguments that are not required.
+
+Args:
+    inputs (str) : Folder that holds the databases, or a glob pattern such as
+      D:/submissions/*/*.gdb. Required.
+    out_dir (str) : Folder for the reports. Each database gets its own subfolder,
+      named for its parent folder, its name, and a hash of its full path.
+      Optional, <folder>/validate_batch by default.
+    workers (int) : Number of worker processes. Optional, one less than the
+      number of processors by default.
+    use_idfield (bool or str) : Report errors by _ID instead of OBJECTID.
+      Optional. False by default.
+    skip_topology (bool or str) : Skip the topology check. Optional. False by default.
+    native_topology (bool or str) : Check topology with native_topology.py instead
+      of building Esri topologies. Optional. False by default.
+
+Returns:
+    <out_dir>/<parent>_<database>_<hash>/ (folder) : the usual ValidateDatabase reports for each database
+    <out_dir>/index.html (file) : compliance level, error counts, and links to the
+      report of every database
+    <out_dir>/summary.csv (file) : the same, with the number of errors of each rule
+"""
+
+import csv
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from jinja2 import Environment, FileSystemLoader
+
+versionString = "GeMS_ValidateBatch.py, version of 10/17/2026"
+
+scripts_dir = Path(__file__).resolve().parent
+rule_keys = [f"rule2_{i}" for i in range(1, 10)] + [
+    f"rule3_{i}" for i in range(1, 14)
+]
+
+# GeMS_ValidateDatabase, imported once in each worker
+vdb = None
+
+
+def find_databases(inputs):
+    """Sorted list of .gdb and .gpkg paths in a folder or matching a glob"""
+    if Path(inputs).is_dir() and not inputs.lower().endswith(".gdb"):
+        paths = [p for p in Path(inputs).iterdir()]
+    else:
+        paths = [Path(p) for p in glob.glob(inputs)]
+    return sorted(str(p) for p in paths if p.suffix.lower() in (".gdb", ".gpkg"))
+
+
+def init_worker():
+    """Runs once in each worker process"""
+    global vdb
+    # ValidateDatabase finds its templates and GeoMaterialDict.csv in scripts_dir
+    os.chdir(scripts_dir)
+    sys.path.insert(0, str(scripts_dir))
+    import GeMS_ValidateDatabase as vdb_module
+
+    vdb = vdb_module
+    vdb.check_version = False
+    vdb.scripts_dir = scripts_dir
+    # parse the reference data now rather than in the first validation
+    vdb.jinja_env()
+    vdb.reference_gmd(str(scripts_dir / "GeoMaterialDict.csv"))
+
+
+def work_folder(gdb_path, out_dir):
+    """Report folder of one database. Databases with the same name in different
+    folders get different folders, named for the parent folder and a hash of
+    the full path"""
+    gdb_path = Path(gdb_path)
+    tag = hashlib.sha1(str(gdb_path.resolve()).lower().encode("utf-8")).hexdigest()[:8]
+    name = f"{gdb_path.parent.name}_{gdb_path.name}_{tag}".replace(".", "_")
+    return Path(out_dir) / name
+
+
+def validate(gdb_path, out_dir, use_idfield, skip_topology, native_topology=False):
+    """Validate one database and return a row for the summary"""
+    gdb_path = Path(gdb_path)
+    workdir = work_folder(gdb_path, out_dir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    # a summary left by an earlier run would be read as this run's if
+    # validation fails before writing its own
+    summary_path = workdir / f"{gdb_path.name}-Validation.json"
+    summary_path.unlink(missing_ok=True)
+
+    row = {
+        "database": str(gdb_path),
+        "level": None,
+        "errors": 0,
+        "warnings": 0,
+        "seconds": None,
+        "report": str((workdir / f"{gdb_path.name}-Validation.html").relative_to(out_dir)),
+        "problem": "",
+    }
+    argv = [
+        "GeMS_ValidateDatabase.py",
+        str(gdb_path),
+        "#",
+        "#",
+        str(workdir),
+        "#",
+        "false",
+        str(use_idfield),
+        str(skip_topology),
+        "false",
+        "false",
+        "false",
+        "false",
+        str(native_topology),
+    ]
+    start = time.perf_counter()
+    try:
+        vdb.main(argv)
+    except BaseException as e:
+        # SystemExit from guf.forceExit included, one bad database should not stop the batch
+        row["problem"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+    row["seconds"] = round(time.perf_counter() - start, 1)
+
+    if summary_path.exists():
+        with open(summary_path, encoding="utf-8") as f:
+            summary = json.load(f)
+        row["level"] = summary.get("level")
+        for key in rule_keys:
+            rule = summary["rules"].get(key)
+            row[key] = rule["errors"] if rule and rule["status"] == "fail" else 0
+            if rule and rule["status"] == "not checked":
+                row[key] = "not checked"
+        row["errors"] = sum(n for n in (row[k] for k in rule_keys) if isinstance(n, int))
+        row["warnings"] = sum(w["count"] for w in summary["warnings"].values())
+        if not summary.get("complete") and not row["problem"]:
+            row["problem"] = "validation did not finish"
+    return row
+
+
+def write_summary(rows, out_dir):
+    fields = ["database", "level", "errors", "warnings"] + rule_keys
+    fields.extend(["seconds", "report", "problem"])
+    with open(Path(out_dir) / "summary.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, restval="")
+        writer.writeheader()
+        writer.writerows(rows)
+
+    environment = Environment(loader=FileSystemLoader(str(scripts_dir)))
+    template = environment.get_template("batch_template.jinja")
+    with open(Path(out_dir) / "index.html", "w", encoding="utf-8") as f:
+        f.write(
+            template.render(
+                rows=rows,
+                rule_keys=rule_keys,
+                version_string=versionString,
+                datetime=time.asctime(time.localtime(time.time())),
+            )
+        )
+
+
+def main(argv):
+    inputs = argv[1]
+    dbs = find_databases(inputs)
+    if not dbs:
+        print(f"No .gdb or .gpkg found in {inputs}")
+        return
+
+    if len(argv) > 2 and not argv[2] in ("#", ""):
+        out_dir = Path(argv[2])
+    elif Path(inputs).is_dir():
+        out_dir = Path(inputs) / "validate_batch"
+    else:
+        out_dir = Path(dbs[0]).parent / "validate_batch"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if len(argv) > 3 and not argv[3] in ("#", ""):
+        workers = int(argv[3])
+    else:
+        workers = max(1, (os.cpu_count() or 2) - 1)
+    use_idfield = len(argv) > 4 and argv[4].lower() in ("true", "yes", "1")
+    skip_topology = len(argv) > 5 and argv[5].lower() in ("true", "yes", "1")
+    native_topology = len(argv) > 6 and argv[6].lower() in ("true", "yes", "1")
+
+    # inside ArcGIS Pro sys.executable is ArcGISPro.exe, workers need python.exe
+    if sys.executable.lower().endswith("arcgispro.exe"):
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, "python.exe"))
+
+    print(f"Validating {len(dbs)} database(s) with {workers} worker(s)")
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        futures = {
+            pool.submit(
+                validate, db, out_dir, use_idfield, skip_topology, native_topology
+            ): db
+            for db in dbs
+        }
+        for future in as_completed(futures):
+            try:
+                row = future.result()
+            except Exception as e:
+                row = {"database": futures[future], "problem": str(e)}
+            rows.append(row)
+            print(f"  {row['database']}: level {row.get('level')} {row.get('problem', '')}")
+
+    # same order on every run
+    rows.sort(key=lambda r: r["database"])
+    write_summary(rows, out_dir)
+    print(f"Summary written to {out_dir / 'index.html'}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -3,8 +3,8 @@
 
 Audits a geodatabase for conformance with the GeMS schema and reports compliance 
 as "may be LEVEL 1 COMPLIANT", "is LEVEL 2 COMPLIANT", or "is LEVEL 3 COMPLIANT". 
-It also runs mp (metadata parser) to check for formal errors in geodatabase-level 
-FGDC metadata. 
+It also checks geodatabase-level FGDC metadata for formal errors against the 
+CSDGM (see fgdc_validator.py). 
 
 Usage:
     Use parameter form in ArcGIS Pro or at command line with the arguments below. 
@@ -37,6 +37,9 @@ Args:
       Not applicable to geopackages. Optional. False by default.
     open_report (bool or str) : True or false whether to open the html validation file 
       upone completion. Optional. False by default.
+    native_topology (bool or str) : True or false whether to check topology rules
+      directly on the geometries with native_topology.py instead of building an
+      Esri topology in Topology.gdb. Optional. False by default.
     
       
 Returns:
@@ -45,6 +48,15 @@ Returns:
     <gdb name>-ValidationErrors.html (file) : Detailed list of errors and warnings
       by table, field, ObjectID, etc. Written to workdir.
     <gdb name>_Validation.gdb (file gdb)
+    <gdb name>-Validation.ndjson (file) : One JSON record per error or warning
+      with rule, table, field, id, and value.
+    <gdb name>-Validation.json (file) : Compliance level and per-rule counts
+      and timings.
+    <gdb name>-ValidationCache.json (file) : Per-table results reused by the next
+      validation of the same database for tables that have not changed.
+    TopologyCache.json (file) : Results of the topologies built in Topology.gdb,
+      reused while the MapUnitPolys and ContactsAndFaults they were built from
+      have not changed.
 
 """
 
@@ -76,11 +88,22 @@ import os
 import sys
 import time
 import copy
+import functools
+import json
 from pathlib import Path
 import GeMS_utilityFunctions as guf
 import GeMS_Definition as gdef
 import topology as tp
-import requests
+import table_snapshot as ts
+import duplicate_ids as dids
+import hierarchy_keys as hk
+import rule_scheduler as rs
+import validation_cache as vc
+import gpkg_rules as gr
+import errors_report as er
+import results_json as rj
+import native_topology as nt
+import fgdc_validator as fv
 from jinja2 import Environment, FileSystemLoader
 
 # for debugging
@@ -93,8 +116,17 @@ from jinja2 import Environment, FileSystemLoader
 val = {}
 
 version_string = "GeMS_ValidateDatabase.py, version of 02/19/2025"
-val["version_string"] = version_string
-val["datetime"] = time.asctime(time.localtime(time.time()))
+
+
+def reset_val():
+    """Empty val for a new validation. The dictionary is reused, not replaced,
+    so that main() can run more than once in the same process"""
+    val.clear()
+    val["version_string"] = version_string
+    val["datetime"] = time.asctime(time.localtime(time.time()))
+
+
+reset_val()
 
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_ValidateDatabase.py"
 
@@ -110,6 +142,18 @@ for f in gdef.standard_fields:
 
 use_idfield = False
 
+# GeMS_ValidateBatch turns this off so that workers do not each check GitHub
+check_version = True
+
+# table_snapshot.SnapshotStore shared by all rules, set in main()
+snapshots = None
+
+# validation_cache.ValidationCache of per-table results from earlier runs, set in main()
+cache = None
+
+# gpkg_rules.GpkgRules when validating a GeoPackage. Set-based rules are then run in SQLite
+sql_rules = None
+
 
 def check_sr(db_obj, db_dict):
     """Checks the datum of the spatial reference. Warning if not NAD83 or WGS84"""
@@ -147,9 +191,20 @@ def compare_sr(obj1, obj2, db_dict):
 
 def values(db_dict, table, field, what, where=None):
     """List or dictionary {[oid]: value} of values found in a field in a
-    dictionary is {oid: value}"""
+    dictionary is {oid: value}. Values come from the shared table snapshot
+    when there is one"""
     vals = None
     if table in db_dict:
+        if snapshots:
+            snap = snapshots.get(table)
+            if snap.has_field(field):
+                oid = which_id(db_dict, table) if what == "dictionary" else None
+                try:
+                    return snap.values(field, what, oid, where)
+                except ValueError:
+                    # where clause that the snapshot cannot evaluate, use a cursor
+                    pass
+
         # fields = db_dict[table]["fields"]
         if what == "dictionary":
             oid = which_id(db_dict, table)
@@ -173,6 +228,87 @@ def values(db_dict, table, field, what, where=None):
     return vals
 
 
+def table_rows(db_dict, table, fields):
+    """Iterate over tuples of values in fields, from the shared table snapshot
+    when there is one"""
+    if snapshots:
+        snap = snapshots.get(table)
+        if all(snap.has_field(f) for f in fields):
+            return snap.rows(fields)
+    with arcpy.da.SearchCursor(db_dict[table]["catalogPath"], fields) as cursor:
+        return [row for row in cursor]
+
+
+def table_fingerprint(db_dict, table):
+    """Schema signature, row count, and the latest editor tracking date or,
+    if editor tracking is not enabled, a hash of the table contents. GeoPackage
+    tables are hashed in SQLite rather than read through arcpy.
+    The hash of a geodatabase table is taken from its snapshot, which the rules
+    read anyway, but it means that a table without editor tracking is read in
+    full even when none of its cached results end up being used"""
+    d = db_dict[table]
+    schema = [[f.name, f.type, f.length, f.isNullable] for f in d["fields"]]
+    date_field = d.get("editedAtFieldName")
+    if d.get("editorTrackingEnabled") and date_field:
+        n = 0
+        last = None
+        for r in arcpy.da.SearchCursor(d["catalogPath"], date_field):
+            n += 1
+            if r[0] is not None and (last is None or r[0] > last):
+                last = r[0]
+        return [schema, n, str(last)]
+    if sql_rules:
+        n, digest = sql_rules.fingerprint(table)
+        return [schema, n, digest]
+    snap = snapshots.get(table)
+    return [schema, snap.row_count, snap.digest]
+
+
+def cached_result(table, key, func):
+    """Value of func(), which must depend only on the contents of table, from
+    the validation cache if table has not changed since the last run"""
+    if cache:
+        return cache.result(table, key, func)
+    return func()
+
+
+def distinct_values(db_dict, table, field, where=None):
+    """List of the distinct values in a field, in the order they are first found.
+    This is what a table contributes to the cross-table rules, so it is cached"""
+    return cached_result(
+        table,
+        f"distinct:{field}:{where}",
+        lambda: list(dict.fromkeys(values(db_dict, table, field, "list", where))),
+    )
+
+
+def find_duplicates(table_path, table, field):
+    """Sorted list of values found more than once in a field"""
+    if sql_rules:
+        # GeoPackage, GROUP BY in SQLite
+        return sql_rules.duplicates(table, field)
+    return guf.get_duplicates(table_path, field)
+
+
+def value_html(table, field, value):
+    """html for a value found in a table and field"""
+    return f"""
+        <span class="table">{table}</span>, 
+        <span class="field">{field}</span>, 
+        <span class="value">{value}</span>
+        """
+
+
+def row_html(table, field, id_fld, id_value):
+    """html for a row in a table identified by its OBJECTID or _ID value"""
+    return f"""
+        <span class="table">{table}</span>, 
+        <span class="field"> {field}</span>, 
+        <span class="field">{id_fld}</span> 
+        <span class="value">{str(id_value)}</span>
+        """
+
+
 def which_id(db_dict, table):
     """Determine whether to report the value in the table's _ID field or OBJECTID"""
     fields = db_dict[table]["fields"]
@@ -365,11 +501,13 @@ def check_fields(db_dict, level, schema_extensions):
     return errors, schema_extensions, fld_warnings
 
 
-def check_topology(db_dict, workdir, is_gpkg, topo_pairs):
+def check_topology(db_dict, workdir, is_gpkg, topo_pairs, gdb_path=None, native=False):
     """2.3 GeologicMap topology: no internal gaps or overlaps in MapUnitPolys, boundaries of
     MapUnitPolys are covered by ContactsAndFaults 3.2 All map-like feature datasets obey
     topology rules. No MapUnitPolys gaps or overlaps. No ContactsAndFaults overlaps, self-overlaps,
-    or self-intersections. MapUnitPoly boundaries covered by ContactsAndFaults"""
+    or self-intersections. MapUnitPoly boundaries covered by ContactsAndFaults
+    If native, the rules are checked on the geometries in gdb_path by native_topology,
+    in worker processes, and nothing here touches arcpy"""
     has_been_validated = False
     level_2_errors = [
         "topology errors",
@@ -383,6 +521,17 @@ def check_topology(db_dict, workdir, is_gpkg, topo_pairs):
         "topology3",
     ]
 
+    if native:
+        return nt.check_pairs(gdb_path, topo_pairs, level_2_errors, level_3_errors)
+
+    # results of topologies built in Topology.gdb, reused while the
+    # source feature classes do not change
+    topo_cache = vc.ValidationCache(
+        Path(workdir) / "TopologyCache.json",
+        {"version": version_string, "pro": tp.pro},
+        lambda key: tp.pair_fingerprint(json.loads(key)[:4], db_dict),
+    )
+
     for topo_pair in topo_pairs:
         make_topology = False
         gmap = topo_pair[0]
@@ -402,7 +551,41 @@ def check_topology(db_dict, workdir, is_gpkg, topo_pairs):
             if not is_gpkg:
                 ap(f"\tNo topology found in {gmap}")
 
-            top_path, has_been_validated = tp.make_topology(workdir, topo_pair, db_dict)
+            # the workdir may be shared by databases in the same folder
+            key = json.dumps(topo_pair + [str(gdb_path)])
+            if topo_cache.check(key):
+                top_path, pair_2, pair_3 = topo_cache.result(
+                    key, "topology", lambda: [None, None, None]
+                )
+                if top_path and arcpy.Exists(top_path):
+                    ap(
+                        f"\t\t{topo_pair[2]} and {topo_pair[3]} have not changed, using the results for {top_path}"
+                    )
+                    gmap = Path(top_path).parent.stem
+                    tp.add_pair_errors(level_2_errors, pair_2, gmap)
+                    tp.add_pair_errors(level_3_errors, pair_3, gmap)
+                    continue
+                topo_cache.forget(key)
+
+            def build():
+                top_path, has_been_validated = tp.make_topology(
+                    workdir, topo_pair, db_dict
+                )
+                pair_2, pair_3 = tp.eval_topology(
+                    str(Path(top_path).parent.parent),
+                    Path(top_path).stem,
+                    db_dict,
+                    Path(top_path).parent.stem,
+                    *tp.new_errors_lists(),
+                )
+                return [top_path, pair_2, pair_3]
+
+            ap("\t\tLooking at validation results for errors")
+            top_path, pair_2, pair_3 = topo_cache.result(key, "topology", build)
+            gmap = Path(top_path).parent.stem
+            tp.add_pair_errors(level_2_errors, pair_2, gmap)
+            tp.add_pair_errors(level_3_errors, pair_3, gmap)
+            continue
 
         # evaluate the topology
         # eval_topology returns (level_2, level_3, missing_rules, top_errors)
@@ -423,6 +606,7 @@ def check_topology(db_dict, workdir, is_gpkg, topo_pairs):
             str(topo_gdb), top_name, db_dict, gmap, level_2_errors, level_3_errors
         )
 
+    topo_cache.save()
     return level_2_errors, level_3_errors
 
 
@@ -442,7 +626,7 @@ def check_map_units(db_dict, level, all_map_units, fds_map_units):
     #     else:
     #         return missing, unused, None, None
 
-    dmu_units = list(set(values(db_dict, "DescriptionOfMapUnits", "MapUnit", "list")))
+    dmu_units = distinct_values(db_dict, "DescriptionOfMapUnits", "MapUnit")
     dmu_units = [u for u in dmu_units if not u == None]
     fds_map_units["DescriptionOfMapUnits"] = dmu_units
 
@@ -514,22 +698,18 @@ def check_map_units(db_dict, level, all_map_units, fds_map_units):
                 if f.name.lower() == "mapunit"
             ]
 
-            if mu_fields:
-                with arcpy.da.SearchCursor(
-                    db_dict[mu_table]["catalogPath"], mu_fields
-                ) as cursor:
-                    for row in cursor:
-                        for i, val in enumerate(row):
-                            if val:
-                                if not val in dmu_units:
-                                    html = f"""
-                                        <span class="table">{mu_table}</span>,
-                                        <span class="field">{mu_fields[i]}</span>,
-                                        <span class="value">{val}</span> 
-                                        """
-                                    missing.append(html)
-                                all_map_units.append(val)
-                                fds_map_units[fd].extend(row)
+            for mu_field in mu_fields:
+                for val in distinct_values(db_dict, mu_table, mu_field):
+                    if val:
+                        if not val in dmu_units:
+                            html = f"""
+                                <span class="table">{mu_table}</span>,
+                                <span class="field">{mu_field}</span>,
+                                <span class="value">{val}</span> 
+                                """
+                            missing.append(html)
+                        all_map_units.append(val)
+                        fds_map_units[fd].append(val)
 
             # reset mu_fields and check again
             # look at fields that have MapUnit in the name but are qualified
@@ -544,19 +724,15 @@ def check_map_units(db_dict, level, all_map_units, fds_map_units):
                 and not "guid" in f.name.lower()
             ]
 
-            if mu_fields:
-                with arcpy.da.SearchCursor(
-                    db_dict[mu_table]["catalogPath"], mu_fields
-                ) as cursor:
-                    for row in cursor:
-                        for i, val in enumerate(row):
-                            if not val in dmu_units and not val == None:
-                                html = f"""
-                                <span class="table">{mu_table}</span>,
-                                <span class="field">{mu_fields[i]}</span>,
-                                <span class="value">{val}</span>
-                                """
-                                mu_warnings.append(html)
+            for mu_field in mu_fields:
+                for val in distinct_values(db_dict, mu_table, mu_field):
+                    if not val in dmu_units and not val == None:
+                        html = f"""
+                        <span class="table">{mu_table}</span>,
+                        <span class="field">{mu_field}</span>,
+                        <span class="value">{val}</span>
+                        """
+                        mu_warnings.append(html)
 
             fds_map_units[fd] = list(set(fds_map_units[fd]))
 
@@ -623,10 +799,17 @@ def glossary_check(db_dict, level, all_gloss_terms):
     ]
 
     # compare Term fields in the tables with the Glossary
-    glossary_terms = values(db_dict, "Glossary", "Term", "list")
+    glossary_terms = set(distinct_values(db_dict, "Glossary", "Term"))
     if not glossary_terms:
-        glossary_terms = [""]
-    if tables:
+        glossary_terms = {""}
+    if sql_rules:
+        # GeoPackage, anti-joins in SQLite
+        found, terms, warnings = sql_rules.missing_terms(level)
+        missing = [value_html(*n) for n in found]
+        all_gloss_terms.extend(terms)
+        if level == 3:
+            term_warnings.extend(dict.fromkeys(value_html(*n) for n in warnings))
+    elif tables:
         for table in tables:
             id_fld = which_id(db_dict, table)
             # look for fields matching the controlled fields
@@ -645,7 +828,7 @@ def glossary_check(db_dict, level, all_gloss_terms):
                         where = None
 
                     # vals = values(db_dict, table, field, "dictionary", where)
-                    vals = values(db_dict, table, field, "list", where)
+                    vals = distinct_values(db_dict, table, field, where)
 
                     # put all of these glossary terms in all_gloss_terms list
                     field_vals = list(set(vals))
@@ -660,12 +843,7 @@ def glossary_check(db_dict, level, all_gloss_terms):
 
                     for el in sorted_vals:
                         if not el in glossary_terms:
-                            html = f"""
-                                <span class="table">{table}</span>, 
-                                <span class="field">{field}</span>, 
-                                <span class="value">{el}</span>
-                                """
-                            missing.append(html)
+                            missing.append(value_html(table, field, el))
 
             if level == 3:
                 # also look for all non-GeMS field names in all tables ending in a controlled suffix, GeMS-sy fields
@@ -705,7 +883,7 @@ def glossary_check(db_dict, level, all_gloss_terms):
                             # values in gems-like fields that are not found in the glossary are
                             # listed as warnings, not errors
                             for g_field in gemsy_fields:
-                                vals = values(db_dict, table, g_field, "list")
+                                vals = distinct_values(db_dict, table, g_field)
                                 vals = list(set([el for el in vals if el]))
                                 all_gloss_terms.extend(vals)
                                 sorted_vals = [el for el in sorted(vals) if el]
@@ -713,11 +891,7 @@ def glossary_check(db_dict, level, all_gloss_terms):
                                 # look for missing values
                                 for el in sorted_vals:
                                     if not el in glossary_terms:
-                                        html = f"""
-                                            <span class="table">{table}</span>, 
-                                            <span class="field">{g_field}</span>, 
-                                            <span class="value">{el}</span>
-                                            """
+                                        html = value_html(table, g_field, el)
                                         # not sure why term_warnings gets duplicates...
                                         if not html in term_warnings:
                                             term_warnings.append(html)
@@ -774,37 +948,40 @@ def sources_check(db_dict, level, all_sources):
         f"MissingDataSources{level}",
     ]
 
-    gems_sources = list(set(values(db_dict, "DataSources", "DataSources_ID", "list")))
+    gems_sources = set(distinct_values(db_dict, "DataSources", "DataSources_ID"))
     missing = []
-    for table in tables:
-        where = None
+    if sql_rules:
+        # GeoPackage, split the pipe-delimited ids and anti-join in SQLite
+        found, sources = sql_rules.missing_sources(level)
+        for table, ds_field, el in found:
+            if guf.is_bad_null(el):
+                el = "NULL value or empty string (see Rule 3.13)"
+            missing.append(value_html(table, ds_field, el))
+        all_sources.extend(el for el in sources if not el in all_sources)
+    else:
+        for table in tables:
+            where = None
 
-        if not "fields" in db_dict[table]:
-            arcpy.AddMessage(f"fields not in {table}")
-        ds_fields = [
-            f.name
-            for f in db_dict[table]["fields"]
-            if f.name.lower().endswith("sourceid")
-        ]
-        for ds_field in ds_fields:
-            d_sources = values(db_dict, table, ds_field, "dictionary", where)
-
-            for val in d_sources.values():
-                if val:
-                    # parse pipe-delimited source ids
-                    for el in val.split("|"):
-                        if not el.strip() in all_sources:
-                            all_sources.append(el.strip())
-                        if not el.strip() in gems_sources:
-                            if guf.is_bad_null(el):
-                                el = "NULL value or empty string (see Rule 3.13)"
-                            missing.append(
-                                f"""
-                                    <span class="table">{table}</span>, 
-                                    <span class="field">{ds_field}</span>, 
-                                    <span class="value">{el}</span>
-                                    """
-                            )
+            if not "fields" in db_dict[table]:
+                arcpy.AddMessage(f"fields not in {table}")
+            ds_fields = [
+                f.name
+                for f in db_dict[table]["fields"]
+                if f.name.lower().endswith("sourceid")
+            ]
+            for ds_field in ds_fields:
+                d_sources = distinct_values(db_dict, table, ds_field, where)
+
+                for val in d_sources:
+                    if val:
+                        # parse pipe-delimited source ids
+                        for el in val.split("|"):
+                            if not el.strip() in all_sources:
+                                all_sources.append(el.strip())
+                            if not el.strip() in gems_sources:
+                                if guf.is_bad_null(el):
+                                    el = "NULL value or empty string (see Rule 3.13)"
+                                missing.append(value_html(table, ds_field, el))
 
     missing_source_ids.extend(list(set(missing)))
 
@@ -835,22 +1012,11 @@ def rule3_3(db_dict):
     errors = []
     warnings = []
     for table in tables:
-        # collect all NoNulls fields
-        gems_eq = db_dict[table]["gems_equivalent"]
-        def_fields = gdef.startDict[gems_eq]
-        no_nulls = [n[0] for n in def_fields if n[2] == "NoNulls"]
-        fields = [f.name for f in db_dict[table]["fields"] if f.name in no_nulls]
-        # oid = [f.name for f in db_dict[table]["fields"] if f.type == "OID"][0]
-        for field in fields:
-            vals = values(db_dict, table, field, "dictionary")
-
-            for k, v in vals.items():
-                if guf.empty(v) or guf.is_bad_null(v):
-                    html = f'<span class="table">{table}</span>, <span class="field">{field}</span>'
-                    if field.lower() in ["fieldid"]:
-                        warnings.append(html)
-                    else:
-                        errors.append(html)
+        table_errors, table_warnings = cached_result(
+            table, "rule3_3", lambda: rule3_3_table(db_dict, table)
+        )
+        errors.extend(table_errors)
+        warnings.extend(table_warnings)
 
     missing_required_values.extend(list(set(errors)))
     missing_warnings.extend(list(set(warnings)))
@@ -858,11 +1024,43 @@ def rule3_3(db_dict):
     return missing_required_values, missing_warnings
 
 
+def rule3_3_table(db_dict, table):
+    """Rule 3.3 errors and warnings for one table"""
+    errors = []
+    warnings = []
+    # collect all NoNulls fields
+    gems_eq = db_dict[table]["gems_equivalent"]
+    def_fields = gdef.startDict[gems_eq]
+    no_nulls = [n[0] for n in def_fields if n[2] == "NoNulls"]
+    fields = [f.name for f in db_dict[table]["fields"] if f.name in no_nulls]
+    # oid = [f.name for f in db_dict[table]["fields"] if f.type == "OID"][0]
+    if sql_rules:
+        null_fields = sql_rules.no_nulls(table)
+    else:
+        # one error per field is reported, so distinct values are enough
+        null_fields = [
+            field
+            for field in fields
+            if any(
+                guf.empty(v) or guf.is_bad_null(v)
+                for v in distinct_values(db_dict, table, field)
+            )
+        ]
+    for field in null_fields:
+        html = f'<span class="table">{table}</span>, <span class="field">{field}</span>'
+        if field.lower() in ["fieldid"]:
+            warnings.append(html)
+        else:
+            errors.append(html)
+
+    return errors, warnings
+
+
 def rule3_5_and_7(db_dict, table, all_vals):
     """3.5 No unnecessary terms in Glossary
     3.7 No unnecessary sources in DataSources"""
     if table == "glossary":
-        terms = set(values(db_dict, "Glossary", "Term", "list"))
+        terms = set(distinct_values(db_dict, "Glossary", "Term"))
         unused = [
             "unnecessary term(s) in Glossary",
             "3.5 Terms in Glossary that are not used in geodatabase",
@@ -870,27 +1068,25 @@ def rule3_5_and_7(db_dict, table, all_vals):
         ]
 
     elif table == "datasources":
-        terms = set(values(db_dict, "DataSources", "DataSources_ID", "list"))
+        terms = set(distinct_values(db_dict, "DataSources", "DataSources_ID"))
         unused = [
             "unused source(s) in DataSources",
             "3.7 DataSources_IDs in DataSources that are not used in geodatabase",
             "UnusedSources",
         ]
 
-    unused.extend(list(terms - set(all_vals)))
+    if sql_rules:
+        # GeoPackage, anti-join in SQLite
+        if table == "glossary":
+            unused.extend(sql_rules.unused_terms())
+        else:
+            unused.extend(sql_rules.unused_sources())
+    else:
+        unused.extend(list(terms - set(all_vals)))
 
     return unused
 
 
-def piped(s, chrs):
-    # replace multiple delimiters with pipe
-    for c in chrs:
-        if c in s:
-            s = s.replace(c, "|")
-
-    return s
-
-
 def rule3_10(db_dict):
     """HierarchyKey values in DescriptionOfMapUnits are unique and well formed"""
     hkey_errors = [
@@ -909,121 +1105,90 @@ def rule3_10(db_dict):
         hkey_errors.append("No HierarchyKey values")
         return hkey_errors, hkey_warnings
 
-    # check for empty values
+    # parse and sort all keys once
+    tree = hk.HierarchyKeyTree(hk_dict)
     id_fld = which_id(db_dict, "DescriptionOfMapUnits")
-    for k, v in hk_dict.items():
-        if guf.empty(v):
+
+    # check for empty values
+    for k in tree.empty:
+        hkey_errors.append(
+            f"""
+            <span class="field">{id_fld}</span> 
+            <span class="value">{k}</span> 
+            has no <span class="field">HierarchyKey</span> value
+            """
+        )
+
+    # look for multiple delimiters
+    if len(tree.delimiters) > 1:
+        formatted = [f"<code>{c}</code>" for c in tree.delimiters]
+        hkey_errors.append(f'Multiple delimiters found: {", ".join(formatted)}')
+
+    # duplicated keys, ignoring the delimiter
+    for group in tree.duplicates:
+        for key in group:
             hkey_errors.append(
                 f"""
                 <span class="field">{id_fld}</span> 
-                <span class="value">{k}</span> 
-                has no <span class="field">HierarchyKey</span> value
+                <span class="value">{key.oid}</span> has duplicated key: 
+                <span class="value">{key.raw}</span> (ignore delimiter)
                 """
             )
 
-    # find the delimiter
-    # make a list of all non-alphanumeric characters found in all hkeys
-    # if the length of the list is not 1, there are multiple delimiters.
-    # list of just the hkeys
-    delims = []
-    for hkey in hk_dict.values():
-        if not guf.empty(hkey):
-            for c in hkey:
-                delims.extend([c for c in hkey if c.isalnum() == False])
-    delims = list(set(delims))
-
-    frag_lengths = []
-    id_fld = which_id(db_dict, "DescriptionOfMapUnits")
-    if delims:
-        # dealing with a list of character-delimited keys
-        # look for multiple delimiters
-        if len(delims) > 1:
-            formatted = [f"<code>{c}</code>" for c in delims]
-            hkey_errors.append(f'Multiple delimiters found: {", ".join(formatted)}')
-
-        # turn each hk_dict value into a tuple (piped hkey, original hkey)
-        piped_dict = {
-            k: (piped(v, delims), v) for k, v in hk_dict.items() if not guf.empty(v)
-        }
-
-        # find duplicated pipe delim keys
-        pipe_keys = [v[0] for v in piped_dict.values()]
-        dupe_pipes = [hk for hk in pipe_keys if pipe_keys.count(hk) > 1]
-        dupe_pipes = set(dupe_pipes)
-
-        # iterate through dictionary items
-        for k, v in piped_dict.items():
-            new_key = v[0]
-            old_key = v[1]
-            # check for duplicated key
-            if new_key in dupe_pipes:
-                hkey_errors.append(
-                    f"""
-                    <span class="field">{id_fld}</span> 
-                    <span class="value">{k}</span> has duplicated key: 
-                    <span class="value">{old_key}</span> (ignore delimiter)
-                    """
-                )
-
-            # collect fragment length
-            for frag in new_key.split("|"):
-                if frag:
-                    frag_lengths.append(len(frag))
-
-                # look for non-numeric characters
-                for c in frag if c != "|" else c:
-                    if c.isnumeric() == False:
-                        hkey_warnings.append(
-                            f"""
-                            <span class="field">{id_fld}</span> 
-                            <span class="value>{k}</span>: 
-                            <span class="value">{old_key}</span> 
-                            includes non-numeric character <span class="value">{c}</span>. Please check!
-                            """
-                        )
-    else:
-        # dealing with a list of integers or single fragment values, that is,
-        # hkey values are not materialized paths, just numbers; 1,2,3,4...
-        # or 001, 002, 003
-
-        # look for duplicates
-        hks = list(hk_dict.values())
-        dupes = [hk for hk in hks if hks.count(hk) > 1]
-        dupes = set(dupes)
-
-        # itrate through dictionary
-        for oid, hkey in hk_dict.items():
-            # look for duplicates
-            if hkey in dupes:
-                hkey_errors.append(f"{id_fld} {oid} has duplicated key: {hkey}")
-
-            # look for non-numeric characters
-            for c in hkey:
-                if c.isnumeric == False:
-                    hkey_warnings.append(
-                        f"""
-                        <span class="tab"></span>
-                        <span class="field">{id_fld}</span> 
-                        <span class="value">{oid}</span>: 
-                        <span class="value">{hkey}</span> 
-                        includes non-numeric character <span class="value">{c}</span>. Please check!
-                        """
-                    )
-
-            # collect hkey length
-            if hkey:
-                frag_lengths.append(len(hkey))
+    # look for non-numeric characters
+    for key in tree.non_numeric:
+        chars = ", ".join(key.non_numeric)
+        hkey_warnings.append(
+            f"""
+            <span class="field">{id_fld}</span> 
+            <span class="value">{key.oid}</span>: 
+            <span class="value">{key.raw}</span> 
+            includes non-numeric character(s) <span class="value">{chars}</span>. Please check!
+            """
+        )
 
     # evaluate lengths
-    frag_lengths = set(frag_lengths)
-    if len(frag_lengths) != 1:
+    if len(tree.widths) != 1:
         hkey_warnings.append(
             "Hierarchy keys/fragments are of inconsistent length. Please check!"
         )
 
+    # children without a parent key
+    delim = tree.delimiters[0] if tree.delimiters else "-"
+    for key in tree.orphans:
+        parent = delim.join(key.frags[:-1])
+        hkey_warnings.append(
+            f"""
+            <span class="field">{id_fld}</span> 
+            <span class="value">{key.oid}</span>: 
+            <span class="value">{key.raw}</span> 
+            has no parent key <span class="value">{parent}</span>
+            """
+        )
+
+    # skipped values in sibling numbering
+    for parent, prev, nxt in tree.gaps:
+        under = f' under <span class="value">{delim.join(parent)}</span>' if parent else ""
+        hkey_warnings.append(
+            f"Gap in sibling keys{under}: {prev} is followed by {nxt}"
+        )
+
     return hkey_errors, hkey_warnings
 
 
+@functools.lru_cache(maxsize=None)
+def reference_gmd(ref_gmd):
+    """{GeoMaterial: Definition} and the list of lower-case GeoMaterials of the
+    reference GeoMaterialDict. Read once per process"""
+    ref_gmd_dict = {
+        # r[0].lower().strip(): r[1].lower().strip()
+        r[0]: r[1]
+        for r in arcpy.da.SearchCursor(ref_gmd, ["GeoMaterial", "Definition"])
+    }
+    ref_geomats = [n.lower().strip() for n in ref_gmd_dict.keys()]
+    return ref_gmd_dict, ref_geomats
+
+
 def rule3_11(db_dict, ref_gmd):
     """All values of GeoMaterial are defined in GeoMaterialDict."""
     # return early if there is no GeoMaterialsDict
@@ -1051,11 +1216,7 @@ def rule3_11(db_dict, ref_gmd):
                 return errors
 
     # compare ref_gmd with gdb_gmd
-    ref_gmd_dict = {
-        # r[0].lower().strip(): r[1].lower().strip()
-        r[0]: r[1]
-        for r in arcpy.da.SearchCursor(ref_gmd, ["GeoMaterial", "Definition"])
-    }
+    ref_gmd_dict, ref_geomats = reference_gmd(ref_gmd)
     gdb_gmd_dict = {
         # r[0].lower().strip(): r[1].lower().strip()
         r[0]: r[1]
@@ -1064,7 +1225,7 @@ def rule3_11(db_dict, ref_gmd):
     for k, v in gdb_gmd_dict.items():
         if k:
             # is the geomaterial in ref_gmd?
-            if k.lower().strip() in [n.lower().strip() for n in ref_gmd_dict.keys()]:
+            if k.lower().strip() in ref_geomats:
                 if v:
                     # is the definition correct?
                     if not v.lower().strip() == ref_gmd_dict[k].lower().strip():
@@ -1100,13 +1261,9 @@ def rule3_11(db_dict, ref_gmd):
 
     # iterate through those tables
     msgs = []
-    # list of reference geomaterials
-    ref_geomats = [
-        r[0].lower().strip() for r in arcpy.da.SearchCursor(ref_gmd, "GeoMaterial")
-    ]
     for table in geomat_tables:
         # list of GeoMaterials in the table
-        tbl_geomats = list(set(values(db_dict, table, "GeoMaterial", "list")))
+        tbl_geomats = distinct_values(db_dict, table, "GeoMaterial")
         if None in tbl_geomats:
             tbl_geomats = list(filter(None, tbl_geomats))
         if tbl_geomats:
@@ -1121,32 +1278,44 @@ def rule3_11(db_dict, ref_gmd):
     return errors
 
 
-def rule3_12(db_dict, gdb_path):
+def rule3_12(db_dict, gdb_path, workdir=None):
     """No duplicate _ID values"""
     duplicate_ids = [
         "duplicated _ID value(s)",
         "3.12 Duplicated _ID Values. Missing value indicates an empty string, i.e., one or more space or tabs",
         "duplicate_ids",
     ]
-    all_ids = [None]
     set_ids = []
+    id_index = dids.DuplicateIDIndex(temp_dir=workdir)
     for k in [t for t, v in db_dict.items() if "fields" in v]:
         idf = f"{k}_ID"
         if idf in [f.name for f in db_dict[k]["fields"]]:
-            with arcpy.da.SearchCursor(db_dict[k]["catalogPath"], idf) as cursor:
-                for row in cursor:
-                    if not row[0] in all_ids:
-                        all_ids.append(row[0])
-                    else:
-                        to_html = f"""
-                            <span class="table">{k}</span>, 
-                            <span class="field">{idf}</span>, 
-                            <span class="value">{row[0]}</span>
-                            """
-                        set_ids.append(to_html)
+            oid = [f.name for f in db_dict[k]["fields"] if f.type == "OID"][0]
+            for row in table_rows(db_dict, k, [oid, idf]):
+                if row[1] is None:
+                    # null _IDs have always been reported here
+                    to_html = f"""
+                        <span class="table">{k}</span>, 
+                        <span class="field">{idf}</span>, 
+                        <span class="value">{row[1]}</span>
+                        """
+                    set_ids.append(to_html)
+                else:
+                    id_index.add(k, row[0], row[1])
+
+    # name both rows of each collision
+    for dupe, first, second in id_index.duplicates():
+        to_html = f"""
+            <span class="table">{second[0]}</span>, 
+            <span class="field">{second[0]}_ID</span>, 
+            <span class="value">{dupe}</span> 
+            (OBJECTID {second[1]}) duplicates 
+            <span class="table">{first[0]}</span> OBJECTID {first[1]}
+            """
+        set_ids.append(to_html)
 
     if set_ids:
-        duplicate_ids.extend((list(set(set_ids))))
+        duplicate_ids.extend(list(dict.fromkeys(set_ids)))
 
     return duplicate_ids
 
@@ -1169,87 +1338,76 @@ def rule3_13(db_dict):
         and not "Annotation" in v["concat_type"]
     ]
     for table in tables:
-        id_fld = which_id(db_dict, table)
-        text_fields = [f.name for f in db_dict[table]["fields"] if f.type == "String"]
-        for field in text_fields:
-            val_dict = values(db_dict, table, field, "dictionary")
-            for k, v in val_dict.items():
-                if v:
-                    if v.isspace() or v.lower() in ("&ltnull&gt", "<null>", ""):
-                        html = f"""
-                            <span class="table">{table}</span>, 
-                            <span class="field"> {field}</span>, 
-                            <span class="field">{id_fld}</span> 
-                            <span class="value">{str(k)}</span>
-                            """
-                        zero_length_strings.append(html)
-
-            # also collect leading_trailing_spaces for 'other stuff' report
-            for n in [
-                k for k, v in val_dict.items() if v and (len(v.strip()) != len(v))
-            ]:
-                html = f"""
-                    <span class="table">{table}</span>, 
-                    <span class="field"> {field}</span>, 
-                    <span class="field">{id_fld}</span> 
-                    <span class="value">{str(n)}</span>
-                    """
-                leading_trailing_spaces.append(html)
+        zero_length, end_spaces = cached_result(
+            table, "rule3_13", lambda: rule3_13_table(db_dict, table)
+        )
+        zero_length_strings.extend(zero_length)
+        leading_trailing_spaces.extend(end_spaces)
+
+    return zero_length_strings, leading_trailing_spaces
+
+
+def rule3_13_table(db_dict, table):
+    """Rule 3.13 errors and leading or trailing space warnings for one table"""
+    zero_length_strings = []
+    leading_trailing_spaces = []
+    if sql_rules:
+        # GeoPackage, TRIM in SQLite
+        blanks, padded = sql_rules.blank_strings(table)
+        zero_length_strings = [row_html(table, *n) for n in blanks]
+        leading_trailing_spaces = [row_html(table, *n) for n in padded]
+        return zero_length_strings, leading_trailing_spaces
+
+    id_fld = which_id(db_dict, table)
+    text_fields = [f.name for f in db_dict[table]["fields"] if f.type == "String"]
+    for field in text_fields:
+        val_dict = values(db_dict, table, field, "dictionary")
+        for k, v in val_dict.items():
+            if v:
+                if v.isspace() or v.lower() in ("&ltnull&gt", "<null>", ""):
+                    zero_length_strings.append(row_html(table, field, id_fld, k))
+
+        # also collect leading_trailing_spaces for 'other stuff' report
+        for n in [k for k, v in val_dict.items() if v and (len(v.strip()) != len(v))]:
+            leading_trailing_spaces.append(row_html(table, field, id_fld, n))
 
     return zero_length_strings, leading_trailing_spaces
 
 
-def validate_online(metadata_file, workdir):
-    """validate the xml metadata against the USGS metadata validation service API"""
+def validate_metadata(metadata_file, workdir):
+    """validate the xml metadata against the CSDGM with fgdc_validator"""
 
     metadata_name = metadata_file.stem
     # metadata_dir = metadata_file.parent
     metadata_errors = workdir / f"{metadata_name}_errors.txt"
 
-    # send the temp file to the API
-    url = r"https://www1.usgs.gov/mp/service.php"
-    try:
-        with open(metadata_file, "rb") as f:
-            r = requests.post(url, files={"input_file": f})
-            r.raise_for_status()
-    except requests.exceptions.RequestException as err:
-        ap(err)
-        return err
-
-    if r.ok:
-        links = r.json()["output"]["link"]
-        errors = requests.get(links["error_txt"])
-        with open(metadata_errors, "wt") as f:
-            for line in errors.iter_lines():
-                if not b"appears in unexpected order within" in line:
-                    f.write(f"{line.decode('utf-8')}\n")
-
-        summary = r.json()["summary"]
-        if "No errors" in summary:
-            message = f"""
-                The database-level FGDC metadata are <a href="{metadata_errors.name}">formally correct</a> 
-                although the metadata record should be reviewed to verify that it is meaningful.<br>
-                """
-            ap("The metadata for this record are formally correct.")
-        else:
-            message = f'The metadata record for this database has <a href="{str(metadata_errors.name)}">formal errors</a>. Please fix!<br>'
-            ap(f"The metadata record for this database has errors. Please fix!")
+    issues = fv.validate(metadata_file)
+    issues = fv.write_errors(issues, metadata_errors)
+
+    if fv.summary(issues).startswith("No errors"):
+        message = f"""
+            The database-level FGDC metadata are <a href="{metadata_errors.name}">formally correct</a> 
+            although the metadata record should be reviewed to verify that it is meaningful.<br>
+            """
+        ap("The metadata for this record are formally correct.")
     else:
-        message = (
-            "There was a problem with the connection to the metadata validation service:<br>"
-            + r.reason
-        )
-        ap(message)
+        message = f'The metadata record for this database has <a href="{str(metadata_errors.name)}">formal errors</a>. Please fix!<br>'
+        ap(f"The metadata record for this database has errors. Please fix!")
 
     return message
 
 
+@functools.lru_cache(maxsize=None)
+def jinja_env():
+    """jinja Environment for the templates in the Scripts folder, made once per process"""
+    return Environment(loader=FileSystemLoader(scripts_dir))
+
+
 def write_html(template, out_file):
-    """Writes either the Validation or ValidationErrors file sending the val{}
+    """Writes the Validation file, or any other template, sending the val{}
     dictionary as parameter
     """
-    environment = Environment(loader=FileSystemLoader(scripts_dir))
-    validation_template = environment.get_template(template)
+    validation_template = jinja_env().get_template(template)
     with open(out_file, mode="w", encoding="utf-8") as results:
         results.write(validation_template.render(val=val))
 
@@ -1453,8 +1611,10 @@ def runDBStoredProcedure(conn, sql):
 ##############start here##################
 # get inputs
 def main(argv):
+    reset_val()
     val["parameters"] = ["Runtime parameters"]
-    guf.checkVersion(version_string, rawurl, "gems-tools-pro")
+    if check_version:
+        guf.checkVersion(version_string, rawurl, "gems-tools-pro")
     args_len = len(argv)
 
     # we already know argv[1] exists, no check
@@ -1530,9 +1690,6 @@ def main(argv):
     # skip topology?
     if 8 < args_len:
         skip_topology = guf.eval_bool(argv[8])
-        top_db = workdir / "Topology.gdb"
-        if arcpy.Exists(str(top_db)):
-            arcpy.Delete_management(str(top_db))
     else:
         skip_topology = False
     val["parameters"].append(f"Skip topology check: {skip_topology}")
@@ -1566,6 +1723,14 @@ def main(argv):
     else:
         open_report = False
 
+    # check topology without building an Esri topology?
+    if 13 < args_len:
+        native_topology = guf.eval_bool(argv[13])
+    else:
+        native_topology = False
+    if not skip_topology:
+        val["parameters"].append(f"Native topology check: {native_topology}")
+
     val["report_path"] = workdir / f"{gdb_name}-Validation.html"
     val["report_name"] = f"{gdb_name}-Validation.html"
     val["errors_name"] = f"{gdb_name}-ValidationErrors.html"
@@ -1573,6 +1738,25 @@ def main(argv):
 
     # make the database dictionary
     db_dict = guf.gdb_object_dict(str(gdb_path))
+
+    # every table gets read once, on first use, and the columns are shared by all rules
+    global snapshots
+    snapshots = ts.SnapshotStore(db_dict, workdir)
+
+    # GeoPackages are SQLite databases, run the set-based rules as SQL
+    global sql_rules
+    if is_gpkg:
+        sql_rules = gr.GpkgRules(gdb_path, gr.tables_from_db_dict(db_dict), use_idfield)
+    else:
+        sql_rules = None
+
+    # results of unchanged tables are reused from the last validation of this database
+    global cache
+    cache = vc.ValidationCache(
+        workdir / f"{gdb_name}-ValidationCache.json",
+        {"version": version_string, "use_idfield": use_idfield},
+        lambda table: table_fingerprint(db_dict, table),
+    )
     #ap(str(db_dict))
 
     # edit session?
@@ -1633,333 +1817,585 @@ def main(argv):
     #     else:
     #         gdb_ver = ""
 
+    # rule results go into val in this order, whichever finishes first
+    for i in range(1, 10):
+        val[f"rule2_{i}"] = None
+    for i in range(1, 14):
+        val[f"rule3_{i}"] = None
+
+    # keys that are copied from the scheduler state into val
+    val_keys = [f"rule2_{i}" for i in range(1, 10)]
+    val_keys.extend([f"rule3_{i}" for i in range(1, 14)])
+    val_keys.extend(
+        [
+            "sr_warnings",
+            "fld_warnings",
+            "missing_warnings",
+            "term_warnings",
+            "mu_warnings",
+            "hkey_warnings",
+            "end_spaces",
+            "et_warnings",
+            "metadata_summary",
+            "extras",
+            "all_units",
+            "fds_units",
+            "non_spatial",
+            "inventory",
+        ]
+    )
+
+    # each rule is declared with the values it needs and the values it provides
+    # and run by the scheduler. Rules reading only the database run side by side
+    # in a thread pool. arcpy is not thread-safe, so rules that run geoprocessing
+    # tools or edit tables, and write messages, run on the main thread
+    # errors and warnings are written to the ValidationErrors file as each rule
+    # finishes and only a summary is kept in val
+    report = er.ErrorsReport(
+        val["errors_path"], scripts_dir, val, environment=jinja_env()
+    )
+
+    # and to NDJSON records and a summary JSON for other programs
+    results = rj.ResultsWriter(
+        workdir / f"{gdb_name}-Validation.ndjson",
+        workdir / f"{gdb_name}-Validation.json",
+        {
+            "database": str(gdb_path),
+            "version": version_string,
+            "datetime": val["datetime"],
+        },
+    )
+
+    def finish_rule(rule, result):
+        for k, v in result.items():
+            if k in val_keys:
+                results.add(k, v, rule.name, rules.timings.get(rule.name))
+                result[k] = report.add(k, v)
+
+    rules = rs.RuleScheduler(
+        on_start=lambda rule: ap(rule.message) if rule.message else None,
+        on_finish=finish_rule,
+        on_complete=lambda rule, result: val.update(
+            {k: v for k, v in result.items() if k in val_keys}
+        ),
+    )
+
+    # when unused Glossary and DataSources rows are deleted, rules that read those
+    # tables afterwards have to wait for the deletion
+    after_prune = ("glossary_pruned", "sources_pruned") if delete_extra else ()
+
     # level 2 compliance
-    ap("\u200B")
+    ap("​")
     ap("Looking at level 2 compliance")
-    # check 2.1
-    ap(
-        """Rule 2.1 - Has required elements: nonspatial tables DataSources, 
+
+    def do_rule2_1(state):
+        errors, tp_pairs, sr_warnings = rule2_1(db_dict, is_gpkg)
+        return {"rule2_1": errors, "topo_pairs": tp_pairs, "sr_warnings": sr_warnings}
+
+    rules.add(
+        "rule2_1",
+        do_rule2_1,
+        provides=("rule2_1", "topo_pairs", "sr_warnings"),
+        message="""Rule 2.1 - Has required elements: nonspatial tables DataSources, 
         DescriptionOfMapUnits, GeoMaterialDict; feature dataset GeologicMap with 
-        feature classes ContactsAndFaults and MapUnitPolys"""
+        feature classes ContactsAndFaults and MapUnitPolys""",
     )
-    rule2_1_results = rule2_1(db_dict, is_gpkg)
-    val["rule2_1"] = rule2_1_results[0]
-    val["sr_warnings"] = rule2_1_results[2]
 
-    # rule 2.2
-    # Required fields within required elements are present and correctly defined
-    ap(
-        "Rule 2.2 - Required fields within required elements are present and correctly defined"
-    )
-    schema_extensions = []
-    # fld_warnings is not getting defined right now. Should we use it?
-    val["rule2_2"], schema_extensions, fld_warnings = check_fields(
-        db_dict, 2, schema_extensions
-    )
+    def do_rule2_2(state):
+        # fld_warnings is not getting defined right now. Should we use it?
+        errors, schema_extensions, fld_warnings = check_fields(db_dict, 2, [])
+        return {"rule2_2": errors, "schema_extensions_2": schema_extensions}
 
-    # rule 2.3 topology
-    ap(
-        """2.3 All MapUnitPolys and ContactsAndFaults based feature classes obey Level 2 topology rules: 
-        no internal gaps or overlaps in MapUnitPolys, boundaries of MapUnitPolys are covered by ContactsAndFaults"""
+    rules.add(
+        "rule2_2",
+        do_rule2_2,
+        provides=("rule2_2", "schema_extensions_2"),
+        message="Rule 2.2 - Required fields within required elements are present and correctly defined",
     )
 
-    if skip_topology:
-        level_2_errors = ["Topology check was skipped"]
-        level_3_errors = ["Topology check was skipped"]
-        ap("Topology check was skipped")
-    elif not rule2_1_results[1]:
-        level_2_errors = [
-            "No MapUnitPolys and ContactAndFaults pairs on which to check topology",
-            None,
-        ]
-        level_3_errors = [
-            "No MapUnitPolys and ContactAndFaults pairs on which to check topology",
-            None,
-        ]
-        ap("No MapUnitPolys and ContactAndFaults pairs on which to check topology")
-    else:
-        # returns (level_2_errors, level_3_errors
-        # arcpy.AddMessage(val["rule2_1"])
-        gmap_missing = False
-        for message in val["rule2_1"]:
-            if message == 'Feature dataset <span class="table">GeologicMap</span>':
-                gmap_missing = True
-
-        if gmap_missing:
+    def do_topology(state):
+        if skip_topology:
+            level_2_errors = ["Topology check was skipped"]
+            level_3_errors = ["Topology check was skipped"]
+            ap("Topology check was skipped")
+        elif not state["topo_pairs"]:
+            level_2_errors = [
+                "No MapUnitPolys and ContactAndFaults pairs on which to check topology",
+                None,
+            ]
+            level_3_errors = [
+                "No MapUnitPolys and ContactAndFaults pairs on which to check topology",
+                None,
+            ]
+            ap("No MapUnitPolys and ContactAndFaults pairs on which to check topology")
+        elif (
+            'Feature dataset <span class="table">GeologicMap</span>'
+            in state["rule2_1"]
+        ):
             level_2_errors = [
                 'Feature dataset <span class="table">GeologicMap</span> is missing. Topology not checked'
             ]
             level_3_errors = level_2_errors
         else:
-            topo_results = check_topology(db_dict, workdir, is_gpkg, rule2_1_results[1])
-            level_2_errors = topo_results[0]
-            level_3_errors = topo_results[1]
-
-    val["rule2_3"] = level_2_errors
-
-    # rule 2.4
-    # All map units in MapUnitPolys have entries in DescriptionOfMapUnits table
-    # make a list of MapUnits found in the DMU
-    # dmu_units = values("DescriptonOfMapUnits", "MapUnit", "list")
-    ap("2.4 All map units in MapUnitPolys have entries in DescriptionOfMapUnits table")
-    all_map_units = []
-    fds_map_units = {}
-    if "DescriptionOfMapUnits" in db_dict:
-        val["rule2_4"], all_map_units, fds_map_units = check_map_units(
-            db_dict, 2, all_map_units, fds_map_units
-        )
-    else:
-        val["rule2_4"] = ["DMU cannot be found. Rule not checked"]
-
-    # rule 2.5
-    # No duplicate MapUnit values in DescriptionOfMapUnit table
-    ap("2.5 No duplicate MapUnit values in DescriptionOfMapUnits table")
-    dmu_map_units_duplicates = [
-        "duplicated MapUnit(s) in DMU",
-        "Duplicated MapUnit values in DescriptionOfMapUnits",
-        "DuplicatedMU",
-    ]
-    if "DescriptionOfMapUnits" in db_dict:
+            level_2_errors, level_3_errors = check_topology(
+                db_dict,
+                workdir,
+                is_gpkg,
+                state["topo_pairs"],
+                gdb_path,
+                native_topology,
+            )
+        return {"rule2_3": level_2_errors, "rule3_2": level_3_errors}
+
+    rules.add(
+        "topology",
+        do_topology,
+        requires=("rule2_1", "topo_pairs"),
+        provides=("rule2_3", "rule3_2"),
+        # building an Esri topology runs geoprocessing tools. The native check
+        # only waits on worker processes, so it runs beside all the other rules
+        main_thread=skip_topology or not native_topology,
+        background=native_topology,
+        message="""2.3 All MapUnitPolys and ContactsAndFaults based feature classes obey Level 2 topology rules: 
+        no internal gaps or overlaps in MapUnitPolys, boundaries of MapUnitPolys are covered by ContactsAndFaults
+        3.2 All MapUnitPolys and ContactsAndFaults based feature classes obey Level 3 topology rules: 
+        no overlaps, self-overlaps, or self-intersections in ContactsAndFaults.""",
+    )
+
+    def do_rule2_4(state):
+        # All map units in MapUnitPolys have entries in DescriptionOfMapUnits table
+        if "DescriptionOfMapUnits" in db_dict:
+            errors, all_map_units, fds_map_units = check_map_units(db_dict, 2, [], {})
+        else:
+            errors = ["DMU cannot be found. Rule not checked"]
+            all_map_units, fds_map_units = [], {}
+        return {
+            "rule2_4": errors,
+            "map_units_2": (all_map_units, fds_map_units),
+        }
+
+    rules.add(
+        "rule2_4",
+        do_rule2_4,
+        provides=("rule2_4", "map_units_2"),
+        message="2.4 All map units in MapUnitPolys have entries in DescriptionOfMapUnits table",
+    )
+
+    def do_rule2_5(state):
+        # No duplicate MapUnit values in DescriptionOfMapUnit table
+        if not "DescriptionOfMapUnits" in db_dict:
+            return {"rule2_5": ["DMU cannot be found. Rule not checked"]}
+        dmu_map_units_duplicates = [
+            "duplicated MapUnit(s) in DMU",
+            "Duplicated MapUnit values in DescriptionOfMapUnits",
+            "DuplicatedMU",
+        ]
         dmu_path = db_dict["DescriptionOfMapUnits"]["catalogPath"]
-        dmu_map_units_duplicates.extend(guf.get_duplicates(dmu_path, "MapUnit"))
-        val["rule2_5"] = dmu_map_units_duplicates
-    else:
-        val["rule2_5"] = ["DMU cannot be found. Rule not checked"]
+        dmu_map_units_duplicates.extend(
+            cached_result(
+                "DescriptionOfMapUnits", "duplicates:MapUnit", lambda: find_duplicates(dmu_path, "DescriptionOfMapUnits", "MapUnit")
+            )
+        )
+        return {"rule2_5": dmu_map_units_duplicates}
 
-    # rule 2.6
-    # Certain field values within required elements have entries in Glossary table
-    ap(
-        "2.6 Certain field values within required elements have entries in Glossary table"
+    rules.add(
+        "rule2_5",
+        do_rule2_5,
+        provides=("rule2_5",),
+        message="2.5 No duplicate MapUnit values in DescriptionOfMapUnits table",
     )
-    all_gloss_terms = []
-    if "Glossary" in db_dict:
-        val["rule2_6"], all_gloss_terms = glossary_check(db_dict, 2, all_gloss_terms)
-    else:
-        val["rule2_6"], all_gloss_terms = [
-            "Glossary cannot be found. Rule not checked"
-        ], []
-
-    # rule 2.7
-    # No duplicate Term values in Glossary table
-    ap("2.7 No duplicate Term values in Glossary table")
-    glossary_term_duplicates = [
-        "duplicated terms in Glossary",
-        "2.7 Duplicated terms in Glossary",
-        "DuplicatedTerms",
-    ]
-    if "Glossary" in db_dict:
-        gloss_path = db_dict["Glossary"]["catalogPath"]
-        glossary_term_duplicates.extend(guf.get_duplicates(gloss_path, "Term"))
-        val["rule2_7"] = glossary_term_duplicates
-    else:
-        val["rule2_7"] = ["Glossary cannot be found. Rule not checked"]
 
-    # rule 2.8
-    # All xxxSourceID values in required elements have entries in DataSources table
-    ap(
-        "2.8 All xxxSourceID values in required elements have entries in DataSources table"
+    def do_rule2_6(state):
+        # Certain field values within required elements have entries in Glossary table
+        if "Glossary" in db_dict:
+            errors, all_gloss_terms = glossary_check(db_dict, 2, [])
+        else:
+            errors, all_gloss_terms = ["Glossary cannot be found. Rule not checked"], []
+        return {"rule2_6": errors, "gloss_terms_2": all_gloss_terms}
+
+    rules.add(
+        "rule2_6",
+        do_rule2_6,
+        provides=("rule2_6", "gloss_terms_2"),
+        message="2.6 Certain field values within required elements have entries in Glossary table",
     )
-    all_sources = []
-    if "DataSources" in db_dict:
-        val["rule2_8"], all_sources = sources_check(db_dict, 2, all_sources)
-    else:
-        val["rule2_8"], all_sources = [
-            "DataSources cannot be found. Rule not checked"
-        ], []
-
-    # rule 2.9
-    # No duplicate DataSources_ID values in DataSources table
-    ap("2.9 No duplicate DataSources_ID values in DataSources table")
-    duplicated_source_ids = [
-        "duplicated source IDs in DataSources",
-        "Duplicated source_IDs in DataSources",
-        "DuplicatedIDs",
-    ]
-    if "DataSources" in db_dict:
-        ds_path = db_dict["DataSources"]["catalogPath"]
-        duplicated_source_ids.extend(guf.get_duplicates(ds_path, "DataSources_ID"))
-        val["rule2_9"] = duplicated_source_ids
-    else:
-        val["rule2_9"] = ["DataSources cannot be found. Rule not checked"]
-
-    ap("\u200B")
-    ap("Looking at level 3 compliance")
-    # rule 3.1
-    # Table and field definitions conform to GeMS schema
-    ap("3.1 Table and field definitions conform to GeMS schema")
-    val["rule3_1"], schema_extensions, val["fld_warnings"] = check_fields(
-        db_dict, 3, schema_extensions
+
+    def do_rule2_7(state):
+        # No duplicate Term values in Glossary table
+        if not "Glossary" in db_dict:
+            return {"rule2_7": ["Glossary cannot be found. Rule not checked"]}
+        glossary_term_duplicates = [
+            "duplicated terms in Glossary",
+            "2.7 Duplicated terms in Glossary",
+            "DuplicatedTerms",
+        ]
+        gloss_path = db_dict["Glossary"]["catalogPath"]
+        glossary_term_duplicates.extend(
+            cached_result(
+                "Glossary", "duplicates:Term", lambda: find_duplicates(gloss_path, "Glossary", "Term")
+            )
+        )
+        return {"rule2_7": glossary_term_duplicates}
+
+    rules.add(
+        "rule2_7",
+        do_rule2_7,
+        provides=("rule2_7",),
+        message="2.7 No duplicate Term values in Glossary table",
     )
 
-    # rule 3.2
-    ap(
-        """3.2 All MapUnitPolys and ContactsAndFaults based feature classes obey Level 3 topology rules: 
-        no overlaps, self-overlaps, or self-intersections in ContactsAndFaults."""
+    def do_rule2_8(state):
+        # All xxxSourceID values in required elements have entries in DataSources table
+        if "DataSources" in db_dict:
+            errors, all_sources = sources_check(db_dict, 2, [])
+        else:
+            errors, all_sources = ["DataSources cannot be found. Rule not checked"], []
+        return {"rule2_8": errors, "sources_2": all_sources}
+
+    rules.add(
+        "rule2_8",
+        do_rule2_8,
+        provides=("rule2_8", "sources_2"),
+        message="2.8 All xxxSourceID values in required elements have entries in DataSources table",
     )
-    val["rule3_2"] = level_3_errors
 
-    # rule 3.3
-    # No missing required values
-    ap("3.3 No missing required values")
-    if "Glossary" in db_dict:
-        val["rule3_3"], val["missing_warnings"] = rule3_3(db_dict)
-    else:
-        val["rule3_3"], val["missing_warnings"] = [
-            "Glossary cannot be found. Rule not checked"
-        ], []
-
-    # rule 3.4
-    # No missing terms in Glossary
-    ap("3.4 No missing terms in Glossary")
-    if "Glossary" in db_dict:
-        val["rule3_4"], all_gloss_terms, val["term_warnings"] = glossary_check(
-            db_dict, 3, all_gloss_terms
+    def do_rule2_9(state):
+        # No duplicate DataSources_ID values in DataSources table
+        if not "DataSources" in db_dict:
+            return {"rule2_9": ["DataSources cannot be found. Rule not checked"]}
+        duplicated_source_ids = [
+            "duplicated source IDs in DataSources",
+            "Duplicated source_IDs in DataSources",
+            "DuplicatedIDs",
+        ]
+        ds_path = db_dict["DataSources"]["catalogPath"]
+        duplicated_source_ids.extend(
+            cached_result(
+                "DataSources", "duplicates:DataSources_ID", lambda: find_duplicates(ds_path, "DataSources", "DataSources_ID")
+            )
         )
-    else:
-        val["rule3_4"], all_gloss_terms, val["term_warnings"] = (
-            ["Glossary cannot be found. Rule not checked"],
-            [],
-            [],
+        return {"rule2_9": duplicated_source_ids}
+
+    rules.add(
+        "rule2_9",
+        do_rule2_9,
+        provides=("rule2_9",),
+        message="2.9 No duplicate DataSources_ID values in DataSources table",
+    )
+
+    # level 3 compliance
+    def do_rule3_1(state):
+        # Table and field definitions conform to GeMS schema
+        schema_extensions = list(state["schema_extensions_2"])
+        errors, schema_extensions, fld_warnings = check_fields(
+            db_dict, 3, schema_extensions
         )
+        return {
+            "rule3_1": errors,
+            "schema_extensions_3": schema_extensions,
+            "fld_warnings": fld_warnings,
+        }
 
-    # rule 3.5
-    # No unnecessary terms in Glossary
-    ap("3.5 No unnecessary terms in Glossary")
-    if delete_extra:
-        ap("\tRemoving unused terms from Glossary")
-        del_extra(db_dict, "Glossary", "Term", all_gloss_terms)
+    rules.add(
+        "rule3_1",
+        do_rule3_1,
+        requires=("schema_extensions_2",),
+        provides=("rule3_1", "schema_extensions_3", "fld_warnings"),
+        message="3.1 Table and field definitions conform to GeMS schema",
+    )
 
-    if "Glossary" in db_dict:
-        val["rule3_5"] = rule3_5_and_7(db_dict, "glossary", all_gloss_terms)
-    else:
-        val["rule3_5"] = ["Glossary cannot be found. Rule not checked"]
+    def do_rule3_3(state):
+        # No missing required values
+        if "Glossary" in db_dict:
+            errors, missing_warnings = rule3_3(db_dict)
+        else:
+            errors, missing_warnings = ["Glossary cannot be found. Rule not checked"], []
+        return {"rule3_3": errors, "missing_warnings": missing_warnings}
+
+    rules.add(
+        "rule3_3",
+        do_rule3_3,
+        requires=after_prune,
+        provides=("rule3_3", "missing_warnings"),
+        message="3.3 No missing required values",
+    )
 
-    # rule 3.6
-    # No missing sources in DataSources
-    ap("3.6 No missing sources in DataSources")
-    if "DataSources" in db_dict:
-        val["rule3_6"], all_sources = sources_check(db_dict, 3, all_sources)
-    else:
-        val["rule3_6"], all_sources = [
-            "DataSources cannot be found. Rule not checked"
-        ], []
+    def do_rule3_4(state):
+        # No missing terms in Glossary
+        if "Glossary" in db_dict:
+            errors, all_gloss_terms, term_warnings = glossary_check(
+                db_dict, 3, list(state["gloss_terms_2"])
+            )
+        else:
+            errors, all_gloss_terms, term_warnings = (
+                ["Glossary cannot be found. Rule not checked"],
+                [],
+                [],
+            )
+        return {
+            "rule3_4": errors,
+            "gloss_terms_3": all_gloss_terms,
+            "term_warnings": term_warnings,
+        }
 
-    # rule 3.7
-    # No unnecessary sources in DataSources
-    ap("3.7 No unnecessary sources in DataSources")
+    rules.add(
+        "rule3_4",
+        do_rule3_4,
+        requires=("gloss_terms_2",),
+        provides=("rule3_4", "gloss_terms_3", "term_warnings"),
+        message="3.4 No missing terms in Glossary",
+    )
 
-    if delete_extra:
-        ap("\tRemoving unused sources from DataSources")
-        del_extra(db_dict, "DataSources", "DataSources_ID", all_sources)
+    def do_rule3_5(state):
+        # No unnecessary terms in Glossary
+        all_gloss_terms = state["gloss_terms_3"]
+        if delete_extra and "Glossary" in db_dict:
+            ap("\tRemoving unused terms from Glossary")
+            del_extra(db_dict, "Glossary", "Term", all_gloss_terms)
+            snapshots.drop("Glossary")
+            cache.forget("Glossary")
+
+        if "Glossary" in db_dict:
+            errors = rule3_5_and_7(db_dict, "glossary", all_gloss_terms)
+        else:
+            errors = ["Glossary cannot be found. Rule not checked"]
+        return {"rule3_5": errors, "glossary_pruned": True}
+
+    rules.add(
+        "rule3_5",
+        do_rule3_5,
+        requires=("gloss_terms_3", "rule2_7", "rule3_4"),
+        provides=("rule3_5", "glossary_pruned"),
+        main_thread=True,
+        message="3.5 No unnecessary terms in Glossary",
+    )
 
-    if "DataSources" in db_dict:
-        val["rule3_7"] = rule3_5_and_7(db_dict, "datasources", all_sources)
-    else:
-        val["rule3_7"] = ["DataSources cannot be found. Rule not checked"]
-
-    # rule 3.8
-    # No map units without entries in DescriptionOfMapUnits
-    # rule 3.9
-    # No unnecessary map units in DescriptionOfMapUnits
-    ap("3.8 No map units without entries in DescriptionOfMapUnits")
-    ap("3.9 No unnecessary map units in DescriptionOfMapUnits")
-    if "DescriptionOfMapUnits" in db_dict:
-        (
-            val["rule3_8"],
-            val["rule3_9"],
-            all_map_units,
-            fds_map_units,
-            val["mu_warnings"],
-        ) = check_map_units(db_dict, 3, all_map_units, fds_map_units)
-    else:
-        error_list = ["DMU cannot be found. Rule not checked"]
-        val["rule3_8"] = error_list
-        val["rule3_9"] = error_list
-        all_map_units = []
-        fds_map_units = []
-        val["mu_warnings"] = []
-
-    # rule 3.10
-    # HierarchyKey values in DescriptionOfMapUnits are unique and well formed
-    ap("3.10 HierarchyKey values in DescriptionOfMapUnits are unique and well formed")
-    if "DescriptionOfMapUnits" in db_dict:
-        val["rule3_10"], val["hkey_warnings"] = rule3_10(db_dict)
-    else:
-        val["rule3_10"], val["hkey_warnings"] = [
-            "DMU cannot be found. Rule not checked"
-        ]
-    # 3.11
-    # All values of GeoMaterial are defined in GeoMaterialDict.
-    ap(
-        "3.11 All values of GeoMaterial are defined in GeoMaterialDict. GeoMaterialDict is as specified in the GeMS standard"
+    def do_rule3_6(state):
+        # No missing sources in DataSources
+        if "DataSources" in db_dict:
+            errors, all_sources = sources_check(db_dict, 3, list(state["sources_2"]))
+        else:
+            errors, all_sources = ["DataSources cannot be found. Rule not checked"], []
+        return {"rule3_6": errors, "sources_3": all_sources}
+
+    rules.add(
+        "rule3_6",
+        do_rule3_6,
+        requires=("sources_2",),
+        provides=("rule3_6", "sources_3"),
+        message="3.6 No missing sources in DataSources",
     )
-    val["rule3_11"] = rule3_11(db_dict, ref_gmd)
-
-    # 3.12
-    # No duplicate _ID values
-    ap("3.12 No duplicate _ID values")
-    val["rule3_12"] = rule3_12(db_dict, str(gdb_path))
-
-    # 3.13
-    # No zero-length or whitespace-only strings
-    ap("3.13 No zero-length or whitespace-only strings")
-    val["rule3_13"], val["end_spaces"] = rule3_13(db_dict)
-
-    # check for editor tracking
-    val["et_warnings"] = ["Editor tracking enabled on:"]
-    for k, v in db_dict.items():
-        if "editorTrackingEnabled" in v:
-            if v["editorTrackingEnabled"]:
-                html = f'<span class="table">{k}</span>'
-                val["et_warnings"].append(html)
-
-    # METADATA
-    if arc_md:
-        ap("Exporting embedded ArcGIS metadata to FGDC")
-        # export the metadata from Arc
-        # this method only exports good metadata if it has been written in ArcCatalog at the
-        # gdb level or imported from an xml such as that produced at the end of Build Metadata.
-        src_md = arcpy.metadata.Metadata(str(gdb_path))
-        src_md.exportMetadata(str(metadata_file), "FGDC_CSDGM")
-
-    if metadata_file:
-        if Path(metadata_file).exists:
-            md_summary = validate_online(metadata_file, workdir)
+
+    def do_rule3_7(state):
+        # No unnecessary sources in DataSources
+        all_sources = state["sources_3"]
+        if delete_extra and "DataSources" in db_dict:
+            ap("\tRemoving unused sources from DataSources")
+            del_extra(db_dict, "DataSources", "DataSources_ID", all_sources)
+            snapshots.drop("DataSources")
+            cache.forget("DataSources")
+
+        if "DataSources" in db_dict:
+            errors = rule3_5_and_7(db_dict, "datasources", all_sources)
         else:
-            md_summary = f"{metadata_file} does not exist."
-    else:
-        ap("Check Metadata option was skipped")
-        md_summary = "<b>Check Metadata</b> option was skipped. Be sure to have prepared valid metadata and check this option to produce a complete report."
+            errors = ["DataSources cannot be found. Rule not checked"]
+        return {"rule3_7": errors, "sources_pruned": True}
+
+    rules.add(
+        "rule3_7",
+        do_rule3_7,
+        requires=("sources_3", "rule2_9", "rule3_6"),
+        provides=("rule3_7", "sources_pruned"),
+        main_thread=True,
+        message="3.7 No unnecessary sources in DataSources",
+    )
 
-    # now that rules have been checked, prepare some summary entries
-    val["metadata_summary"] = md_summary
-    val["level"] = determine_level(val)
+    def do_rule3_8_9(state):
+        # No map units without entries in DescriptionOfMapUnits
+        # No unnecessary map units in DescriptionOfMapUnits
+        all_map_units, fds_map_units = state["map_units_2"]
+        if "DescriptionOfMapUnits" in db_dict:
+            (
+                missing,
+                unused,
+                all_map_units,
+                fds_map_units,
+                mu_warnings,
+            ) = check_map_units(db_dict, 3, list(all_map_units), dict(fds_map_units))
+        else:
+            error_list = ["DMU cannot be found. Rule not checked"]
+            missing, unused, mu_warnings = error_list, error_list, []
+            all_map_units, fds_map_units = [], []
+        return {
+            "rule3_8": missing,
+            "rule3_9": unused,
+            "mu_warnings": mu_warnings,
+            "map_units_3": (all_map_units, fds_map_units),
+        }
+
+    rules.add(
+        "rule3_8_9",
+        do_rule3_8_9,
+        requires=("map_units_2",),
+        provides=("rule3_8", "rule3_9", "mu_warnings", "map_units_3"),
+        message="""3.8 No map units without entries in DescriptionOfMapUnits
+        3.9 No unnecessary map units in DescriptionOfMapUnits""",
+    )
+
+    def do_rule3_10(state):
+        # HierarchyKey values in DescriptionOfMapUnits are unique and well formed
+        if "DescriptionOfMapUnits" in db_dict:
+            errors, hkey_warnings = cached_result(
+                "DescriptionOfMapUnits", "rule3_10", lambda: rule3_10(db_dict)
+            )
+        else:
+            errors, hkey_warnings = ["DMU cannot be found. Rule not checked"], []
+        return {"rule3_10": errors, "hkey_warnings": hkey_warnings}
+
+    rules.add(
+        "rule3_10",
+        do_rule3_10,
+        provides=("rule3_10", "hkey_warnings"),
+        message="3.10 HierarchyKey values in DescriptionOfMapUnits are unique and well formed",
+    )
+
+    rules.add(
+        "rule3_11",
+        lambda state: {"rule3_11": rule3_11(db_dict, ref_gmd)},
+        provides=("rule3_11",),
+        message="3.11 All values of GeoMaterial are defined in GeoMaterialDict. GeoMaterialDict is as specified in the GeMS standard",
+    )
+
+    rules.add(
+        "rule3_12",
+        lambda state: {"rule3_12": rule3_12(db_dict, str(gdb_path), str(workdir))},
+        requires=after_prune,
+        provides=("rule3_12",),
+        message="3.12 No duplicate _ID values",
+    )
+
+    def do_rule3_13(state):
+        # No zero-length or whitespace-only strings
+        errors, end_spaces = rule3_13(db_dict)
+        return {"rule3_13": errors, "end_spaces": end_spaces}
+
+    rules.add(
+        "rule3_13",
+        do_rule3_13,
+        requires=after_prune,
+        provides=("rule3_13", "end_spaces"),
+        message="3.13 No zero-length or whitespace-only strings",
+    )
+
+    def do_editor_tracking(state):
+        # check for editor tracking
+        et_warnings = ["Editor tracking enabled on:"]
+        for k, v in db_dict.items():
+            if "editorTrackingEnabled" in v:
+                if v["editorTrackingEnabled"]:
+                    html = f'<span class="table">{k}</span>'
+                    et_warnings.append(html)
+        return {"et_warnings": et_warnings}
+
+    rules.add("editor_tracking", do_editor_tracking, provides=("et_warnings",))
+
+    def do_metadata(state):
+        # METADATA
+        if arc_md:
+            ap("Exporting embedded ArcGIS metadata to FGDC")
+            # export the metadata from Arc
+            # this method only exports good metadata if it has been written in ArcCatalog at the
+            # gdb level or imported from an xml such as that produced at the end of Build Metadata.
+            src_md = arcpy.metadata.Metadata(str(gdb_path))
+            src_md.exportMetadata(str(metadata_file), "FGDC_CSDGM")
+
+        if metadata_file:
+            if Path(metadata_file).exists():
+                md_summary = validate_metadata(metadata_file, workdir)
+            else:
+                md_summary = f"{metadata_file} does not exist."
+        else:
+            ap("Check Metadata option was skipped")
+            md_summary = "<b>Check Metadata</b> option was skipped. Be sure to have prepared valid metadata and check this option to produce a complete report."
+        return {"metadata_summary": md_summary}
+
+    rules.add(
+        "metadata", do_metadata, provides=("metadata_summary",), main_thread=True
+    )
 
-    ap("\u200B")
-    ap("Inventorying database:")
     # other stuff
-    # find extensions to schema
-    ap("\tLooking for extensions to GeMS schema")
-    val["extras"] = extra_tables(db_dict, schema_extensions)
-
-    # prepare lists of units for Occurrence table
-    if "DescriptionOfMapUnits" in db_dict:
-        ap("\tFinding occurrences of map units")
-        all_map_units.sort()
-        val["all_units"] = list(set(all_map_units))
-        fds_map_units = sort_fds_units(fds_map_units)
-        val["fds_units"] = fds_map_units
-    else:
-        val["all_units"] = []
-        val["fds_units"] = []
+    def do_extras(state):
+        # find extensions to schema
+        return {"extras": extra_tables(db_dict, list(state["schema_extensions_3"]))}
+
+    rules.add(
+        "extras",
+        do_extras,
+        requires=("schema_extensions_3",),
+        provides=("extras",),
+        message="\tLooking for extensions to GeMS schema",
+    )
 
-    # prepare contents of non-spatial tables
-    ap("\tStoring contents of non-spatial tables")
-    val["non_spatial"] = dump_tables(db_dict)
+    def do_occurrences(state):
+        # prepare lists of units for Occurrence table
+        all_map_units, fds_map_units = state["map_units_3"]
+        if "DescriptionOfMapUnits" in db_dict:
+            all_map_units.sort()
+            return {
+                "all_units": list(set(all_map_units)),
+                "fds_units": sort_fds_units(fds_map_units),
+            }
+        else:
+            return {"all_units": [], "fds_units": []}
+
+    rules.add(
+        "occurrences",
+        do_occurrences,
+        requires=("map_units_3",),
+        provides=("all_units", "fds_units"),
+        message="\tFinding occurrences of map units",
+    )
 
-    # build inventory
-    ap("\tBuilding database inventory")
-    val["inventory"] = inventory(db_dict)
+    def do_non_spatial(state):
+        # prepare contents of non-spatial tables
+        return {"non_spatial": dump_tables(db_dict)}
+
+    rules.add(
+        "non_spatial",
+        do_non_spatial,
+        requires=after_prune,
+        provides=("non_spatial",),
+        message="\tStoring contents of non-spatial tables",
+    )
+
+    def do_inventory(state):
+        # build inventory, GetCount is a geoprocessing tool
+        return {"inventory": inventory(db_dict)}
+
+    rules.add(
+        "inventory",
+        do_inventory,
+        requires=after_prune,
+        provides=("inventory",),
+        main_thread=True,
+        message="\tBuilding database inventory",
+    )
+
+    rules.run({})
+
+    cache.save(keep=db_dict)
+    ap(
+        f"Reused {cache.hits} cached table result(s). Tables new or changed since the last validation: {len(cache.changed_tables())}"
+    )
+
+    # now that rules have been checked, prepare some summary entries
+    val["level"] = determine_level(val)
+    results.close(val["level"], rules.timings)
+
+    ap("​")
+    ap("Rule timings:")
+    for name, seconds in rules.timings.items():
+        ap(f"\t{name}: {seconds:.1f} s")
 
     ### Compact DB option
     if compact_db == "true":
@@ -1970,7 +2406,8 @@ def main(argv):
         pass
 
     write_html("report_template.jinja", val["report_path"])
-    write_html("errors_template.jinja", val["errors_path"])
+    report.close()
+    snapshots.close()
 
     if open_report:
         os.startfile(val["report_path"])
@@ -1985,7 +2422,7 @@ if __name__ == "__main__":
 
 
 #-------------------validation script----------
-import os,glob
+import glob
 sys.path.insert(1, os.path.join(os.path.dirname(__file__),'Scripts'))
 from GeMS_utilityFunctions import *
 
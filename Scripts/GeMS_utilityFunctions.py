@@ -2,6 +2,7 @@
 
 import arcpy, os.path, time, glob
 import GeMS_Definition as gdef
+import side_units as su
 
 
 editPrefixes = ("xxx", "edit_", "errors_", "ed_")
@@ -191,6 +192,112 @@ def getMup(fds):
     return caf.replace("ContactsAndFaults", "MapUnitPolys")
 
 
+def mapUnitIndex(mup, valueField="MapUnit"):
+    # returns a side_units.PolygonIndex of the valueField values of the polygons of mup
+    sr = arcpy.Describe(mup).spatialReference
+    polys = []
+    with arcpy.da.SearchCursor(mup, [valueField, "SHAPE@"]) as cursor:
+        for row in cursor:
+            shape = row[1]
+            if shape is None:
+                continue
+            if shape.hasCurves:
+                shape = shape.densify("OFFSET", shape.length, sr.XYTolerance)
+            rings = []
+            for part in shape:
+                ring = []
+                for pt in part:
+                    if pt:
+                        ring.append((pt.X, pt.Y))
+                    elif ring:  # start of an interior ring
+                        rings.append(ring)
+                        ring = []
+                if ring:
+                    rings.append(ring)
+            polys.append((row[0], rings))
+    return su.PolygonIndex(polys)
+
+
+def lineParts(shape, sr):
+    # returns the parts of a polyline as lists of (x, y), curves densified
+    if shape is None:
+        return []
+    if shape.hasCurves:
+        shape = shape.densify("OFFSET", shape.length, sr.XYTolerance)
+    return [[(pt.X, pt.Y) for pt in part if pt] for part in shape]
+
+
+def addSideMapUnits(lineFc, mup, offset=None):
+    # adds LEFT_MapUnit and RIGHT_MapUnit to the lines of lineFc, the map units
+    # of the polygons of mup on either side of each line, as Identity with
+    # KEEP_RELATIONSHIPS does, but without overlaying the feature classes.
+    # Lines are not split where they cross polygon boundaries. Every part of
+    # a line is probed, see side_units.line_sides
+    sr = arcpy.Describe(mup).spatialReference
+    if offset is None:
+        offset = 10 * sr.XYTolerance
+    index = mapUnitIndex(mup)
+
+    muLength = arcpy.ListFields(mup, "MapUnit")[0].length
+    fields = fieldNameList(lineFc)
+    for f in ("LEFT_MapUnit", "RIGHT_MapUnit"):
+        if f not in fields:
+            arcpy.AddField_management(lineFc, f, "TEXT", "", "", muLength)
+    with arcpy.da.UpdateCursor(
+        lineFc, ["SHAPE@", "LEFT_MapUnit", "RIGHT_MapUnit"]
+    ) as cursor:
+        for row in cursor:
+            left, right = su.line_sides(
+                lineParts(row[0], sr), index, offset, sr.XYTolerance
+            )
+            cursor.updateRow([row[0], left, right])
+
+
+def featureEnvelopes(fc, whereClause=None):
+    # returns {OBJECTID: (xmin, ymin, xmax, ymax)} for the features of fc
+    envelopes = {}
+    with arcpy.da.SearchCursor(fc, ["OID@", "SHAPE@"], whereClause) as cursor:
+        for row in cursor:
+            if row[1] is not None:
+                e = row[1].extent
+                envelopes[row[0]] = (e.XMin, e.YMin, e.XMax, e.YMax)
+    return envelopes
+
+
+def editedBoxes(fc, since, envelopes):
+    # returns boxes around the features of fc added, edited, or deleted since
+    # the datetime since, at their old and new places, and the envelopes of
+    # the features of fc now. envelopes are those of the last check
+    field = arcpy.Describe(fc).editedAtFieldName
+    current = set()
+    edited = []
+    with arcpy.da.SearchCursor(fc, ["OID@", field]) as cursor:
+        for row in cursor:
+            current.add(row[0])
+            if row[1] is None or row[1] > since or row[0] not in envelopes:
+                edited.append(row[0])
+    deleted = [envelopes[oid] for oid in envelopes if oid not in current]
+    boxes = list(deleted)
+    newEnvelopes = {oid: e for oid, e in envelopes.items() if oid in current}
+    oidField = arcpy.Describe(fc).OIDFieldName
+    for i in range(0, len(edited), 1000):
+        chunk = edited[i : i + 1000]
+        boxes.extend(envelopes[oid] for oid in chunk if oid in envelopes)
+        whereClause = oidField + " IN (" + ",".join(str(oid) for oid in chunk) + ")"
+        changed = featureEnvelopes(fc, whereClause)
+        boxes.extend(changed.values())
+        newEnvelopes.update(changed)
+    addMsgAndPrint(
+        "  "
+        + str(len(edited))
+        + " features added or edited and "
+        + str(len(deleted))
+        + " deleted in "
+        + os.path.basename(fc)
+    )
+    return boxes, newEnvelopes
+
+
 def getNameToken(fds):
     if os.path.basename(fds) == "CorrelationOfMapUnits":
         return "CMU"
@@ -0,0 +1,106 @@
+"""Streaming detection of duplicated _ID values across all tables of a database
+
+IDs are fed in one at a time with the table and OBJECTID of the row they came
+from. A hash index remembers the first occurrence of every ID so that each
+duplicate can be reported together with the row it collides with. Once the
+index holds more than `threshold` IDs, it is written out to temp files
+partitioned by a hash of the ID and the rest of the stream follows it there.
+Each partition is then small enough to be checked in memory on its own.
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import zlib
+
+# number of distinct IDs held in memory before switching to partitioned temp files
+THRESHOLD = 1000000
+
+# number of temp files used in partitioned mode
+PARTITIONS = 64
+
+
+def _partition(value, n):
+    # stable across processes, unlike hash() on str
+    return zlib.crc32(repr(value).encode("utf-8")) % n
+
+
+class DuplicateIDIndex:
+    """Hash index of ID values. add() every (table, oid, value) then read
+    duplicates() for a list of (value, (first_table, first_oid), (table, oid))
+    in the order the duplicated rows were added"""
+
+    def __init__(self, threshold=THRESHOLD, temp_dir=None, partitions=PARTITIONS):
+        self.threshold = threshold
+        self.temp_dir = temp_dir
+        self.n_partitions = partitions
+        self.seen = {}
+        self.found = []
+        self.seq = 0
+        self.part_dir = None
+        self.part_files = None
+
+    def add(self, table, oid, value):
+        self.seq += 1
+        if self.part_files:
+            f = self.part_files[_partition(value, self.n_partitions)]
+            pickle.dump((self.seq, value, table, oid), f, pickle.HIGHEST_PROTOCOL)
+            return
+
+        if value in self.seen:
+            self.found.append((self.seq, value, self.seen[value], (table, oid)))
+        else:
+            self.seen[value] = (table, oid)
+            if len(self.seen) > self.threshold:
+                self._spill()
+
+    def _spill(self):
+        """Move the index to partition files. Entries are written in the order
+        they were first seen, so first occurrences stay first"""
+        self.part_dir = tempfile.mkdtemp(prefix="gems_ids_", dir=self.temp_dir)
+        self.part_files = [
+            open(os.path.join(self.part_dir, f"{i}.ids"), "wb")
+            for i in range(self.n_partitions)
+        ]
+        for value, (table, oid) in self.seen.items():
+            f = self.part_files[_partition(value, self.n_partitions)]
+            # sequence 0 sorts ahead of anything added later
+            pickle.dump((0, value, table, oid), f, pickle.HIGHEST_PROTOCOL)
+        self.seen = {}
+
+    def _read_partition(self, path):
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    break
+
+    def duplicates(self):
+        found = list(self.found)
+        if self.part_files:
+            for f in self.part_files:
+                f.close()
+            for i in range(self.n_partitions):
+                path = os.path.join(self.part_dir, f"{i}.ids")
+                seen = {}
+                for seq, value, table, oid in self._read_partition(path):
+                    if value in seen:
+                        found.append((seq, value, seen[value], (table, oid)))
+                    else:
+                        seen[value] = (table, oid)
+            self.close()
+
+        found.sort(key=lambda n: n[0])
+        return [n[1:] for n in found]
+
+    def close(self):
+        if self.part_files:
+            for f in self.part_files:
+                if not f.closed:
+                    f.close()
+            self.part_files = None
+        if self.part_dir:
+            shutil.rmtree(self.part_dir, ignore_errors=True)
+            self.part_dir = None
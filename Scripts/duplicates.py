@@ -0,0 +1,61 @@
+"""Duplicate points, no arcpy
+
+find_duplicates does what FindIdentical(..., ["Shape", "Type", "Azimuth",
+"Inclination"], xy_tolerance, ONLY_DUPLICATES) does for a point feature class,
+in one pass. Each point is hashed by its attribute values and its coordinates
+quantized to a grid of tolerance-wide cells. Points that are within tolerance
+of each other are in the same or neighboring cells, so only those are compared.
+"""
+
+import math
+
+
+def find_duplicates(rows, tolerance=0):
+    """(IN_FID, FEAT_SEQ) for every point that has a duplicate, as in the
+    ONLY_DUPLICATES output of FindIdentical. Duplicates have the same attribute
+    values and are no farther apart than tolerance; duplicates of duplicates
+    are in the same group. Groups are numbered from 1 in the order of their
+    first point.
+    rows - iterable of (oid, x, y, (attribute values))"""
+    rows = list(rows)
+    parent = list(range(len(rows)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    cells = {}
+    for i, (_, x, y, attribs) in enumerate(rows):
+        if tolerance > 0:
+            cx = math.floor(x / tolerance)
+            cy = math.floor(y / tolerance)
+            neighbors = [
+                (attribs, gx, gy)
+                for gx in (cx - 1, cx, cx + 1)
+                for gy in (cy - 1, cy, cy + 1)
+            ]
+            key = (attribs, cx, cy)
+        else:
+            key = (attribs, x, y)
+            neighbors = [key]
+        for n in neighbors:
+            for j in cells.get(n, ()):
+                if math.hypot(x - rows[j][1], y - rows[j][2]) <= tolerance:
+                    ri, rj = find(i), find(j)
+                    if ri != rj:
+                        parent[max(ri, rj)] = min(ri, rj)
+        cells.setdefault(key, []).append(i)
+
+    groups = {}
+    for i in range(len(rows)):
+        groups.setdefault(find(i), []).append(i)
+    found = []
+    seq = 0
+    for root in sorted(groups):
+        members = groups[root]
+        if len(members) > 1:
+            seq += 1
+            found.extend((rows[i][0], seq) for i in members)
+    return found
@@ -0,0 +1,212 @@
+"""Streaming writer for the <gdb name>-ValidationErrors.html report
+
+Rendering every error of every rule into one string takes a lot of memory on
+databases with hundreds of thousands of errors and makes a file that browsers
+cannot open. ErrorsReport instead writes each rule's section to a part file as
+soon as the rule finishes and lists at most max_inline rows in it. The rest of
+the rows go to overflow files next to the report, either pages of page_rows
+rows (overflow="html") or one NDJSON file per section (overflow="ndjson"),
+linked from the end of the section. close() stitches the parts together in
+report order.
+
+The full error list is then replaced in val by an ErrorSummary that keeps the
+message, header and anchor, the rows that were listed inline, and the total
+length, which is all report_template.jinja and determine_level need.
+"""
+
+import json
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from jinja2 import Environment, FileSystemLoader
+
+# rows listed in the ValidationErrors file for each rule or warning
+MAX_INLINE = 1000
+
+# rows per overflow html page
+PAGE_ROWS = 5000
+
+# warnings in the order they appear in the report
+warning_keys = (
+    "sr_warnings",
+    "end_spaces",
+    "fld_warnings",
+    "hkey_warnings",
+    "term_warnings",
+    "mu_warnings",
+    "et_warnings",
+    "missing_warnings",
+)
+
+
+class ErrorSummary:
+    """Stand-in for a list of errors that has been written to the report.
+    len() is the length of the full list, indexing and iteration only see the
+    items that were kept"""
+
+    def __init__(self, items, total):
+        self.items = list(items)
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, i):
+        return self.items[i]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, item):
+        return item in self.items
+
+
+class ErrorsReport:
+    """Writes the ValidationErrors file section by section.
+    errors_path - path of the html file
+    template_dir - folder with errors_template.jinja
+    val - the dictionary of report values, read when the file is finished
+    environment - jinja Environment to reuse, one is made if not supplied"""
+
+    def __init__(
+        self,
+        errors_path,
+        template_dir,
+        val,
+        max_inline=MAX_INLINE,
+        page_rows=PAGE_ROWS,
+        overflow="html",
+        environment=None,
+    ):
+        if not overflow in ("html", "ndjson"):
+            raise ValueError(f"overflow must be 'html' or 'ndjson', not {overflow}")
+        self.errors_path = Path(errors_path)
+        self.val = val
+        self.max_inline = max_inline
+        self.page_rows = page_rows
+        self.overflow = overflow
+        if environment is None:
+            environment = Environment(loader=FileSystemLoader(str(template_dir)))
+        self.macros = environment.get_template("errors_template.jinja").module
+        self.part_dir = Path(
+            tempfile.mkdtemp(prefix="gems_errors_", dir=self.errors_path.parent)
+        )
+        self.parts = {}
+        self._lock = threading.Lock()
+
+        # overflow files from an earlier run would otherwise be left behind
+        stem = self.errors_path.stem
+        for pattern in (f"{stem}-*-[0-9]*.html", f"{stem}-*.ndjson"):
+            for old in self.errors_path.parent.glob(pattern):
+                old.unlink()
+
+    def _overflow_name(self, anchor, n=None):
+        stem = self.errors_path.stem
+        if self.overflow == "ndjson":
+            return f"{stem}-{anchor}.ndjson"
+        return f"{stem}-{anchor}-{n}.html"
+
+    def _write_overflow(self, key, anchor, title, rows):
+        """Write rows that do not fit in the section, return a list of (name, href)"""
+        if not rows:
+            return []
+        folder = self.errors_path.parent
+        if self.overflow == "ndjson":
+            name = self._overflow_name(anchor)
+            with open(folder / name, "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({"rule": key, "anchor": anchor, "html": str(row)}))
+                    f.write("\n")
+            return [(name, name)]
+
+        n_pages = (len(rows) + self.page_rows - 1) // self.page_rows
+        pages = [
+            (str(i), self._overflow_name(anchor, i)) for i in range(1, n_pages + 1)
+        ]
+        for i, (page, href) in enumerate(pages):
+            chunk = rows[i * self.page_rows : (i + 1) * self.page_rows]
+            with open(folder / href, "w", encoding="utf-8") as f:
+                f.write(
+                    self.macros.overflow_page(self.val, title, chunk, i + 1, pages)
+                )
+        return [(f"page {name}", href) for name, href in pages]
+
+    def _write_part(self, key, html):
+        path = self.part_dir / f"{key}.html"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(str(html))
+        with self._lock:
+            self.parts[key] = path
+
+    def add_rule(self, key, errors):
+        """Write the section for a rule error list and return its ErrorSummary.
+        Lists of 3 (passed) or 1 (not checked) items have no section"""
+        if errors is None or isinstance(errors, ErrorSummary):
+            return errors
+        if isinstance(errors, str):
+            errors = [errors]
+        if len(errors) <= 3:
+            return ErrorSummary(errors, len(errors))
+
+        rows = errors[3:]
+        inline = rows[: self.max_inline]
+        links = self._write_overflow(
+            key, errors[2], errors[1], rows[self.max_inline :]
+        )
+        self._write_part(
+            key, self.macros.rule_section(errors, inline, len(rows), links)
+        )
+        return ErrorSummary(errors[:3] + inline, len(errors))
+
+    def add_warnings(self, key, warnings):
+        """Write the section for a list of warnings and return its ErrorSummary"""
+        if warnings is None or isinstance(warnings, ErrorSummary):
+            return warnings
+        if len(warnings) <= 1:
+            return ErrorSummary(warnings, len(warnings))
+
+        rows = warnings[1:]
+        inline = rows[: self.max_inline]
+        links = self._write_overflow(key, key, warnings[0], rows[self.max_inline :])
+        self._write_part(
+            key, self.macros.warning_section(warnings[0], inline, len(rows), links)
+        )
+        return ErrorSummary(warnings[:1] + inline, len(warnings))
+
+    def add(self, key, value):
+        """Hand any val entry to the writer. Rule and warning lists are
+        written and summarized, anything else is returned as it is"""
+        if key.startswith(("rule2", "rule3")):
+            return self.add_rule(key, value)
+        if key in warning_keys:
+            return self.add_warnings(key, value)
+        return value
+
+    def _copy_part(self, out, key):
+        path = self.parts.get(key)
+        if path:
+            with open(path, encoding="utf-8") as f:
+                shutil.copyfileobj(f, out)
+            out.write("\n")
+
+    def close(self):
+        """Put the sections together in report order and delete the part files"""
+        try:
+            with open(self.errors_path, "w", encoding="utf-8") as out:
+                out.write(self.macros.page_head(self.val))
+                for title, prefix in (
+                    ("Level 2 errors", "rule2"),
+                    ("Level 3 errors", "rule3"),
+                ):
+                    out.write(self.macros.level_head(title))
+                    for key in [k for k in self.val if k.startswith(prefix)]:
+                        self._copy_part(out, key)
+                    out.write("</div>\n")
+
+                out.write(self.macros.warnings_head())
+                for key in warning_keys:
+                    self._copy_part(out, key)
+                out.write("</div>\n")
+        finally:
+            shutil.rmtree(self.part_dir, ignore_errors=True)
@@ -0,0 +1,549 @@
+"""Offline validation of FGDC CSDGM metadata records
+
+Replaces the round trip to the USGS mp web service. A record is checked
+against a compact table of the CSDGM (FGDC-STD-001-1998) content model below:
+required elements, elements that are not permitted where they are found,
+elements that repeat too often, elements out of order, empty elements, and
+the values of dates, bounding coordinates, and the elements that have a
+closed list of values. Messages and the summary line are written the way mp
+writes them, eg.
+    Error (line 12): pubdate is required in citeinfo
+    Warning (line 40): spdom appears in unexpected order within idinfo
+    2 errors, 1 warning
+
+The FGDC xsd is kept in Resources as fgdc-std-001-1998.xsd and lxml checks
+the record against it; the compiled schema is kept for the life of the
+process. The table is then only used for what mp says in its own words,
+elements out of order and required elements that are missing, and the
+schema errors about the same elements are left out. Values the schema cannot
+check, calendar dates and southbc against northbc, are still checked here.
+Without the xsd, the table checks everything.
+"""
+
+import functools
+import re
+from pathlib import Path
+from lxml import etree
+
+XSD_PATH = Path(__file__).parent.parent / "Resources" / "fgdc-std-001-1998.xsd"
+
+# element: children in order. name? optional, name* optional and repeatable,
+# name+ required and repeatable, (a|b) exactly one of a or b.
+# Elements that are not listed on the left are text elements.
+CSDGM = """
+metadata: idinfo dataqual? spdoinfo? spref? eainfo? distinfo* metainfo
+idinfo: citation descript timeperd status spdom? keywords accconst useconst ptcontac? browse* datacred? secinfo? native? crossref*
+citation: citeinfo
+descript: abstract purpose supplinf?
+timeperd: timeinfo current
+status: progress update
+spdom: bounding dsgpoly*
+bounding: westbc eastbc northbc southbc
+dsgpoly: dsgpolyo dsgpolyx*
+dsgpolyo: (grngpoin+|gring)
+dsgpolyx: (grngpoin+|gring)
+grngpoin: gringlat gringlon
+keywords: theme+ place* stratum* temporal*
+theme: themekt themekey+
+place: placekt placekey+
+stratum: stratkt stratkey+
+temporal: tempkt tempkey+
+ptcontac: cntinfo
+browse: browsen browsed browset
+secinfo: secsys secclass sechandl
+crossref: citeinfo
+dataqual: attracc? logic complete posacc? lineage cloud?
+attracc: attraccr qattracc*
+qattracc: attraccv attracce
+posacc: horizpa? vertacc?
+horizpa: horizpar qhorizpa*
+qhorizpa: horizpav horizpae
+vertacc: vertaccr qvertpa*
+qvertpa: vertaccv vertacce
+lineage: srcinfo* procstep+
+srcinfo: srccite srcscale? typesrc srctime srccitea srccontr
+srccite: citeinfo
+srctime: timeinfo srccurr
+procstep: procdesc srcused* procdate proctime? srcprod* proccont?
+proccont: cntinfo
+spdoinfo: indspref? direct? (ptvctinf|rastinfo)?
+ptvctinf: (sdtsterm+|vpfterm)
+sdtsterm: sdtstype ptvctcnt?
+vpfterm: vpflevel vpfinfo+
+vpfinfo: vpftype ptvctcnt?
+rastinfo: rasttype rowcount colcount vrtcount?
+spref: horizsys? vertdef?
+horizsys: (geograph|planar+|local) geodetic?
+geograph: latres longres geogunit
+planar: (mapproj|gridsys|localp) planci
+mapproj: mapprojn (albers|azimequi|equicon|equirect|gvnsp|gnomonic|lamberta|lambertc|mercator|modsak|miller|obqmerc|orthogr|polarst|polycon|robinson|sinusoid|spaceobq|stereo|transmer|vdgrin|mapprojp)
+albers: stdparll+ longcm latprjo feast fnorth
+azimequi: longcm latprjo feast fnorth
+equicon: stdparll+ longcm latprjo feast fnorth
+equirect: stdparll longcm feast fnorth
+gvnsp: heightpt longpc latprjc feast fnorth
+gnomonic: longpc latprjc feast fnorth
+lamberta: longpc latprjc feast fnorth
+lambertc: stdparll+ longcm latprjo feast fnorth
+mercator: (stdparll|sfequat) longcm feast fnorth
+modsak: feast fnorth
+miller: longcm feast fnorth
+obqmerc: sfctrlin (obqlazim|obqlpt) latprjo feast fnorth
+obqlazim: azimangl azimptl
+obqlpt: obqllat obqllong obqllat obqllong
+orthogr: longpc latprjc feast fnorth
+polarst: svlong (stdparll|sfprjorg) feast fnorth
+polycon: longcm latprjo feast fnorth
+robinson: longpc feast fnorth
+sinusoid: longcm feast fnorth
+spaceobq: landsat pathnum feast fnorth
+stereo: longpc latprjc feast fnorth
+transmer: sfctrmer longcm latprjo feast fnorth
+vdgrin: longcm feast fnorth
+mapprojp: stdparll* longcm? latprjo? feast? fnorth? sfequat? heightpt? longpc? latprjc? sfctrlin? obqlazim? obqlpt? svlong? sfprjorg? landsat? pathnum? sfctrmer? otherprj?
+gridsys: gridsysn (utm|ups|spcs|arcsys|othergrd)
+utm: utmzone transmer
+ups: upszone polarst
+spcs: spcszone (lambertc|transmer|obqmerc|polycon)
+arcsys: arczone (equirect|azimequi)
+localp: localpd localpgi
+planci: plance (coordrep|distbrep) plandu
+coordrep: absres ordres
+distbrep: distres bearres bearunit bearrefd bearrefm
+local: localdes localgeo
+geodetic: horizdn? ellips semiaxis denflat
+vertdef: altsys? depthsys?
+altsys: altdatum altres+ altunits altenc
+depthsys: depthdn depthres+ depthdu depthem
+eainfo: (detailed|overview)+
+detailed: enttyp attr*
+enttyp: enttypl enttypd enttypds
+attr: attrlabl attrdef attrdefs attrdomv* begdatea? enddatea? attrvai? attrmfrq?
+attrdomv: (edom+|rdom|codesetd|udom)
+edom: edomv edomvd edomvds attr*
+rdom: rdommin rdommax attrunit? attrmres? attr*
+codesetd: codesetn codesets
+attrvai: attrva attrvae
+overview: eaover eadetcit+
+distinfo: distrib resdesc? distliab stdorder* custom? techpreq? availabl?
+distrib: cntinfo
+stdorder: (nondig|digform+) fees ordering? turnarnd?
+digform: digtinfo digtopt
+digtinfo: formname formvern? formverd? formspec? formcont? filedec? transize?
+digtopt: (onlinopt|offoptn)+
+onlinopt: computer+ accinstr? oncomp?
+computer: (networka|dialinst)
+networka: networkr+
+dialinst: lowbps highbps? numdata numstop parity? compress? dialtel+ dialfile+
+offoptn: offmedia reccap? recfmt+ compat?
+reccap: recden+ recdenu
+availabl: timeinfo
+metainfo: metd metrd? metfrd? metc metstdn metstdv mettc? metac? metuc? metsi? metextns*
+metc: cntinfo
+metsi: metscs metscc metshd
+metextns: onlink* metprof?
+cntinfo: (cntperp|cntorgp) cntpos? cntaddr+ cntvoice+ cnttdd* cntfax* cntemail* hours? cntinst?
+cntperp: cntper cntorg?
+cntorgp: cntorg cntper?
+cntaddr: addrtype address* city state postal country?
+citeinfo: origin+ pubdate pubtime? title edition? geoform? serinfo? pubinfo? othercit? onlink* lworkcit?
+serinfo: sername issue
+pubinfo: pubplace publish
+lworkcit: citeinfo
+timeinfo: (sngdate|mdattim|rngdates)
+sngdate: caldate time?
+mdattim: sngdate+
+rngdates: begdate begtime? enddate endtime?
+"""
+
+# text elements with a closed list of values
+DOMAINS = {
+    "progress": ("Complete", "In work", "Planned"),
+    "direct": ("Point", "Vector", "Raster"),
+    "rasttype": ("Point", "Pixel", "Grid Cell", "Voxel"),
+    "plance": ("coordinate pair", "distance and bearing", "row and column"),
+    "bearrefd": ("North", "South"),
+    "bearrefm": ("Magnetic", "Grid", "True"),
+    "mettc": (
+        "local time",
+        "local time with time differential factor",
+        "universal time",
+    ),
+    "sdtstype": (
+        "Point",
+        "Entity point",
+        "Label point",
+        "Area point",
+        "Node, planar graph",
+        "Node, network",
+        "String",
+        "Link",
+        "Complete chain",
+        "Area chain",
+        "Network chain, planar graph",
+        "Network chain, nonplanar graph",
+        "Circular arc, three point center",
+        "Elliptical arc",
+        "Uniform B-spline",
+        "Piecewise Bezier",
+        "Ring with mixed composition",
+        "Ring composed of strings",
+        "Ring composed of chains",
+        "Ring composed of arcs",
+        "G-polygon",
+        "GT-polygon composed of rings",
+        "GT-polygon composed of chains",
+        "Universe polygon composed of rings",
+        "Universe polygon composed of chains",
+        "Void polygon composed of rings",
+        "Void polygon composed of chains",
+    ),
+    "vpflevel": ("0", "1", "2", "3"),
+}
+_angle_units = (
+    "Decimal degrees",
+    "Decimal minutes",
+    "Decimal seconds",
+    "Degrees and decimal minutes",
+    "Degrees, minutes, and decimal seconds",
+    "Radians",
+    "Grads",
+)
+DOMAINS["geogunit"] = _angle_units
+DOMAINS["bearunit"] = _angle_units
+_encodings = (
+    "Explicit elevation coordinate included with horizontal coordinates",
+    "Implicit coordinate",
+    "Attribute values",
+)
+DOMAINS["altenc"] = _encodings
+DOMAINS["depthem"] = _encodings
+
+# date elements and the words they accept besides YYYY, YYYYMM, or YYYYMMDD
+DATES = {
+    "pubdate": ("Unknown", "Unpublished material"),
+    "caldate": ("Unknown",),
+    "begdate": ("Unknown",),
+    "enddate": ("Unknown", "Present"),
+    "procdate": ("Unknown", "Not complete"),
+    "metd": (),
+    "metrd": (),
+    "metfrd": (),
+}
+
+# real number elements and their (lowest, highest) values, None for no limit
+REALS = {
+    "westbc": (-180, 180),
+    "eastbc": (-180, 180),
+    "northbc": (-90, 90),
+    "southbc": (-90, 90),
+    "gringlat": (-90, 90),
+    "gringlon": (-180, 180),
+    "stdparll": (-90, 90),
+    "latprjo": (-90, 90),
+    "latprjc": (-90, 90),
+    "longcm": (-180, 180),
+    "longpc": (-180, 180),
+    "svlong": (-180, 180),
+    "obqllat": (-90, 90),
+    "obqllong": (-180, 180),
+    "feast": (None, None),
+    "fnorth": (None, None),
+    "latres": (0, None),
+    "longres": (0, None),
+    "absres": (0, None),
+    "ordres": (0, None),
+    "semiaxis": (0, None),
+    "denflat": (0, None),
+    "sfctrmer": (0, None),
+    "sfequat": (0, None),
+    "sfctrlin": (0, None),
+    "sfprjorg": (0, None),
+    "heightpt": (None, None),
+}
+INTEGERS = {
+    "rowcount": (0, None),
+    "colcount": (0, None),
+    "vrtcount": (0, None),
+    "ptvctcnt": (0, None),
+    "utmzone": (-60, 60),
+    "spcszone": (0, None),
+    "landsat": (0, None),
+    "pathnum": (0, None),
+}
+
+_term = re.compile(r"\(([^)]*)\)([?*+]?)|(\w+)([?*+]?)")
+_date = re.compile(r"^(\d{4})(\d{2})?(\d{2})?$")
+_order = "appears in unexpected order within"
+_missing = "Missing child element(s)"
+
+
+def _bounds(quantifier):
+    """(min, max) occurrences for a quantifier, max None for no limit"""
+    return {"": (1, 1), "?": (0, 1), "*": (0, None), "+": (1, None)}[quantifier]
+
+
+def parse_model(text):
+    """Dictionary of element: (terms, ordered) from lines of the CSDGM table.
+    Each term is a dict with the names it accepts, min and max occurrences,
+    and for choices, the max occurrences of each name"""
+    model = {}
+    for line in text.strip().splitlines():
+        parent, spec = [s.strip() for s in line.split(":")]
+        terms = []
+        by_name = {}
+        ordered = True
+        for group, group_q, name, name_q in _term.findall(spec):
+            if group:
+                alts = {}
+                for alt in group.split("|"):
+                    alt_name, alt_q = re.match(r"(\w+)([?*+]?)", alt).groups()
+                    alts[alt_name] = _bounds(alt_q)[1]
+                lo, hi = _bounds(group_q)
+                terms.append(
+                    {"names": tuple(alts), "min": lo, "max": hi, "choice": alts}
+                )
+            elif name in by_name:
+                # the same element again later in the sequence, eg. obqllat in
+                # obqlpt. Count both and do not check the order
+                term = by_name[name]
+                lo, hi = _bounds(name_q)
+                term["min"] += lo
+                term["max"] = None if hi is None or term["max"] is None else term["max"] + hi
+                ordered = False
+                continue
+            else:
+                lo, hi = _bounds(name_q)
+                terms.append({"names": (name,), "min": lo, "max": hi, "choice": None})
+            for n in terms[-1]["names"]:
+                by_name[n] = terms[-1]
+        model[parent] = (terms, ordered)
+    return model
+
+
+MODEL = parse_model(CSDGM)
+
+
+@functools.lru_cache(maxsize=None)
+def xml_schema(xsd_path=XSD_PATH):
+    """Compiled XMLSchema for xsd_path, or None if the file is not there"""
+    if not Path(xsd_path).exists():
+        return None
+    return etree.XMLSchema(etree.parse(str(xsd_path)))
+
+
+def _line(el):
+    return el.sourceline if el.sourceline is not None else 0
+
+
+def _check_value(el, text, schema=False):
+    """Message for an improper value of a text element, or None. If schema,
+    only what the xsd does not check"""
+    tag = el.tag
+    if schema:
+        if tag in DATES and not text in DATES[tag]:
+            m = _date.match(text)
+            if m and _bad_day(m):
+                return f"improper value for {tag}: {text}"
+        return None
+    if tag in DOMAINS and not text in DOMAINS[tag]:
+        return f"improper value for {tag}: {text}"
+    if tag in DATES and not text in DATES[tag]:
+        m = _date.match(text)
+        if not m or _bad_day(m):
+            return f"improper value for {tag}: {text}"
+    for numbers, kind in ((REALS, float), (INTEGERS, int)):
+        if tag in numbers:
+            try:
+                value = kind(text)
+            except ValueError:
+                return f"improper value for {tag}: {text}"
+            lo, hi = numbers[tag]
+            if lo is not None and value < lo or hi is not None and value > hi:
+                return f"{tag} is out of range: {text}"
+    return None
+
+
+def _bad_day(m):
+    month, day = m.group(2), m.group(3)
+    return month and not 1 <= int(month) <= 12 or day and not 1 <= int(day) <= 31
+
+
+def _check_element(el, issues, explained=None):
+    """Check el and everything below it, appending (line, level, message) to issues.
+    If explained is a set, the xsd is checking the record too: only order and
+    required elements are checked, and elements with children out of order or
+    missing are added to explained"""
+    tag = el.tag
+    children = [c for c in el if isinstance(c.tag, str)]
+    structure = explained is None
+
+    if not tag in MODEL:
+        # text element
+        for c in children:
+            if structure:
+                issues.append((_line(c), "Error", f"{c.tag} is not permitted in {tag}"))
+        text = (el.text or "").strip()
+        if not text and not children:
+            if structure:
+                issues.append((_line(el), "Error", f"{tag} is empty"))
+        elif text:
+            message = _check_value(el, text, not structure)
+            if message:
+                issues.append((_line(el), "Error", message))
+        return
+
+    terms, ordered = MODEL[tag]
+    index = {n: i for i, t in enumerate(terms) for n in t["names"]}
+    counts = {}
+    last = -1
+    for c in children:
+        if not c.tag in index:
+            if structure:
+                issues.append((_line(c), "Error", f"{c.tag} is not permitted in {tag}"))
+            continue
+        counts[c.tag] = counts.get(c.tag, 0) + 1
+        if ordered:
+            if index[c.tag] < last:
+                issues.append((_line(c), "Warning", f"{c.tag} {_order} {tag}"))
+                if not structure:
+                    explained.add(el)
+            last = max(last, index[c.tag])
+        _check_element(c, issues, explained)
+
+    for term in terms:
+        present = [n for n in term["names"] if counts.get(n)]
+        total = sum(counts.get(n, 0) for n in term["names"])
+        if total < term["min"]:
+            if term["choice"]:
+                names = ", ".join(term["names"])
+                message = f"one of {names} is required in {tag}"
+            else:
+                message = f"{term['names'][0]} is required in {tag}"
+            issues.append((_line(el), "Error", message))
+            if not structure:
+                explained.add(el)
+        if structure:
+            if term["choice"]:
+                if term["max"] == 1 and len(present) > 1:
+                    for n in present[1:]:
+                        issues.append(
+                            (
+                                _line(el),
+                                "Error",
+                                f"{n} is not permitted with {present[0]} in {tag}",
+                            )
+                        )
+                limits = term["choice"] if term["max"] == 1 else {}
+                for n in present:
+                    if limits.get(n) is not None and counts[n] > limits[n]:
+                        issues.append((_line(el), "Error", f"too many {n} in {tag}"))
+            elif term["max"] is not None and total > term["max"]:
+                issues.append(
+                    (_line(el), "Error", f"too many {term['names'][0]} in {tag}")
+                )
+
+    if tag == "bounding":
+        values = {c.tag: (c.text or "").strip() for c in children}
+        try:
+            if float(values["southbc"]) > float(values["northbc"]):
+                issues.append((_line(el), "Error", "southbc is greater than northbc"))
+        except (KeyError, ValueError):
+            pass
+
+
+def validate(source, xsd_path=XSD_PATH):
+    """List of (line, level, message) for a metadata record.
+    source - path of an xml file, or an lxml element or tree. Elements that were
+    built in memory are serialized and read back so that messages have line numbers"""
+    if isinstance(source, (str, Path)):
+        try:
+            tree = etree.parse(str(source))
+        except etree.XMLSyntaxError as e:
+            return [(e.lineno or 0, "Error", f"not well-formed XML: {e.msg}")]
+        root = tree.getroot()
+    else:
+        if hasattr(source, "getroot"):
+            source = source.getroot()
+        root = etree.fromstring(etree.tostring(source, pretty_print=True))
+
+    issues = []
+    if root.tag != "metadata":
+        issues.append((_line(root), "Error", f"{root.tag} is not permitted as the root element"))
+        return issues
+
+    schema = xml_schema(xsd_path)
+    if schema is None:
+        _check_element(root, issues)
+    else:
+        explained = set()
+        _check_element(root, issues, explained)
+        schema.validate(root)
+        tree = root.getroottree()
+        for e in schema.error_log:
+            if e.type_name == "SCHEMAV_ELEMENT_CONTENT" and e.path:
+                # the element with missing children, or the parent of one that
+                # is not expected where it is
+                found = tree.xpath(e.path)
+                if found and not _missing in e.message:
+                    found = [found[0].getparent()]
+                if found and found[0] in explained:
+                    continue
+            issues.append((e.line, "Error", e.message))
+    issues.sort(key=lambda i: i[0])
+    return issues
+
+
+def summary(issues):
+    """Last line of the errors file, eg. 'No errors' or '3 errors, 1 warning'"""
+    n_err = sum(1 for i in issues if i[1] == "Error")
+    n_warn = len(issues) - n_err
+    line = f"{n_err} error{'s' if n_err != 1 else ''}" if n_err else "No errors"
+    if n_warn:
+        line = f"{line}, {n_warn} warning{'s' if n_warn != 1 else ''}"
+    return line
+
+
+def write_errors(issues, errors_path, skip_order=True):
+    """Write the errors text file and return the issues that were written.
+    Warnings about element order are left out unless skip_order is False"""
+    if skip_order:
+        issues = [i for i in issues if not _order in i[2]]
+    with open(errors_path, "wt") as f:
+        for line, level, message in issues:
+            f.write(f"{level} (line {line}): {message}\n")
+        f.write(summary(issues))
+    return issues
+
+
+def reorder(el):
+    """Sort the children of el, and below, into the order of the CSDGM"""
+    if el.tag in MODEL and MODEL[el.tag][1]:
+        terms = MODEL[el.tag][0]
+        index = {n: i for i, t in enumerate(terms) for n in t["names"]}
+        keyed = []
+        key = -1
+        for c in el:
+            if isinstance(c.tag, str) and c.tag in index:
+                key = index[c.tag]
+            # comments and unknown elements stay after the element they follow
+            keyed.append((key, c))
+        el[:] = [c for k, c in sorted(keyed, key=lambda kc: kc[0])]
+    for c in el:
+        if isinstance(c.tag, str):
+            reorder(c)
+    return el
+
+
+def as_text(el, depth=0):
+    """Indented text version of a metadata record"""
+    lines = []
+    text = (el.text or "").strip()
+    children = [c for c in el if isinstance(c.tag, str)]
+    if children:
+        lines.append(f"{'  ' * depth}{el.tag}:")
+        for c in children:
+            lines.append(as_text(c, depth + 1))
+    else:
+        lines.append(f"{'  ' * depth}{el.tag}: {text}")
+    return "\n".join(lines)
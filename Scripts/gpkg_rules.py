@@ -0,0 +1,424 @@
+"""Set-based validation rules for GeoPackages, run inside SQLite
+
+A GeoPackage is an SQLite database, so instead of pulling every value through
+an arcpy cursor and checking it in Python, the rules that compare whole
+columns are sent to SQLite as queries:
+
+    duplicated MapUnit, Term, and DataSources_ID values - GROUP BY ... HAVING COUNT(*) > 1
+    NULL values in NoNulls fields - one EXISTS query per field
+    zero-length, whitespace-only, and padded strings - TRIM
+    terms missing from Glossary, sources missing from DataSources - anti-joins
+    unused Glossary terms and DataSources - NOT IN the union of all references
+
+fingerprint reads a table straight from SQLite, so the validation cache can
+tell if it has changed without reading it through arcpy.
+
+Methods return plain values or (table, field, value) records, the same items
+that the corresponding rules in GeMS_ValidateDatabase find with cursors, and
+ValidateDatabase turns them into the same error lists.
+
+Only the standard library and GeMS_Definition are used, no arcpy, so the
+rules can be run on any platform:
+
+    rules = GpkgRules("path/to/db.gpkg")
+    print(rules.duplicates("Glossary", "Term"))
+"""
+
+import hashlib
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+import GeMS_Definition as gdef
+
+# characters removed by TRIM, close to what str.strip() removes
+_ws = "char(32, 9, 10, 11, 12, 13)"
+
+# data types that are never searched for terms or sources
+_skip_data_types = (
+    "FeatureDataset",
+    "Annotation",
+    "Topology",
+    "RasterBand",
+    "RasterDataset",
+    "Workspace",
+)
+
+_geometry_types = {
+    "POINT": "Point",
+    "MULTIPOINT": "Multipoint",
+    "LINESTRING": "Polyline",
+    "MULTILINESTRING": "Polyline",
+    "CURVE": "Polyline",
+    "MULTICURVE": "Polyline",
+    "POLYGON": "Polygon",
+    "MULTIPOLYGON": "Polygon",
+    "SURFACE": "Polygon",
+    "MULTISURFACE": "Polygon",
+}
+
+
+def q(name):
+    """Quoted SQL identifier"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def camel_to_snake(s):
+    # same as GeMS_utilityFunctions.camel_to_snake, which cannot be imported without arcpy
+    if "CMU" in s:
+        s = s[3:]
+        return f"cmu_{''.join(['_'+c.lower() if c.isupper() else c for c in s]).lstrip('_')}"
+    else:
+        return "".join(["_" + c.lower() if c.isupper() else c for c in s]).lstrip("_")
+
+
+def gems_equivalent(name, concat_type):
+    """GeMS element a table is based on, following GeMS_utilityFunctions.gdb_object_dict"""
+    equivalent = ""
+    if any(el in concat_type for el in ("Topology", "Annotation")):
+        return equivalent
+    keys = list(gdef.tableDict.keys())
+    keys.append("GeoMaterialDict")
+    for a in keys:
+        if (
+            any(n in name.lower() for n in (a.lower(), camel_to_snake(a)))
+            and gdef.shape_dict[a] in concat_type.lower()
+        ):
+            equivalent = a
+
+    if name.lower().endswith("points") and equivalent == "":
+        equivalent = "GenericPoints"
+    if name.lower().endswith("samples") and equivalent == "":
+        equivalent = "GenericSamples"
+    if any(name.lower().endswith(l) for l in ("label", "labels")):
+        equivalent = ""
+    if "mapunitoverlaypolys" in name.lower():
+        equivalent = "MapUnitOverlayPolys"
+    return equivalent
+
+
+def _field_type(decl, pk, geom_column, name):
+    """arcpy-style field type from an SQLite column declaration"""
+    decl = decl.upper()
+    if name == geom_column:
+        return "Geometry"
+    if pk and "INT" in decl:
+        return "OID"
+    if decl.startswith(("TEXT", "VARCHAR", "CHAR", "CLOB")):
+        return "String"
+    if decl in ("DATE", "DATETIME"):
+        return "Date"
+    if any(n in decl for n in ("REAL", "DOUBLE", "FLOAT")):
+        return "Double"
+    if "INT" in decl:
+        return "Integer"
+    if decl == "BLOB":
+        return "Blob"
+    return "String"
+
+
+def describe(conn):
+    """Dictionary of {table: {dataType, concat_type, gems_equivalent, fields}}
+    built from the GeoPackage system tables. fields is a list of (name, type)
+    using arcpy field type names"""
+    geoms = {
+        r[0]: (r[1], r[2])
+        for r in conn.execute(
+            "SELECT table_name, column_name, geometry_type_name FROM gpkg_geometry_columns"
+        )
+    }
+    tables = {}
+    for name, data_type in conn.execute(
+        "SELECT table_name, data_type FROM gpkg_contents"
+    ):
+        geom_column = None
+        if data_type == "features":
+            geom_column, geom_type = geoms.get(name, (None, ""))
+            shape = _geometry_types.get(geom_type.upper(), geom_type.title())
+            d = {"dataType": "FeatureClass", "concat_type": f"Simple {shape} Feature Class"}
+        elif data_type == "attributes":
+            d = {"dataType": "Table", "concat_type": "Nonspatial Table"}
+        else:
+            continue
+        d["fields"] = [
+            (r[1], _field_type(r[2], r[5], geom_column, r[1]))
+            for r in conn.execute(f"PRAGMA table_info({q(name)})")
+        ]
+        d["gems_equivalent"] = gems_equivalent(name, d["concat_type"])
+        tables[name] = d
+    return tables
+
+
+def tables_from_db_dict(db_dict):
+    """The same description built from GeMS_utilityFunctions.gdb_object_dict,
+    so that rules pick exactly the same tables as GeMS_ValidateDatabase"""
+    return {
+        k: {
+            "dataType": v["dataType"],
+            "concat_type": v["concat_type"],
+            "gems_equivalent": v["gems_equivalent"],
+            "fields": [(f.name, f.type) for f in v.get("fields", [])],
+        }
+        for k, v in db_dict.items()
+    }
+
+
+class GpkgRules:
+    """Validation queries against one GeoPackage.
+    tables - optional description of the tables, see describe(). Read from the
+      GeoPackage if not supplied
+    use_idfield - report <table>_ID values instead of the primary key, like
+      use_idfield in GeMS_ValidateDatabase"""
+
+    def __init__(self, gpkg_path, tables=None, use_idfield=False):
+        self.gpkg_path = str(gpkg_path)
+        self.use_idfield = use_idfield
+        if tables is None:
+            with closing(self.connect()) as conn:
+                tables = describe(conn)
+        self.tables = tables
+
+    def connect(self):
+        """Read-only connection. A new one is opened for every query method so
+        that methods can be called from different threads"""
+        uri = f"{Path(self.gpkg_path).resolve().as_uri()}?mode=ro"
+        return sqlite3.connect(uri, uri=True)
+
+    def query(self, sql, params=()):
+        with closing(self.connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def field_names(self, table, types=None):
+        return [
+            n for n, t in self.tables[table]["fields"] if types is None or t in types
+        ]
+
+    def which_id(self, table):
+        """Field reported as the identifier of a row"""
+        fields = self.tables[table]["fields"]
+        if self.use_idfield:
+            gemsid = [n for n, t in fields if n.lower().endswith("_id")]
+            if gemsid:
+                return gemsid[0]
+        return [n for n, t in fields if t == "OID"][0]
+
+    def fingerprint(self, table):
+        """(row count, hash of every value) of a table, in rowid order"""
+        digest = hashlib.blake2b(digest_size=16)
+        n = 0
+        with closing(self.connect()) as conn:
+            for row in conn.execute(f"SELECT * FROM {q(table)}"):
+                digest.update(repr(row).encode("utf-8"))
+                n += 1
+        return n, digest.hexdigest()
+
+    # Rules 2.5, 2.7, 2.9
+    def duplicates(self, table, field):
+        """Sorted list of non-null values that appear more than once in field"""
+        sql = f"""SELECT {q(field)} FROM {q(table)} WHERE {q(field)} IS NOT NULL
+            GROUP BY {q(field)} HAVING COUNT(*) > 1 ORDER BY {q(field)}"""
+        return [r[0] for r in self.query(sql)]
+
+    # Rule 3.3
+    def no_nulls(self, table):
+        """NoNulls fields of one table that have NULL, blank, or <null> values"""
+        gems_eq = self.tables[table]["gems_equivalent"]
+        no_nulls = [n[0] for n in gdef.startDict[gems_eq] if n[2] == "NoNulls"]
+        found = []
+        for field in [f for f in self.field_names(table) if f in no_nulls]:
+            t = f"CAST({q(field)} AS TEXT)"
+            sql = f"""SELECT EXISTS (SELECT 1 FROM {q(table)} WHERE {q(field)} IS NULL
+                OR TRIM({t}, {_ws}) = '' OR LOWER({t}) = '<null>')"""
+            if self.query(sql)[0][0]:
+                found.append(field)
+        return found
+
+    # Rule 3.13
+    def blank_strings(self, table):
+        """(blanks, padded) lists of (field, id field, id) for the rows of one table
+        with zero-length, whitespace-only, or <null> strings and for those with
+        leading or trailing spaces. Rows are in order of value, like values()"""
+        blanks = []
+        padded = []
+        id_fld = self.which_id(table)
+        for field in self.field_names(table, ("String",)):
+            f = q(field)
+            sql = f"""SELECT {q(id_fld)} FROM {q(table)} WHERE {f} <> ''
+                AND (TRIM({f}, {_ws}) = '' OR LOWER({f}) IN ('&ltnull&gt', '<null>'))
+                ORDER BY {f}"""
+            blanks.extend((field, id_fld, r[0]) for r in self.query(sql))
+
+            sql = f"""SELECT {q(id_fld)} FROM {q(table)} WHERE {f} <> ''
+                AND TRIM({f}, {_ws}) <> {f} ORDER BY {f}"""
+            padded.extend((field, id_fld, r[0]) for r in self.query(sql))
+
+        return blanks, padded
+
+    # Rules 2.6, 3.4, 3.5
+    def _level_tables(self, level):
+        """Tables searched for controlled terms at level 2 or 3"""
+        req = [
+            el for el in gdef.rule2_1_elements if not el in ("GeologicMap", "Glossary")
+        ]
+        if level == 2:
+            return [t for t, v in self.tables.items() if v["gems_equivalent"] in req]
+        return [
+            k
+            for k, v in self.tables.items()
+            if not v["dataType"] in _skip_data_types + ("RelationshipClass",)
+            and not k == "GeoMaterialDict"
+            and v["gems_equivalent"] not in req
+        ]
+
+    def _term_fields(self, level):
+        """(table, field, where) of the controlled-term fields checked at level"""
+        found = []
+        for table in self._level_tables(level):
+            for field in self.field_names(table, ("String",)):
+                if field in gdef.defined_term_fields_list:
+                    if field == "GeoMaterialConfidence":
+                        where = "GeoMaterial IS NOT NULL"
+                    else:
+                        where = None
+                    found.append((table, field, where))
+        return found
+
+    def _gemsy_fields(self):
+        """(table, field) of non-GeMS text fields ending in type, method, or confidence"""
+        found = []
+        for table, v in self.tables.items():
+            if v["dataType"] in _skip_data_types or table == "GeoMaterialDict":
+                continue
+            for suffix in ["type", "method", "confidence"]:
+                for field in self.field_names(table, ("String",)):
+                    if (
+                        field.lower().endswith(suffix)
+                        and not field in gdef.defined_term_fields_list
+                    ):
+                        found.append((table, field))
+        return found
+
+    def _not_in_glossary(self, table, field, where=None):
+        """Distinct non-empty values of field that are not a Term in Glossary"""
+        f = q(field)
+        where = f"AND {where}" if where else ""
+        sql = f"""SELECT DISTINCT {f} FROM {q(table)} AS t
+            WHERE {f} IS NOT NULL AND {f} <> '' {where}
+            AND NOT EXISTS (SELECT 1 FROM Glossary AS g WHERE g.Term = t.{f})
+            ORDER BY {f}"""
+        return [r[0] for r in self.query(sql)]
+
+    def _distinct(self, table, field, where=None):
+        where = f"WHERE {where}" if where else ""
+        return [
+            r[0]
+            for r in self.query(f"SELECT DISTINCT {q(field)} FROM {q(table)} {where}")
+        ]
+
+    def missing_terms(self, level):
+        """(missing, terms, warnings)
+        missing - (table, field, value) for values of controlled fields that are
+          not in Glossary
+        terms - all values found in those fields, for finding unused terms
+        warnings - at level 3, (table, field, value) for values of GeMS-like
+          fields that are not in Glossary"""
+        missing = []
+        terms = []
+        warnings = []
+        for table, field, where in self._term_fields(level):
+            terms.extend(v for v in self._distinct(table, field, where) if v is not None)
+            missing.extend(
+                (table, field, el)
+                for el in self._not_in_glossary(table, field, where)
+            )
+
+        # like rule 3.4, GeMS-like fields are only searched if there are level 3 tables
+        if level == 3 and self._level_tables(3):
+            for table, g_field in self._gemsy_fields():
+                terms.extend(v for v in self._distinct(table, g_field) if v)
+                warnings.extend(
+                    (table, g_field, el) for el in self._not_in_glossary(table, g_field)
+                )
+
+        return missing, terms, warnings
+
+    def unused_terms(self):
+        """Glossary terms not found in any controlled or GeMS-like field"""
+        used = [
+            f"SELECT {q(field)} FROM {q(table)} WHERE {q(field)} IS NOT NULL"
+            + (f" AND {where}" if where else "")
+            for level in (2, 3)
+            for table, field, where in self._term_fields(level)
+        ]
+        if self._level_tables(3):
+            used.extend(
+                f"SELECT {q(field)} FROM {q(table)} WHERE {q(field)} <> ''"
+                for table, field in self._gemsy_fields()
+            )
+        sql = "SELECT DISTINCT Term FROM Glossary"
+        if used:
+            sql += f" WHERE Term IS NULL OR Term NOT IN ({' UNION '.join(used)})"
+        return [r[0] for r in self.query(sql)]
+
+    # Rules 2.8, 3.6, 3.7
+    def _source_fields(self, level):
+        if level == 2:
+            req = [t for t in gdef.rule2_1_elements if not t == "GeologicMap"]
+            tables = [t for t, v in self.tables.items() if v["gems_equivalent"] in req]
+        else:
+            tables = [
+                k
+                for k, v in self.tables.items()
+                if not v["dataType"] in _skip_data_types
+                and not k in gdef.rule2_1_elements
+            ]
+        return [
+            (table, field)
+            for table in tables
+            for field in self.field_names(table)
+            if field.lower().endswith("sourceid")
+        ]
+
+    def _source_pieces(self, table, field):
+        """SQL for the pieces of the pipe-delimited source ids in a field"""
+        f = f"CAST({q(field)} AS TEXT)"
+        return f"""WITH RECURSIVE split(piece, rest) AS (
+                SELECT NULL, {f} || '|' FROM {q(table)} WHERE {q(field)} IS NOT NULL AND {f} <> ''
+                UNION ALL
+                SELECT substr(rest, 1, instr(rest, '|') - 1), substr(rest, instr(rest, '|') + 1)
+                FROM split WHERE rest <> ''
+            )"""
+
+    def missing_sources(self, level):
+        """(missing, sources)
+        missing - (table, field, source id) for pieces of xxxSourceID values that
+          are not in DataSources. Source ids are as found, not stripped
+        sources - all source ids found, stripped, for finding unused sources"""
+        missing = []
+        sources = []
+        for table, field in self._source_fields(level):
+            sql = f"""{self._source_pieces(table, field)}
+                SELECT DISTINCT piece,
+                    NOT EXISTS (SELECT 1 FROM DataSources AS d
+                        WHERE d.DataSources_ID = TRIM(piece, {_ws}))
+                FROM split WHERE piece IS NOT NULL"""
+            for el, is_missing in self.query(sql):
+                if not el.strip() in sources:
+                    sources.append(el.strip())
+                if is_missing:
+                    missing.append((table, field, el))
+        return missing, sources
+
+    def unused_sources(self):
+        """DataSources_ID values that are not used in any xxxSourceID field"""
+        used = []
+        for level in (2, 3):
+            for table, field in self._source_fields(level):
+                used.append(
+                    f"""SELECT TRIM(piece, {_ws}) FROM (
+                    {self._source_pieces(table, field)}
+                    SELECT piece FROM split WHERE piece IS NOT NULL)"""
+                )
+        sql = "SELECT DISTINCT DataSources_ID FROM DataSources"
+        if used:
+            sql += f" WHERE DataSources_ID IS NULL OR DataSources_ID NOT IN ({' UNION '.join(used)})"
+        return [r[0] for r in self.query(sql)]
@@ -0,0 +1,151 @@
+"""Parsing and analysis of DescriptionOfMapUnits HierarchyKey values
+
+HierarchyKeys are materialized paths like 001-002-003, where each fragment is
+the rank of a unit or heading among its siblings. Every key is parsed once,
+character by character, into its fragments and an integer tuple, and the keys
+are sorted on those tuples. The sorted list is then walked once to find
+duplicates, orphaned children (a key whose parent key is not in the table) and
+gaps in the numbering of siblings.
+
+No arcpy here so that the same parsed tree can be used by ValidateDatabase,
+DMUtoDocx, DocxToDMU and reID.
+"""
+
+
+class HKey:
+    """One parsed HierarchyKey"""
+
+    __slots__ = ("oid", "raw", "frags", "ints", "delims", "non_numeric")
+
+    def __init__(self, oid, raw):
+        self.oid = oid
+        self.raw = raw
+        frags = []
+        delims = set()
+        non_numeric = []
+        cur = []
+        # single walk over the characters
+        for c in raw.strip():
+            if c.isalnum():
+                cur.append(c)
+                if not c.isdigit() and not c in non_numeric:
+                    non_numeric.append(c)
+            else:
+                delims.add(c)
+                frags.append("".join(cur))
+                cur = []
+        frags.append("".join(cur))
+        self.frags = tuple(frags)
+        self.delims = delims
+        self.non_numeric = non_numeric
+        self.ints = tuple(int(f) if f.isdigit() else None for f in frags)
+
+    @property
+    def depth(self):
+        return len(self.frags)
+
+    @property
+    def parent(self):
+        """sort key of the parent of this key, None for top-level keys"""
+        if len(self.frags) < 2:
+            return None
+        return sort_key_frags(self.frags[:-1])
+
+    def sort_key(self):
+        return sort_key_frags(self.frags)
+
+
+def sort_key_frags(frags):
+    # numeric fragments sort by value and ahead of anything non-numeric
+    return tuple((0, int(f), "") if f.isdigit() else (1, 0, f) for f in frags)
+
+
+def sort_key(hkey):
+    """Key for sorting HierarchyKey strings numerically, fragment by fragment.
+    Unlike ORDER BY HierarchyKey, 1-10 sorts after 1-9"""
+    if hkey is None:
+        return ()
+    return HKey(None, hkey).sort_key()
+
+
+def depth(hkey):
+    """Number of fragments in a HierarchyKey string"""
+    if hkey is None:
+        return 0
+    return HKey(None, hkey).depth
+
+
+class HierarchyKeyTree:
+    """All HierarchyKeys of a table parsed and sorted.
+    hk_dict is {oid: HierarchyKey}
+
+    After construction:
+        empty - oids with null or blank keys
+        keys - HKey objects in hierarchical order
+        delimiters - sorted list of all delimiter characters found
+        duplicates - list of [HKey, HKey, ...] with identical fragments (ignoring delimiter)
+        non_numeric - HKeys that include letters
+        widths - set of all fragment lengths
+        orphans - HKeys whose parent key is missing
+        gaps - (parent fragments, previous sibling, next sibling) where sibling
+          numbering skips one or more values
+    """
+
+    def __init__(self, hk_dict):
+        self.empty = []
+        keys = []
+        for oid, raw in hk_dict.items():
+            if raw is None or str(raw).strip() == "":
+                self.empty.append(oid)
+            else:
+                keys.append(HKey(oid, str(raw)))
+
+        keys.sort(key=lambda k: (k.sort_key(), k.frags))
+        self.keys = keys
+
+        delims = set()
+        self.widths = set()
+        self.non_numeric = []
+        self.duplicates = []
+        self.orphans = []
+        self.gaps = []
+
+        present = set(k.sort_key() for k in keys)
+        last = None
+        dupe_group = None
+        # last numbered sibling seen under each parent, keys are sorted so siblings
+        # are seen in order
+        last_child = {}
+        for k in keys:
+            delims.update(k.delims)
+            self.widths.update(len(f) for f in k.frags if f)
+            if k.non_numeric:
+                self.non_numeric.append(k)
+
+            if last is not None and k.frags == last.frags:
+                if dupe_group is None:
+                    dupe_group = [last]
+                    self.duplicates.append(dupe_group)
+                dupe_group.append(k)
+                continue
+            dupe_group = None
+            last = k
+
+            parent = k.parent
+            if parent is not None and not parent in present:
+                self.orphans.append(k)
+
+            n = k.ints[-1]
+            if n is not None:
+                prev = last_child.get(parent)
+                if prev is not None and n - prev > 1:
+                    self.gaps.append((k.frags[:-1], prev, n))
+                last_child[parent] = n
+
+        self.delimiters = sorted(delims)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def oids_in_order(self):
+        return [k.oid for k in self.keys]
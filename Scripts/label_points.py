@@ -0,0 +1,78 @@
+"""Label points and the polygons that contain them, no arcpy
+
+GeMS_MakePolys3 in reporting mode needs to know which polygons hold more than
+one label point, and which polygons got a new MapUnit. Every point is located
+once in a side_units.PolygonIndex of the polygons, an STRtree of polygon boxes
+with a point-in-polygon test, and the answers are read from the result.
+
+A new MapUnit is looked for both ways: the point inside each old polygon is
+located in the new polygons, and the label point of each new polygon in the
+old ones. One point per old polygon misses an old polygon that was split in
+two when only the half without the point changed.
+"""
+
+
+def points_by_polygon(index, points):
+    """{polygon value: [point keys]} for the points inside a polygon, in the
+    order of points. Points outside every polygon are left out.
+    index - side_units.PolygonIndex with polygon OBJECTIDs as values
+    points - iterable of (key, x, y)"""
+    found = {}
+    for key, x, y in points:
+        poly = index.locate(x, y, None)
+        if poly is not None:
+            found.setdefault(poly, []).append(key)
+    return found
+
+
+def reconcile_labels(by_polygon, is_label):
+    """Points to drop from the points made from the old polygons, and extra
+    label points. In a polygon with more than one point, label points are
+    favored over points made from the old polygons, which are all dropped,
+    and if there is more than one label point, all of them are extra.
+    by_polygon - from points_by_polygon
+    is_label - function that says whether a point key is a label point"""
+    drop = []
+    extra = []
+    for keys in by_polygon.values():
+        if len(keys) < 2:
+            continue
+        drop.extend(k for k in keys if not is_label(k))
+        labels = [k for k in keys if is_label(k)]
+        if len(labels) > 1:
+            extra.extend(labels)
+    return drop, extra
+
+
+def multi_label_polygons(by_polygon):
+    """Set of the polygons with more than one point"""
+    return {poly for poly, keys in by_polygon.items() if len(keys) > 1}
+
+
+def changed_polygons(by_polygon, old_units, new_units, old_index=None, new_points=()):
+    """Polygons whose MapUnit differs from that of an old polygon inside them,
+    or from that of the old polygon their own label point is in, in the order
+    they are found. Old polygons with no MapUnit are not counted.
+    by_polygon - new polygon: keys of points made from the old polygons
+    old_units - point key: old MapUnit
+    new_units - new polygon: MapUnit
+    old_index - side_units.PolygonIndex of the old polygons, MapUnit values
+    new_points - iterable of (new polygon, x, y), a point inside each new polygon"""
+    changed = []
+    for poly, keys in by_polygon.items():
+        for k in keys:
+            old = old_units[k]
+            if old not in (None, "") and old != new_units.get(poly):
+                changed.append(poly)
+                break
+
+    if old_index is not None:
+        found = set(changed)
+        for poly, x, y in new_points:
+            if poly in found:
+                continue
+            old = old_index.locate(x, y, None)
+            if old not in (None, "") and old != new_units.get(poly):
+                changed.append(poly)
+                found.add(poly)
+    return changed
@@ -0,0 +1,56 @@
+"""MergeNumbers for GeMS_Deplanarize, no arcpy
+
+Arc ends are put into nodes by their coordinates quantized to integers, the
+search radius being one unit, so no end point feature classes or sorting are
+needed. Arcs that should be joined are put into groups with a union-find
+structure, and every arc in a group gets the same MergeNumber: joining arcs
+that are already in groups joins the whole groups, in near-linear time.
+"""
+
+
+def node_key(x, y, radius):
+    """Integer (x, y) key of the node at x, y"""
+    return (round(x / radius), round(y / radius))
+
+
+class UnionFind:
+    """Groups of hashable items"""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, a):
+        parent = self.parent
+        root = parent.setdefault(a, a)
+        while parent[root] != root:
+            root = parent[root]
+        while parent[a] != root:
+            parent[a], a = root, parent[a]
+        return root
+
+    def union(self, a, b):
+        ra = self.find(a)
+        rb = self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+        return ra
+
+
+def merge_numbers(arc_ids, merge_groups):
+    """{arc id: MergeNumber}. Arcs in the same merge group, or in merge groups
+    that share an arc, get the same number; every other arc gets a number of
+    its own. Numbers count from 1 in the order of arc_ids.
+    arc_ids - every arc
+    merge_groups - lists of arc ids that should be joined"""
+    groups = UnionFind()
+    for group in merge_groups:
+        for arc in group[1:]:
+            groups.union(group[0], arc)
+    numbers = {}
+    by_root = {}
+    for arc in arc_ids:
+        root = groups.find(arc)
+        if root not in by_root:
+            by_root[root] = len(by_root) + 1
+        numbers[arc] = by_root[root]
+    return numbers
@@ -0,0 +1,347 @@
+"""GeMS topology rules checked directly on the geometries, no arcpy
+
+check_topology in GeMS_ValidateDatabase otherwise copies every MapUnitPolys and
+ContactsAndFaults pair into Topology.gdb, builds and validates an Esri topology,
+and reads the T_<id>_*Errors tables back. Here the features are read through
+OGR and the same six rules are evaluated with OGR (GEOS) geometry operations,
+using an STRtree (spatial_index.py) to find the features that can interact:
+
+    Must Not Have Gaps (Area) - rings of the union of MapUnitPolys. As in an
+      Esri topology, the outer boundary of the map counts as one error
+    Must Not Overlap (Area) - pairs of polygons whose intersection has area
+    Boundary Must Be Covered By (Area-Line) - stretches of polygon boundary
+      farther than the xy tolerance from any ContactsAndFaults line
+    Must Not Overlap (Line) - pairs of lines that share a length of line
+    Must Not Self-Overlap (Line) - lines that run back over themselves
+    Must Not Self-Intersect (Line) - lines that are not simple
+
+The error counts are written in the same strings that topology.eval_topology
+builds from the errors tables. The xy tolerance is the Esri default of 1 mm
+in the units of the spatial reference.
+"""
+
+import math
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from osgeo import ogr
+
+import spatial_index as si
+
+rules_dict = {
+    1: "Must Not Have Gaps (Area)",
+    3: "Must Not Overlap (Area)",
+    19: "Must Not Overlap (Line)",
+    37: "Boundary Must Be Covered By (Area-Line)",
+    39: "Must Not Self-Overlap (Line)",
+    40: "Must Not Self-Intersect (Line)",
+}
+
+# rule ids in the order eval_topology reports them, which is the order of the
+# point, line, and polygon errors tables that the errors are written to
+level_2_order = (1, 37, 3)
+level_3_order = (40, 19, 39)
+
+# Esri default xy tolerance in meters, and in degrees for geographic coordinates
+TOLERANCE_METERS = 0.001
+TOLERANCE_DEGREES = 0.000000008983153
+
+
+def open_db(db_path):
+    """OGR dataset for a file geodatabase or geopackage, read-only"""
+    if str(db_path).lower().endswith(".gpkg"):
+        driver = ogr.GetDriverByName("GPKG")
+    else:
+        driver = ogr.GetDriverByName("OpenFileGDB")
+    return driver.Open(str(db_path), 0)
+
+
+def xy_tolerance(layer):
+    """Esri default xy tolerance in the units of the layer"""
+    sr = layer.GetSpatialRef()
+    if sr is None:
+        return TOLERANCE_METERS
+    if sr.IsGeographic():
+        return TOLERANCE_DEGREES
+    return TOLERANCE_METERS / (sr.GetLinearUnits() or 1)
+
+
+def read_geometries(layer):
+    """Lists of FIDs and geometries of the features of an OGR layer.
+    Curves are densified, features with no geometry are skipped"""
+    fids = []
+    geoms = []
+    layer.ResetReading()
+    for feature in layer:
+        geom = feature.GetGeometryRef()
+        if geom is None or geom.IsEmpty():
+            continue
+        if geom.HasCurveGeometry():
+            geom = geom.GetLinearGeometry()
+        else:
+            geom = geom.Clone()
+        fids.append(feature.GetFID())
+        geoms.append(geom)
+    return fids, geoms
+
+
+def box(geom):
+    """(xmin, ymin, xmax, ymax) of an OGR geometry"""
+    xmin, xmax, ymin, ymax = geom.GetEnvelope()
+    return (xmin, ymin, xmax, ymax)
+
+
+def parts(geom):
+    """The single part geometries in geom"""
+    n = geom.GetGeometryCount()
+    name = geom.GetGeometryName()
+    if name.startswith("MULTI") or name == "GEOMETRYCOLLECTION":
+        found = []
+        for i in range(n):
+            found.extend(parts(geom.GetGeometryRef(i)))
+        return found
+    return [geom]
+
+
+def linear_length(geom):
+    """Total length of the lines in geom, which may be a geometry collection"""
+    if geom is None or geom.IsEmpty():
+        return 0
+    return sum(p.Length() for p in parts(geom) if "LINE" in p.GetGeometryName())
+
+
+def count_pieces(geom, tolerance):
+    """Number of connected stretches of line in geom that are longer than
+    tolerance. Pieces that meet end to end, eg. at the start of a ring, are
+    counted once"""
+    pieces = [
+        p for p in parts(geom) if "LINE" in p.GetGeometryName() and p.Length() > 0
+    ]
+    if not pieces:
+        return 0
+
+    parent = list(range(len(pieces)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # ends are put in a grid of tolerance-wide cells, so each end is only
+    # compared with the ends in its own and the neighboring cells
+    cell = tolerance if tolerance > 0 else None
+    grid = {}
+    for i, p in enumerate(pieces):
+        n = p.GetPointCount()
+        for pa in (p.GetPoint_2D(0), p.GetPoint_2D(n - 1)):
+            if cell:
+                cx = math.floor(pa[0] / cell)
+                cy = math.floor(pa[1] / cell)
+                keys = [(gx, gy) for gx in (cx - 1, cx, cx + 1) for gy in (cy - 1, cy, cy + 1)]
+                key = (cx, cy)
+            else:
+                key = (pa[0], pa[1])
+                keys = [key]
+            for k in keys:
+                for j, pb in grid.get(k, ()):
+                    if abs(pa[0] - pb[0]) <= tolerance and abs(pa[1] - pb[1]) <= tolerance:
+                        parent[find(i)] = find(j)
+            grid.setdefault(key, []).append((i, pa))
+
+    lengths = {}
+    for i, p in enumerate(pieces):
+        root = find(i)
+        lengths[root] = lengths.get(root, 0) + p.Length()
+    return sum(1 for length in lengths.values() if length > tolerance)
+
+
+def polygon_gaps(polys, tolerance):
+    """Number of rings in the union of the polygons. Holes smaller than the
+    tolerance would be closed by an Esri topology and are not counted"""
+    multi = ogr.Geometry(ogr.wkbMultiPolygon)
+    for poly in polys:
+        for p in parts(poly):
+            if p.GetGeometryName() == "POLYGON":
+                multi.AddGeometry(p)
+    if multi.IsEmpty():
+        return 0
+    union = multi.UnionCascaded()
+    if union is None:
+        union = multi.Buffer(0)
+
+    n = 0
+    for p in parts(union):
+        if p.GetGeometryName() != "POLYGON":
+            continue
+        n += 1
+        for r in range(1, p.GetGeometryCount()):
+            hole = ogr.Geometry(ogr.wkbPolygon)
+            hole.AddGeometry(p.GetGeometryRef(r))
+            if hole.GetArea() > tolerance * tolerance:
+                n += 1
+    return n
+
+
+def polygon_overlaps(polys, tree, tolerance):
+    """Number of pairs of polygons that overlap"""
+    n = 0
+    for i, j in tree.pairs():
+        a, b = polys[i], polys[j]
+        if not a.Intersects(b):
+            continue
+        overlap = a.Intersection(b)
+        if overlap is not None and overlap.GetArea() > tolerance * tolerance:
+            n += 1
+    return n
+
+
+def boundaries_not_covered(polys, lines, line_tree, tolerance):
+    """Number of stretches of polygon boundary not covered by a line"""
+    buffers = {}
+    n = 0
+    for poly in polys:
+        rest = poly.GetBoundary()
+        for j in line_tree.query(si.expand_box(box(poly), tolerance)):
+            if not j in buffers:
+                buffers[j] = lines[j].Buffer(tolerance)
+            if rest.Intersects(buffers[j]):
+                rest = rest.Difference(buffers[j])
+                if rest is None or rest.IsEmpty():
+                    break
+        if rest is not None and not rest.IsEmpty():
+            n += count_pieces(rest, tolerance)
+    return n
+
+
+def line_overlaps(lines, tree, tolerance):
+    """Number of pairs of lines that share a length of line"""
+    n = 0
+    for i, j in tree.pairs():
+        a, b = lines[i], lines[j]
+        if not a.Intersects(b):
+            continue
+        if linear_length(a.Intersection(b)) > tolerance:
+            n += 1
+    return n
+
+
+def line_self_errors(lines, tolerance):
+    """Numbers of lines that overlap themselves and that intersect themselves.
+    A line that overlaps itself also intersects itself"""
+    n_overlap = 0
+    n_intersect = 0
+    for line in lines:
+        if line.IsSimple():
+            continue
+        n_intersect += 1
+        # the union of a line with itself dissolves stretches that run twice
+        noded = line.Union(line)
+        if linear_length(line) - linear_length(noded) > tolerance:
+            n_overlap += 1
+    return n_overlap, n_intersect
+
+
+def check_rules(polys, lines, tolerance):
+    """Dictionary of rule id: number of errors"""
+    poly_tree = si.STRtree([box(p) for p in polys])
+    line_tree = si.STRtree([box(l) for l in lines])
+    counts = {
+        1: polygon_gaps(polys, tolerance),
+        3: polygon_overlaps(polys, poly_tree, tolerance),
+        37: boundaries_not_covered(polys, lines, line_tree, tolerance),
+        19: line_overlaps(lines, line_tree, tolerance),
+    }
+    counts[39], counts[40] = line_self_errors(lines, tolerance)
+    return counts
+
+
+def rule_message(rule_id, n):
+    if n == 1:
+        return f"Rule '{rules_dict[rule_id]}' has {n} error"
+    return f"Rule '{rules_dict[rule_id]}' has {n} errors"
+
+
+def pair_name(topo_pair):
+    """Name of the feature dataset that topology.make_topology would use for a pair
+    topo_pair = [GeologicMap feature dataset(if gdb), fd_tag_name, mapunitpolys, contactsandfaults]
+    """
+    if topo_pair[0]:
+        gmap = topo_pair[0]
+        if not topo_pair[1] == "|":
+            tags = topo_pair[1].split("|")
+            prefix = tags[0] if tags[0].endswith("_") or tags[0] == "" else f"{tags[0]}_"
+            suffix = (
+                tags[1] if tags[1].startswith("_") or tags[1] == "" else f"_{tags[1]}"
+            )
+            gmap = f"{prefix}{gmap}{suffix}"
+        return gmap
+    if not topo_pair[1] == "|":
+        tags = topo_pair[1].split("|")
+        return f"{tags[0].strip('_')}{tags[1]}"
+    return "GeologicMap"
+
+
+def pair_counts(db_path, topo_pair):
+    """{rule id: number of errors} for one MapUnitPolys and ContactsAndFaults
+    pair. Only takes and returns plain values so that it can run in a worker
+    process"""
+    ds = open_db(db_path)
+    mup_layer = ds.GetLayerByName(topo_pair[2])
+    caf_layer = ds.GetLayerByName(topo_pair[3])
+    tolerance = xy_tolerance(mup_layer)
+    _, polys = read_geometries(mup_layer)
+    _, lines = read_geometries(caf_layer)
+    return check_rules(polys, lines, tolerance)
+
+
+def add_counts(topo_pair, counts, level_2_errors, level_3_errors):
+    """Add the pair_counts of one pair to the rule 2.3 and 3.2 error lists, as
+    topology.eval_topology does"""
+    level_2_errors.extend(
+        [f"&emsp;{rule_message(r, counts[r])}" for r in level_2_order if counts[r]]
+    )
+    level_3_errors.extend(
+        [f"&emsp;{rule_message(r, counts[r])}" for r in level_3_order if counts[r]]
+    )
+
+    # the outer boundary of the map is always a gap error
+    if "&emsp;Rule 'Must Not Have Gaps (Area)' has 1 error" in level_2_errors:
+        level_2_errors.remove("&emsp;Rule 'Must Not Have Gaps (Area)' has 1 error")
+
+    gmap = pair_name(topo_pair)
+    if len(level_2_errors) > 3:
+        level_2_errors.insert(3, f'<span class="table">{gmap}</span>')
+
+    if len(level_3_errors) > 3:
+        level_3_errors.insert(3, f'<span class="table">{gmap}</span>')
+
+    return level_2_errors, level_3_errors
+
+
+def check_pair(db_path, topo_pair, level_2_errors, level_3_errors):
+    """Check one MapUnitPolys and ContactsAndFaults pair and add the results to
+    the rule 2.3 and 3.2 error lists"""
+    counts = pair_counts(db_path, topo_pair)
+    return add_counts(topo_pair, counts, level_2_errors, level_3_errors)
+
+
+def check_pairs(db_path, topo_pairs, level_2_errors, level_3_errors, workers=None):
+    """check_pair for every pair, each in a worker process. The geometry work
+    then runs outside this process and its GIL, alongside whatever else the
+    caller is doing. Results are added in the order of topo_pairs"""
+    if workers == 1 or not topo_pairs:
+        counts = [pair_counts(db_path, pair) for pair in topo_pairs]
+    else:
+        # inside ArcGIS Pro sys.executable is ArcGISPro.exe, workers need python.exe
+        if sys.executable.lower().endswith("arcgispro.exe"):
+            multiprocessing.set_executable(os.path.join(sys.exec_prefix, "python.exe"))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(pair_counts, db_path, pair) for pair in topo_pairs]
+            counts = [f.result() for f in futures]
+
+    for pair, pair_count in zip(topo_pairs, counts):
+        add_counts(pair, pair_count, level_2_errors, level_3_errors)
+    return level_2_errors, level_3_errors
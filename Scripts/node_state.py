@@ -0,0 +1,133 @@
+"""Node results of GeMS_TopologyCheck kept between runs, no arcpy
+
+In "since last check" mode GeMS_TopologyCheck rebuilds and classifies only the
+nodes inside the areas where ContactsAndFaults or MapUnitPolys features were
+added, edited, or deleted since the last run, and takes every other node's
+results from the state file that the last run wrote.
+
+The state file is JSON with the settings of the run, the time it was made,
+the extent of every feature so deleted and moved features can be found, and
+the nodes that had something to report. The arcs of a saved node are kept as
+arc end keys, (LineID, ToFrom, x, y), because the planarized arcs get new
+OBJECTIDs on every run; they are matched to the arcs of the new run by key.
+"""
+
+import json
+import os
+
+import spatial_index as si
+import topology_nodes as tn
+
+
+def load(path, settings):
+    """The saved state, or None if there is none or it was made with other
+    settings"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("settings") != settings:
+        return None
+    for name, envelopes in state["envelopes"].items():
+        state["envelopes"][name] = {int(k): v for k, v in envelopes.items()}
+    return state
+
+
+def save(path, settings, checked, envelopes, nodes):
+    """Write the state file.
+    checked - time the run started, ISO format
+    envelopes - {feature class: {OBJECTID: (xmin, ymin, xmax, ymax)}}
+    nodes - saved nodes, from recheck"""
+    state = {
+        "settings": settings,
+        "checked": checked,
+        "envelopes": envelopes,
+        "nodes": nodes,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def end_key(line_id, arc, x, y):
+    return [line_id, arc.ToFrom, x, y]
+
+
+def recheck(xs, ys, items, keys, tolerance, boxes, state, hkey_dict, hkey_test_value, is_fault):
+    """Nodes and their events, rebuilt inside boxes and taken from state outside.
+    xs, ys, items - the arc ends of this run, as for topology_nodes.build_nodes
+    keys - arc end key of each item
+    boxes - (xmin, ymin, xmax, ymax) of what changed since state was saved,
+    already grown by the search tolerance. None to rebuild every node
+    state - from load, or None
+    Returns node_list, events for topology_nodes.apply_events, the numbers of
+    1, 2, 3, 4, and 5+ arc nodes rebuilt, and the nodes to save"""
+    key_pos = {tuple(k): i for i, k in enumerate(keys)}
+    entries = []
+    if boxes is None or state is None:
+        tree = None
+        selected = list(range(len(xs)))
+    else:
+        boxes = list(boxes)
+        kept = []
+        for x, y, node_keys, node_events in state["nodes"]:
+            positions = [key_pos.get(tuple(k)) for k in node_keys]
+            if None in positions:
+                # arcs of this node have changed without an edit date
+                boxes.append((x - tolerance, y - tolerance, x + tolerance, y + tolerance))
+            else:
+                kept.append((x, y, positions, node_events))
+        tree = si.STRtree(boxes)
+        for x, y, positions, node_events in kept:
+            if tree.query((x, y, x, y)):
+                continue
+            events = []
+            for seq, kind, value in node_events:
+                if kind == "connect":
+                    value = [items[positions[value[0]]].OFID, items[positions[value[1]]].OFID]
+                events.append((seq, kind, value))
+            entries.append((x, y, positions, events))
+        # the ends of every node with its anchor in a box are within tolerance
+        selected = [
+            i
+            for i in range(len(xs))
+            if tree.query(si.expand_box((xs[i], ys[i], xs[i], ys[i]), tolerance))
+        ]
+
+    nodes = tn.build_nodes(
+        [xs[i] for i in selected],
+        [ys[i] for i in selected],
+        selected,
+        tolerance,
+        lambda i: items[i].LineDir,
+    )
+    if tree is not None:
+        nodes = [n for n in nodes if tree.query((n[0], n[1], n[0], n[1]))]
+    node_list = [[n[0], n[1], [items[i] for i in n[2]]] for n in nodes]
+    events, counts = tn.node_events(node_list, hkey_dict, hkey_test_value, is_fault)
+    found = [(n[0], n[1], n[2], []) for n in nodes]
+    for e in events:
+        found[e[0]][3].append(e[1:])
+    entries.extend(found)
+
+    entries.sort(key=lambda e: (e[0], e[1]))
+    node_list = []
+    events = []
+    saved = []
+    for k, (x, y, positions, node_events) in enumerate(entries):
+        arcs = [items[i] for i in positions]
+        node_list.append([x, y, arcs])
+        events.extend((k,) + tuple(e) for e in node_events)
+        if node_events:
+            ofids = [a.OFID for a in arcs]
+            to_save = []
+            for seq, kind, value in node_events:
+                if kind == "connect":
+                    value = [ofids.index(value[0]), ofids.index(value[1])]
+                to_save.append([seq, kind, value])
+            saved.append([x, y, [keys[i] for i in positions], to_save])
+    return node_list, events, counts, saved
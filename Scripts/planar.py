@@ -0,0 +1,271 @@
+"""Noding (planarizing) of lines, no arcpy
+
+node_lines splits lines wherever they cross or touch each other or themselves,
+as FeatureToLine does, and keeps the id of the source line on every piece.
+
+Segments are bucketed into a grid of square cells. Only segments that share a
+cell are tested against each other, and each pair is tested once, in the cell
+that holds the lower left corner of the overlap of their boxes. The grid is
+built one vertical strip of cells at a time: the segments are sorted on the
+left edge of their boxes and fed into the strips in that order, and only the
+segments that reach into the current strip, with their boxes, are held along
+with its cells. A segment that spans several strips is gridded in each.
+
+The lines, the list of their segments, and the split points found so far are
+held in memory for the whole run. Split points are only turned into pieces at
+the end, because the split points and line ends within the tolerance of each
+other are snapped together across lines, and those clusters can chain from
+one strip into the next.
+
+A line end or vertex closer than the tolerance to another line splits that line
+where it comes closest, and the split points and line ends that are closer than
+the tolerance to each other are snapped to one node, with topology_nodes.cluster.
+Collinear overlaps are split at the ends of the overlap; both pieces are kept.
+"""
+
+import array
+import math
+
+import topology_nodes as tn
+
+
+def dedupe_points(points):
+    """points with consecutive duplicates removed"""
+    pts = []
+    for pt in points:
+        pt = (pt[0], pt[1])
+        if not pts or pt != pts[-1]:
+            pts.append(pt)
+    return pts
+
+
+def project(px, py, ax, ay, bx, by):
+    """(t, x, y, distance) of the point of segment a-b closest to p,
+    t the position along the segment from 0 at a to 1 at b"""
+    dx = bx - ax
+    dy = by - ay
+    d2 = dx * dx + dy * dy
+    if d2 == 0:
+        t = 0.0
+    else:
+        t = min(1.0, max(0.0, ((px - ax) * dx + (py - ay) * dy) / d2))
+    x = ax + t * dx
+    y = ay + t * dy
+    return t, x, y, math.hypot(px - x, py - y)
+
+
+def crossing(ax, ay, bx, by, cx, cy, dx, dy):
+    """(t, u, x, y) where segments a-b and c-d cross, t along a-b and u along
+    c-d, or None if they don't cross or are parallel"""
+    rx = bx - ax
+    ry = by - ay
+    sx = dx - cx
+    sy = dy - cy
+    denom = rx * sy - ry * sx
+    if denom == 0:
+        return None
+    t = ((cx - ax) * sy - (cy - ay) * sx) / denom
+    u = ((cx - ax) * ry - (cy - ay) * rx) / denom
+    if 0 <= t <= 1 and 0 <= u <= 1:
+        return t, u, ax + t * rx, ay + t * ry
+    return None
+
+
+class Noder:
+    """Split points of a set of line parts.
+    parts - list of (oid, [(x, y), ...]), consecutive duplicate vertices removed
+    tolerance - distance within which lines are taken to touch"""
+
+    def __init__(self, parts, tolerance):
+        self.parts = parts
+        self.tolerance = tolerance
+        # split points of each part: (position, x, y), position = segment + t
+        self.splits = [[] for _ in parts]
+        # segments as (part, vertex) for each segment
+        self.segments = [
+            (p, i) for p, (_, pts) in enumerate(parts) for i in range(len(pts) - 1)
+        ]
+
+    def seg_box(self, s):
+        p, i = self.segments[s]
+        (ax, ay), (bx, by) = self.parts[p][1][i : i + 2]
+        tol = self.tolerance
+        return (
+            min(ax, bx) - tol,
+            min(ay, by) - tol,
+            max(ax, bx) + tol,
+            max(ay, by) + tol,
+        )
+
+    def adjacent(self, s1, s2):
+        """True if two segments follow each other in the same part"""
+        p1, i1 = self.segments[s1]
+        p2, i2 = self.segments[s2]
+        if p1 != p2:
+            return False
+        if abs(i1 - i2) == 1:
+            return True
+        pts = self.parts[p1][1]
+        last = len(pts) - 2
+        return pts[0] == pts[-1] and {i1, i2} == {0, last}
+
+    def test_pair(self, s1, s2):
+        """Add the split points where two segments cross or touch"""
+        p1, i1 = self.segments[s1]
+        p2, i2 = self.segments[s2]
+        (ax, ay), (bx, by) = self.parts[p1][1][i1 : i1 + 2]
+        (cx, cy), (dx, dy) = self.parts[p2][1][i2 : i2 + 2]
+        tol = self.tolerance
+        touched = False
+        # an exact touch counts at zero tolerance, eg. where lines overlap
+        for t, (px, py) in ((0, (ax, ay)), (1, (bx, by))):
+            u, x, y, d = project(px, py, cx, cy, dx, dy)
+            if d < tol or d == 0:
+                touched = True
+                self.splits[p1].append((i1 + t, px, py))
+                self.splits[p2].append((i2 + u, x, y))
+        for u, (px, py) in ((0, (cx, cy)), (1, (dx, dy))):
+            t, x, y, d = project(px, py, ax, ay, bx, by)
+            if d < tol or d == 0:
+                touched = True
+                self.splits[p2].append((i2 + u, px, py))
+                self.splits[p1].append((i1 + t, x, y))
+        if not touched:
+            found = crossing(ax, ay, bx, by, cx, cy, dx, dy)
+            if found:
+                t, u, x, y = found
+                self.splits[p1].append((i1 + t, x, y))
+                self.splits[p2].append((i2 + u, x, y))
+
+    def cell_size(self):
+        """Average segment extent, at least twice the tolerance"""
+        total = 0
+        for s in range(len(self.segments)):
+            b = self.seg_box(s)
+            total += max(b[2] - b[0], b[3] - b[1])
+        size = total / max(1, len(self.segments))
+        return max(size, 2 * self.tolerance, 1e-9)
+
+    def find_splits(self, strip_segments=500000):
+        """Test every two segments that share a grid cell, one strip at a time.
+        strip_segments - sets the number of strips, the number of segments
+        divided by this. A strip grids more segments if some cross into it
+        from other strips"""
+        n = len(self.segments)
+        if not n:
+            return
+        # left edges, to sort on, and the extent of all the boxes
+        lefts = array.array("d")
+        x1 = None
+        for s in range(n):
+            b = self.seg_box(s)
+            lefts.append(b[0])
+            x1 = b[2] if x1 is None else max(x1, b[2])
+        order = sorted(range(n), key=lefts.__getitem__)
+        x0 = lefts[order[0]]
+        del lefts
+        cell = self.cell_size()
+        n_cols = max(1, math.ceil((x1 - x0) / cell))
+        n_strips = max(1, math.ceil(n / strip_segments))
+        strip_cols = max(1, math.ceil(n_cols / n_strips))
+
+        def col(x):
+            return math.floor((x - x0) / cell)
+
+        def row(y):
+            return math.floor(y / cell)
+
+        # segments that reach into the current strip, as (segment, box)
+        active = []
+        pos = 0
+        k = 0
+        while pos < n or active:
+            if not active:
+                # skip strips that no segment reaches into
+                k = max(k, col(self.seg_box(order[pos])[0]) // strip_cols)
+            first = k * strip_cols
+            last = first + strip_cols - 1
+            while pos < n:
+                b = self.seg_box(order[pos])
+                if col(b[0]) > last:
+                    break
+                active.append((order[pos], b))
+                pos += 1
+
+            grid = {}
+            for s, b in active:
+                for c in range(max(first, col(b[0])), min(last, col(b[2])) + 1):
+                    for r in range(row(b[1]), row(b[3]) + 1):
+                        grid.setdefault((c, r), []).append((s, b))
+            for (c, r), members in grid.items():
+                for m, (s1, b1) in enumerate(members):
+                    for s2, b2 in members[m + 1 :]:
+                        if b1[0] > b2[2] or b2[0] > b1[2]:
+                            continue
+                        if b1[1] > b2[3] or b2[1] > b1[3]:
+                            continue
+                        # test the pair only in the cell of the corner of the overlap
+                        if (
+                            col(max(b1[0], b2[0])) != c
+                            or row(max(b1[1], b2[1])) != r
+                        ):
+                            continue
+                        if self.adjacent(s1, s2):
+                            continue
+                        self.test_pair(s1, s2)
+
+            # segments that end in this strip are done with
+            active = [(s, b) for s, b in active if col(b[2]) > last]
+            k += 1
+
+    def pieces(self):
+        """List of (oid, [(x, y), ...]) pieces of the parts between split points"""
+        # split points and part ends, snapped together
+        xs = []
+        ys = []
+        refs = []
+        for p, (_, pts) in enumerate(self.parts):
+            self.splits[p].append((0, pts[0][0], pts[0][1]))
+            self.splits[p].append((len(pts) - 1, pts[-1][0], pts[-1][1]))
+            for q, (_, x, y) in enumerate(self.splits[p]):
+                xs.append(x)
+                ys.append(y)
+                refs.append((p, q))
+        node_of = {}
+        for members in tn.cluster(xs, ys, self.tolerance):
+            anchor = min(members, key=lambda i: (xs[i], ys[i]))
+            for i in members:
+                node_of[refs[i]] = (xs[anchor], ys[anchor])
+
+        pieces = []
+        for p, (oid, pts) in enumerate(self.parts):
+            splits = sorted(
+                (pos, node_of[(p, q)]) for q, (pos, _, _) in enumerate(self.splits[p])
+            )
+            for (pos_a, node_a), (pos_b, node_b) in zip(splits, splits[1:]):
+                if pos_b == pos_a:
+                    continue
+                inner = pts[math.floor(pos_a) + 1 : math.ceil(pos_b)]
+                piece = dedupe_points([node_a] + inner + [node_b])
+                if len(piece) > 1:
+                    pieces.append((oid, piece))
+        return pieces
+
+
+def node_lines(lines, tolerance, strip_segments=500000):
+    """Lines split at every place where they cross or touch.
+    lines - iterable of (oid, [(x, y), ...]), one for each part of each line
+    tolerance - distance within which lines touch and split points are merged
+    strip_segments - about how many segments to grid in each strip. This
+      bounds the grid cells and the segment boxes held at once, not the
+      lines or their split points, which are all held in memory
+    Returns a list of (oid, [(x, y), ...]) in the order of lines, and the pieces
+    of each line in order along it"""
+    parts = []
+    for oid, points in lines:
+        pts = dedupe_points(points)
+        if len(pts) > 1:
+            parts.append((oid, pts))
+    noder = Noder(parts, tolerance)
+    noder.find_splits(strip_segments)
+    return noder.pieces()
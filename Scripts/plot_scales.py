@@ -0,0 +1,125 @@
+"""PlotAtScale separations for GeMS_SetPlotAtScales, no arcpy
+
+GeMS_SetPlotAtScales used to build a PointDistance table of every pair of
+points within the search radius, then sort it, and take the closest pair, drop
+one of its points, and scan the table for the rows of that point, until no
+pairs were left. Here the neighbors within the search radius are found with a
+KD-tree, and the closest pair comes from a heap that holds the nearest
+neighbor of each point that is left. Entries of dropped points, or whose
+neighbor has been dropped, are skipped or moved on to the next neighbor when
+they reach the top of the heap.
+
+Pairs are taken in the order of (distance, lower OBJECTID, higher OBJECTID),
+the order of the sorted near table, so the same points are dropped at the same
+separations.
+"""
+
+import heapq
+import math
+
+
+class KDTree:
+    """2-d tree of points, for finding the points within a distance of a point.
+    points - list of (x, y)"""
+
+    def __init__(self, points, leaf_size=16):
+        self.points = points
+        self.leaf_size = leaf_size
+        self.root = self._build(list(range(len(points))), 0)
+
+    def _build(self, ids, axis):
+        """(axis, split, left, right) for branches, list of ids for leaves"""
+        if len(ids) <= self.leaf_size:
+            return ids
+        ids.sort(key=lambda i: self.points[i][axis])
+        mid = len(ids) // 2
+        split = self.points[ids[mid]][axis]
+        return (
+            axis,
+            split,
+            self._build(ids[:mid], 1 - axis),
+            self._build(ids[mid:], 1 - axis),
+        )
+
+    def within(self, x, y, radius):
+        """ids of the points no farther than radius from (x, y)"""
+        found = []
+        pt = (x, y)
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                for i in node:
+                    px, py = self.points[i]
+                    if math.hypot(px - x, py - y) <= radius:
+                        found.append(i)
+                continue
+            axis, split, left, right = node
+            # points equal to split can be on either side
+            if pt[axis] - radius <= split:
+                stack.append(left)
+            if pt[axis] + radius >= split:
+                stack.append(right)
+        return found
+
+
+def separations(points, radius, less_significant=None):
+    """{OBJECTID: separation} of the points that are dropped, each at the
+    distance to the point it was dropped for. The closest pair of points that
+    are left is taken over and over, and one of its points is dropped.
+    points - list of (OBJECTID, x, y)
+    radius - pairs farther apart than this are not considered
+    less_significant - function of the two OBJECTIDs of a pair, lower first,
+    that returns the one to drop, or None to drop neither and go on to the
+    next pair. By default the higher is dropped"""
+    tree = KDTree([(x, y) for _, x, y in points])
+    oids = [p[0] for p in points]
+
+    # sorted neighbors of each point
+    neighbors = []
+    for i, (oid, x, y) in enumerate(points):
+        near = []
+        for j in tree.within(x, y, radius):
+            if j != i:
+                d = math.hypot(points[j][1] - x, points[j][2] - y)
+                near.append((d, min(oid, oids[j]), max(oid, oids[j]), j))
+        near.sort()
+        neighbors.append(near)
+
+    alive = [True] * len(points)
+    next_near = [0] * len(points)
+    heap = [(near[0][:3], i) for i, near in enumerate(neighbors) if near]
+    heapq.heapify(heap)
+    by_oid = {oid: i for i, oid in enumerate(oids)}
+    found = {}
+    kept_pairs = set()
+    while heap:
+        key, i = heapq.heappop(heap)
+        if not alive[i]:
+            continue
+        near = neighbors[i]
+        k = next_near[i]
+        while k < len(near) and (
+            not alive[near[k][3]] or near[k][1:3] in kept_pairs
+        ):
+            k += 1
+        next_near[i] = k
+        if k == len(near):
+            continue
+        if near[k][:3] != key:
+            heapq.heappush(heap, (near[k][:3], i))
+            continue
+        d, lower, higher, _ = near[k]
+        if less_significant is None:
+            pt = higher
+        else:
+            pt = less_significant(lower, higher)
+        if pt is None:
+            kept_pairs.add((lower, higher))
+            heapq.heappush(heap, (key, i))
+            continue
+        found[pt] = d
+        alive[by_oid[pt]] = False
+        if alive[i]:
+            heapq.heappush(heap, (key, i))
+    return found
@@ -0,0 +1,130 @@
+"""Incremental builds of GeMS_MakePolys3 kept between runs, no arcpy
+
+An incremental build rebuilds only the polygons of MapUnitPolys that touch the
+old or new extent of a contact or label point edited since the last build, and
+splices the new faces into MapUnitPolys in their place.
+
+The state file is JSON with the settings of the build, the times it was made
+in the editor tracking time of the contacts and of the label points, and the
+extent of every contact and label point so deleted and moved features can be
+found.
+
+Edits far apart are rebuilt in separate regions. The edit boxes that touch
+each other, or touch the same old polygon, make one region, and each region is
+polygonized in its own window, the box around its edits and its old polygons,
+so two edits at opposite corners of a map do not polygonize the whole map.
+"""
+
+import json
+import os
+
+import spatial_index as si
+
+
+def load(path, settings):
+    """The state saved by the last incremental build, or None if there is none
+    or it was made with other settings"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("settings") != settings or "label_envelopes" not in state:
+        return None
+    for k in ("envelopes", "label_envelopes"):
+        state[k] = {int(oid): v for oid, v in state[k].items()}
+    return state
+
+
+def save(path, settings, built, envelopes, label_built, label_envelopes):
+    """Write the state file.
+    built - time the build started, ISO format
+    envelopes - {OBJECTID: (xmin, ymin, xmax, ymax)} of ContactsAndFaults
+    label_built, label_envelopes - the same for the label points, or for
+    MapUnitPolys after the build if there are no label points"""
+    state = {
+        "settings": settings,
+        "built": built,
+        "envelopes": envelopes,
+        "label_built": label_built,
+        "label_envelopes": label_envelopes,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _contains(a, b):
+    """True if box a holds all of box b"""
+    return a[0] <= b[0] and a[1] <= b[1] and b[2] <= a[2] and b[3] <= a[3]
+
+
+def regions(boxes, polygons, touches):
+    """Group the edit boxes and the old polygons they touch into regions.
+    boxes - (xmin, ymin, xmax, ymax) of the edits
+    polygons - iterable of (OBJECTID, box, shape) of the old polygons, read once
+    touches - touches(shape, i), True if shape meets boxes[i]. Only called when
+    the boxes overlap and boxes[i] does not hold all of the polygon box
+    Returns a list of (OBJECTIDs, window box), one for each group of boxes that
+    touch each other or the same polygon, in the order of their first box"""
+    parent = list(range(len(boxes)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def join(i, j):
+        i, j = find(i), find(j)
+        if i != j:
+            parent[max(i, j)] = min(i, j)
+
+    tree = si.STRtree(boxes)
+    for i, j in tree.pairs():
+        join(i, j)
+
+    touched = []
+    for oid, box, shape in polygons:
+        hits = [
+            i
+            for i in tree.query(box)
+            if _contains(boxes[i], box) or touches(shape, i)
+        ]
+        if hits:
+            for i in hits[1:]:
+                join(hits[0], i)
+            touched.append((oid, box, hits[0]))
+
+    found = {}
+    for i, box in enumerate(boxes):
+        r = find(i)
+        if r not in found:
+            found[r] = ([], [box])
+        else:
+            found[r][1].append(box)
+    for oid, box, i in touched:
+        oids, window = found[find(i)]
+        oids.append(oid)
+        window.append(box)
+    return [(oids, si.union_box(window)) for oids, window in found.values()]
+
+
+def keep_face(r, poly, within, point, region_of, seen):
+    """True if a face made in the window of region r is one to splice in.
+    poly - the old polygon that holds the label point of the face, None if none
+    does; within - the face lies within the window of region r
+    point - (x, y) label point of the face
+    region_of - {OBJECTID: region} of the polygons to rebuild
+    seen - label points of faces outside of every old polygon kept so far,
+    added to when the face is kept, so a face that lies within two windows is
+    kept once"""
+    if poly is not None:
+        return region_of.get(poly) == r
+    if not within or point in seen:
+        return False
+    seen.add(point)
+    return True
@@ -0,0 +1,319 @@
+"""Polygons from lines, no arcpy
+
+polygonize does what FeatureToPolygon does with ContactsAndFaults and label
+points, and GeMS_MakePolys3 uses it in place of FeatureToPolygon when its
+engine is polygonize. The lines are noded with planar.node_lines and put into
+a half-edge graph: every piece of line is two half-edges, one in each
+direction, and the half-edges that leave a node are sorted by angle. Faces are traced by leaving
+each node on the half-edge just clockwise of the one that arrived, so every
+bounded face is traced once, counterclockwise, and the outside of every
+connected group of lines is traced clockwise. Those clockwise rings are the
+holes of the smallest face that contains them, or the outside of the map.
+
+Dangles, and lines that join two groups of lines without closing a face, have
+the same face on both sides. They are dropped and only the faces they were in
+are traced again, as FeatureToPolygon does not let them split a polygon.
+
+A clockwise ring is matched to the smallest counterclockwise ring of another
+group whose box holds its box and whose ring holds its first point. The
+candidates are tried from the smallest up, so a hole in a face with islands
+inside islands is found with one point-in-ring test of the face it belongs to
+in most cases.
+
+Each face takes the attributes of the first label point inside it, found with a
+side_units.PolygonIndex; faces with no label point get None.
+
+Usage, with GDAL's Python bindings (osgeo) installed:
+    python polygonize.py <geopackage> [lines layer] [label points layer]
+      [output layer] [tolerance]
+    Use '#' for optional arguments that are not required.
+
+Args:
+    geopackage (str) : GeoPackage that holds the lines and the label points. The
+      output layer is written to it.
+    lines layer (str) : Optional, ContactsAndFaults by default. Lines with
+      IsConcealed = 'Y' or 'yes' are left out, as in GeMS_MakePolys3.
+    label points layer (str) : Optional. Its fields are copied to the output.
+    output layer (str) : Optional, MapUnitPolys_polygonize by default. Replaced
+      if it exists.
+    tolerance (float) : Optional, 0 by default. Distance within which lines
+      touch.
+"""
+
+import math
+import sys
+
+import planar
+import side_units as su
+import spatial_index as si
+
+
+def ring_area(ring):
+    """Signed area of a closed ring, positive if counterclockwise"""
+    area = 0.0
+    for a, b in zip(ring, ring[1:]):
+        area += a[0] * b[1] - b[0] * a[1]
+    return area / 2
+
+
+class HalfEdgeGraph:
+    """Half-edges of noded lines. Half-edge h runs along the points of piece
+    h // 2, forward if h is even and backward if it is odd, so its twin is h ^ 1.
+    pieces - list of (oid, [(x, y), ...]) that meet only at their ends"""
+
+    def __init__(self, pieces):
+        self.points = []
+        self.oids = []
+        seen = set()
+        for oid, pts in pieces:
+            pts = [(p[0], p[1]) for p in pts]
+            key = min(tuple(pts), tuple(reversed(pts)))
+            # the same piece from two overlapping lines
+            if key in seen:
+                continue
+            seen.add(key)
+            self.oids.append(oid)
+            self.points.append(pts)
+            self.points.append(pts[::-1])
+        self.removed = [False] * len(self.points)
+        self.outgoing = {}
+        for h, pts in enumerate(self.points):
+            self.outgoing.setdefault(pts[0], []).append(h)
+        for node, hs in self.outgoing.items():
+            hs.sort(key=self.angle)
+        self.position = {}
+        for hs in self.outgoing.values():
+            for i, h in enumerate(hs):
+                self.position[h] = i
+
+    def angle(self, h):
+        (ax, ay), (bx, by) = self.points[h][0], self.points[h][1]
+        return math.atan2(by - ay, bx - ax)
+
+    def next(self, h):
+        """Half-edge after h around the face on its left"""
+        twin = h ^ 1
+        hs = self.outgoing[self.points[twin][0]]
+        i = self.position[twin]
+        while True:
+            i = (i - 1) % len(hs)
+            if not self.removed[hs[i]]:
+                return hs[i]
+
+    def _trace(self, starts, face_of, faces):
+        """Trace the faces of the half-edges in starts that have none yet"""
+        for start in starts:
+            if self.removed[start] or face_of[start] is not None:
+                continue
+            f = len(faces)
+            ring = []
+            h = start
+            while face_of[h] is None:
+                face_of[h] = f
+                ring.append(h)
+                h = self.next(h)
+            faces.append(ring)
+
+    def trace(self):
+        """List of the half-edges of each face, and the face of each half-edge"""
+        face_of = [None] * len(self.points)
+        faces = []
+        self._trace(range(len(self.points)), face_of, faces)
+        return faces, face_of
+
+    def faces(self):
+        """Rings of half-edges of every face, with the edges that have the same
+        face on both sides removed"""
+        faces, face_of = self.trace()
+        dirty = range(len(faces))
+        while True:
+            both = [
+                h
+                for f in dirty
+                for h in faces[f]
+                if not h & 1 and face_of[h ^ 1] == f
+            ]
+            if not both:
+                return [ring for ring in faces if ring is not None]
+            # removing an edge only changes the face it was in
+            hit = set()
+            for h in both:
+                hit.add(face_of[h])
+                self.removed[h] = True
+                self.removed[h ^ 1] = True
+            starts = []
+            for f in hit:
+                for h in faces[f]:
+                    face_of[h] = None
+                    if not self.removed[h]:
+                        starts.append(h)
+                faces[f] = None
+            first = len(faces)
+            self._trace(starts, face_of, faces)
+            dirty = range(first, len(faces))
+
+    def groups(self):
+        """Connected group of lines of each half-edge"""
+        group = [None] * len(self.points)
+        for start in range(len(self.points)):
+            if self.removed[start] or group[start] is not None:
+                continue
+            stack = [start]
+            group[start] = start
+            while stack:
+                h = stack.pop()
+                for g in [h ^ 1] + self.outgoing[self.points[h][-1]]:
+                    if not self.removed[g] and group[g] is None:
+                        group[g] = start
+                        stack.append(g)
+        return group
+
+    def ring(self, half_edges):
+        """Closed ring of (x, y) along half_edges"""
+        ring = [self.points[half_edges[0]][0]]
+        for h in half_edges:
+            ring.extend(self.points[h][1:])
+        return ring
+
+
+def _contains(a, b):
+    """True if box a holds all of box b"""
+    return a[0] <= b[0] and a[1] <= b[1] and b[2] <= a[2] and b[3] <= a[3]
+
+
+def build_faces(pieces):
+    """List of [shell, hole, ...] rings of the bounded faces of noded lines.
+    Shells are counterclockwise and holes clockwise."""
+    graph = HalfEdgeGraph(pieces)
+    shells = []
+    holes = []
+    faces = graph.faces()
+    group = graph.groups()
+    for half_edges in faces:
+        ring = graph.ring(half_edges)
+        area = ring_area(ring)
+        if area > 0:
+            shells.append((area, ring, group[half_edges[0]]))
+        elif area < 0:
+            holes.append((ring, group[half_edges[0]]))
+
+    faces = [[ring] for _, ring, _ in shells]
+    boxes = [su.ring_box([ring]) for _, ring, _ in shells]
+    tree = si.STRtree(boxes)
+    for hole, hole_group in holes:
+        # a hole is the outside of a group of lines that does not touch the
+        # lines of the shell around it, so any point of it is inside the shell,
+        # and the smallest shell that holds it is the face it is a hole of
+        x, y = hole[0]
+        box = su.ring_box([hole])
+        candidates = [
+            i
+            for i in tree.query(box)
+            if shells[i][2] != hole_group and _contains(boxes[i], box)
+        ]
+        candidates.sort(key=lambda i: shells[i][0])
+        for i in candidates:
+            if su.inside(x, y, [shells[i][1]]):
+                faces[i].append(hole)
+                break
+    return faces
+
+
+def polygonize(lines, tolerance=0, labels=()):
+    """Polygons made by lines, with their label points.
+    lines - iterable of (oid, [(x, y), ...]), one for each part of each line
+    tolerance - distance within which lines touch
+    labels - iterable of (key, x, y)
+    Returns a list of ([shell, hole, ...], key of the label point or None)"""
+    faces = build_faces(planar.node_lines(lines, tolerance))
+    index = su.PolygonIndex(list(enumerate(faces)))
+    keys = [None] * len(faces)
+    for key, x, y in labels:
+        f = index.locate(x, y, None)
+        if f is not None and keys[f] is None:
+            keys[f] = key
+    return list(zip(faces, keys))
+
+
+def main(argv):
+    from osgeo import ogr
+
+    ogr.UseExceptions()
+    gpkg = argv[1]
+
+    def arg(i, default):
+        if len(argv) > i and argv[i] not in ("#", ""):
+            return argv[i]
+        return default
+
+    lines_name = arg(2, "ContactsAndFaults")
+    labels_name = arg(3, None)
+    out_name = arg(4, "MapUnitPolys_polygonize")
+    tolerance = float(arg(5, 0))
+
+    ds = ogr.Open(gpkg, 1)
+    lines_layer = ds.GetLayerByName(lines_name)
+    defn = lines_layer.GetLayerDefn()
+    has_concealed = defn.GetFieldIndex("IsConcealed") >= 0
+    lines = []
+    for feature in lines_layer:
+        geom = feature.GetGeometryRef()
+        if geom is None:
+            continue
+        if has_concealed and str(feature.GetField("IsConcealed")).lower() in ("y", "yes"):
+            continue
+        if geom.GetGeometryCount():
+            parts = [geom.GetGeometryRef(i) for i in range(geom.GetGeometryCount())]
+        else:
+            parts = [geom]
+        for part in parts:
+            lines.append((feature.GetFID(), part.GetPoints()))
+
+    label_fields = []
+    labels = []
+    attribs = {}
+    if labels_name:
+        labels_layer = ds.GetLayerByName(labels_name)
+        label_defn = labels_layer.GetLayerDefn()
+        label_fields = [label_defn.GetFieldDefn(i) for i in range(label_defn.GetFieldCount())]
+        for feature in labels_layer:
+            geom = feature.GetGeometryRef()
+            if geom is None:
+                continue
+            fid = feature.GetFID()
+            labels.append((fid, geom.GetX(), geom.GetY()))
+            attribs[fid] = [feature.GetField(i) for i in range(len(label_fields))]
+
+    print(f"Building polygons from {len(lines)} lines")
+    polygons = polygonize(lines, tolerance, labels)
+
+    if ds.GetLayerByName(out_name) is not None:
+        for i in range(ds.GetLayerCount()):
+            if ds.GetLayerByIndex(i).GetName() == out_name:
+                ds.DeleteLayer(i)
+                break
+    out = ds.CreateLayer(out_name, lines_layer.GetSpatialRef(), ogr.wkbPolygon)
+    for field in label_fields:
+        out.CreateField(field)
+    out_defn = out.GetLayerDefn()
+    out.StartTransaction()
+    for rings, key in polygons:
+        polygon = ogr.Geometry(ogr.wkbPolygon)
+        for ring in rings:
+            r = ogr.Geometry(ogr.wkbLinearRing)
+            for x, y in ring:
+                r.AddPoint_2D(x, y)
+            polygon.AddGeometry(r)
+        feature = ogr.Feature(out_defn)
+        feature.SetGeometry(polygon)
+        if key is not None:
+            for i, value in enumerate(attribs[key]):
+                feature.SetField(i, value)
+        out.CreateFeature(feature)
+    out.CommitTransaction()
+    ds = None
+    print(f"{len(polygons)} polygons written to {out_name}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
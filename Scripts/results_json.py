@@ -0,0 +1,149 @@
+"""Machine-readable validation results
+
+Alongside the html reports, ValidateDatabase writes
+    <gdb name>-Validation.ndjson - one JSON record per error or warning
+    <gdb name>-Validation.json - summary with the compliance level and, for
+      every rule, pass/fail, the number of errors, and the time it took
+
+Records are appended and flushed as each rule finishes, and the summary is
+rewritten at the same time with "complete": false, so that other processes
+can follow a validation while it runs.
+
+Errors are kept as html snippets by the rules. The table, field, id and value
+of each record are read back from the <span class="table|field|value"> tags
+in the snippet, and the snippet with tags removed is kept as the message.
+"""
+
+import html
+import json
+import os
+import re
+
+_span = re.compile(r'<span class="(table|field|value)">(.*?)</span>', re.DOTALL)
+_tag = re.compile(r"<[^>]+>")
+_objectid = re.compile(r"OBJECTID\s+(\d+)")
+_level = re.compile(r"LEVEL (\d) COMPLIANT")
+
+
+def plain(text):
+    """Text of an html snippet with tags removed and whitespace collapsed"""
+    return " ".join(html.unescape(_tag.sub("", str(text))).split())
+
+
+def parse_error(snippet):
+    """Dictionary of table, field, id, and value found in an error snippet"""
+    spans = {"table": [], "field": [], "value": []}
+    for cls, text in _span.findall(str(snippet)):
+        spans[cls].append(plain(text))
+
+    record = {"table": None, "field": None, "id": None, "value": None}
+    if spans["table"]:
+        record["table"] = spans["table"][0]
+    if spans["field"]:
+        record["field"] = spans["field"][0]
+    if len(spans["field"]) > 1 and spans["value"]:
+        # table, field, id field, id value: rows identified by OBJECTID or _ID
+        record["id"] = spans["value"][0]
+    elif spans["value"]:
+        record["value"] = spans["value"][0]
+    if record["id"] is None:
+        m = _objectid.search(str(snippet))
+        if m:
+            record["id"] = m.group(1)
+    record["message"] = plain(snippet)
+    return record
+
+
+def level_number(level):
+    """1, 2, or 3 from the sentence written by determine_level"""
+    m = _level.search(str(level))
+    return int(m.group(1)) if m else None
+
+
+class ResultsWriter:
+    """Writes the NDJSON records and the summary JSON of one validation.
+    header - dictionary of values that go at the top of the summary"""
+
+    def __init__(self, ndjson_path, summary_path, header):
+        self.ndjson_path = str(ndjson_path)
+        self.summary_path = str(summary_path)
+        self.summary = dict(header)
+        self.summary["complete"] = False
+        self.summary["level"] = None
+        self.summary["rules"] = {}
+        self.summary["warnings"] = {}
+        self.summary["timings"] = {}
+        self.out = open(self.ndjson_path, "w", encoding="utf-8")
+
+    def _write(self, record):
+        self.out.write(json.dumps(record, default=str))
+        self.out.write("\n")
+
+    def add(self, key, value, task=None, seconds=None):
+        """Record a rule error list or a list of warnings as it comes out of a rule.
+        task is the name of the scheduler rule that produced it"""
+        if task is not None and seconds is not None:
+            self.summary["timings"][task] = round(seconds, 3)
+
+        if key.startswith(("rule2", "rule3")):
+            if value is None:
+                return
+            if isinstance(value, str):
+                value = [value]
+            if len(value) == 3:
+                status, errors = "pass", []
+            elif len(value) < 3:
+                status, errors = "not checked", []
+            else:
+                status, errors = "fail", value[3:]
+            self.summary["rules"][key] = {
+                "status": status,
+                "errors": len(errors),
+                "message": plain(value[0]) if value else None,
+                "task": task,
+            }
+            for error in errors:
+                if error is None:
+                    continue
+                record = {"kind": "error", "rule": key}
+                record.update(parse_error(error))
+                self._write(record)
+
+        elif key.endswith("_warnings") or key == "end_spaces":
+            if not isinstance(value, list) or not value:
+                return
+            warnings = value[1:]
+            self.summary["warnings"][key] = {
+                "description": plain(value[0]),
+                "count": len(warnings),
+            }
+            for warning in warnings:
+                record = {"kind": "warning", "rule": key}
+                record.update(parse_error(warning))
+                self._write(record)
+        else:
+            return
+
+        self.out.flush()
+        self._write_summary()
+
+    def _write_summary(self):
+        tmp_path = f"{self.summary_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.summary, f, indent=2, default=str)
+        os.replace(tmp_path, self.summary_path)
+
+    def close(self, level=None, timings=None):
+        """Finish the summary with the compliance level and the time each
+        scheduler rule took"""
+        if not self.out.closed:
+            self.out.close()
+        if level is not None:
+            self.summary["level"] = level_number(level)
+            self.summary["level_description"] = plain(level)
+        if timings:
+            self.summary["timings"].update(
+                {k: round(v, 3) for k, v in timings.items()}
+            )
+        self.summary["complete"] = True
+        self._write_summary()
@@ -0,0 +1,170 @@
+"""Runs validation rules in a thread pool according to their declared inputs and outputs
+
+Each rule is a function that takes the shared state dictionary and returns a
+dictionary of the values it provides. A rule only starts once every key it
+requires is in the state, so the rules form a dependency graph that is checked
+for missing inputs and cycles before anything runs. Rules that do not depend
+on each other, for example the topology check and the attribute rules, run at
+the same time.
+
+arcpy is not thread-safe, so only rules that read the database, or do not
+touch arcpy at all, go to the pool. Rules added with main_thread=True, those
+that run geoprocessing tools or edit tables, run in the calling thread while
+no pool rule is running. Rules added with background=True do not touch arcpy
+in this process at all, for example because they only wait on worker
+processes, and main thread rules do not wait for them.
+
+Results are handed back through on_complete in the order the rules were added,
+no matter which finished first, so reports come out the same on every run.
+The wall time of each rule is kept in timings.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# arcpy releases the GIL inside cursors but does not like too many of them at once
+MAX_WORKERS = 4
+
+
+class Rule:
+    def __init__(
+        self,
+        name,
+        func,
+        requires=(),
+        provides=(),
+        message=None,
+        main_thread=False,
+        background=False,
+    ):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.provides = tuple(provides)
+        self.message = message
+        self.main_thread = main_thread
+        self.background = background and not main_thread
+
+
+class RuleScheduler:
+    def __init__(
+        self, max_workers=MAX_WORKERS, on_start=None, on_finish=None, on_complete=None
+    ):
+        """on_start(rule) is called from the calling thread when a rule is submitted.
+        on_finish(rule, result) is called from the calling thread as soon as a
+        rule finishes, before its results go into state, and may replace values
+        in result.
+        on_complete(rule, result) is called from the calling thread, in the
+        order the rules were added"""
+        self.rules = []
+        self.max_workers = max_workers
+        self.on_start = on_start
+        self.on_finish = on_finish
+        self.on_complete = on_complete
+        self.timings = {}
+
+    def add(
+        self,
+        name,
+        func,
+        requires=(),
+        provides=(),
+        message=None,
+        main_thread=False,
+        background=False,
+    ):
+        self.rules.append(
+            Rule(name, func, requires, provides, message, main_thread, background)
+        )
+
+    def check(self, state):
+        """Make sure every required key is either already in state or provided
+        by some rule, and that the rules can all be run"""
+        available = set(state)
+        providers = {}
+        for rule in self.rules:
+            for p in rule.provides:
+                providers.setdefault(p, rule.name)
+
+        for rule in self.rules:
+            missing = [
+                r for r in rule.requires if not r in available and not r in providers
+            ]
+            if missing:
+                raise ValueError(f"Rule {rule.name} requires {missing}, which nothing provides")
+
+        # topological pass to find cycles
+        done = set(available)
+        pending = list(self.rules)
+        while pending:
+            ready = [r for r in pending if all(n in done for n in r.requires)]
+            if not ready:
+                names = [r.name for r in pending]
+                raise ValueError(f"Circular dependencies between rules {names}")
+            for r in ready:
+                done.update(r.provides)
+                pending.remove(r)
+
+    def _timed(self, rule, state):
+        start = time.perf_counter()
+        result = rule.func(state)
+        return result or {}, time.perf_counter() - start
+
+    def run(self, state):
+        """Run all rules, updating state with what each provides. Returns state"""
+        self.check(state)
+        pending = list(self.rules)
+        running = {}
+        finished = {}
+        next_report = 0
+
+        def finish(rule, result, elapsed):
+            nonlocal next_report
+            self.timings[rule.name] = elapsed
+            if self.on_finish:
+                self.on_finish(rule, result)
+            state.update(result)
+            finished[rule.name] = result
+
+            # report completed rules in declaration order
+            while (
+                next_report < len(self.rules)
+                and self.rules[next_report].name in finished
+            ):
+                done_rule = self.rules[next_report]
+                if self.on_complete:
+                    self.on_complete(done_rule, finished[done_rule.name])
+                next_report += 1
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                ready = [r for r in pending if all(n in state for n in r.requires)]
+                main = [r for r in ready if r.main_thread]
+                if main:
+                    # no new pool rules until the main thread rules have run
+                    if all(r.background for r in running.values()):
+                        rule = main[0]
+                        pending.remove(rule)
+                        if self.on_start:
+                            self.on_start(rule)
+                        finish(rule, *self._timed(rule, state))
+                        continue
+                else:
+                    # submit everything whose inputs are ready, in declaration order
+                    for rule in ready:
+                        pending.remove(rule)
+                        if self.on_start:
+                            self.on_start(rule)
+                        running[pool.submit(self._timed, rule, state)] = rule
+
+                if not running:
+                    names = [r.name for r in pending]
+                    raise RuntimeError(f"Rules {names} are waiting on values that were never provided")
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    rule = running.pop(future)
+                    # re-raises any exception from the rule
+                    finish(rule, *future.result())
+
+        return state
@@ -0,0 +1,178 @@
+"""Map units to the left and right of lines, no arcpy
+
+Identity_analysis(caf, mup, ..., KEEP_RELATIONSHIPS) overlays the lines with
+the polygons just to learn LEFT_MapUnit and RIGHT_MapUnit. Here a probe point is
+put a small distance to each side of the midpoint of the longest segment of
+each part of a line, and the polygon that contains each probe is found with an
+STRtree of polygon boxes (spatial_index.py) and a point-in-polygon test.
+
+The probes of a segment shorter than four times the offset are brought in to a
+quarter of its length, so that they do not reach around its ends. When a
+tolerance is given, a probe only counts if the boundary of the polygon it lands
+in passes within the tolerance of the point of the line it was put out from.
+A probe that has crossed a sliver narrower than the offset into the polygon
+beyond is tried again at half the distance, and the parts are tried longest
+segment first until both sides are found.
+
+Probes that fall outside every polygon, at the edge of the map, get '', as
+Identity leaves LEFT_MapUnit or RIGHT_MapUnit empty there.
+"""
+
+import math
+
+import spatial_index as si
+
+
+def ring_box(rings):
+    """(xmin, ymin, xmax, ymax) of a list of rings"""
+    xs = [pt[0] for ring in rings for pt in ring]
+    ys = [pt[1] for ring in rings for pt in ring]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def inside(x, y, rings):
+    """True if (x, y) is inside the polygon made of rings, holes included as
+    rings. Even-odd rule, so parts and holes need no particular order"""
+    found = False
+    for ring in rings:
+        n = len(ring)
+        j = n - 1
+        for i in range(n):
+            xi, yi = ring[i][0], ring[i][1]
+            xj, yj = ring[j][0], ring[j][1]
+            if (yi > y) != (yj > y):
+                if x < xi + (y - yi) * (xj - xi) / (yj - yi):
+                    found = not found
+            j = i
+    return found
+
+
+def boundary_distance(x, y, rings):
+    """Distance from (x, y) to the nearest edge of rings"""
+    best = math.inf
+    for ring in rings:
+        for a, b in zip(ring, ring[1:]):
+            ax, ay = a[0], a[1]
+            dx = b[0] - ax
+            dy = b[1] - ay
+            d2 = dx * dx + dy * dy
+            t = 0.0 if d2 == 0 else ((x - ax) * dx + (y - ay) * dy) / d2
+            t = min(1.0, max(0.0, t))
+            best = min(best, math.hypot(x - ax - t * dx, y - ay - t * dy))
+    return best
+
+
+def longest_segment(points):
+    """(a, b, length) of the longest segment of a part, or None if it has no length"""
+    best = None
+    for a, b in zip(points, points[1:]):
+        length = math.hypot(b[0] - a[0], b[1] - a[1])
+        if length > 0 and (best is None or length > best[2]):
+            best = (a, b, length)
+    return best
+
+
+def probes(points, offset, min_offset=0):
+    """((x, y) left, (x, y) right) of a part, offset from the midpoint of its
+    longest segment, or None if it has no length. The offset is cut to a
+    quarter of the length of the segment, but not below min_offset"""
+    best = longest_segment(points)
+    if best is None:
+        return None
+    (ax, ay), (bx, by), length = best[0][:2], best[1][:2], best[2]
+    offset = max(min_offset, min(offset, length / 4))
+    mx = (ax + bx) / 2
+    my = (ay + by) / 2
+    # left normal of the direction of the line
+    nx = -(by - ay) / length * offset
+    ny = (bx - ax) / length * offset
+    return (mx + nx, my + ny), (mx - nx, my - ny)
+
+
+class PolygonIndex:
+    """Polygons that can be searched by point.
+    polygons - list of (value, [ring, ...]), ring a list of (x, y)"""
+
+    def __init__(self, polygons):
+        self.polygons = [(v, rings) for v, rings in polygons if rings]
+        self.tree = si.STRtree([ring_box(rings) for _, rings in self.polygons])
+
+    def locate(self, x, y, outside=""):
+        """value of the first polygon that contains (x, y), or outside"""
+        found = self.find(x, y)
+        return outside if found is None else self.polygons[found][0]
+
+    def find(self, x, y):
+        """index in polygons of the first polygon that contains (x, y), or None"""
+        for i in self.tree.query((x, y, x, y)):
+            if inside(x, y, self.polygons[i][1]):
+                return i
+        return None
+
+
+# times a probe is brought in to half its distance from the line
+RETRIES = 4
+
+
+def line_sides(parts, polygons, offset, tolerance=0, outside=""):
+    """(left, right) values of the polygons on either side of a line.
+    parts - list of lists of (x, y), in the direction of the line
+    polygons - PolygonIndex
+    offset - distance of the probe points from the line
+    tolerance - distance within which the line is on a polygon boundary. If 0,
+      the first probe of the part with the longest segment is taken as it is"""
+    # parts with the longest segment first
+    candidates = []
+    for points in parts:
+        best = longest_segment(points)
+        if best is not None:
+            candidates.append((best[2], points, best))
+    candidates.sort(key=lambda c: -c[0])
+
+    sides = [None, None]
+    first = None
+    for _, points, (a, b, length) in candidates:
+        mx = (a[0] + b[0]) / 2
+        my = (a[1] + b[1]) / 2
+        distance = max(tolerance, min(offset, length / 4))
+        for _ in range(RETRIES + 1):
+            pts = probes([a, b], distance, tolerance)
+            found = [polygons.find(x, y) for x, y in pts]
+            if first is None:
+                first = found
+            if tolerance <= 0:
+                break
+            for side, i in enumerate(found):
+                if sides[side] is None and i is not None:
+                    rings = polygons.polygons[i][1]
+                    if boundary_distance(mx, my, rings) <= tolerance:
+                        sides[side] = i
+            if not None in sides or distance / 2 < tolerance:
+                break
+            distance /= 2
+        if tolerance <= 0 or not None in sides:
+            break
+
+    if first is None:
+        return outside, outside
+    # a side not found next to the line keeps what the first probe found,
+    # eg. outside the map
+    values = []
+    for side, i in enumerate(sides):
+        if i is None:
+            i = first[side]
+        values.append(outside if i is None else polygons.polygons[i][0])
+    return tuple(values)
+
+
+def side_units(lines, polygons, offset, tolerance=0):
+    """List of (left, right) map units for each line.
+    lines - list of lines, each a list of parts, each a list of (x, y) in the
+      direction of the line
+    polygons - PolygonIndex, or list of (MapUnit, [ring, ...])
+    offset - distance of the probe points from the line, larger than the xy
+      tolerance and smaller than the narrowest polygon
+    tolerance - see line_sides"""
+    if not isinstance(polygons, PolygonIndex):
+        polygons = PolygonIndex(polygons)
+    return [line_sides(parts, polygons, offset, tolerance) for parts in lines]
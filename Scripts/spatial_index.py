@@ -0,0 +1,101 @@
+"""Spatial index of bounding boxes, no arcpy or GEOS needed
+
+STRtree is a Sort-Tile-Recursive packed R-tree. It is built once from a list
+of (xmin, ymin, xmax, ymax) boxes and answers which boxes touch or overlap a
+query box. Like shapely's STRtree, queries return positions in the list the
+tree was built from, so callers keep their geometries and ids in parallel lists.
+"""
+
+import math
+
+
+def boxes_touch(a, b):
+    """True if boxes a and b overlap or share an edge or corner"""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def union_box(boxes):
+    """Smallest box that contains all of boxes"""
+    boxes = list(boxes)
+    return (
+        min(b[0] for b in boxes),
+        min(b[1] for b in boxes),
+        max(b[2] for b in boxes),
+        max(b[3] for b in boxes),
+    )
+
+
+def expand_box(box, d):
+    """box grown by d on every side"""
+    return (box[0] - d, box[1] - d, box[2] + d, box[3] + d)
+
+
+class STRtree:
+    """Packed R-tree of boxes.
+    boxes - list of (xmin, ymin, xmax, ymax), None for items without a box
+    node_capacity - children per node"""
+
+    def __init__(self, boxes, node_capacity=10):
+        self.boxes = list(boxes)
+        self.node_capacity = max(2, node_capacity)
+        # nodes are (box, children) for branches and (box, index) for leaves
+        level = [(b, i) for i, b in enumerate(self.boxes) if b is not None]
+        self.root = None
+        if not level:
+            return
+        leaf = True
+        while True:
+            level = self._pack(level, leaf)
+            leaf = False
+            if len(level) == 1:
+                break
+        self.root = level[0]
+
+    def _pack(self, nodes, leaf):
+        """Group nodes into parents of node_capacity children"""
+        cap = self.node_capacity
+        n_parents = math.ceil(len(nodes) / cap)
+        n_slices = math.ceil(math.sqrt(n_parents))
+        slice_size = n_slices * cap
+
+        nodes = sorted(nodes, key=lambda n: n[0][0] + n[0][2])
+        parents = []
+        for s in range(0, len(nodes), slice_size):
+            vertical = sorted(
+                nodes[s : s + slice_size], key=lambda n: n[0][1] + n[0][3]
+            )
+            for c in range(0, len(vertical), cap):
+                children = vertical[c : c + cap]
+                parents.append(
+                    (union_box(n[0] for n in children), (leaf, children))
+                )
+        return parents
+
+    def __len__(self):
+        return sum(1 for b in self.boxes if b is not None)
+
+    def query(self, box):
+        """Sorted positions of the boxes that touch or overlap box"""
+        found = []
+        if self.root is None or box is None:
+            return found
+        stack = [self.root]
+        while stack:
+            node_box, (leaf, children) = stack.pop()
+            if not boxes_touch(node_box, box):
+                continue
+            if leaf:
+                found.extend(i for b, i in children if boxes_touch(b, box))
+            else:
+                stack.extend(children)
+        found.sort()
+        return found
+
+    def pairs(self):
+        """(i, j) with i < j for every two boxes that touch or overlap"""
+        for i, box in enumerate(self.boxes):
+            if box is None:
+                continue
+            for j in self.query(box):
+                if j > i:
+                    yield i, j
@@ -0,0 +1,323 @@
+"""Single-pass, columnar snapshots of geodatabase tables
+
+Each table is read with one arcpy.da.SearchCursor into per-field columns so that
+validation rules can share the same in-memory values instead of reopening a
+cursor for every table and field. Integer and floating point fields are held in
+typed arrays, everything else in lists. When the store grows past its memory
+cap, memo (long text) columns are spilled to pickled chunks in a scratch folder
+and read back on demand.
+"""
+
+import arcpy
+import array
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+import GeMS_Definition as gdef
+
+# fields that cannot be usefully read into a column
+skip_types = ("Geometry", "Blob", "Raster")
+int_types = ("OID", "Integer", "SmallInteger", "BigInteger")
+float_types = ("Double", "Single")
+
+# default cap on the estimated size of all in-memory columns, in bytes
+MEMORY_CAP = 256 * 1024 * 1024
+
+# rows per pickled chunk in a spilled column
+CHUNK_ROWS = 10000
+
+# rough per-object overhead used when estimating the size of text values
+_OBJ_BYTES = 56
+
+# the only where clauses the snapshot evaluates itself, eg "GeoMaterial IS NOT NULL"
+_null_where = re.compile(r"^\s*(\w+)\s+IS\s+(NOT\s+)?NULL\s*$", re.IGNORECASE)
+
+
+class _NumericColumn:
+    """Typed array of numbers with a separate set of the row indices that are NULL"""
+
+    def __init__(self, typecode):
+        self.data = array.array(typecode)
+        self.nulls = set()
+
+    def append(self, v):
+        if v is None:
+            self.nulls.add(len(self.data))
+            self.data.append(0)
+        else:
+            self.data.append(v)
+
+    def nbytes(self):
+        return self.data.itemsize * len(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        if not self.nulls:
+            return iter(self.data)
+        return (None if i in self.nulls else v for i, v in enumerate(self.data))
+
+
+class _TextColumn:
+    """List of values with a running estimate of its size. Can be spilled to disk"""
+
+    def __init__(self, memo=False):
+        self.data = []
+        self.memo = memo
+        self.size = 0
+        self.n = 0
+        self.spill_path = None
+        # number of iterators over the column that have not finished
+        self.readers = 0
+        self._readers_lock = threading.Lock()
+
+    def append(self, v):
+        self.n += 1
+        self.data.append(v)
+        if isinstance(v, str):
+            self.size += len(v) + _OBJ_BYTES
+        else:
+            self.size += _OBJ_BYTES
+        if self.spill_path and len(self.data) >= CHUNK_ROWS:
+            self._flush()
+
+    def nbytes(self):
+        return self.size if not self.spill_path else 0
+
+    def spill(self, folder):
+        """Move the values in memory to a scratch file. Later values go straight
+        to the file in chunks. The file is written under a temporary name and
+        spill_path is only set once it is complete, so a reader in another
+        thread sees either the values in memory or the whole file"""
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=folder)
+        os.close(fd)
+        self._flush(tmp)
+        path = tmp[: -len(".tmp")] + ".col"
+        os.replace(tmp, path)
+        self.spill_path = path
+
+    def _flush(self, path=None):
+        with open(path or self.spill_path, "ab") as f:
+            pickle.dump(self.data, f, pickle.HIGHEST_PROTOCOL)
+        self.data = []
+
+    def close(self):
+        if self.spill_path and self.data:
+            self._flush()
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        if not self.spill_path:
+            return self._iter_memory(self.data)
+        return self._iter_spilled(self.spill_path)
+
+    def _reading(self, n):
+        with self._readers_lock:
+            self.readers += n
+
+    def _iter_memory(self, data):
+        self._reading(1)
+        try:
+            yield from data
+        finally:
+            self._reading(-1)
+
+    def _iter_spilled(self, path):
+        self._reading(1)
+        try:
+            with open(path, "rb") as f:
+                while True:
+                    try:
+                        chunk = pickle.load(f)
+                    except EOFError:
+                        break
+                    yield from chunk
+        finally:
+            self._reading(-1)
+
+    def remove(self):
+        if self.spill_path and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+
+class TableSnapshot:
+    """All readable columns of one table, read in a single cursor pass"""
+
+    def __init__(self, name, catalog_path, fields, store):
+        self.name = name
+        self.oid_field = None
+        self.columns = {}
+        self.field_types = {}
+        for f in fields:
+            if f.type in skip_types:
+                continue
+            if f.type == "OID" and not self.oid_field:
+                self.oid_field = f.name
+            if f.type in int_types:
+                self.columns[f.name] = _NumericColumn("q")
+            elif f.type in float_types:
+                self.columns[f.name] = _NumericColumn("d")
+            else:
+                memo = f.type == "String" and f.length > gdef.defaultLength
+                self.columns[f.name] = _TextColumn(memo)
+            self.field_types[f.name] = f.type
+
+        names = list(self.columns)
+        cols = [self.columns[n] for n in names]
+        self.row_count = 0
+        # hash of the values read, used to tell if the table has changed
+        digest = hashlib.blake2b(digest_size=16)
+        if names:
+            with arcpy.da.SearchCursor(catalog_path, names) as cursor:
+                for row in cursor:
+                    digest.update(repr(row).encode("utf-8"))
+                    for col, v in zip(cols, row):
+                        col.append(v)
+                    self.row_count += 1
+                    if self.row_count % CHUNK_ROWS == 0:
+                        store.check_cap(self)
+        self.digest = digest.hexdigest()
+        for col in cols:
+            if isinstance(col, _TextColumn):
+                col.close()
+        store.check_cap(self)
+
+    def nbytes(self):
+        return sum(c.nbytes() for c in self.columns.values())
+
+    def memo_columns(self):
+        """In-memory memo columns that no one is reading, largest first"""
+        memos = [
+            c
+            for c in self.columns.values()
+            if isinstance(c, _TextColumn)
+            and c.memo
+            and not c.spill_path
+            and not c.readers
+        ]
+        return sorted(memos, key=lambda c: c.size, reverse=True)
+
+    def has_field(self, field):
+        return field in self.columns
+
+    def column(self, field):
+        """Iterable of the values in field, in cursor order"""
+        return self.columns[field]
+
+    def rows(self, fields):
+        """Iterate over tuples of values in fields, like a SearchCursor"""
+        return zip(*[iter(self.columns[f]) for f in fields])
+
+    def _mask(self, where):
+        """List of booleans for the rows matching a simple IS [NOT] NULL where clause.
+        Returns None if there is no where clause. Raises ValueError if it cannot
+        be evaluated here"""
+        if where is None:
+            return None
+        m = _null_where.match(where)
+        if not m or not m.group(1) in self.columns:
+            raise ValueError(where)
+        not_null = bool(m.group(2))
+        return [(v is not None) == not_null for v in self.columns[m.group(1)]]
+
+    def values(self, field, what, oid_field=None, where=None):
+        """Same results as values() in GeMS_ValidateDatabase built from a SearchCursor.
+        "dictionary" returns {oid: value} ordered by value, anything else a list"""
+        mask = self._mask(where)
+        col = self.columns[field]
+        if what == "dictionary":
+            pairs = zip(self.columns[oid_field], col)
+            if mask is not None:
+                pairs = (p for p, keep in zip(pairs, mask) if keep)
+            # emulate ORDER BY <field>, NULLs first
+            pairs = sorted(pairs, key=lambda p: (p[1] is not None, p[1]))
+            return {k: v for k, v in pairs}
+        else:
+            if mask is None:
+                return list(col)
+            return [v for v, keep in zip(col, mask) if keep]
+
+    def remove(self):
+        for c in self.columns.values():
+            if isinstance(c, _TextColumn):
+                c.remove()
+
+
+class SnapshotStore:
+    """Lazily builds and caches one TableSnapshot per table in db_dict.
+    spill_dir is where memo columns go when the estimated size of all columns
+    is larger than memory_cap bytes"""
+
+    def __init__(self, db_dict, spill_dir, memory_cap=MEMORY_CAP):
+        self.db_dict = db_dict
+        self.spill_dir = str(spill_dir)
+        self.memory_cap = memory_cap
+        self.snapshots = {}
+        # one lock per table so that rules running in different threads can
+        # read different tables at the same time
+        self._table_locks = {}
+        self._lock = threading.RLock()
+
+    def _table_lock(self, table):
+        with self._lock:
+            return self._table_locks.setdefault(table, threading.Lock())
+
+    def get(self, table):
+        """TableSnapshot of table, reading it the first time it is asked for"""
+        snap = self.snapshots.get(table)
+        if snap is None:
+            with self._table_lock(table):
+                snap = self.snapshots.get(table)
+                if snap is None:
+                    d = self.db_dict[table]
+                    snap = TableSnapshot(table, d["catalogPath"], d["fields"], self)
+                    with self._lock:
+                        self.snapshots[table] = snap
+        return snap
+
+    def drop(self, table):
+        """Forget the snapshot of a table whose rows have been edited"""
+        with self._table_lock(table):
+            with self._lock:
+                snap = self.snapshots.pop(table, None)
+            if snap is not None:
+                snap.remove()
+
+    def nbytes(self, current=None):
+        with self._lock:
+            snaps = list(self.snapshots.values())
+        total = sum(s.nbytes() for s in snaps)
+        if current is not None and not current.name in self.snapshots:
+            total += current.nbytes()
+        return total
+
+    def check_cap(self, current):
+        """Spill memo columns, starting with the table being read, until the
+        store fits under memory_cap or there is nothing left to spill"""
+        if self.nbytes(current) <= self.memory_cap:
+            return
+        with self._lock:
+            # only completed snapshots, other than current, can be spilled here
+            # and the lock keeps two threads from spilling the same column.
+            # Columns that other threads are reading are skipped
+            candidates = [current] + [
+                s for s in self.snapshots.values() if not s is current
+            ]
+            for snap in candidates:
+                for col in snap.memo_columns():
+                    col.spill(self.spill_dir)
+                    if self.nbytes(current) <= self.memory_cap:
+                        return
+
+    def close(self):
+        """Delete any spill files"""
+        with self._lock:
+            for s in self.snapshots.values():
+                s.remove()
+            self.snapshots = {}
@@ -1,4 +1,6 @@
 import arcpy
+import hashlib
+from collections import Counter
 from osgeo import ogr
 from lxml import etree
 from pathlib import Path
@@ -125,6 +127,12 @@ def create_fd(work_dir, gmap, sr, topo_pair, db_dict):
         ap(f"\t\tCreating feature dataset {gmap}")
         arcpy.CreateFeatureDataset_management(str(gdb_path), gmap, sr.name)
 
+    # remove copies from an earlier run, the topology first because feature
+    # classes in a topology cannot be deleted
+    for old in (fd_path / f"{gmap}_Topology", fd_path / topo_pair[2], fd_path / topo_pair[3]):
+        if arcpy.Exists(str(old)):
+            arcpy.Delete_management(str(old))
+
     # copy the feature
     source_mup = db_dict[topo_pair[2]]["catalogPath"]
     source_caf = db_dict[topo_pair[3]]["catalogPath"]
@@ -135,6 +143,9 @@ def create_fd(work_dir, gmap, sr, topo_pair, db_dict):
     export(source_mup, copy_mup, pro)
     export(source_caf, copy_caf, pro)
 
+    # the copies have new GDB_Items ObjectIDs
+    gdb_items_cache.clear()
+
     return gdb_path, str(copy_mup), str(copy_caf)
 
 
@@ -225,6 +236,48 @@ def make_topology(work_dir, topo_pair, db_dict):
     return top_path, True
 
 
+def fc_fingerprint(fc_path):
+    """row count, extent, and a hash of the OIDs and geometries of a feature class.
+    The row hashes are summed so that the order of the rows does not matter"""
+    n = 0
+    total = 0
+    with arcpy.da.SearchCursor(fc_path, ["OID@", "SHAPE@WKB"]) as cursor:
+        for oid, wkb in cursor:
+            h = hashlib.blake2b(str(oid).encode(), digest_size=16)
+            if wkb:
+                h.update(bytes(wkb))
+            total = (total + int(h.hexdigest(), 16)) % 2**128
+            n += 1
+    extent = None
+    if n:
+        e = arcpy.Describe(fc_path).extent
+        extent = [e.XMin, e.YMin, e.XMax, e.YMax]
+    return {"rows": n, "extent": extent, "geometry": f"{total:032x}"}
+
+
+def pair_fingerprint(topo_pair, db_dict):
+    """fingerprints of the MapUnitPolys and ContactsAndFaults of a topology pair"""
+    return {fc: fc_fingerprint(db_dict[fc]["catalogPath"]) for fc in topo_pair[2:]}
+
+
+def new_errors_lists():
+    """empty rule 2.3 and 3.2 errors lists, as check_topology starts them"""
+    return (
+        ["topology errors", "2.3 Topology errors", "topology2"],
+        ["topology errors", "3.2 Topology errors", "topology3"],
+    )
+
+
+def add_pair_errors(errors, pair_errors, gmap):
+    """add the errors eval_topology found for one pair, starting from
+    new_errors_lists, to the errors of the pairs before it, as eval_topology
+    would have if it had been handed those lists"""
+    errors.extend(pair_errors[4:])
+    if len(errors) > 3:
+        errors.insert(3, f'<span class="table">{gmap}</span>')
+    return errors
+
+
 def get_gdb_item(ds, sql):
     """helper function to query ogr dataset
     only one value returned. For looking up one field from one row"""
@@ -235,13 +288,51 @@ def get_gdb_item(ds, sql):
         return None
 
 
+# GDB_Items Name: ObjectID for each dataset, by path. Read again by each
+# eval_topology and cleared when create_fd copies the feature classes
+gdb_items_cache = {}
+
+
+def gdb_items(ds, refresh=False):
+    """dictionary of GDB_Items Name: ObjectID for an ogr dataset, read once per
+    dataset and again if refresh is True"""
+    db = ds.GetDescription()
+    if refresh or not db in gdb_items_cache:
+        items = {}
+        l = ds.ExecuteSQL("SELECT ObjectID, Name FROM GDB_Items")
+        if not l is None:
+            for f in l:
+                if f.GetField(1) is not None:
+                    items[f.GetField(1)] = f.GetField(0)
+            ds.ReleaseResultSet(l)
+        gdb_items_cache[db] = items
+    return gdb_items_cache[db]
+
+
+def gdb_item_id(ds, name):
+    """ObjectID of a GDB_Items row by Name. The cached map is read again when
+    the name is not in it, eg. after a topology was added to Topology.gdb"""
+    items = gdb_items(ds)
+    if not name in items:
+        items = gdb_items(ds, refresh=True)
+    return items.get(name)
+
+
+def gdb_item_name(ds, object_id):
+    """Name of a GDB_Items row by ObjectID"""
+    for refresh in (False, True):
+        for name, oid in gdb_items(ds, refresh).items():
+            if oid == int(object_id):
+                return name
+    return None
+
+
 def make_topology_dict(ds, root, db_dict):
     rules = root.findall(".//TopologyRule")
     top_dict = {}
     for rule in rules:
         origin_id = rule.find("OriginClassID").text
-        sql = f"SELECT Name from GDB_Items WHERE ObjectID = {origin_id}"
-        origin_class = get_gdb_item(ds, sql)
+        origin_class = gdb_item_name(ds, origin_id)
         rule_type = rule.find("TopologyRuleType").text
         if not origin_class in top_dict:
             top_dict[origin_class] = [rule_type]
@@ -253,8 +344,7 @@ def make_topology_dict(ds, root, db_dict):
             rule_type == "esriTRTAreaBoundaryCoveredByLine"
             and db_dict[origin_class]["gems_equivalent"] == "MapUnitPolys"
         ):
-            sql = f"SELECT Name from GDB_Items WHERE ObjectID = {rule.find('DestinationClassID').text}"
-            dest_class = get_gdb_item(ds, sql)
+            dest_class = gdb_item_name(ds, rule.find("DestinationClassID").text)
             top_dict["mup_dest"] = dest_class
         else:
             top_dict["mup_dest"] = None
@@ -262,20 +352,48 @@ def make_topology_dict(ds, root, db_dict):
     return top_dict
 
 
-def check_errors_table(ds, table, origin_id, rule_ids, dest_id=None):
-    """select rows from the T_errors table where the rule and the class ids match
-    a valid topology will return no rows"""
+def error_counts(ds, table):
+    """Counter of (TopoRuleType, OriginClassID) for the rows of a T_errors table
+    that are not exceptions. The rows are counted by SQLite, or by reading
+    them all here if the SQLite dialect is not available"""
+    counts = Counter()
+    try:
+        l = ds.ExecuteSQL(
+            f"""SELECT TopoRuleType, OriginClassID, COUNT(*) FROM {table}
+            WHERE IsException = 0 GROUP BY TopoRuleType, OriginClassID""",
+            dialect="SQLite",
+        )
+    except RuntimeError:
+        # raised instead of returning None when ogr.UseExceptions() is on
+        l = None
+    if not l is None:
+        for f in l:
+            counts[(f.GetField(0), f.GetField(1))] += f.GetField(2)
+        ds.ReleaseResultSet(l)
+        return counts
+
+    l = ds.ExecuteSQL(
+        f"SELECT TopoRuleType, OriginClassID FROM {table} WHERE IsException = 0"
+    )
+    if not l is None:
+        for f in l:
+            counts[(f.GetField(0), f.GetField(1))] += 1
+        ds.ReleaseResultSet(l)
+    return counts
+
+
+def check_errors_table(counts, origin_id, rule_ids, dest_id=None):
+    """look up the number of errors for each rule and the origin class id in the
+    error_counts of a T_errors table. a valid topology will have none"""
     errors = []
     errors_pass = True
+    if origin_id is None:
+        return (errors_pass, errors)
 
     for n in rule_ids:
         # if n != 37:
-        sql = f"""SELECT * from {table} WHERE TopoRuleType = {n} 
-            and OriginClassID = {origin_id}
-            and IsException = 0"""
-        l = ds.ExecuteSQL(sql)
-        if l.GetFeatureCount() > 0:
-            i = l.GetFeatureCount()
+        i = counts.get((n, int(origin_id)), 0)
+        if i > 0:
             if i == 1:
                 errors.append(f"Rule '{rules_dict[n]}' has {i} error")
             else:
@@ -317,6 +435,7 @@ def has_been_validated(top_path):
 
 def eval_topology(db, top, db_dict, gmap, level_2_errors, level_3_errors):
     ds = ogr.GetDriverByName("OpenFileGDB").Open(db)
+    gdb_items(ds, refresh=True)
     top_def = get_gdb_item(ds, f"SELECT Definition FROM GDB_Items WHERE name = '{top}'")
 
     # make a dictionary of d[FeatureClass] = [rule1, rule2, rule3] from the Definition in XML
@@ -327,6 +446,9 @@ def eval_topology(db, top, db_dict, gmap, level_2_errors, level_3_errors):
     line_errors = f"T_{top_id}_LineErrors"
     poly_errors = f"T_{top_id}_PolyErrors"
 
+    # one pass through each errors table, shared by the level 2 and 3 checks
+    counts = {t: error_counts(ds, t) for t in (point_errors, line_errors, poly_errors)}
+
     found_caf = False
     found_mup = False
 
@@ -359,17 +481,15 @@ def eval_topology(db, top, db_dict, gmap, level_2_errors, level_3_errors):
                 )
 
         # now, check the T_<top_id>_errors tables
-        origin_id = get_gdb_item(
-            ds, f"SELECT ObjectID FROM GDB_Items WHERE Name = '{mup}'"
-        )
+        origin_id = gdb_item_id(ds, mup)
         dest_id = None
         if mup_dest:
-            dest_id = get_gdb_item(
-                ds, f"SELECT ObjectID FROM GDB_Items WHERE Name = '{mup_dest}'"
-            )
+            dest_id = gdb_item_id(ds, mup_dest)
 
         for table in [line_errors, poly_errors]:
-            results = check_errors_table(ds, table, origin_id, level_2_ids, dest_id)
+            results = check_errors_table(
+                counts[table], origin_id, level_2_ids, dest_id
+            )
             if not results[0]:
                 level_2_errors.extend([f"&emsp;{res}" for res in results[1]])
 
@@ -384,9 +504,7 @@ def eval_topology(db, top, db_dict, gmap, level_2_errors, level_3_errors):
         found_caf = True
         caf_rules = top_dict[caf]
         # now, check the T_<top_id>_errors tables
-        origin_id = get_gdb_item(
-            ds, f"SELECT ObjectID FROM GDB_Items WHERE Name = '{caf}'"
-        )
+        origin_id = gdb_item_id(ds, caf)
 
         level_3_errors.extend(
             [
@@ -397,7 +515,7 @@ def eval_topology(db, top, db_dict, gmap, level_2_errors, level_3_errors):
         )
 
         for table in [point_errors, line_errors, poly_errors]:
-            results = check_errors_table(ds, table, origin_id, level_3_ids)
+            results = check_errors_table(counts[table], origin_id, level_3_ids)
             if not results[0]:
                 level_3_errors.extend([f"&emsp;{r}" for r in results[1]])
 
@@ -0,0 +1,603 @@
+"""Nodes of a line network, built in memory
+
+GeMS_TopologyCheck sorts the ends of the planarized ContactsAndFaults arcs into
+nodes: places where one or more arcs start or end. build_nodes clusters the end
+points with a spatial hash grid whose cells are as wide as the tolerance, so
+two ends closer than the tolerance are always in the same or neighboring cells
+and are put in the same node, wherever they fall relative to the cell edges.
+Ends are clustered transitively: if a is close to b and b is close to c, all
+three are one node.
+
+classify_nodes applies the GeMS_TopologyCheck node rules. The arc ends are
+copied into one structured NumPy array, with Type, IsConcealed, the
+confidences, and the other text attributes stored as integer codes, and the
+rules for 1, 2, 3, and 4-arc nodes are evaluated for all nodes of that degree
+at once by comparing code columns.
+
+tiled_nodes does both for very large maps one square tile at a time in a pool
+of worker processes. Clusters of end points that reach a tile edge are merged
+across tiles before they are classified, so the result is the same as from one
+pass over the whole map.
+
+No arcpy here. Lines are handed in as lists of (x, y) vertices.
+"""
+
+import math
+import multiprocessing
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def azimuth(pt1, pt2):
+    """Geographic azimuth, degrees clockwise from north, from pt1 to pt2"""
+    dx = pt2[0] - pt1[0]
+    dy = pt2[1] - pt1[1]
+    azi = 90 - math.degrees(math.atan2(dy, dx))
+    if azi < 0:
+        azi = azi + 360
+    return azi
+
+
+def line_ends(points):
+    """((x, y, azimuth, "From"), (x, y, azimuth, "To")) for the first and last
+    vertices of a line. Azimuths point from the end along the line, into the arc.
+    None if the line has fewer than 2 vertices"""
+    if len(points) < 2:
+        return None
+    first, second = points[0], points[1]
+    last, next_to_last = points[-1], points[-2]
+    return (
+        (first[0], first[1], azimuth(first, second), "From"),
+        (last[0], last[1], azimuth(last, next_to_last), "To"),
+    )
+
+
+def cluster(xs, ys, tolerance):
+    """Lists of the positions of points that are within tolerance, in x and in y,
+    of another point of the same list"""
+    n = len(xs)
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    if tolerance > 0:
+        grid = {}
+        for i in range(n):
+            cx = math.floor(xs[i] / tolerance)
+            cy = math.floor(ys[i] / tolerance)
+            for gx in (cx - 1, cx, cx + 1):
+                for gy in (cy - 1, cy, cy + 1):
+                    for j in grid.get((gx, gy), ()):
+                        if (
+                            abs(xs[i] - xs[j]) < tolerance
+                            and abs(ys[i] - ys[j]) < tolerance
+                        ):
+                            ri, rj = find(i), find(j)
+                            if ri != rj:
+                                parent[max(ri, rj)] = min(ri, rj)
+            grid.setdefault((cx, cy), []).append(i)
+    else:
+        first = {}
+        for i in range(n):
+            j = first.setdefault((xs[i], ys[i]), i)
+            if j != i:
+                parent[i] = find(j)
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def build_nodes(xs, ys, items, tolerance, key=None):
+    """List of [x, y, [items]] nodes, one for each cluster of end points.
+    xs, ys, items - parallel lists, one entry for each end of each arc
+    key - function to sort the items of a node by, eg. the azimuth of the arc
+    Each node is placed at its lowest (x, y) end and nodes are sorted by x and y,
+    the order of an ORDER BY POINT_X, POINT_Y scan of the end points"""
+    nodes = []
+    for members in cluster(xs, ys, tolerance):
+        anchor = min(members, key=lambda i: (xs[i], ys[i]))
+        node_items = [items[i] for i in members]
+        if key is not None:
+            node_items.sort(key=key)
+        nodes.append([xs[anchor], ys[anchor], node_items])
+    nodes.sort(key=lambda node: (node[0], node[1]))
+    return nodes
+
+
+# attributes that must match for two arcs to be merged
+same_fields = ("Type", "IsConc", "ExConf", "IdConf", "LCM", "DSID", "Notes")
+# categorical attributes of the arcs, stored as codes
+code_fields = same_fields + ("ToFrom", "RMU", "LMU")
+
+arc_dtype = [("node", "i8"), ("OFID", "i8"), ("LineDir", "f8")] + [
+    (f, "i4") for f in code_fields
+]
+
+
+class Categories:
+    """Integer codes for the values of a categorical attribute"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        c = self.codes.get(value)
+        if c is None:
+            c = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def lookup(self, func, dtype=bool):
+        """array of func(value) for each code"""
+        return np.array([func(v) for v in self.values], dtype=dtype)
+
+
+def arc_array(node_list):
+    """Structured array with one row per arc end, in node order, and a
+    Categories for each categorical attribute.
+    node_list - [x, y, [arcs]] nodes, arcs with the attributes of code_fields,
+    LineDir, and OFID, eg. GeMS_TopologyCheck.CAF_arc"""
+    cats = {f: Categories() for f in code_fields}
+    n = sum(len(node[2]) for node in node_list)
+    arcs = np.zeros(n, dtype=arc_dtype)
+    columns = {f: np.empty(n, dtype="i4") for f in code_fields}
+    nodes = np.empty(n, dtype="i8")
+    ofids = np.empty(n, dtype="i8")
+    line_dirs = np.empty(n, dtype="f8")
+    i = 0
+    for k, node in enumerate(node_list):
+        for arc in node[2]:
+            nodes[i] = k
+            ofids[i] = arc.OFID
+            line_dirs[i] = arc.LineDir if arc.LineDir is not None else np.nan
+            for f in code_fields:
+                columns[f][i] = cats[f].code(getattr(arc, f))
+            i += 1
+    arcs["node"] = nodes
+    arcs["OFID"] = ofids
+    arcs["LineDir"] = line_dirs
+    for f in code_fields:
+        arcs[f] = columns[f]
+    return arcs, cats
+
+
+def node_events(node_list, hkey_dict, hkey_test_value, is_fault):
+    """What the node rules find at each node, and the numbers of 1, 2, 3, 4, and
+    5+ arc nodes. The rules for each number of arcs are evaluated for all nodes
+    with that many arcs at once, on arrays of attribute codes.
+    Events are (node position, order within the node, kind, note or pair), kind
+    one of 'bad', 'flip', 'missing', or 'connect'. See apply_events.
+    hkey_dict - MapUnit: HierarchyKey, with None and '' mapped to None
+    hkey_test_value - HierarchyKey below which a unit is a covering unit
+    is_fault - function that says whether a Type value is a fault"""
+    arcs, cats = arc_array(node_list)
+    n_nodes = len(node_list)
+    degree = np.bincount(arcs["node"], minlength=n_nodes)
+    start = np.concatenate(([0], np.cumsum(degree)[:-1])).astype("i8")
+
+    fault = cats["Type"].lookup(lambda t: t is not None and is_fault(t))
+    concealed = cats["IsConc"].lookup(lambda c: c is not None and c.lower() == "y")
+    from_code = cats["ToFrom"].codes.get("From", -1)
+
+    # (node position, order within the node, list, note or pair)
+    events = []
+
+    def add(positions, seq, kind, payload=None):
+        for p in positions:
+            value = payload(p) if callable(payload) else payload
+            events.append((int(p), seq, kind, value))
+
+    def columns(sel, d):
+        """index of the arcs of the selected nodes, shape (nodes, d)"""
+        return start[sel][:, None] + np.arange(d)
+
+    def same_attrs(ia, ib):
+        same = np.ones(len(ia), dtype=bool)
+        for f in same_fields:
+            same &= arcs[f][ia] == arcs[f][ib]
+        return same
+
+    def pairs(ia, ib):
+        ofid = arcs["OFID"]
+        return lambda p: [int(ofid[ia[p]]), int(ofid[ib[p]])]
+
+    def hkey_rank(mu_codes):
+        """rank of the HierarchyKey of each map unit code, None sorting as ''"""
+        keys = {}
+        for c in np.unique(mu_codes):
+            hkey = hkey_dict[cats["RMU"].values[c]]
+            keys[c] = "" if hkey is None else hkey
+        order = {k: r for r, k in enumerate(sorted(set(keys.values())))}
+        lut = np.zeros(len(cats["RMU"].values), dtype="i8")
+        for c, k in keys.items():
+            lut[c] = order[k]
+        return lut[mu_codes]
+
+    def covering(mu_codes):
+        covers = {}
+        for c in np.unique(mu_codes):
+            mu = cats["RMU"].values[c]
+            # stuff outside map, unmapped areas
+            covers[c] = not (mu is None or mu == "") and hkey_dict[mu] < hkey_test_value
+        return np.array([covers[c] for c in mu_codes], dtype=bool)
+
+    # left and right map units share one set of codes so they can be compared
+    lmu_to_rmu = np.array(
+        [cats["RMU"].code(v) for v in cats["LMU"].values], dtype="i4"
+    )
+
+    ######################
+    sel = np.flatnonzero(degree == 1)
+    a = start[sel]
+    bad = ~fault[arcs["Type"][a]]
+    conc = concealed[arcs["IsConc"][a]]
+    add(sel[bad & conc], 0, "bad", "dangling concealed contact")
+    add(sel[bad & ~conc], 0, "bad", "dangling contact")
+
+    ######################
+    sel = np.flatnonzero(degree == 2)
+    idx = columns(sel, 2)
+    a, b = idx[:, 0], idx[:, 1]
+    add(sel[arcs["Type"][a] != arcs["Type"][b]], 0, "bad", "mismatched Type values")
+    add(sel[arcs["IsConc"][a] != arcs["IsConc"][b]], 1, "bad", "one arc concealed, one not")
+    m = same_attrs(a, b)
+    pos = {int(p): i for i, p in enumerate(sel)}
+    add(sel[m], 2, "connect", lambda p: pairs(a, b)(pos[p]))
+    m = (
+        fault[arcs["Type"][a]]
+        & fault[arcs["Type"][b]]
+        & (arcs["ToFrom"][a] == arcs["ToFrom"][b])
+    )
+    tf = cats["ToFrom"].values
+    add(
+        sel[m],
+        3,
+        "flip",
+        lambda p: f"{tf[arcs['ToFrom'][a[pos[p]]]]}, {tf[arcs['ToFrom'][b[pos[p]]]]}",
+    )
+
+    ######################
+    sel = np.flatnonzero(degree == 3)
+    idx = columns(sel, 3)
+    types = arcs["Type"][idx]
+    conc = concealed[arcs["IsConc"][idx]]
+    n_con = conc.sum(axis=1)
+    t01 = types[:, 0] == types[:, 1]
+    t02 = types[:, 0] == types[:, 2]
+    t12 = types[:, 1] == types[:, 2]
+    all_same = t01 & t12
+    # the first two arcs of the same Type, and the arc of the other Type
+    n_same = np.where(all_same, 3, np.where(t01 | t02 | t12, 2, 1))
+    s0 = np.where(t01 | t02, 0, 1)
+    s1 = np.where(t01, 1, 2)
+    other = np.where(t01, 2, np.where(t02, 1, 0))
+    # map units opposite (not adjoining) arcs 0, 1, 2: the unit to the right of
+    # the next arc, or to the left if the arc ends at the node
+    tofrom = arcs["ToFrom"][idx]
+    mus = np.where(
+        tofrom == from_code, arcs["RMU"][idx], lmu_to_rmu[arcs["LMU"][idx]]
+    )
+    mus = mus[:, [1, 2, 0]]
+    rows = np.arange(len(sel))
+
+    impossible = (n_con == 1) | (n_con == 2)
+    add(sel[impossible], 0, "bad", "impossible number of concealed arcs")
+    few = ~impossible & (n_same < 2)
+    add(sel[few], 0, "bad", "at least 2 arcs must be same Type")
+    ok = ~impossible & ~few
+    m = ok & (n_con == 3) & ((mus[:, 0] != mus[:, 1]) | (mus[:, 1] != mus[:, 2]))
+    add(sel[m], 0, "bad", "all arcs concealed but bounding map units not all the same")
+
+    ia = idx[rows, s0]
+    ib = idx[rows, s1]
+    same_fault = fault[arcs["Type"][ia]]
+    same_tofrom = arcs["ToFrom"][ia] == arcs["ToFrom"][ib]
+    pos = {int(p): i for i, p in enumerate(sel)}
+
+    # two arcs of the same Type
+    two = ok & (n_same == 2)
+    m = two & same_fault & same_tofrom
+    add(sel[m], 1, "flip")
+    m = two & same_fault & ~same_tofrom & same_attrs(ia, ib)
+    add(sel[m], 1, "connect", lambda p: pairs(ia, ib)(pos[p]))
+
+    contacts = (two | (ok & all_same)) & ~same_fault
+    youngest = np.zeros(len(sel), dtype="i8")
+    ymu = np.zeros(len(sel), dtype="i4")
+    if contacts.any():
+        ranks = hkey_rank(mus[contacts].ravel()).reshape(-1, 3)
+        youngest[contacts] = ranks.argmin(axis=1)
+        ymu = mus[rows, youngest]
+    m = two & ~same_fault
+    is_youngest = ymu == mus[rows, other]
+    covers = np.zeros(len(sel), dtype=bool)
+    need = (m & is_youngest) | (ok & all_same & ~same_fault)
+    if need.any():
+        covers[need] = covering(ymu[need])
+    add(sel[m & is_youngest & same_attrs(ia, ib)], 1, "connect", lambda p: pairs(ia, ib)(pos[p]))
+    add(sel[m & is_youngest & covers], 2, "missing")
+    rmu = cats["RMU"].values
+    add(
+        sel[m & ~is_youngest],
+        1,
+        "bad",
+        lambda p: "# "
+        + str(rmu[mus[pos[p], other[pos[p]]]])
+        + " is not youngest unit in "
+        + str([rmu[c] for c in mus[pos[p]]]),
+    )
+
+    # all three arcs of the same Type
+    m = ok & all_same & same_fault & same_tofrom & (
+        arcs["ToFrom"][idx[:, 0]] == arcs["ToFrom"][idx[:, 2]]
+    )
+    add(sel[m], 1, "flip")
+    m = ok & all_same & ~same_fault
+    ya = np.where(youngest == 0, 1, 0)
+    yb = np.where(youngest == 2, 1, 2)
+    ja = idx[rows, ya]
+    jb = idx[rows, yb]
+    add(sel[m & same_attrs(ja, jb)], 1, "connect", lambda p: pairs(ja, jb)(pos[p]))
+    add(sel[m & covers], 2, "missing")
+
+    ######################
+    sel = np.flatnonzero(degree == 4)
+    idx = columns(sel, 4)
+    rows = np.arange(len(sel))
+    types = arcs["Type"][idx]
+    conc = concealed[arcs["IsConc"][idx]]
+    n_con = conc.sum(axis=1)
+    # first and second concealed arcs, and the arcs opposite and adjacent to the first
+    c0 = np.argmax(conc, axis=1)
+    c1 = np.where(n_con == 2, 3 - np.argmax(conc[:, ::-1], axis=1), c0)
+    opp = (c0 + 2) % 4
+    adj0 = np.where(c0 % 2 == 0, 1, 0)
+    adj1 = adj0 + 2
+    i_c0, i_c1 = idx[rows, c0], idx[rows, c1]
+    i_opp, i_a0, i_a1 = idx[rows, opp], idx[rows, adj0], idx[rows, adj1]
+    pos = {int(p): i for i, p in enumerate(sel)}
+
+    add(sel[n_con > 2], 0, "bad", "too many concealed arcs")
+    two = n_con == 2
+    mismatch = (arcs["Type"][i_c0] != arcs["Type"][i_c1]) | (
+        arcs["Type"][i_a0] != arcs["Type"][i_a1]
+    )
+    add(sel[two & mismatch], 0, "bad", "opposite arcs must have same Type")
+    opp_conc = concealed[arcs["IsConc"][i_opp]]
+    add(sel[two & ~mismatch & ~opp_conc], 0, "bad", "adjacent arcs concealed")
+    good = two & ~mismatch & opp_conc
+    add(sel[good & same_attrs(i_a0, i_a1)], 0, "connect", lambda p: pairs(i_a0, i_a1)(pos[p]))
+    flip = (
+        fault[arcs["Type"][i_c0]] & (arcs["ToFrom"][i_c0] == arcs["ToFrom"][i_opp])
+    )
+    add(sel[good & flip], 1, "flip")
+    add(
+        sel[good & ~flip & same_attrs(i_c0, i_opp)],
+        1,
+        "connect",
+        lambda p: pairs(i_c0, i_opp)(pos[p]),
+    )
+
+    one = n_con == 1
+    adj_fault = fault[arcs["Type"][i_a0]]
+    add(sel[one & adj_fault], 0, "bad", "arcs adjacent to single concealed arc must not be faults")
+    diff_type = arcs["Type"][i_opp] != arcs["Type"][i_c0]
+    add(
+        sel[one & ~adj_fault & diff_type],
+        0,
+        "bad",
+        "concealed arc and unconcealed continuation must be same Type",
+    )
+    m = one & ~adj_fault & ~diff_type & same_attrs(i_a0, i_a1)
+    add(sel[m], 0, "connect", lambda p: pairs(i_a0, i_a1)(pos[p]))
+    add(sel[n_con == 0], 0, "bad", "4 unconcealed arcs")
+
+    ######################
+    add(np.flatnonzero(degree >= 5), 0, "bad", "too many arcs")
+
+    counts = [int((degree == d).sum()) for d in (1, 2, 3, 4)]
+    counts.append(int((degree >= 5).sum()))
+    return events, counts
+
+
+def apply_events(node_list, events):
+    """badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs from the
+    events of node_events. Notes are appended to the nodes, and nodes are added
+    to the lists, in the order GeMS_TopologyCheck.processNodes added them"""
+    badNodes = []
+    faultFlipNodes = []
+    missingConcealedArcNodes = []
+    connectFIDs = []
+    events = sorted(events, key=lambda e: (e[0], e[1]))
+    for p, seq, kind, value in events:
+        node = node_list[p]
+        if kind == "bad":
+            node.append(value)
+            badNodes.append(node)
+        elif kind == "flip":
+            if value is not None:
+                node.append(value)
+            faultFlipNodes.append(node)
+        elif kind == "missing":
+            missingConcealedArcNodes.append(node)
+        else:
+            connectFIDs.append(value)
+    return badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs
+
+
+def classify_nodes(node_list, hkey_dict, hkey_test_value, is_fault):
+    """badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs, and the
+    numbers of 1, 2, 3, 4, and 5+ arc nodes, as GeMS_TopologyCheck.processNodes
+    has always found them. See node_events"""
+    events, counts = node_events(node_list, hkey_dict, hkey_test_value, is_fault)
+    return apply_events(node_list, events) + (counts,)
+
+
+# picklable copy of the attributes of an arc end, for tile_job
+Arc = namedtuple("Arc", code_fields + ("LineDir", "OFID"))
+
+
+def tiles(xs, ys, tile_size, tolerance):
+    """Dict of (column, row): [positions] of the points in each square tile, and
+    a list that says whether each point is closer than tolerance to an edge of
+    its tile, a seam point. Points in different tiles that are within tolerance
+    of each other are always both seam points"""
+    x0 = min(xs)
+    y0 = min(ys)
+    tile_map = {}
+    seam = []
+    for i in range(len(xs)):
+        col = math.floor((xs[i] - x0) / tile_size)
+        row = math.floor((ys[i] - y0) / tile_size)
+        tile_map.setdefault((col, row), []).append(i)
+        dx = xs[i] - (x0 + col * tile_size)
+        dy = ys[i] - (y0 + row * tile_size)
+        seam.append(
+            dx < tolerance
+            or tile_size - dx < tolerance
+            or dy < tolerance
+            or tile_size - dy < tolerance
+        )
+    return tile_map, seam
+
+
+def tile_job(args):
+    """Build and classify the nodes of one tile.
+    Returns the nodes that have no seam points, as (x, y, [positions], [events]),
+    the numbers of 1, 2, 3, 4, and 5+ arc nodes among them, and the positions
+    of the points of each cluster that has a seam point, to be merged across
+    tiles by tiled_nodes"""
+    positions, xs, ys, arcs, seam, tolerance, hkey_dict, hkey_test_value, faults = args
+    nodes = []
+    members_list = []
+    seam_clusters = []
+    for members in cluster(xs, ys, tolerance):
+        if any(seam[i] for i in members):
+            seam_clusters.append([positions[i] for i in members])
+            continue
+        anchor = min(members, key=lambda i: (xs[i], ys[i]))
+        members = sorted(members, key=lambda i: arcs[i].LineDir)
+        nodes.append([xs[anchor], ys[anchor], [arcs[i] for i in members]])
+        members_list.append([positions[i] for i in members])
+    events, counts = node_events(nodes, hkey_dict, hkey_test_value, faults.__contains__)
+    found = [
+        (node[0], node[1], members, []) for node, members in zip(nodes, members_list)
+    ]
+    for e in events:
+        found[e[0]][3].append(e)
+    return found, counts, seam_clusters
+
+
+def tiled_nodes(
+    xs, ys, items, tolerance, tile_size, hkey_dict, hkey_test_value, is_fault, workers=None
+):
+    """build_nodes and classify_nodes, one square tile of the map at a time in a
+    pool of worker processes. Clusters of end points that reach a tile edge are
+    merged across tiles and classified at the end, so the nodes, the notes, and
+    the lists are the same as from one pass over the whole map.
+    items - arc ends with the attributes of Arc, eg. GeMS_TopologyCheck.CAF_arc
+    tile_size - width of the tiles in map units. Smaller tiles use less memory
+    in each worker
+    workers - number of worker processes, default the number of CPUs
+    Returns nodeList, (badNodes, faultFlipNodes, missingConcealedArcNodes,
+    connectFIDs), and the numbers of 1, 2, 3, 4, and 5+ arc nodes"""
+    if not xs:
+        return [], ([], [], [], []), [0, 0, 0, 0, 0]
+    tile_map, seam = tiles(xs, ys, tile_size, tolerance)
+    records = [Arc(*(getattr(a, f) for f in Arc._fields)) for a in items]
+    faults = {a.Type for a in records if a.Type is not None and is_fault(a.Type)}
+    jobs = []
+    for positions in tile_map.values():
+        jobs.append(
+            (
+                positions,
+                [xs[i] for i in positions],
+                [ys[i] for i in positions],
+                [records[i] for i in positions],
+                [seam[i] for i in positions],
+                tolerance,
+                hkey_dict,
+                hkey_test_value,
+                faults,
+            )
+        )
+
+    if workers == 1 or len(jobs) == 1:
+        results = list(map(tile_job, jobs))
+    else:
+        # inside ArcGIS Pro sys.executable is ArcGISPro.exe, workers need python.exe
+        if sys.executable.lower().endswith("arcgispro.exe"):
+            multiprocessing.set_executable(os.path.join(sys.exec_prefix, "python.exe"))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(tile_job, jobs))
+
+    found = []
+    counts = [0, 0, 0, 0, 0]
+    seam_clusters = []
+    for tile_found, tile_counts, tile_seams in results:
+        found.extend(tile_found)
+        counts = [a + b for a, b in zip(counts, tile_counts)]
+        seam_clusters.extend(tile_seams)
+
+    # join the seam clusters that have points within tolerance of each other
+    parent = list(range(len(seam_clusters)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner = []
+    points = []
+    for k, members in enumerate(seam_clusters):
+        owner.extend([k] * len(members))
+        points.extend(members)
+    for group in cluster([xs[i] for i in points], [ys[i] for i in points], tolerance):
+        for g in group[1:]:
+            a, b = find(owner[group[0]]), find(owner[g])
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+    merged = {}
+    for k, members in enumerate(seam_clusters):
+        merged.setdefault(find(k), []).extend(members)
+
+    seam_nodes = []
+    seam_members = []
+    for members in merged.values():
+        members.sort()
+        anchor = min(members, key=lambda i: (xs[i], ys[i]))
+        members.sort(key=lambda i: items[i].LineDir)
+        seam_nodes.append([xs[anchor], ys[anchor], [records[i] for i in members]])
+        seam_members.append(members)
+    events, seam_counts = node_events(
+        seam_nodes, hkey_dict, hkey_test_value, faults.__contains__
+    )
+    counts = [a + b for a, b in zip(counts, seam_counts)]
+    seam_found = [
+        (node[0], node[1], members, [])
+        for node, members in zip(seam_nodes, seam_members)
+    ]
+    for e in events:
+        seam_found[e[0]][3].append(e)
+    found.extend(seam_found)
+
+    # nodes in the order of build_nodes, and their events renumbered to match
+    found.sort(key=lambda f: (f[0], f[1]))
+    node_list = []
+    events = []
+    for k, (x, y, members, found_events) in enumerate(found):
+        node_list.append([x, y, [items[i] for i in members]])
+        events.extend((k,) + e[1:] for e in found_events)
+    return node_list, apply_events(node_list, events), counts
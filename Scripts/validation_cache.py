@@ -0,0 +1,126 @@
+"""Sidecar cache of per-table validation results, kept in the validation workdir
+
+Every table that a rule reads gets a fingerprint made of a schema signature,
+the row count and either the latest editor tracking date or a hash of the
+table contents. Values computed from a single table (distinct values of a
+field, the per-table part of a rule) are stored under that table together
+with its fingerprint. On the next run, tables whose fingerprint has not changed
+hand back their stored values and only changed tables are read again, so
+cross-table rules like the Glossary, DataSources and MapUnit checks are
+rebuilt from cached contributions plus those of the changed tables.
+
+The whole cache is thrown away when the settings it was built with, eg. the
+version of the validation script, are different.
+
+No arcpy here. Fingerprints are computed by the caller and handed in as a
+function so the cache does not need to know how tables are read.
+"""
+
+import json
+import os
+import threading
+
+CACHE_VERSION = 1
+
+# types that survive a round trip through json unchanged
+_json_types = (str, int, float, bool, type(None))
+
+
+def jsonable(value):
+    """True if value is made only of lists, tuples, dicts, and simple values"""
+    if isinstance(value, _json_types):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(jsonable(v) for v in value)
+    if isinstance(value, dict):
+        return all(isinstance(k, str) and jsonable(v) for k, v in value.items())
+    return False
+
+
+class ValidationCache:
+    """Per-table cache of validation results.
+    cache_path - json file, read if it exists
+    settings - dictionary of anything that changes rule results when it changes,
+      eg. {"version": version_string, "use_idfield": False}
+    fingerprint - function(table) that returns a json-friendly fingerprint"""
+
+    def __init__(self, cache_path, settings, fingerprint):
+        self.cache_path = str(cache_path)
+        self.settings = dict(settings, cache_version=CACHE_VERSION)
+        self.fingerprint = fingerprint
+        self.tables = {}
+        # tables that have been fingerprinted during this run
+        self.checked = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._table_locks = {}
+
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, encoding="utf-8") as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                cached = {}
+            if cached.get("settings") == self.settings:
+                self.tables = cached.get("tables", {})
+
+    def _table_lock(self, table):
+        with self._lock:
+            return self._table_locks.setdefault(table, threading.Lock())
+
+    def check(self, table):
+        """Fingerprint table, once per run, and drop its cached results if it
+        has changed. Returns True if the table is unchanged"""
+        with self._table_lock(table):
+            if table in self.checked:
+                return self.checked[table]
+            fp = self.fingerprint(table)
+            with self._lock:
+                entry = self.tables.get(table)
+                unchanged = entry is not None and entry["fingerprint"] == fp
+                if not unchanged:
+                    self.tables[table] = {"fingerprint": fp, "results": {}}
+                self.checked[table] = unchanged
+            return unchanged
+
+    def changed_tables(self):
+        return [t for t, unchanged in self.checked.items() if not unchanged]
+
+    def result(self, table, key, func):
+        """Cached value of func() for table, calling func if table has changed
+        or the value has not been stored yet. Values that cannot be written to
+        json are returned but not stored"""
+        self.check(table)
+        with self._lock:
+            results = self.tables[table]["results"]
+            if key in results:
+                self.hits += 1
+                return results[key]
+        value = func()
+        with self._lock:
+            self.misses += 1
+            if jsonable(value):
+                # store a json round-tripped copy so that cached and fresh values
+                # look the same, eg. tuples become lists
+                value = json.loads(json.dumps(value))
+                self.tables[table]["results"][key] = value
+        return value
+
+    def forget(self, table):
+        """Drop everything about a table, eg. after rows have been deleted from it"""
+        with self._table_lock(table):
+            with self._lock:
+                self.tables.pop(table, None)
+                self.checked.pop(table, None)
+
+    def save(self, keep=None):
+        """Write the cache. If keep is supplied, only those tables are written"""
+        with self._lock:
+            tables = {
+                k: v for k, v in self.tables.items() if keep is None or k in keep
+            }
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"settings": self.settings, "tables": tables}, f)
+            os.replace(tmp_path, self.cache_path)
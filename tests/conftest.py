@@ -0,0 +1,6 @@
+"""The helper modules in Scripts are imported by name, as the tools do"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Scripts"))
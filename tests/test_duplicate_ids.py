@@ -0,0 +1,77 @@
+import os
+
+import duplicate_ids as dids
+
+
+def stream(index, rows):
+    for table, oid, value in rows:
+        index.add(table, oid, value)
+    return index.duplicates()
+
+
+ROWS = [
+    ("DataSources", 1, "DAS1"),
+    ("MapUnitPolys", 1, "MUP1"),
+    ("DataSources", 2, "DAS2"),
+    ("ContactsAndFaults", 1, "DAS1"),
+    ("MapUnitPolys", 2, "MUP2"),
+    ("OrientationPoints", 7, "MUP1"),
+    ("Glossary", 3, "DAS1"),
+    ("Glossary", 4, "GLO4"),
+    ("Glossary", 5, "MUP2"),
+]
+
+EXPECTED = [
+    ("DAS1", ("DataSources", 1), ("ContactsAndFaults", 1)),
+    ("MUP1", ("MapUnitPolys", 1), ("OrientationPoints", 7)),
+    ("DAS1", ("DataSources", 1), ("Glossary", 3)),
+    ("MUP2", ("MapUnitPolys", 2), ("Glossary", 5)),
+]
+
+
+def test_in_memory():
+    index = dids.DuplicateIDIndex()
+    assert stream(index, ROWS) == EXPECTED
+    assert index.part_dir is None
+
+
+def test_partitioned_matches_in_memory(tmp_path):
+    # two distinct IDs in memory, then everything goes to 3 partition files
+    index = dids.DuplicateIDIndex(threshold=2, temp_dir=str(tmp_path), partitions=3)
+    for table, oid, value in ROWS[:3]:
+        index.add(table, oid, value)
+    assert index.part_files is not None
+    assert len(os.listdir(index.part_dir)) == 3
+    for table, oid, value in ROWS[3:]:
+        index.add(table, oid, value)
+    assert index.duplicates() == EXPECTED
+
+
+def test_first_occurrence_is_kept_after_spill(tmp_path):
+    # the first DAS1 is written out with the spilled index, the repeats
+    # follow it into the same partition
+    rows = [("A", 1, "DAS1"), ("A", 2, "X"), ("B", 1, "Y")]
+    rows += [("C", oid, "DAS1") for oid in range(1, 4)]
+    index = dids.DuplicateIDIndex(threshold=1, temp_dir=str(tmp_path), partitions=4)
+    found = stream(index, rows)
+    assert found == [("DAS1", ("A", 1), ("C", oid)) for oid in range(1, 4)]
+
+
+def test_spill_files_are_removed(tmp_path):
+    index = dids.DuplicateIDIndex(threshold=1, temp_dir=str(tmp_path), partitions=2)
+    stream(index, ROWS)
+    assert index.part_dir is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_close_without_duplicates(tmp_path):
+    index = dids.DuplicateIDIndex(threshold=1, temp_dir=str(tmp_path), partitions=2)
+    for table, oid, value in ROWS[:4]:
+        index.add(table, oid, value)
+    index.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_partition_is_stable():
+    assert dids._partition("DAS1", 64) == dids._partition("DAS1", 64)
+    assert all(0 <= dids._partition(f"ID{i}", 5) < 5 for i in range(100))
@@ -0,0 +1,47 @@
+import duplicates as dp
+
+ATTRS = ("bedding", 45.0, 30.0)
+
+
+def test_exact_duplicates_at_zero_tolerance():
+    rows = [
+        (1, 10.0, 20.0, ATTRS),
+        (2, 10.0, 20.0, ATTRS),
+        (3, 10.0, 20.0, ("joint", 45.0, 30.0)),
+        (4, 10.0, 20.000001, ATTRS),
+    ]
+    assert dp.find_duplicates(rows) == [(1, 1), (2, 1)]
+
+
+def test_null_attributes_match():
+    rows = [(1, 0.0, 0.0, ("bedding", None, None)), (2, 0.0, 0.0, ("bedding", None, None))]
+    assert dp.find_duplicates(rows, 0.01) == [(1, 1), (2, 1)]
+
+
+def test_tolerance_is_inclusive_and_crosses_cells():
+    rows = [
+        # exactly 0.5 apart, in different cells of a 0.5 grid
+        (1, 1.0, 0.25, ATTRS),
+        (2, 1.5, 0.25, ATTRS),
+        # just farther than the tolerance
+        (3, 5.0, 0.0, ATTRS),
+        (4, 5.5001, 0.0, ATTRS),
+    ]
+    assert dp.find_duplicates(rows, 0.5) == [(1, 1), (2, 1)]
+
+
+def test_duplicates_of_duplicates_are_one_group():
+    # 1 and 3 are farther apart than the tolerance, but both are near 2
+    rows = [
+        (7, 0.0, 0.0, ATTRS),
+        (8, 0.0, 5.0, ATTRS),
+        (9, 0.0, 0.8, ATTRS),
+        (5, 0.0, 1.6, ATTRS),
+        (6, 0.0, 5.0, ATTRS),
+    ]
+    assert dp.find_duplicates(rows, 1.0) == [(7, 1), (9, 1), (5, 1), (8, 2), (6, 2)]
+
+
+def test_no_duplicates():
+    assert dp.find_duplicates([]) == []
+    assert dp.find_duplicates([(1, 0.0, 0.0, ATTRS)], 1.0) == []
@@ -0,0 +1,124 @@
+import json
+from pathlib import Path
+
+import pytest
+
+jinja2 = pytest.importorskip("jinja2")
+
+import errors_report as er
+
+SCRIPTS = Path(er.__file__).parent
+
+
+def rule(n, key="rule3_1", header="3.1 Missing MapUnits"):
+    return ["missing map units", header, key] + [f"error {i}" for i in range(n)]
+
+
+def make(tmp_path, **kwargs):
+    val = {"errors_name": "db-ValidationErrors.html", "gdb_path": "db.gdb"}
+    report = er.ErrorsReport(tmp_path / "db-ValidationErrors.html", SCRIPTS, val, **kwargs)
+    return val, report
+
+
+def test_summary_length_and_membership():
+    summary = er.ErrorSummary(["a", "b", "c", "d"], 10)
+    assert len(summary) == 10
+    assert list(summary) == ["a", "b", "c", "d"]
+    assert summary[1] == "b"
+    assert "d" in summary and not "x" in summary
+
+
+def test_passed_and_unchecked_rules_have_no_section(tmp_path):
+    val, report = make(tmp_path)
+    passed = report.add("rule2_2", ["a", "b", "c"])
+    assert len(passed) == 3 and list(passed) == ["a", "b", "c"]
+    unchecked = report.add("rule2_4", "DMU cannot be found. Rule not checked")
+    assert len(unchecked) == 1
+    assert report.parts == {}
+    assert report.add("rule2_5", None) is None
+    # anything that is not a rule or warning list goes through untouched
+    assert report.add("db_name", "db") == "db"
+    report.close()
+
+
+def test_inline_cap_and_overflow_pages(tmp_path):
+    val, report = make(tmp_path, max_inline=5, page_rows=4)
+    errors = rule(15)
+    summary = report.add("rule3_1", errors)
+    assert len(summary) == 18
+    assert list(summary) == errors[:8]
+    # what was already written is handed back as it is
+    assert report.add("rule3_1", summary) is summary
+
+    pages = sorted(tmp_path.glob("db-ValidationErrors-*.html"))
+    assert [p.name for p in pages] == [
+        f"db-ValidationErrors-{errors[2]}-{i}.html" for i in (1, 2, 3)
+    ]
+    listed = [pages[0].read_text().count("error "), pages[2].read_text().count("error ")]
+    assert listed == [4, 2]
+    assert "error 14<br>" in pages[2].read_text()
+
+    val["rule3_1"] = summary
+    report.close()
+    html = (tmp_path / "db-ValidationErrors.html").read_text()
+    assert "error 4<br>" in html and not "error 5<br>" in html
+    assert "10 more not listed here" in html
+    assert pages[0].name in html
+    # the part files are gone
+    assert not report.part_dir.exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        [p.name for p in pages] + ["db-ValidationErrors.html"]
+    )
+
+
+def test_ndjson_overflow(tmp_path):
+    val, report = make(tmp_path, max_inline=2, overflow="ndjson")
+    summary = report.add("mu_warnings", ["Map unit warnings"] + [f"w{i}" for i in range(5)])
+    assert len(summary) == 6
+    assert list(summary) == ["Map unit warnings", "w0", "w1"]
+    lines = (tmp_path / "db-ValidationErrors-mu_warnings.ndjson").read_text().splitlines()
+    assert [json.loads(line)["html"] for line in lines] == ["w2", "w3", "w4"]
+    report.close()
+    assert "Map unit warnings" in (tmp_path / "db-ValidationErrors.html").read_text()
+    with pytest.raises(ValueError):
+        make(tmp_path, overflow="csv")
+
+
+def test_old_overflow_files_are_removed(tmp_path):
+    old = tmp_path / "db-ValidationErrors-rule3_1-9.html"
+    old.write_text("old")
+    val, report = make(tmp_path)
+    assert not old.exists()
+    report.close()
+
+
+def test_sections_in_report_order(tmp_path):
+    val, report = make(tmp_path, max_inline=10)
+    # written in the order the rules finished
+    summaries = {}
+    for key in ("rule3_1", "rule2_1", "end_spaces", "sr_warnings"):
+        if key.startswith("rule"):
+            summaries[key] = report.add(key, rule(2, key, f"header {key}"))
+        else:
+            summaries[key] = report.add(key, [f"header {key}", "warning"])
+    # and put in val in the order the rules were declared
+    for key in ("rule2_1", "rule3_1", "sr_warnings", "end_spaces"):
+        val[key] = summaries[key]
+    report.close()
+    html = (tmp_path / "db-ValidationErrors.html").read_text()
+    found = [html.index(f"header {k}") for k in ("rule2_1", "rule3_1", "sr_warnings", "end_spaces")]
+    assert found == sorted(found)
+
+
+def test_summaries_in_determine_level_and_templates(tmp_path):
+    val, report = make(tmp_path, max_inline=1)
+    failed = report.add("rule2_1", rule(4, "rule2_1"))
+    passed = report.add("rule2_2", ["a", "b", "c"])
+    report.close()
+
+    # determine_level and the report template only look at the length
+    assert len(failed) != 3 and len(passed) == 3
+    env = jinja2.Environment()
+    template = env.from_string("{{ errors|length }} {{ errors|length - 3 }} {{ errors[2] }}")
+    assert template.render(errors=failed) == "7 4 rule2_1"
+    assert template.render(errors=passed) == "3 0 c"
@@ -0,0 +1,197 @@
+from lxml import etree
+
+import fgdc_validator as fv
+
+RECORD = """<metadata>
+  <idinfo>
+    <citation><citeinfo>
+      <origin>USGS</origin><pubdate>2024</pubdate><title>A map</title>
+    </citeinfo></citation>
+    <descript><abstract>a</abstract><purpose>p</purpose></descript>
+    <timeperd><timeinfo><sngdate><caldate>20240131</caldate></sngdate></timeinfo>
+      <current>publication date</current></timeperd>
+    <status><progress>Complete</progress><update>None planned</update></status>
+    <spdom><bounding>
+      <westbc>-120</westbc><eastbc>-119</eastbc><northbc>45</northbc><southbc>44</southbc>
+    </bounding></spdom>
+    <keywords><theme><themekt>None</themekt><themekey>geology</themekey></theme></keywords>
+    <accconst>None</accconst><useconst>None</useconst>
+  </idinfo>
+  <metainfo>
+    <metd>20240201</metd>
+    <metc><cntinfo><cntorgp><cntorg>USGS</cntorg></cntorgp>
+      <cntaddr><addrtype>mailing</addrtype><city>Reston</city><state>VA</state>
+        <postal>20192</postal></cntaddr>
+      <cntvoice>555</cntvoice></cntinfo></metc>
+    <metstdn>FGDC</metstdn><metstdv>FGDC-STD-001-1998</metstdv>
+  </metainfo>
+</metadata>
+"""
+
+
+def check(root, tmp_path):
+    # no xsd, so everything is checked with the table
+    return fv.validate(root, xsd_path=tmp_path / "none.xsd")
+
+
+def messages(issues):
+    return [i[2] for i in issues]
+
+
+def record():
+    return etree.fromstring(RECORD)
+
+
+def test_valid_record(tmp_path):
+    assert check(record(), tmp_path) == []
+
+
+def test_parse_model_choice_and_repeats():
+    terms, ordered = fv.MODEL["obqlpt"]
+    assert not ordered
+    assert terms[0]["names"] == ("obqllat",) and terms[0]["min"] == 2
+    terms, ordered = fv.MODEL["timeinfo"]
+    assert terms[0]["choice"] == {"sngdate": 1, "mdattim": 1, "rngdates": 1}
+
+
+def test_required_and_not_permitted(tmp_path):
+    root = record()
+    citeinfo = root.find(".//citeinfo")
+    citeinfo.remove(citeinfo.find("pubdate"))
+    etree.SubElement(citeinfo, "bogus").text = "x"
+    found = messages(check(root, tmp_path))
+    assert "pubdate is required in citeinfo" in found
+    assert "bogus is not permitted in citeinfo" in found
+
+
+def test_choice(tmp_path):
+    root = record()
+    timeinfo = root.find(".//timeinfo")
+    rng = etree.SubElement(timeinfo, "rngdates")
+    etree.SubElement(rng, "begdate").text = "2020"
+    etree.SubElement(rng, "enddate").text = "Present"
+    assert "rngdates is not permitted with sngdate in timeinfo" in messages(
+        check(root, tmp_path)
+    )
+    timeinfo.clear()
+    assert "one of sngdate, mdattim, rngdates is required in timeinfo" in messages(
+        check(root, tmp_path)
+    )
+
+
+def test_values(tmp_path):
+    root = record()
+    root.find(".//progress").text = "Done"
+    root.find(".//caldate").text = "20241301"
+    root.find(".//westbc").text = "-200"
+    root.find(".//southbc").text = "46"
+    root.find(".//accconst").text = "  "
+    found = messages(check(root, tmp_path))
+    assert "improper value for progress: Done" in found
+    assert "improper value for caldate: 20241301" in found
+    assert "westbc is out of range: -200" in found
+    assert "southbc is greater than northbc" in found
+    assert "accconst is empty" in found
+
+
+def test_order_warning_and_reorder(tmp_path):
+    root = record()
+    idinfo = root.find("idinfo")
+    idinfo.insert(0, idinfo.find("status"))
+    # citation, descript, and timeperd now come after status
+    assert len(check(root, tmp_path)) == 3
+
+    root = record()
+    idinfo = root.find("idinfo")
+    idinfo.append(idinfo.find("accconst"))
+    issues = check(root, tmp_path)
+    assert [i[1:] for i in issues] == [
+        ("Warning", "accconst appears in unexpected order within idinfo")
+    ]
+    assert fv.summary(issues) == "No errors, 1 warning"
+
+    errors_path = tmp_path / "errors.txt"
+    assert fv.write_errors(issues, errors_path) == []
+    assert errors_path.read_text() == "No errors"
+
+    assert check(fv.reorder(root), tmp_path) == []
+
+
+def test_not_metadata_or_not_xml(tmp_path):
+    assert messages(check(etree.fromstring("<idinfo/>"), tmp_path)) == [
+        "idinfo is not permitted as the root element"
+    ]
+    bad = tmp_path / "bad.xml"
+    bad.write_text("<metadata><idinfo></metadata>")
+    issues = check(bad, tmp_path)
+    assert len(issues) == 1 and issues[0][2].startswith("not well-formed XML")
+
+
+def test_summary_counts():
+    issues = [(1, "Error", "a"), (2, "Error", "b"), (3, "Warning", "c")]
+    assert fv.summary(issues) == "2 errors, 1 warning"
+    assert fv.summary([]) == "No errors"
+
+
+def test_bundled_xsd_is_compiled_once():
+    assert fv.XSD_PATH.exists()
+    assert fv.xml_schema() is fv.xml_schema()
+
+
+def test_valid_record_with_xsd():
+    assert fv.validate(record()) == []
+
+
+def test_xsd_required_messages_come_from_the_table():
+    root = record()
+    citeinfo = root.find(".//citeinfo")
+    citeinfo.remove(citeinfo.find("pubdate"))
+    # the xsd complains about title, which is there because pubdate is not
+    assert messages(fv.validate(root)) == ["pubdate is required in citeinfo"]
+
+    root = record()
+    root.find(".//timeinfo").clear()
+    assert messages(fv.validate(root)) == [
+        "one of sngdate, mdattim, rngdates is required in timeinfo"
+    ]
+
+
+def test_xsd_order_is_only_warned_about():
+    root = record()
+    idinfo = root.find("idinfo")
+    idinfo.insert(0, idinfo.find("status"))
+    issues = fv.validate(root)
+    assert [i[1] for i in issues] == ["Warning"] * 3
+    assert fv.summary(issues) == "No errors, 3 warnings"
+
+
+def test_xsd_errors():
+    root = record()
+    root.find(".//status").append(etree.fromstring("<update>Annually</update>"))
+    rng = etree.SubElement(root.find(".//timeinfo"), "rngdates")
+    etree.SubElement(rng, "begdate").text = "2020"
+    etree.SubElement(rng, "enddate").text = "Present"
+    found = messages(fv.validate(root))
+    assert found == [
+        "Element 'rngdates': This element is not expected.",
+        "Element 'update': This element is not expected.",
+    ]
+
+
+def test_xsd_values():
+    root = record()
+    root.find(".//progress").text = "Done"
+    root.find(".//caldate").text = "20241301"
+    root.find(".//westbc").text = "-200"
+    root.find(".//southbc").text = "46"
+    root.find(".//accconst").text = "  "
+    found = messages(fv.validate(root))
+    assert len(found) == 5
+    # the xsd only checks the pattern of a date and knows nothing of northbc
+    assert "improper value for caldate: 20241301" in found
+    assert "southbc is greater than northbc" in found
+    assert [m.split(":")[0] for m in found if m.startswith("Element")] == [
+        "Element 'progress'",
+        "Element 'westbc'",
+        "Element 'accconst'",
+    ]
@@ -0,0 +1,110 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+import gpkg_rules as gr
+
+
+@pytest.fixture
+def gpkg(tmp_path):
+    """A small GeoPackage with Glossary, DataSources, and MapUnitPolys"""
+    path = tmp_path / "db.gpkg"
+    with closing(sqlite3.connect(path)) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE gpkg_contents (table_name TEXT, data_type TEXT);
+            CREATE TABLE gpkg_geometry_columns
+                (table_name TEXT, column_name TEXT, geometry_type_name TEXT);
+            INSERT INTO gpkg_contents VALUES ('Glossary', 'attributes'),
+                ('DataSources', 'attributes'), ('MapUnitPolys', 'features');
+            INSERT INTO gpkg_geometry_columns VALUES ('MapUnitPolys', 'geom', 'MULTIPOLYGON');
+
+            CREATE TABLE Glossary (fid INTEGER PRIMARY KEY, Term TEXT,
+                Definition TEXT, DefinitionSourceID TEXT, Glossary_ID TEXT);
+            INSERT INTO Glossary VALUES
+                (1, 'certain', 'sure', 'DAS1', 'GLO1'),
+                (2, 'certain', 'sure again', 'DAS1', 'GLO2'),
+                (3, 'unused', 'never used', 'DAS1', 'GLO3'),
+                (4, NULL, 'no term', 'DAS1', 'GLO4');
+
+            CREATE TABLE DataSources (fid INTEGER PRIMARY KEY, Source TEXT,
+                Notes TEXT, URL TEXT, DataSources_ID TEXT);
+            INSERT INTO DataSources VALUES
+                (1, 'this map', NULL, NULL, 'DAS1'),
+                (2, 'an old map', NULL, NULL, 'DAS2');
+
+            CREATE TABLE MapUnitPolys (fid INTEGER PRIMARY KEY, geom BLOB,
+                MapUnit TEXT, IdentityConfidence TEXT, DataSourceID TEXT,
+                Notes TEXT, MapUnitPolys_ID TEXT);
+            INSERT INTO MapUnitPolys VALUES
+                (1, NULL, 'Qal', 'certain', 'DAS1', NULL, 'MUP1'),
+                (2, NULL, NULL, 'certain', 'DAS1| DAS9', '  ', 'MUP2'),
+                (3, NULL, 'Tv', 'probable', 'DAS1', ' padded', 'MUP3');
+            """
+        )
+        conn.commit()
+    return path
+
+
+def test_describe(gpkg):
+    rules = gr.GpkgRules(gpkg)
+    mup = rules.tables["MapUnitPolys"]
+    assert mup["concat_type"] == "Simple Polygon Feature Class"
+    assert mup["gems_equivalent"] == "MapUnitPolys"
+    assert ("fid", "OID") in mup["fields"]
+    assert ("geom", "Geometry") in mup["fields"]
+    assert rules.tables["Glossary"]["gems_equivalent"] == "Glossary"
+
+
+def test_duplicates_skip_nulls(gpkg):
+    rules = gr.GpkgRules(gpkg)
+    assert rules.duplicates("Glossary", "Term") == ["certain"]
+    assert rules.duplicates("DataSources", "DataSources_ID") == []
+
+
+def test_no_nulls_finds_null_map_unit(gpkg):
+    rules = gr.GpkgRules(gpkg)
+    assert rules.no_nulls("MapUnitPolys") == ["MapUnit"]
+    assert rules.no_nulls("DataSources") == []
+
+
+def test_blank_and_padded_strings(gpkg):
+    blanks, padded = gr.GpkgRules(gpkg).blank_strings("MapUnitPolys")
+    assert blanks == [("Notes", "fid", 2)]
+    # as in rule3_13_table, a whitespace-only value is also padded
+    assert padded == [("Notes", "fid", 2), ("Notes", "fid", 3)]
+
+
+def test_blank_strings_use_idfield(gpkg):
+    blanks, _ = gr.GpkgRules(gpkg, use_idfield=True).blank_strings("MapUnitPolys")
+    assert blanks == [("Notes", "MapUnitPolys_ID", "MUP2")]
+
+
+def test_terms(gpkg):
+    rules = gr.GpkgRules(gpkg)
+    missing, terms, warnings = rules.missing_terms(2)
+    assert missing == [("MapUnitPolys", "IdentityConfidence", "probable")]
+    assert sorted(terms) == ["certain", "probable"]
+    assert warnings == []
+    assert sorted(rules.unused_terms(), key=str) == [None, "unused"]
+
+
+def test_sources_split_on_pipes(gpkg):
+    rules = gr.GpkgRules(gpkg)
+    missing, sources = rules.missing_sources(2)
+    assert missing == [("MapUnitPolys", "DataSourceID", " DAS9")]
+    assert sorted(sources) == ["DAS1", "DAS9"]
+    assert rules.unused_sources() == ["DAS2"]
+
+
+def test_fingerprint_follows_values(gpkg):
+    rules = gr.GpkgRules(gpkg)
+    n, digest = rules.fingerprint("MapUnitPolys")
+    assert n == 3
+    assert rules.fingerprint("MapUnitPolys") == (n, digest)
+    with closing(sqlite3.connect(gpkg)) as conn:
+        conn.execute("UPDATE MapUnitPolys SET MapUnit = 'Qoa' WHERE fid = 1")
+        conn.commit()
+    assert rules.fingerprint("MapUnitPolys")[0] == 3
+    assert rules.fingerprint("MapUnitPolys")[1] != digest
@@ -0,0 +1,80 @@
+import hierarchy_keys as hk
+
+
+def raw(keys):
+    return [k.raw for k in keys]
+
+
+def test_parse():
+    key = hk.HKey(1, " 001-02.a ")
+    assert key.frags == ("001", "02", "a")
+    assert key.ints == (1, 2, None)
+    assert key.delims == {"-", "."}
+    assert key.non_numeric == ["a"]
+    assert key.depth == 3
+    assert key.parent == hk.sort_key("1-2")
+    assert hk.HKey(2, "003").parent is None
+
+
+def test_sort_key_is_numeric():
+    keys = ["1-10", "1-9", "2", "1", "1-a", "1-9-1"]
+    assert sorted(keys, key=hk.sort_key) == ["1", "1-9", "1-9-1", "1-10", "1-a", "2"]
+    assert hk.sort_key(None) == ()
+    assert hk.depth(None) == 0
+    assert hk.depth("01-02-03") == 3
+
+
+def test_order_and_empty():
+    tree = hk.HierarchyKeyTree({1: "001-010", 2: "001-009", 3: None, 4: "  ", 5: "001"})
+    assert tree.oids_in_order() == [5, 2, 1]
+    assert [k.oid for k in tree] == [5, 2, 1]
+    assert tree.empty == [3, 4]
+
+
+def test_duplicates_across_delimiters():
+    tree = hk.HierarchyKeyTree({1: "001-002", 2: "001.002", 3: "001", 4: "001-002", 5: "001-003"})
+    assert len(tree.duplicates) == 1
+    assert sorted(k.oid for k in tree.duplicates[0]) == [1, 2, 4]
+    # a duplicate is not also reported as an orphan or a gap
+    assert tree.orphans == []
+    assert tree.gaps == []
+
+
+def test_mixed_delimiters():
+    tree = hk.HierarchyKeyTree({1: "1-1", 2: "1.2", 3: "1_3", 4: "1"})
+    assert tree.delimiters == ["-", ".", "_"]
+    assert hk.HierarchyKeyTree({1: "1-1", 2: "1"}).delimiters == ["-"]
+
+
+def test_non_numeric_fragments():
+    tree = hk.HierarchyKeyTree({1: "001", 2: "001-00a", 3: "b01", 4: "001-001"})
+    assert raw(tree.non_numeric) == ["001-00a", "b01"]
+    # non-numeric fragments sort after numeric ones and do not count for gaps
+    assert raw(tree.keys) == ["001", "001-001", "001-00a", "b01"]
+    assert tree.gaps == []
+
+
+def test_uneven_widths():
+    tree = hk.HierarchyKeyTree({1: "001", 2: "001-01", 3: "002"})
+    assert tree.widths == {2, 3}
+    assert hk.HierarchyKeyTree({1: "001", 2: "001-001"}).widths == {3}
+
+
+def test_orphans():
+    tree = hk.HierarchyKeyTree({1: "001", 2: "002-001", 3: "002-001-001", 4: "001-001-001"})
+    # 2-1 has no 2; 1-1-1 has no 1-1; 2-1-1 has its parent
+    assert raw(tree.orphans) == ["001-001-001", "002-001"]
+
+
+def test_parent_matches_across_widths():
+    tree = hk.HierarchyKeyTree({1: "1", 2: "001-1"})
+    assert tree.orphans == []
+
+
+def test_sibling_gaps():
+    tree = hk.HierarchyKeyTree(
+        {1: "001", 2: "003", 3: "003-001", 4: "003-002", 5: "003-005", 6: "004", 7: "004-002"}
+    )
+    assert tree.gaps == [((), 1, 3), (("003",), 2, 5)]
+    # numbering of children starts anywhere, only skips between siblings count
+    assert hk.HierarchyKeyTree({1: "002", 2: "002-005"}).gaps == []
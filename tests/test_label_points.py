@@ -0,0 +1,85 @@
+import label_points as lp
+import side_units as su
+
+SQUARE = [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)]
+HOLE = [(4, 4), (4, 6), (6, 6), (6, 4), (4, 4)]
+ISLAND = [(4, 4), (6, 4), (6, 6), (4, 6), (4, 4)]
+EAST = [(10, 0), (20, 0), (20, 10), (10, 10), (10, 0)]
+
+
+def index():
+    return su.PolygonIndex([(1, [SQUARE, HOLE]), (2, [ISLAND]), (3, [EAST])])
+
+
+def test_points_by_polygon_with_hole():
+    points = [
+        ("a", 1, 1),
+        ("b", 5, 5),  # in the hole, so in the island
+        ("c", 30, 5),  # outside the map
+        ("d", 15, 5),
+        ("e", 9, 9),
+    ]
+    assert lp.points_by_polygon(index(), points) == {1: ["a", "e"], 2: ["b"], 3: ["d"]}
+
+
+def is_label(key):
+    return key[0] == "label"
+
+
+def test_reconcile_labels():
+    by_polygon = {
+        # one point: nothing to do
+        1: [("old", 1)],
+        # a label point is favored over the point from the old polygon
+        2: [("old", 2), ("label", 20)],
+        # two label points are both extra
+        3: [("label", 30), ("old", 3), ("label", 31)],
+        # two points from old polygons that were split apart, now joined
+        4: [("old", 4), ("old", 5)],
+    }
+    drop, extra = lp.reconcile_labels(by_polygon, is_label)
+    assert drop == [("old", 2), ("old", 3), ("old", 4), ("old", 5)]
+    assert extra == [("label", 30), ("label", 31)]
+
+
+def test_multi_label_polygons():
+    assert lp.multi_label_polygons({1: ["a"], 2: ["b", "c"], 3: []}) == {2}
+
+
+def test_changed_polygons_skip_null_map_units():
+    by_polygon = {1: ["a"], 2: ["b"], 3: ["c"], 4: ["d", "e"], 5: ["f"]}
+    old_units = {"a": "Qal", "b": None, "c": "", "d": "Qal", "e": "Tv", "f": "Qal"}
+    # polygon 5 has no MapUnit now
+    new_units = {1: "Qal", 2: "Qal", 3: "Qal", 4: "Qal"}
+    assert lp.changed_polygons(by_polygon, old_units, new_units) == [4, 5]
+
+
+def test_changed_polygons_split_polygon():
+    # old polygon 1 was the whole of SQUARE, unit Qal, with its inside point
+    # in the west half. A new contact at x = 5 splits it, and the east half,
+    # new polygon 11, is now Tv. Old polygon 3, EAST, is unchanged as 12
+    old_index = su.PolygonIndex([("Qal", [SQUARE]), ("Qal", [EAST])])
+    west = [(0, 0), (5, 0), (5, 10), (0, 10), (0, 0)]
+    east = [(5, 0), (10, 0), (10, 10), (5, 10), (5, 0)]
+    new_index = su.PolygonIndex([(10, [west]), (11, [east]), (12, [EAST])])
+    by_polygon = lp.points_by_polygon(new_index, [("p1", 2, 5), ("p3", 15, 5)])
+    old_units = {"p1": "Qal", "p3": "Qal"}
+    new_units = {10: "Qal", 11: "Tv", 12: "Qal"}
+
+    # the old points alone do not see it
+    assert lp.changed_polygons(by_polygon, old_units, new_units) == []
+    new_points = [(10, 2.5, 5), (11, 7.5, 5), (12, 15, 5)]
+    changed = lp.changed_polygons(by_polygon, old_units, new_units, old_index, new_points)
+    assert changed == [11]
+
+
+def test_changed_polygons_both_ways_once():
+    old_index = su.PolygonIndex([("Qal", [SQUARE]), (None, [EAST])])
+    by_polygon = {10: ["p1"]}
+    old_units = {"p1": "Qal"}
+    new_units = {10: "Tv", 11: "Tv"}
+    # 10 is found from the old point and again from its own label point; 11
+    # was in an old polygon with no MapUnit
+    new_points = [(10, 5, 5), (11, 15, 5), (12, 30, 30)]
+    changed = lp.changed_polygons(by_polygon, old_units, new_units, old_index, new_points)
+    assert changed == [10]
@@ -0,0 +1,39 @@
+import merge_numbers as mn
+
+
+def test_node_key():
+    assert mn.node_key(10.2, -3.7, 1) == (10, -4)
+    assert mn.node_key(10.2, -3.7, 0.5) == (20, -7)
+    # halfway values round to even, so ends on either side of a tie can differ
+    assert mn.node_key(0.5, 1.5, 1) == (0, 2)
+
+
+def test_arcs_without_groups_get_their_own_numbers():
+    assert mn.merge_numbers([5, 3, 9], []) == {5: 1, 3: 2, 9: 3}
+
+
+def test_groups_that_share_an_arc_are_joined():
+    numbers = mn.merge_numbers([1, 2, 3, 4, 5, 6], [[2, 3], [5, 6], [3, 5]])
+    assert numbers == {1: 1, 2: 2, 3: 2, 4: 3, 5: 2, 6: 2}
+
+
+def test_ring_of_merges():
+    numbers = mn.merge_numbers([1, 2, 3, 4], [[1, 2], [2, 3], [3, 1], [4]])
+    assert numbers == {1: 1, 2: 1, 3: 1, 4: 2}
+
+
+def test_long_chain():
+    n = 100000
+    groups = [[i, i + 1] for i in range(n - 1)]
+    numbers = mn.merge_numbers(range(n), groups)
+    assert set(numbers.values()) == {1}
+
+
+def test_union_find():
+    uf = mn.UnionFind()
+    assert uf.find("a") == "a"
+    uf.union("a", "b")
+    uf.union("c", "d")
+    assert uf.find("b") == uf.find("a") != uf.find("c")
+    uf.union("b", "d")
+    assert len({uf.find(x) for x in "abcd"}) == 1
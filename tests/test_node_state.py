@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import node_state as ns
+import topology_nodes as tn
+
+HKEYS = {"A": "01", "B": "02", "C": "03", None: None}
+SETTINGS = {"fds": "GeologicMap", "hkey": "02"}
+
+
+def is_fault(t):
+    return "fault" in t.lower()
+
+
+def network(changes={}, ofid_offset=0):
+    """Arc ends of six nodes, 10 apart along x: a dangle, a connected pair, a
+    fault flip, a T-junction, a crossing, and a bad pair. changes - {line id:
+    Type} of lines to change. Returns xs, ys, items, keys"""
+    nodes = [
+        [(1, 0, "From")],
+        [(2, 0, "To"), (3, 180, "From")],
+        [(4, 0, "From"), (5, 180, "From")],
+        [(6, 0, "From"), (7, 120, "From"), (8, 240, "From")],
+        [(9, 0, "From"), (10, 90, "From"), (11, 180, "From"), (12, 270, "From")],
+        [(13, 0, "From"), (14, 180, "From")],
+    ]
+    types = {4: "fault", 5: "fault", 14: "fault"}
+    units = {7: "A"}
+    xs, ys, items, keys = [], [], [], []
+    for k, arcs in enumerate(nodes):
+        for line_id, azimuth, tofrom in arcs:
+            arc = tn.Arc(
+                changes.get(line_id, types.get(line_id, "contact")),
+                "N", None, None, None, "DAS1", None, tofrom,
+                units.get(line_id, "B"), "C", azimuth, line_id + ofid_offset,
+            )
+            xs.append(10.0 * k)
+            ys.append(0.0)
+            items.append(arc)
+            keys.append(ns.end_key(line_id, arc, 10.0 * k, 0.0))
+    return xs, ys, items, keys
+
+
+def run(data, boxes=None, state=None):
+    xs, ys, items, keys = data
+    node_list, events, counts, saved = ns.recheck(
+        xs, ys, items, keys, 0.001, boxes, state, HKEYS, "02", is_fault
+    )
+    return node_list, tn.apply_events(node_list, events), counts, saved
+
+
+def saved_state(tmp_path, saved, envelopes={"CAF": {1: [0, 0, 1, 1]}}):
+    path = str(tmp_path / "nodes.json")
+    ns.save(path, SETTINGS, "2024-01-01T00:00:00", envelopes, saved)
+    return ns.load(path, SETTINGS)
+
+
+def test_full_run_matches_classify_nodes():
+    xs, ys, items, keys = network()
+    node_list, groups, counts, saved = run((xs, ys, items, keys))
+    nodes = tn.build_nodes(xs, ys, items, 0.001, key=lambda a: a.LineDir)
+    expected = tn.classify_nodes(nodes, HKEYS, "02", is_fault)
+    assert node_list == nodes
+    assert groups == expected[:4]
+    assert counts == expected[4] == [1, 3, 1, 1, 0]
+    # only nodes with something to report are saved
+    assert len(saved) == 6
+
+
+def test_load_and_save(tmp_path):
+    state = saved_state(tmp_path, [])
+    assert state["envelopes"] == {"CAF": {1: [0, 0, 1, 1]}}
+    path = str(tmp_path / "nodes.json")
+    assert ns.load(path, dict(SETTINGS, hkey="03")) is None
+    assert ns.load(str(tmp_path / "none.json"), SETTINGS) is None
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert ns.load(path, SETTINGS) is None
+
+
+def test_recheck_edited_area(tmp_path):
+    _, _, _, saved = run(network())
+    state = saved_state(tmp_path, json.loads(json.dumps(saved)))
+
+    # line 1 is now a fault, so its dangle is no longer an error, and every
+    # arc has a new OBJECTID, as after planarizing again
+    data = network({1: "fault"}, ofid_offset=100)
+    box = (-0.001, -0.001, 0.001, 0.001)
+    node_list, groups, counts, _ = run(data, [box], state)
+    expected = run(data)
+    assert node_list == expected[0]
+    assert groups == expected[1]
+    # connect pairs taken from the state are for the new OBJECTIDs
+    assert [102, 103] in groups[3]
+    # only the node in the box was classified again
+    assert counts == [1, 0, 0, 0, 0]
+
+
+def test_recheck_finds_arcs_changed_without_an_edit(tmp_path):
+    _, _, _, saved = run(network())
+    state = saved_state(tmp_path, saved)
+    data = network()
+    # the arc end at the last node is now on another line
+    xs, ys, items, keys = data
+    keys[-1] = ns.end_key(99, items[-1], xs[-1], ys[-1])
+    node_list, groups, counts, _ = run(data, [], state)
+    assert node_list == run(data)[0]
+    assert groups == run(data)[1]
+    assert counts == [0, 1, 0, 0, 0]
+
+
+def test_no_state_rebuilds_everything():
+    data = network()
+    assert run(data, [(0, 0, 1, 1)], None)[:3] == run(data)[:3]
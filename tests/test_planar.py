@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import planar
+
+
+def pieces_of(lines, tolerance=0, strip_segments=500000):
+    return planar.node_lines(lines, tolerance, strip_segments)
+
+
+def test_crossing():
+    pieces = pieces_of([(1, [(0, 0), (2, 2)]), (2, [(0, 2), (2, 0)])])
+    assert pieces == [
+        (1, [(0, 0), (1, 1)]),
+        (1, [(1, 1), (2, 2)]),
+        (2, [(0, 2), (1, 1)]),
+        (2, [(1, 1), (2, 0)]),
+    ]
+
+
+def test_t_junction():
+    pieces = pieces_of([(1, [(0, 0), (4, 0)]), (2, [(2, 0), (2, 3)])])
+    assert pieces == [
+        (1, [(0, 0), (2, 0)]),
+        (1, [(2, 0), (4, 0)]),
+        (2, [(2, 0), (2, 3)]),
+    ]
+
+
+def test_undershoot_within_tolerance_is_snapped():
+    pieces = pieces_of([(1, [(0, 0), (4, 0)]), (2, [(2, 0.01), (2, 3)])], 0.05)
+    # the end of line 2 is the node, and line 1 is split there
+    assert pieces == [
+        (1, [(0, 0), (2, 0)]),
+        (1, [(2, 0), (4, 0)]),
+        (2, [(2, 0), (2, 3)]),
+    ]
+
+
+def test_self_crossing_loop():
+    # a line that crosses itself once
+    pieces = pieces_of([(1, [(0, 0), (2, 2), (2, 0), (0, 2)])])
+    assert [p for _, p in pieces] == [
+        [(0, 0), (1, 1)],
+        [(1, 1), (2, 2), (2, 0), (1, 1)],
+        [(1, 1), (0, 2)],
+    ]
+
+
+@pytest.mark.parametrize("tolerance", [0, 0.001])
+def test_collinear_overlap_keeps_both(tolerance):
+    pieces = pieces_of([(1, [(0, 0), (3, 0)]), (2, [(1, 0), (4, 0)])], tolerance)
+    assert pieces == [
+        (1, [(0, 0), (1, 0)]),
+        (1, [(1, 0), (3, 0)]),
+        (2, [(1, 0), (3, 0)]),
+        (2, [(3, 0), (4, 0)]),
+    ]
+
+
+def test_ring_is_not_split_at_its_start():
+    ring = [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)]
+    assert pieces_of([(1, ring)]) == [(1, ring)]
+
+
+def test_degenerate_lines_are_dropped():
+    assert pieces_of([(1, [(0, 0), (0, 0)]), (2, [(5, 5)])]) == []
+    assert pieces_of([(1, [(0, 0), (0, 0), (1, 0)])]) == [(1, [(0, 0), (1, 0)])]
+
+
+def test_strips_do_not_change_the_result():
+    rng = random.Random(3)
+    lines = []
+    for oid in range(60):
+        # some long lines that span many strips, and many short ones
+        n = 2 if oid % 10 else 8
+        lines.append(
+            (oid, [(rng.uniform(0, 100), rng.uniform(0, 100)) for _ in range(n)])
+        )
+    one = pieces_of(lines, 0.01)
+    many = pieces_of(lines, 0.01, strip_segments=5)
+    assert many == one
+    assert len(one) > len(lines)
+
+
+def test_strips_with_empty_strips_between():
+    # two groups of crossing lines far apart, so most strips are empty
+    lines = []
+    for oid, x in enumerate((-500, -400, 700, 800)):
+        lines.append((oid, [(x, -1), (x + 0.5, 1)]))
+        lines.append((oid + 10, [(x - 1, 0), (x + 1.5, 0)]))
+    one = pieces_of(lines)
+    assert pieces_of(lines, strip_segments=1) == one
+    assert len(one) == 16
@@ -0,0 +1,81 @@
+import math
+import random
+
+import pytest
+
+import plot_scales as ps
+
+
+def near_table(points, radius, less_significant=None):
+    """The near table loop that separations replaces: take the closest pair
+    left, in (distance, lower OBJECTID, higher OBJECTID) order, over and over"""
+    pairs = []
+    for i, (a, ax, ay) in enumerate(points):
+        for b, bx, by in points[i + 1 :]:
+            d = math.hypot(ax - bx, ay - by)
+            if d <= radius:
+                pairs.append((d, min(a, b), max(a, b)))
+    pairs.sort()
+    found = {}
+    for d, lower, higher in pairs:
+        if lower in found or higher in found:
+            continue
+        pt = higher if less_significant is None else less_significant(lower, higher)
+        if pt is not None:
+            found[pt] = d
+    return found
+
+
+def random_points(n, seed, grid=None):
+    rng = random.Random(seed)
+    if grid:
+        # on a lattice, so many pairs are the same distance apart
+        return [(oid, rng.randrange(grid), rng.randrange(grid)) for oid in range(1, n + 1)]
+    return [(oid, rng.uniform(0, 100), rng.uniform(0, 100)) for oid in range(1, n + 1)]
+
+
+def test_kdtree_within():
+    points = random_points(500, 1, grid=30)
+    tree = ps.KDTree([(x, y) for _, x, y in points], leaf_size=4)
+    for _, x, y in points[:50]:
+        for radius in (0, 1, 2.5):
+            expected = [
+                i for i, (_, px, py) in enumerate(points) if math.hypot(px - x, py - y) <= radius
+            ]
+            assert sorted(tree.within(x, y, radius)) == expected
+
+
+@pytest.mark.parametrize("seed, grid", [(2, None), (3, 12), (4, 5)])
+def test_separations_match_near_table(seed, grid):
+    points = random_points(300, seed, grid)
+    assert ps.separations(points, 6) == near_table(points, 6)
+
+
+def test_ties_take_lower_objectids_first():
+    # 1-2 and 2-3 and 3-4 are all 1 apart; 1-2 is taken first, dropping 2,
+    # then 3-4, dropping 4
+    points = [(3, 2, 0), (1, 0, 0), (4, 3, 0), (2, 1, 0)]
+    assert ps.separations(points, 1) == {2: 1.0, 4: 1.0}
+
+
+def test_pairs_beyond_radius_are_ignored():
+    points = [(1, 0, 0), (2, 5, 0)]
+    assert ps.separations(points, 4.9) == {}
+    assert ps.separations(points, 5) == {2: 5.0}
+
+
+def test_less_significant():
+    # drop the lower OBJECTID, but never point 1
+    def less(lower, higher):
+        if lower == 1:
+            return None
+        return lower
+
+    points = random_points(200, 5, grid=10)
+    assert ps.separations(points, 3, less) == near_table(points, 3, less)
+    found = ps.separations([(1, 0, 0), (2, 1, 0), (3, 1.5, 0)], 2, less)
+    assert found == {2: 0.5}
+
+
+def test_no_points():
+    assert ps.separations([], 10) == {}
@@ -0,0 +1,71 @@
+import poly_state as ps
+
+SETTINGS = {"version": "v", "caf": "caf", "mup": "mup"}
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "polys.json")
+    ps.save(path, SETTINGS, "2026-01-01T00:00:00", {1: [0, 0, 1, 1]}, "2026-01-02T00:00:00", {})
+    state = ps.load(path, SETTINGS)
+    assert state["envelopes"] == {1: [0, 0, 1, 1]}
+    assert state["label_built"] == "2026-01-02T00:00:00"
+    assert not (tmp_path / "polys.json.tmp").exists()
+
+
+def test_load_other_settings_or_bad_file(tmp_path):
+    path = str(tmp_path / "polys.json")
+    assert ps.load(path, SETTINGS) is None
+    ps.save(path, SETTINGS, "t", {}, "t", {})
+    assert ps.load(path, dict(SETTINGS, mup="other")) is None
+    with open(path, "w") as f:
+        f.write("{")
+    assert ps.load(path, SETTINGS) is None
+
+
+def test_regions_far_apart():
+    boxes = [(0, 0, 1, 1), (100, 100, 101, 101)]
+    polys = [(1, (-5, -5, 5, 5), "a"), (2, (95, 95, 105, 105), "b"), (3, (40, 40, 50, 50), "c")]
+    found = ps.regions(boxes, polys, lambda shape, i: True)
+    assert found == [([1], (-5, -5, 5, 5)), ([2], (95, 95, 105, 105))]
+
+
+def test_regions_joined_by_overlap_and_by_polygon():
+    # 0 and 1 overlap; 2 is apart from both but in the same polygon as 1
+    boxes = [(0, 0, 2, 2), (1, 1, 3, 3), (8, 0, 9, 1), (50, 50, 51, 51)]
+    polys = [(7, (2.5, 0, 10, 3), None), (8, (49, 49, 52, 52), None)]
+    found = ps.regions(boxes, polys, lambda shape, i: True)
+    assert found == [([7], (0, 0, 10, 3)), ([8], (49, 49, 52, 52))]
+
+
+def test_regions_exact_test_only_when_needed():
+    boxes = [(0, 0, 10, 10), (20, 0, 30, 10)]
+    calls = []
+
+    def touches(shape, i):
+        calls.append((shape, i))
+        return False
+
+    # polygon 1 is within box 0, so it touches without the exact test; the box
+    # of polygon 2 overlaps box 1 but the polygon does not
+    polys = [(1, (2, 2, 4, 4), "p1"), (2, (25, 5, 40, 20), "p2")]
+    found = ps.regions(boxes, polys, touches)
+    assert calls == [("p2", 1)]
+    assert found == [([1], (0, 0, 10, 10)), ([], (20, 0, 30, 10))]
+
+
+def test_regions_no_polygons():
+    found = ps.regions([(0, 0, 1, 1)], iter(()), lambda shape, i: True)
+    assert found == [([], (0, 0, 1, 1))]
+
+
+def test_keep_face():
+    region_of = {1: 0, 2: 1}
+    seen = set()
+    assert ps.keep_face(0, 1, False, (0, 0), region_of, seen)
+    # a face in a polygon of another region, or of no region
+    assert not ps.keep_face(0, 2, False, (0, 0), region_of, seen)
+    assert not ps.keep_face(0, 3, True, (0, 0), region_of, seen)
+    # a face outside of every old polygon is kept once, if within the window
+    assert not ps.keep_face(0, None, False, (5, 5), region_of, seen)
+    assert ps.keep_face(0, None, True, (5, 5), region_of, seen)
+    assert not ps.keep_face(1, None, True, (5, 5), region_of, seen)
@@ -0,0 +1,108 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import polygonize as pz
+
+
+def square(x0, y0, size):
+    return [(x0, y0), (x0 + size, y0), (x0 + size, y0 + size), (x0, y0 + size), (x0, y0)]
+
+
+def areas(polygons):
+    """Sorted (area, number of holes, label) of each polygon"""
+    found = []
+    for rings, key in polygons:
+        area = pz.ring_area(rings[0]) + sum(pz.ring_area(r) for r in rings[1:])
+        found.append((round(area, 9), len(rings) - 1, key))
+    return sorted(found, key=lambda f: (f[0], str(f[2])))
+
+
+def test_ring_area_sign():
+    assert pz.ring_area(square(0, 0, 2)) == 4
+    assert pz.ring_area(square(0, 0, 2)[::-1]) == -4
+
+
+def test_shared_edge_and_labels():
+    lines = [
+        (1, [(0, 0), (2, 0), (2, 2), (0, 2), (0, 0)]),
+        (2, [(2, 0), (5, 0), (5, 2), (2, 2)]),
+    ]
+    polygons = pz.polygonize(lines, 0, [("a", 1, 1)])
+    assert areas(polygons) == [(4, 0, "a"), (6, 0, None)]
+    for rings, _ in polygons:
+        assert pz.ring_area(rings[0]) > 0
+
+
+def test_island_is_a_hole():
+    lines = [(1, square(0, 0, 10)), (2, square(4, 4, 2))]
+    polygons = pz.polygonize(lines, 0, [("outer", 1, 1), ("inner", 5, 5)])
+    assert areas(polygons) == [(4, 0, "inner"), (96, 1, "outer")]
+
+
+def test_dangles_and_bridges_are_dropped():
+    lines = [
+        (1, square(0, 0, 4)),
+        # a dangle into the square
+        (2, [(0, 2), (1, 2)]),
+        (3, square(10, 0, 4)),
+        # a line from one square to the other
+        (4, [(4, 2), (10, 2)]),
+    ]
+    assert areas(pz.polygonize(lines)) == [(16, 0, None), (16, 0, None)]
+
+
+def test_crossing_lines_split_faces():
+    lines = [(1, square(0, 0, 4)), (2, [(0, 0), (4, 4)]), (3, [(0, 4), (4, 0)])]
+    assert areas(pz.polygonize(lines)) == [(4, 0, None)] * 4
+
+
+def test_duplicate_lines_make_one_face():
+    lines = [(1, square(0, 0, 4)), (2, square(0, 0, 4)[::-1])]
+    assert areas(pz.polygonize(lines)) == [(16, 0, None)]
+
+
+def test_first_label_point_wins():
+    polygons = pz.polygonize([(1, square(0, 0, 4))], 0, [("b", 1, 1), ("a", 2, 2), ("c", 9, 9)])
+    assert [key for _, key in polygons] == ["b"]
+
+
+def test_open_lines_make_no_faces():
+    assert pz.polygonize([(1, [(0, 0), (1, 1), (2, 0)])]) == []
+
+
+def test_nested_islands_in_several_groups():
+    lines = [
+        (1, square(0, 0, 20)),
+        # an island with an island in it
+        (2, square(2, 2, 8)),
+        (3, square(4, 4, 2)),
+        # three deep, beside it
+        (4, square(12, 2, 6)),
+        (5, square(13, 3, 4)),
+        (6, square(14, 4, 2)),
+    ]
+    labels = [("map", 1, 1), ("a", 3, 3), ("b", 5, 5), ("c", 12.5, 2.5), ("d", 13.5, 3.5), ("e", 15, 5)]
+    assert areas(pz.polygonize(lines, 0, labels)) == [
+        (4, 0, "b"),
+        (4, 0, "e"),
+        (12, 1, "d"),
+        (20, 1, "c"),
+        (60, 1, "a"),
+        (300, 2, "map"),
+    ]
+
+
+def test_bridge_between_islands_is_dropped():
+    # the bridge joins two islands into one group; once it is gone they are
+    # two holes of the face around them
+    lines = [
+        (1, square(0, 0, 20)),
+        (2, square(2, 2, 4)),
+        (3, square(10, 2, 4)),
+        (4, [(6, 4), (10, 4)]),
+        # a dangle off the bridge
+        (5, [(8, 4), (8, 8)]),
+    ]
+    polygons = pz.polygonize(lines, 0, [("map", 1, 1)])
+    assert areas(polygons) == [(16, 0, None), (16, 0, None), (368, 2, "map")]
@@ -0,0 +1,123 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import results_json as rj
+
+MISSING = 'Term <span class="value">sandstone</span> in <span class="table">MapUnitPolys</span>, field <span class="field">Lithology</span>'
+BAD_ID = '<span class="table">ContactsAndFaults</span>, <span class="field">DataSourceID</span>, <span class="field">OBJECTID</span> <span class="value">12</span>'
+TOPO = "&emsp;Rule 'Must Not Overlap (Area)' has 3 errors"
+
+RULES = {
+    "rule2_1": ["PASS", "2.1 Required elements", "rule2_1"],
+    "rule2_4": ["DMU cannot be found. Rule not checked"],
+    "rule3_5": ["missing terms", "3.5 Missing terms", "rule3_5", MISSING, BAD_ID],
+    "rule2_3": ["topology errors", "2.3 Topology errors", "topology2", '<span class="table">GeologicMap</span>', TOPO],
+}
+
+
+def make(tmp_path):
+    return rj.ResultsWriter(
+        tmp_path / "db-Validation.ndjson",
+        tmp_path / "db-Validation.json",
+        {"database": "db.gdb", "version": "2.0"},
+    )
+
+
+def records(tmp_path):
+    with open(tmp_path / "db-Validation.ndjson") as f:
+        return [json.loads(line) for line in f]
+
+
+def summary(tmp_path):
+    with open(tmp_path / "db-Validation.json") as f:
+        return json.load(f)
+
+
+def test_parse_error():
+    assert rj.parse_error(MISSING) == {
+        "table": "MapUnitPolys",
+        "field": "Lithology",
+        "id": None,
+        "value": "sandstone",
+        "message": "Term sandstone in MapUnitPolys, field Lithology",
+    }
+    record = rj.parse_error(BAD_ID)
+    assert (record["table"], record["field"], record["id"], record["value"]) == (
+        "ContactsAndFaults", "DataSourceID", "12", None
+    )
+    assert rj.parse_error("Polygon OBJECTID 44 has no label")["id"] == "44"
+    assert rj.plain("a&amp;b  <b>c</b>\n d") == "a&b c d"
+
+
+def test_one_record_per_error_as_rules_finish(tmp_path):
+    writer = make(tmp_path)
+    writer.add("rule3_5", RULES["rule3_5"], "rule3_5", 0.25)
+    # readable before the validation is done
+    found = records(tmp_path)
+    assert [r["message"] for r in found] == [rj.plain(MISSING), rj.plain(BAD_ID)]
+    assert all(r["kind"] == "error" and r["rule"] == "rule3_5" for r in found)
+    assert summary(tmp_path)["complete"] is False
+
+    writer.add("rule2_3", RULES["rule2_3"], "topology")
+    writer.add("mu_warnings", ["Map units not used", "<span class=\"value\">Qal</span>"])
+    writer.close()
+    found = records(tmp_path)
+    assert len(found) == 5
+    assert found[3]["message"] == "Rule 'Must Not Overlap (Area)' has 3 errors"
+    assert found[4] == {
+        "kind": "warning", "rule": "mu_warnings", "table": None, "field": None,
+        "id": None, "value": "Qal", "message": "Qal",
+    }
+
+
+def test_summary(tmp_path):
+    writer = make(tmp_path)
+    for key, value in RULES.items():
+        writer.add(key, value, key, 0.5)
+    writer.add("rule2_5", None)
+    writer.add("db_name", "db")
+    writer.add("end_spaces", ["Trailing spaces"])
+    writer.close(
+        'This database is <a href=#Level2><font size="+1"><b>LEVEL 2 COMPLIANT.</b></a></font>\n',
+        {"rule2_1": 1.23456},
+    )
+    found = summary(tmp_path)
+    assert found["database"] == "db.gdb"
+    assert found["complete"] is True
+    assert found["level"] == 2
+    assert found["level_description"] == "This database is LEVEL 2 COMPLIANT."
+    assert {k: (v["status"], v["errors"]) for k, v in found["rules"].items()} == {
+        "rule2_1": ("pass", 0),
+        "rule2_4": ("not checked", 0),
+        "rule3_5": ("fail", 2),
+        "rule2_3": ("fail", 2),
+    }
+    assert found["warnings"] == {"end_spaces": {"description": "Trailing spaces", "count": 0}}
+    assert found["timings"]["rule2_1"] == 1.235
+    assert found["timings"]["rule3_5"] == 0.5
+    assert not Path(f"{tmp_path / 'db-Validation.json'}.tmp").exists()
+
+
+def test_summary_counts_match_the_errors_report(tmp_path):
+    pytest.importorskip("jinja2")
+    import errors_report as er
+
+    val = {"errors_name": "db-ValidationErrors.html"}
+    report = er.ErrorsReport(tmp_path / "db-ValidationErrors.html", Path(er.__file__).parent, val, max_inline=1)
+    writer = make(tmp_path)
+    for key, value in RULES.items():
+        # as finish_rule in ValidateDatabase: the results see the full list,
+        # the report is handed it and keeps a summary
+        writer.add(key, value, key)
+        val[key] = report.add(key, value)
+    writer.close()
+    report.close()
+
+    rules = summary(tmp_path)["rules"]
+    for key, value in val.items():
+        if key.startswith("rule"):
+            shown = len(value) - 3 if len(value) > 3 else 0
+            assert rules[key]["errors"] == shown
+    assert len(records(tmp_path)) == sum(r["errors"] for r in rules.values())
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+
+import rule_scheduler as rs
+
+
+def provider(key, value, delay=0, log=None):
+    def func(state):
+        if log is not None:
+            log.append(("start", key, threading.current_thread()))
+        time.sleep(delay)
+        if log is not None:
+            log.append(("end", key, threading.current_thread()))
+        return {key: value(state) if callable(value) else value}
+
+    return func
+
+
+def test_rules_wait_for_what_they_require():
+    rules = rs.RuleScheduler()
+    # declared before the rules it depends on
+    rules.add("c", provider("c", lambda s: s["a"] + s["b"]), requires=("a", "b"), provides=("c",))
+    rules.add("a", provider("a", 1, 0.05), provides=("a",))
+    rules.add("b", provider("b", lambda s: s["start"] * 2), requires=("start",), provides=("b",))
+    state = rules.run({"start": 5})
+    assert state == {"start": 5, "a": 1, "b": 10, "c": 11}
+
+
+def test_on_complete_in_declaration_order():
+    for _ in range(3):
+        completed = []
+        finished = []
+        rules = rs.RuleScheduler(
+            on_finish=lambda rule, result: finished.append(rule.name),
+            on_complete=lambda rule, result: completed.append((rule.name, result)),
+        )
+        # the first rule finishes last
+        for i, delay in enumerate([0.1, 0.05, 0, 0.02]):
+            rules.add(f"r{i}", provider(f"k{i}", i, delay), provides=(f"k{i}",))
+        rules.run({})
+        assert completed == [(f"r{i}", {f"k{i}": i}) for i in range(4)]
+        assert finished[-1] == "r0"
+
+
+def test_on_finish_can_replace_results():
+    def trim(rule, result):
+        if "k" in result:
+            result["k"] = result["k"][:1]
+
+    rules = rs.RuleScheduler(on_finish=trim)
+    rules.add("long", provider("k", [1, 2, 3]), provides=("k",))
+    rules.add("uses", provider("n", lambda s: len(s["k"])), requires=("k",), provides=("n",))
+    assert rules.run({}) == {"k": [1], "n": 1}
+
+
+def test_main_thread_rules_run_alone():
+    log = []
+    rules = rs.RuleScheduler()
+    rules.add("pool1", provider("p1", 1, 0.1, log), provides=("p1",))
+    rules.add("fast", provider("x", 1, 0, log), provides=("x",))
+    rules.add(
+        "main", provider("m", 1, 0.05, log), requires=("x",), provides=("m",), main_thread=True
+    )
+    rules.add("pool2", provider("p2", 1, 0.05, log), requires=("x",), provides=("p2",))
+    rules.add(
+        "after", provider("a", 1, 0.01, log), requires=("m",), provides=("a",), main_thread=True
+    )
+    rules.run({})
+
+    threads = {key: thread for _, key, thread in log}
+    assert threads["m"] is threading.current_thread()
+    assert threads["a"] is threading.current_thread()
+    assert threads["p1"] is not threading.current_thread()
+
+    # nothing else is running between the start and end of a main thread rule
+    for key in ("m", "a"):
+        start = log.index(("start", key, threads[key]))
+        assert log[start + 1] == ("end", key, threads[key])
+    # main waited for the pool rule already running, and pool2, ready at the
+    # same time as main, waited for main
+    events = [(e, key) for e, key, _ in log]
+    assert events.index(("end", "p1")) < events.index(("start", "m"))
+    assert events.index(("end", "m")) < events.index(("start", "p2"))
+
+
+def test_main_thread_rules_do_not_wait_for_background_rules():
+    log = []
+    rules = rs.RuleScheduler()
+    rules.add("bg", provider("b", 1, 0.2, log), provides=("b",), background=True)
+    rules.add("main", provider("m", 1, 0, log), provides=("m",), main_thread=True)
+    rules.add("last", provider("l", 1, 0, log), requires=("b", "m"), provides=("l",))
+    rules.run({})
+    events = [(e, key) for e, key, _ in log]
+    assert events.index(("start", "m")) < events.index(("end", "b"))
+    assert events[-2:] == [("start", "l"), ("end", "l")]
+    # a main thread rule is never a background rule
+    assert not rs.Rule("x", None, main_thread=True, background=True).background
+
+
+def test_timings():
+    rules = rs.RuleScheduler()
+    rules.add("slow", provider("s", 1, 0.1), provides=("s",))
+    rules.add("fast", provider("f", 1), provides=("f",), main_thread=True)
+    rules.run({})
+    assert set(rules.timings) == {"slow", "fast"}
+    assert rules.timings["slow"] >= 0.1
+    assert rules.timings["fast"] < rules.timings["slow"]
+
+
+def test_rules_returning_nothing():
+    rules = rs.RuleScheduler()
+    rules.add("none", lambda state: None)
+    assert rules.run({"x": 1}) == {"x": 1}
+
+
+def test_missing_input():
+    rules = rs.RuleScheduler()
+    rules.add("a", provider("a", 1), requires=("nothing",), provides=("a",))
+    with pytest.raises(ValueError, match="nothing"):
+        rules.run({})
+
+
+def test_cycle():
+    rules = rs.RuleScheduler()
+    rules.add("a", provider("a", 1), requires=("b",), provides=("a",))
+    rules.add("b", provider("b", 1), requires=("a",), provides=("b",))
+    with pytest.raises(ValueError, match="Circular"):
+        rules.run({})
+
+
+def test_declared_output_never_provided():
+    rules = rs.RuleScheduler()
+    rules.add("a", lambda state: {}, provides=("a",))
+    rules.add("b", provider("b", 1), requires=("a",), provides=("b",))
+    with pytest.raises(RuntimeError, match="never provided"):
+        rules.run({})
+
+
+def test_exceptions_are_raised():
+    def fail(state):
+        raise KeyError("broken")
+
+    rules = rs.RuleScheduler()
+    rules.add("fail", fail)
+    with pytest.raises(KeyError):
+        rules.run({})
@@ -0,0 +1,114 @@
+import math
+
+import side_units as su
+
+
+def square(x0, y0, x1, y1):
+    return [(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)]
+
+
+def close(a, b):
+    return all(math.isclose(p, q, abs_tol=1e-12) for p, q in zip(a, b))
+
+
+def test_probes():
+    # left of a line going east is north
+    left, right = su.probes([(0, 0), (4, 0), (4, 1)], 0.5)
+    assert close(left, (2, 0.5)) and close(right, (2, -0.5))
+    # the longest segment is used, whichever way the line runs
+    left, right = su.probes([(0, 1), (0, 0), (10, 0)], 0.5)
+    assert close(left, (5, 0.5)) and close(right, (5, -0.5))
+    assert su.probes([(1, 1), (1, 1)], 0.5) is None
+    assert su.probes([(1, 1)], 0.5) is None
+
+
+def test_probes_on_short_segments():
+    # brought in to a quarter of the length, but not below min_offset
+    left, right = su.probes([(0, 0), (1, 0)], 0.5)
+    assert close(left, (0.5, 0.25)) and close(right, (0.5, -0.25))
+    left, _ = su.probes([(0, 0), (1, 0)], 0.5, min_offset=0.4)
+    assert close(left, (0.5, 0.4))
+
+
+def test_inside_with_holes():
+    rings = [square(0, 0, 10, 10), square(2, 2, 4, 4), square(6, 6, 8, 8)]
+    assert su.inside(1, 1, rings)
+    assert not su.inside(3, 3, rings)
+    assert not su.inside(7, 7, rings)
+    assert su.inside(5, 5, rings)
+    assert not su.inside(11, 5, rings)
+    # an island in the hole is inside again, even-odd
+    assert su.inside(3, 3, rings + [square(2.5, 2.5, 3.5, 3.5)])
+    # ring direction does not matter
+    assert su.inside(1, 1, [square(0, 0, 10, 10)[::-1]])
+
+
+def test_boundary_distance():
+    rings = [square(0, 0, 10, 10), square(2, 2, 4, 4)]
+    assert su.boundary_distance(5, 3, rings) == 1
+    assert su.boundary_distance(3, 3, rings) == 1
+    assert su.boundary_distance(12, 10, rings) == 2
+
+
+def test_locate_at_the_map_edge():
+    index = su.PolygonIndex(
+        [("Qal", [square(0, 0, 10, 10), square(2, 2, 4, 4)]), ("Tg", [square(10, 0, 20, 10)]), ("x", [])]
+    )
+    assert index.locate(1, 1) == "Qal"
+    assert index.locate(15, 5) == "Tg"
+    # in the hole, and outside every polygon
+    assert index.locate(3, 3) == ""
+    assert index.locate(-1, 5) == ""
+    assert index.locate(25, 5, None) is None
+    assert index.find(15, 5) == 1
+
+    # a line along the west edge of the map has nothing to its left
+    assert su.side_units([[[(0, 0), (0, 10)]]], index, 0.1) == [("", "Qal")]
+    # and one along the contact going south has Qal on its right
+    assert su.side_units([[[(10, 10), (10, 0)]]], index, 0.1) == [("Tg", "Qal")]
+
+
+def test_every_part_is_probed():
+    index = su.PolygonIndex([("A", [square(0, 0, 10, 10)]), ("B", [square(10, 0, 20, 10)])])
+    # the first part is outside the map, the second runs along the contact
+    parts = [[(30, 0), (30, 1)], [(10, 10), (10, 0)]]
+    assert su.line_sides(parts, index, 0.1, 0.001) == ("B", "A")
+    # without a tolerance the part with the longest segment decides
+    assert su.line_sides(parts, index, 0.1) == ("B", "A")
+    assert su.line_sides([parts[0]], index, 0.1, 0.001) == ("", "")
+    assert su.line_sides([[(1, 1)]], index, 0.1, 0.001) == ("", "")
+    assert su.line_sides([], index, 0.1, 0.001, None) == (None, None)
+
+
+def test_short_arc():
+    # a contact 0.2 long between A to the west and a small triangle of B to the
+    # east, inside C. A probe a full offset out would land in C
+    triangle = [(10, 5), (10.2, 5.1), (10, 5.2), (10, 5)]
+    index = su.PolygonIndex(
+        [
+            ("A", [square(0, 0, 10, 10)]),
+            ("B", [triangle]),
+            ("C", [square(10, 0, 20, 10), triangle]),
+        ]
+    )
+    line = [[(10, 5), (10, 5.2)]]
+    assert su.line_sides(line, index, 0.5) == ("A", "B")
+    assert su.line_sides(line, index, 0.5, 0.001) == ("A", "B")
+
+
+def test_sliver_narrower_than_the_offset():
+    # a sliver of S, 0.05 wide, between A and B. The probe to the right of the
+    # line between A and S lands in B at first
+    index = su.PolygonIndex(
+        [
+            ("A", [square(0, 0, 10, 10)]),
+            ("S", [square(10, 0, 10.05, 10)]),
+            ("B", [square(10.05, 0, 20, 10)]),
+        ]
+    )
+    line = [[(10, 10), (10, 0)]]
+    assert su.line_sides(line, index, 0.1) == ("B", "A")
+    assert su.line_sides(line, index, 0.1, 0.001) == ("S", "A")
+    assert su.side_units([line], index, 0.1, 0.001) == [("S", "A")]
+    # and with polygons handed in as a list
+    assert su.side_units([line], index.polygons, 0.1, 0.001) == [("S", "A")]
@@ -0,0 +1,154 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import topology_nodes as tn
+
+HKEYS = {"A": "01", "B": "02", "C": "03", "D": "04", None: None}
+
+
+def is_fault(t):
+    return "fault" in t.lower()
+
+
+def arc(ofid, azimuth, type="contact", conc="N", rmu="B", lmu="C", tofrom="From"):
+    return tn.Arc(type, conc, None, None, None, "DAS1", None, tofrom, rmu, lmu, azimuth, ofid)
+
+
+def classify(*nodes):
+    """badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs, counts
+    of nodes at (0, 0), (10, 0), ... with the arcs given"""
+    node_list = [[10 * k, 0, sorted(arcs, key=lambda a: a.LineDir)] for k, arcs in enumerate(nodes)]
+    return tn.classify_nodes(node_list, HKEYS, "02", is_fault)
+
+
+def notes(node_group):
+    return [node[3:] for node in node_group]
+
+
+def test_azimuth_and_line_ends():
+    assert tn.azimuth((0, 0), (0, 1)) == 0
+    assert tn.azimuth((0, 0), (1, 0)) == 90
+    assert tn.azimuth((0, 0), (-1, 0)) == 270
+    ends = tn.line_ends([(0, 0), (0, 1), (1, 1)])
+    assert ends == ((0, 0, 0, "From"), (1, 1, 270, "To"))
+    assert tn.line_ends([(0, 0)]) is None
+
+
+def test_cluster_is_transitive_across_cells():
+    # each point is within tolerance of the next, and they straddle cell edges
+    xs = [0.95, 1.05, 1.15, 5.0]
+    ys = [0.0, 0.0, 0.0, 0.0]
+    groups = sorted(sorted(g) for g in tn.cluster(xs, ys, 0.12))
+    assert groups == [[0, 1, 2], [3]]
+
+
+def test_cluster_zero_tolerance_is_exact():
+    groups = tn.cluster([1.0, 1.0, 1.0000001], [2.0, 2.0, 2.0], 0)
+    assert sorted(sorted(g) for g in groups) == [[0, 1], [2]]
+
+
+def test_build_nodes_order_and_anchor():
+    nodes = tn.build_nodes([3, 1, 1.001, 0], [0, 5, 5, 9], ["a", "b", "c", "d"], 0.01)
+    assert [(x, y) for x, y, _ in nodes] == [(0, 9), (1, 5), (3, 0)]
+    assert sorted(nodes[1][2]) == ["b", "c"]
+
+
+def test_dangles():
+    bad, flips, missing, connect, counts = classify(
+        [arc(1, 0)], [arc(2, 0, conc="Y")], [arc(3, 0, type="thrust fault")]
+    )
+    assert notes(bad) == [["dangling contact"], ["dangling concealed contact"]]
+    assert counts == [3, 0, 0, 0, 0]
+
+
+def test_two_arc_nodes():
+    bad, flips, missing, connect, counts = classify(
+        [arc(1, 0), arc(2, 180, tofrom="To")],
+        [arc(3, 0), arc(4, 180, type="fault")],
+        [arc(5, 0), arc(6, 180, conc="Y")],
+        [arc(7, 0, type="fault"), arc(8, 180, type="fault")],
+    )
+    assert connect == [[1, 2], [7, 8]]
+    assert notes(bad) == [["mismatched Type values"], ["one arc concealed, one not"]]
+    assert notes(flips) == [["From, From"]]
+    assert counts == [0, 4, 0, 0, 0]
+
+
+def test_t_junction_connects_arcs_around_youngest_unit():
+    # A, the youngest unit, lies between the arcs at 120 and 240 degrees
+    bad, flips, missing, connect, counts = classify(
+        [arc(1, 0, rmu="B"), arc(2, 120, rmu="A"), arc(3, 240, rmu="C")]
+    )
+    assert bad == [] and flips == []
+    assert connect == [[2, 3]]
+    # A is younger than the hkey test value, so a concealed contact is missing
+    assert len(missing) == 1
+    assert counts == [0, 0, 1, 0, 0]
+
+
+def test_t_junction_with_null_map_unit():
+    # the unmapped area outside the map has no unit and is never covering
+    bad, flips, missing, connect, _ = classify(
+        [arc(1, 0, rmu="B"), arc(2, 120, rmu=None), arc(3, 240, rmu="C")]
+    )
+    assert bad == [] and missing == []
+    assert connect == [[2, 3]]
+
+
+def test_t_junction_rules():
+    bad, _, _, _, _ = classify(
+        [arc(1, 0), arc(2, 120, conc="Y"), arc(3, 240)],
+        [arc(4, 0), arc(5, 120, type="fault"), arc(6, 240, type="shoreline")],
+    )
+    assert notes(bad) == [
+        ["impossible number of concealed arcs"],
+        ["at least 2 arcs must be same Type"],
+    ]
+
+
+def test_crossings():
+    bad, _, _, connect, counts = classify(
+        [arc(1, 0), arc(2, 90), arc(3, 180), arc(4, 270)],
+        # a contact that continues concealed across another contact
+        [arc(5, 0, conc="Y"), arc(6, 90), arc(7, 180), arc(8, 270)],
+        [arc(9, 0, conc="Y"), arc(10, 90, conc="Y"), arc(11, 180, conc="Y"), arc(12, 270)],
+        [arc(13 + i, 72 * i) for i in range(5)],
+    )
+    assert notes(bad) == [["4 unconcealed arcs"], ["too many concealed arcs"], ["too many arcs"]]
+    assert connect == [[6, 8]]
+    assert counts == [0, 0, 0, 3, 1]
+
+
+def test_tiled_nodes_match_one_pass():
+    rng = random.Random(7)
+    xs, ys, items = [], [], []
+    # line ends on a lattice, some a little off so clusters cross tile edges
+    for k in range(600):
+        x = rng.randrange(20) + rng.choice((0, 0, 0.0004))
+        y = rng.randrange(20) + rng.choice((0, 0, 0.0004))
+        xs.append(x)
+        ys.append(y)
+        items.append(
+            arc(
+                k,
+                rng.choice((0, 90, 180, 270)) + rng.random(),
+                type=rng.choice(("contact", "fault")),
+                conc=rng.choice(("N", "N", "Y")),
+                rmu=rng.choice(("A", "B", "C", None)),
+                lmu=rng.choice(("A", "B", "C", None)),
+                tofrom=rng.choice(("From", "To")),
+            )
+        )
+    tolerance = 0.001
+    nodes = tn.build_nodes(xs, ys, items, tolerance, key=lambda a: a.LineDir)
+    expected = tn.classify_nodes(nodes, HKEYS, "02", is_fault)
+
+    node_list, groups, counts = tn.tiled_nodes(
+        xs, ys, items, tolerance, 3, HKEYS, "02", is_fault, workers=1
+    )
+    assert node_list == nodes
+    assert groups == expected[:4]
+    assert counts == expected[4]
@@ -0,0 +1,118 @@
+import json
+
+import validation_cache as vc
+
+SETTINGS = {"version": "2.0", "use_idfield": False}
+
+
+def make(tmp_path, fingerprints, settings=SETTINGS):
+    return vc.ValidationCache(tmp_path / "cache.json", settings, lambda t: fingerprints[t])
+
+
+def counter():
+    calls = []
+
+    def func(value):
+        def compute():
+            calls.append(value)
+            return value
+
+        return compute
+
+    return calls, func
+
+
+def test_hit_within_a_run(tmp_path):
+    cache = make(tmp_path, {"Glossary": [1]})
+    calls, func = counter()
+    assert cache.result("Glossary", "terms", func(["a", "b"])) == ["a", "b"]
+    assert cache.result("Glossary", "terms", func(["x"])) == ["a", "b"]
+    assert calls == [["a", "b"]]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_persisted_hit(tmp_path):
+    cache = make(tmp_path, {"Glossary": [1], "DataSources": [2]})
+    cache.result("Glossary", "terms", lambda: ("a", "b"))
+    cache.result("DataSources", "ids", lambda: ["DAS1"])
+    cache.save()
+
+    cache = make(tmp_path, {"Glossary": [1], "DataSources": [2]})
+    calls, func = counter()
+    # tuples come back as lists, from the cache and the first time alike
+    assert cache.result("Glossary", "terms", func(None)) == ["a", "b"]
+    assert cache.result("DataSources", "ids", func(None)) == ["DAS1"]
+    assert calls == []
+    assert cache.changed_tables() == []
+
+
+def test_changed_fingerprint_is_a_miss(tmp_path):
+    cache = make(tmp_path, {"Glossary": [1], "DataSources": [2]})
+    cache.result("Glossary", "terms", lambda: ["a"])
+    cache.result("DataSources", "ids", lambda: ["DAS1"])
+    cache.save()
+
+    cache = make(tmp_path, {"Glossary": [1, "edited"], "DataSources": [2]})
+    calls, func = counter()
+    assert cache.result("Glossary", "terms", func(["a", "c"])) == ["a", "c"]
+    assert cache.result("DataSources", "ids", func(None)) == ["DAS1"]
+    assert calls == [["a", "c"]]
+    assert cache.changed_tables() == ["Glossary"]
+
+
+def test_fingerprint_once_per_run(tmp_path):
+    calls = []
+
+    def fingerprint(table):
+        calls.append(table)
+        return 1
+
+    cache = vc.ValidationCache(tmp_path / "cache.json", SETTINGS, fingerprint)
+    for key in ("a", "b", "c"):
+        cache.result("Glossary", key, lambda: key)
+    assert cache.check("Glossary") is False
+    assert calls == ["Glossary"]
+
+
+def test_settings_change_drops_everything(tmp_path):
+    cache = make(tmp_path, {"Glossary": [1]})
+    cache.result("Glossary", "terms", lambda: ["a"])
+    cache.save()
+    cache = make(tmp_path, {"Glossary": [1]}, dict(SETTINGS, version="2.1"))
+    assert cache.tables == {}
+    assert cache.check("Glossary") is False
+
+
+def test_values_that_are_not_json_are_not_stored(tmp_path):
+    cache = make(tmp_path, {"Glossary": [1]})
+    calls, func = counter()
+    value = {"a", "b"}
+    assert cache.result("Glossary", "set", func(value)) is value
+    assert cache.result("Glossary", "set", func(value)) is value
+    assert len(calls) == 2
+    assert not vc.jsonable({1: "a"})
+    assert vc.jsonable({"a": [1, 2.0, None, (True, "x")]})
+
+
+def test_forget_and_keep(tmp_path):
+    cache = make(tmp_path, {"Glossary": [1], "DataSources": [2]})
+    cache.result("Glossary", "terms", lambda: ["a"])
+    cache.result("DataSources", "ids", lambda: ["DAS1"])
+    cache.forget("Glossary")
+    calls, func = counter()
+    cache.result("Glossary", "terms", func(["b"]))
+    assert calls == [["b"]]
+
+    cache.save(keep=["DataSources"])
+    with open(tmp_path / "cache.json") as f:
+        saved = json.load(f)
+    assert list(saved["tables"]) == ["DataSources"]
+    assert saved["settings"]["cache_version"] == vc.CACHE_VERSION
+    assert not (tmp_path / "cache.json.tmp").exists()
+
+
+def test_unreadable_cache_file(tmp_path):
+    (tmp_path / "cache.json").write_text("{not json")
+    cache = make(tmp_path, {"Glossary": [1]})
+    assert cache.tables == {}
+    assert cache.result("Glossary", "terms", lambda: ["a"]) == ["a"]